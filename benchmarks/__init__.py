@@ -0,0 +1,10 @@
+"""Hot-path benchmarks of DB-GPT, driven by in-process fake workers.
+
+Run all benchmarks and write the JSON report to a file:
+
+    python -m benchmarks --output bench.json
+
+Compare with the report of another commit:
+
+    python -m benchmarks --output bench.json --compare baseline.json
+"""
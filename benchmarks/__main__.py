@@ -0,0 +1,74 @@
+import argparse
+import json
+import logging
+import sys
+
+from benchmarks.runner import (
+    build_report,
+    compare_reports,
+    dump_report,
+    format_results,
+    registered_benchmarks,
+    run_benchmarks,
+)
+
+# Importing a module registers its benchmarks
+from benchmarks import (  # noqa: F401
+    bench_embeddings,
+    bench_history,
+    bench_http_client,
+    bench_inference,
+    bench_knowledge,
+    bench_proxy,
+    bench_streaming,
+    bench_worker_manager,
+)
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks", description="Run DB-GPT hot-path benchmarks"
+    )
+    parser.add_argument(
+        "-k",
+        "--filter",
+        action="append",
+        help="Only run benchmarks whose name contains the filter, can be repeated",
+    )
+    parser.add_argument(
+        "--quick", action="store_true", help="Small workloads, for smoke tests"
+    )
+    parser.add_argument(
+        "--output", help="Write the JSON report to file, default to stdout"
+    )
+    parser.add_argument(
+        "--compare", help="A JSON report of another run, print the metric ratios"
+    )
+    parser.add_argument("--list", action="store_true", help="List benchmarks")
+    options = parser.parse_args(args)
+
+    logging.basicConfig(
+        level=logging.WARNING, format="%(asctime)s %(levelname)s %(message)s"
+    )
+    if options.list:
+        print("\n".join(registered_benchmarks()))
+        return 0
+
+    results = run_benchmarks(options.filter, quick=options.quick)
+    report = build_report(results, quick=options.quick)
+    dump_report(report, options.output)
+    print(format_results(results), file=sys.stderr)
+    if options.compare:
+        with open(options.compare) as f:
+            baseline = json.load(f)
+        for row in compare_reports(baseline, report):
+            ratio = f"{row['ratio']:.3f}" if row["ratio"] is not None else "n/a"
+            print(
+                f"{row['benchmark']:<32} {row['case']:<36} {row['metric']:<24} {ratio}",
+                file=sys.stderr,
+            )
+    return 1 if any(r.status == "error" for r in results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,51 @@
+"""Benchmarks of embedding requests"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.fakes import FakeEmbeddingWorker
+from benchmarks.runner import BenchmarkContext, benchmark, latency_stats
+from pilot.model.cluster.embedding.batcher import EmbeddingMicroBatcher
+
+
+@benchmark("embeddings.micro_batcher")
+def bench_micro_batcher(ctx: BenchmarkContext):
+    """Texts per second of concurrent single-text callers, serial against micro-batched"""
+    worker = FakeEmbeddingWorker(cost_per_batch=0.005)
+    # One forward pass at a time, like a model on one device
+    device_lock = threading.Lock()
+
+    def _forward(texts):
+        with device_lock:
+            return worker.embeddings({"input": texts})
+
+    requests = ctx.scale(256, 32)
+    for callers in [1, 8, 32, 64]:
+        for mode in ["serial", "batched"]:
+            batcher = None
+            embed = _forward
+            if mode == "batched":
+                batcher = EmbeddingMicroBatcher(_forward, max_batch_size=64)
+                batcher.start()
+                embed = batcher.embed
+
+            def _call(i):
+                start = time.perf_counter()
+                embed([f"query text {i}"])
+                return time.perf_counter() - start
+
+            try:
+                with ThreadPoolExecutor(max_workers=callers) as executor:
+                    start = time.perf_counter()
+                    samples = list(executor.map(_call, range(requests)))
+                    cost = time.perf_counter() - start
+            finally:
+                if batcher:
+                    batcher.stop()
+            ctx.record(
+                f"{mode}_callers_{callers}",
+                {"mode": mode, "callers": callers, "requests": requests},
+                texts_per_s=requests / cost,
+                **latency_stats(samples),
+            )
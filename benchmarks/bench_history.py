@@ -0,0 +1,71 @@
+"""Benchmarks of chat history appends"""
+
+import os
+
+from benchmarks.runner import BenchmarkContext, benchmark, latency_stats, timed
+from pilot.scene.message import OnceConversation
+
+
+def _round(chat_order: int) -> OnceConversation:
+    once = OnceConversation("chat_normal")
+    once.chat_order = chat_order
+    once.model_name = "fake-model"
+    once.add_user_message(f"question {chat_order}")
+    once.add_ai_message("a long answer " * 100)
+    return once
+
+
+@benchmark("history.append", requires=["duckdb"])
+def bench_history_append(ctx: BenchmarkContext):
+    """Append latency of DuckdbHistoryMemory and DuckdbMessageHistoryMemory by conversation length"""
+    from pilot.memory.chat_history import duckdb_history
+    from pilot.memory.chat_history.duckdb_message_history import (
+        DuckdbMessageHistoryMemory,
+    )
+
+    checkpoints = [10, 100, 500] if not ctx.quick else [10, 50]
+    window = ctx.scale(10, 3)
+    legacy_path = os.path.join(ctx.work_dir, "legacy", "chat_history.db")
+    message_path = os.path.join(ctx.work_dir, "message", "chat_history.db")
+    os.makedirs(os.path.dirname(legacy_path), exist_ok=True)
+
+    origin = duckdb_history.duckdb_path
+    duckdb_history.duckdb_path = legacy_path
+    try:
+        factories = {
+            "duckdb": duckdb_history.DuckdbHistoryMemory,
+            "duckdb_message": lambda conv_uid: DuckdbMessageHistoryMemory(
+                conv_uid, db_path=message_path
+            ),
+        }
+        for store_type, factory in factories.items():
+            # The first round of new conversations, the conversation row is written
+            samples = []
+            for i in range(window):
+                memory = factory(f"bench_new_conv_{i}")
+                once = _round(1)
+                samples.extend(timed(lambda: memory.append(once), 1))
+            ctx.record(
+                f"{store_type}_rounds_1",
+                {"store_type": store_type, "rounds": 1},
+                **latency_stats(samples),
+            )
+
+            memory = factory("bench_conv")
+            rounds = 0
+            for checkpoint in checkpoints:
+                while rounds < checkpoint - window:
+                    rounds += 1
+                    memory.append(_round(rounds))
+                samples = []
+                for _ in range(window):
+                    rounds += 1
+                    once = _round(rounds)
+                    samples.extend(timed(lambda: memory.append(once), 1))
+                ctx.record(
+                    f"{store_type}_rounds_{checkpoint}",
+                    {"store_type": store_type, "rounds": checkpoint},
+                    **latency_stats(samples),
+                )
+    finally:
+        duckdb_history.duckdb_path = origin
@@ -0,0 +1,114 @@
+"""Benchmarks of the pooled HTTP clients against a loopback model worker"""
+
+import asyncio
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List
+
+from benchmarks.fakes import hash_vector
+from benchmarks.runner import BenchmarkContext, benchmark, latency_stats
+from pilot.model.cluster.worker.remote_worker import RemoteModelWorker
+from pilot.utils.http_client import (
+    HttpClientParameters,
+    HttpClientPool,
+    get_http_client_pool,
+    set_http_client_pool,
+)
+
+
+def _fake_worker_app():
+    """The embeddings endpoint of a model worker, vectors hashed from the texts"""
+    from fastapi import FastAPI
+
+    app = FastAPI()
+
+    @app.post("/api/worker/embeddings")
+    async def embeddings(params: Dict):
+        return [hash_vector(text) for text in params["input"]]
+
+    return app
+
+
+@contextmanager
+def _serve(app):
+    import uvicorn
+
+    server = uvicorn.Server(
+        uvicorn.Config(app, host="127.0.0.1", port=0, log_level="error", lifespan="off")
+    )
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+    try:
+        yield server.servers[0].sockets[0].getsockname()[1]
+    finally:
+        server.should_exit = True
+        thread.join()
+
+
+async def _fresh_client_embeddings(worker: RemoteModelWorker, params: Dict):
+    """The former remote worker: a new client, so a new connection, per call"""
+    import httpx
+
+    async with httpx.AsyncClient() as client:
+        response = await client.post(
+            worker.worker_addr + "/embeddings", json=params, timeout=worker.timeout
+        )
+        return response.json()
+
+
+async def _run_calls(call, concurrency: int, total: int) -> List[float]:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def _one():
+        async with semaphore:
+            start = time.perf_counter()
+            await call()
+            latencies.append(time.perf_counter() - start)
+
+    await asyncio.gather(*[_one() for _ in range(total)])
+    return latencies
+
+
+@benchmark("http_client.remote_worker", requires=["fastapi", "uvicorn", "httpx"])
+def bench_remote_worker_embeddings(ctx: BenchmarkContext):
+    """RemoteModelWorker.async_embeddings with a fresh client per call against the pooled client"""
+    total = ctx.scale(500, 100)
+    params = {"model": "fake-embedding", "input": ["select the answer from table"]}
+
+    with _serve(_fake_worker_app()) as port:
+        worker = RemoteModelWorker()
+        worker.load_worker(
+            "fake-embedding", "fake-embedding", host="127.0.0.1", port=port
+        )
+
+        async def _run(case: str, concurrency: int):
+            old_pool = get_http_client_pool()
+            pool = HttpClientPool(params=HttpClientParameters(http2=False))
+            set_http_client_pool(pool)
+            try:
+                if case == "fresh_client":
+                    call = lambda: _fresh_client_embeddings(worker, params)
+                else:
+                    call = lambda: worker.async_embeddings(params)
+                # Warm up, the pooled client opens its connections here
+                await _run_calls(call, concurrency, concurrency)
+                start = time.perf_counter()
+                latencies = await _run_calls(call, concurrency, total)
+                return latencies, time.perf_counter() - start
+            finally:
+                await pool.aclose()
+                set_http_client_pool(old_pool)
+
+        for concurrency in [1, 16]:
+            for case in ["fresh_client", "pooled"]:
+                latencies, elapsed = ctx.run_async(_run(case, concurrency))
+                ctx.record(
+                    f"{case}_c{concurrency}",
+                    {"concurrency": concurrency, "calls": total},
+                    calls_per_s=total / elapsed,
+                    **latency_stats(latencies),
+                )
@@ -0,0 +1,194 @@
+"""Benchmarks of the Hugging Face decoding loop on CPU"""
+
+import random
+import time
+from typing import Callable, List
+
+from benchmarks.runner import BenchmarkContext, benchmark, latency_stats
+from pilot.model.llm_utils import is_partial_stop
+
+_WORDS = (
+    "The database returns the sum of sales by region and month. SELECT region, "
+    "sum(amount) FROM orders GROUP BY region; 数据库 查询 表格 émigré naïve ✅ 🚀 "
+    "It's done, isn't it? 1234 5678"
+).split()
+
+_STOP = "###"
+
+_DECODE_KWARGS = dict(
+    skip_special_tokens=True,
+    spaces_between_special_tokens=False,
+    clean_up_tokenization_spaces=True,
+)
+
+
+def _train_tokenizer():
+    """Byte level BPE trained on the fly, no model files are downloaded"""
+    from tokenizers import Tokenizer, decoders, models, pre_tokenizers, trainers
+    from transformers import PreTrainedTokenizerFast
+
+    tokenizer = Tokenizer(models.BPE())
+    tokenizer.pre_tokenizer = pre_tokenizers.ByteLevel(add_prefix_space=False)
+    tokenizer.decoder = decoders.ByteLevel()
+    trainer = trainers.BpeTrainer(
+        vocab_size=1000,
+        special_tokens=["</s>"],
+        initial_alphabet=pre_tokenizers.ByteLevel.alphabet(),
+    )
+    rng = random.Random(0)
+    corpus = [" ".join(rng.choice(_WORDS) for _ in range(50)) for _ in range(200)]
+    tokenizer.train_from_iterator(corpus, trainer)
+    return PreTrainedTokenizerFast(tokenizer_object=tokenizer, eos_token="</s>")
+
+
+def _full_decode_loop(tokenizer, prompt_ids, generated, stream_interval, on_step):
+    """Decode all tokens and search the whole text, as the loop did before"""
+    output_ids = list(prompt_ids)
+    output = ""
+    for i, token in enumerate(generated):
+        output_ids.append(token)
+        if i % stream_interval == 0 or i == len(generated) - 1:
+            output = tokenizer.decode(output_ids[len(prompt_ids) :], **_DECODE_KWARGS)
+            if output.rfind(_STOP, 0) == -1:
+                is_partial_stop(output, _STOP)
+        on_step(i)
+    return output
+
+
+def _incremental_loop(tokenizer, prompt_ids, generated, stream_interval, on_step):
+    from pilot.model.detokenizer import IncrementalDetokenizer, StopStringScanner
+
+    output_ids = list(prompt_ids)
+    detokenizer = IncrementalDetokenizer(tokenizer, prompt_ids, echo=False)
+    scanner = StopStringScanner(_STOP)
+    output = ""
+    for i, token in enumerate(generated):
+        output_ids.append(token)
+        final = i == len(generated) - 1
+        if i % stream_interval == 0 or final:
+            output = detokenizer.decode(output_ids, final=final)
+            scanner.scan(output)
+        on_step(i)
+    return output
+
+
+@benchmark("inference.detokenize", requires=["tokenizers", "transformers"])
+def bench_detokenize(ctx: BenchmarkContext):
+    """Per-token CPU cost of detokenization and stop string search by output length"""
+    tokenizer = _train_tokenizer()
+    num_tokens = ctx.scale(4096, 1024)
+    rng = random.Random(42)
+    generated: List[int] = []
+    while len(generated) < num_tokens:
+        text = " ".join(rng.choice(_WORDS) for _ in range(200))
+        generated.extend(tokenizer(" " + text).input_ids)
+    generated = generated[:num_tokens]
+    prompt_ids = tokenizer("Question: sum of sales by region").input_ids
+    expected = tokenizer.decode(generated, **_DECODE_KWARGS)
+    window = num_tokens // 8
+    stream_interval = 2
+
+    loops: List[Callable] = [_full_decode_loop, _incremental_loop]
+    for mode, loop in zip(["full_decode", "incremental"], loops):
+        step_ends = [0.0] * num_tokens
+
+        def _on_step(i):
+            step_ends[i] = time.perf_counter()
+
+        start = time.perf_counter()
+        output = loop(tokenizer, prompt_ids, generated, stream_interval, _on_step)
+        cost = time.perf_counter() - start
+        first_cost = step_ends[window - 1] - start
+        last_cost = step_ends[-1] - step_ends[-window - 1]
+        ctx.record(
+            mode,
+            {
+                "tokens": num_tokens,
+                "stream_interval": stream_interval,
+                "window_tokens": window,
+            },
+            tokens_per_s=num_tokens / cost,
+            first_us_per_token=first_cost / window * 1e6,
+            last_us_per_token=last_cost / window * 1e6,
+            # 1.0 means constant cost per token
+            last_to_first_ratio=last_cost / first_cost,
+            same_output=int(output == expected),
+        )
+
+
+class _CharTokenizer:
+    """Every character is one token, 0 is the eos token"""
+
+    eos_token_id = 0
+
+    class _Encoding:
+        def __init__(self, input_ids):
+            self.input_ids = input_ids
+
+    def __call__(self, text: str):
+        return self._Encoding([1 + ord(c) % 200 for c in text])
+
+    def decode(self, ids, **kwargs) -> str:
+        return "".join(chr(ord("a") + i % 26) for i in ids if i != self.eos_token_id)
+
+
+def _time_to_first_token(model, prompt: str, prefix_cache) -> float:
+    from pilot.model.inference import generate_stream
+
+    params = {"prompt": prompt, "temperature": 0, "max_new_tokens": 8, "echo": False}
+    start = time.perf_counter()
+    stream = generate_stream(
+        model, _CharTokenizer(), params, "cpu", 8192, prefix_cache=prefix_cache
+    )
+    next(stream)
+    cost = time.perf_counter() - start
+    stream.close()
+    return cost
+
+
+@benchmark("inference.prefix_cache", requires=["torch", "transformers"])
+def bench_prefix_cache(ctx: BenchmarkContext):
+    """Time to first token of prompts sharing a system prompt, with and without the
+    prefix KV cache"""
+    import torch
+    from transformers import LlamaConfig, LlamaForCausalLM
+
+    from pilot.model.prefix_cache import PrefixKVCache
+
+    torch.manual_seed(0)
+    config = LlamaConfig(
+        vocab_size=256,
+        hidden_size=256,
+        intermediate_size=512,
+        num_hidden_layers=4,
+        num_attention_heads=4,
+        num_key_value_heads=4,
+        max_position_embeddings=8192,
+    )
+    model = LlamaForCausalLM(config).eval()
+    rng = random.Random(0)
+    requests = ctx.scale(20, 5)
+    for system_tokens in [ctx.scale(512, 256), ctx.scale(2048, 1024)]:
+        system_prompt = "".join(rng.choice("abcdefgh ") for _ in range(system_tokens))
+        questions = [
+            " Question: " + " ".join(rng.choice(_WORDS) for _ in range(8))
+            for _ in range(requests)
+        ]
+        for mode in ["no_cache", "prefix_cache"]:
+            prefix_cache = PrefixKVCache() if mode == "prefix_cache" else None
+            # The first request fills the cache
+            _time_to_first_token(model, system_prompt, prefix_cache)
+            samples = [
+                _time_to_first_token(model, system_prompt + question, prefix_cache)
+                for question in questions
+            ]
+            metrics = latency_stats(samples, "ttft_")
+            if prefix_cache:
+                stats = prefix_cache.stats()
+                metrics["hit_rate"] = stats.hit_rate
+                metrics["saved_prefill_rate"] = stats.saved_prefill_rate
+            ctx.record(
+                mode,
+                {"system_tokens": system_tokens, "requests": requests},
+                **metrics,
+            )
@@ -0,0 +1,215 @@
+"""Benchmarks of knowledge retrieval and ingestion"""
+
+import random
+import threading
+import time
+from typing import Any, Dict, List
+
+from benchmarks.fakes import HashEmbeddings
+from benchmarks.runner import BenchmarkContext, benchmark, latency_stats, timed
+from pilot.server.knowledge.ingestion import (
+    IngestionHandler,
+    IngestionParameters,
+    IngestionPipeline,
+)
+
+_WORDS = (
+    "database table column index query join select order group sum count user "
+    "sales region product revenue month year customer report metric vector model"
+).split()
+
+
+def _text(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(_WORDS) for _ in range(words))
+
+
+def _chroma_store(work_dir: str, name: str, embeddings):
+    from pilot.vector_store.chroma_store import ChromaStore
+
+    return ChromaStore(
+        {
+            "vector_store_name": name,
+            "chroma_persist_path": work_dir,
+            "embeddings": embeddings,
+        }
+    )
+
+
+@benchmark("knowledge.chroma_similar_search", requires=["chromadb", "langchain"])
+def bench_chroma_similar_search(ctx: BenchmarkContext):
+    """ChromaStore.similar_search latency by collection size"""
+    from langchain.schema import Document
+
+    rng = random.Random(42)
+    embeddings = HashEmbeddings()
+    queries = [_text(rng, 8) for _ in range(ctx.scale(50, 5))]
+    loaded = 0
+    store = _chroma_store(ctx.work_dir, "bench_search", embeddings)
+    for size in [1000, 10000] if not ctx.quick else [200]:
+        documents = [
+            Document(page_content=_text(rng, 40), metadata={"source": f"doc{i}"})
+            for i in range(loaded, size)
+        ]
+        for start in range(0, len(documents), 1000):
+            store.load_document(documents[start : start + 1000])
+        loaded = size
+        for topk in [5, 20]:
+            samples = []
+            for query in queries:
+                samples.extend(timed(lambda: store.similar_search(query, topk), 1))
+            ctx.record(
+                f"docs_{size}_topk_{topk}",
+                {"documents": size, "topk": topk, "queries": len(queries)},
+                qps=len(samples) / sum(samples),
+                **latency_stats(samples),
+            )
+
+
+class _CountingHandler(IngestionHandler):
+    """Stages cost like reading files, an embedding model and a vector store"""
+
+    def __init__(self, load_cost: float, embed_cost: float, index_cost: float):
+        self.load_cost = load_cost
+        self.embed_cost = embed_cost
+        self.index_cost = index_cost
+        # Only one forward pass at a time, like a model on one device
+        self._embed_lock = threading.Lock()
+
+    def load(self, document):
+        time.sleep(self.load_cost)
+        return document
+
+    def split(self, document, loaded) -> List[Any]:
+        return [f"{loaded[0]} chunk {i}" for i in range(loaded[1])]
+
+    def embed(self, document, chunks):
+        with self._embed_lock:
+            time.sleep(self.embed_cost)
+        return [[0.0] for _ in chunks]
+
+    def index(self, document, chunks, embeddings):
+        time.sleep(self.index_cost)
+        return [str(i) for i in range(len(chunks))]
+
+
+@benchmark("knowledge.ingestion_pipeline")
+def bench_ingestion_pipeline(ctx: BenchmarkContext):
+    """Documents per second of the ingestion pipeline against the serial read-then-embed loop"""
+    docs = [(f"doc{i}", 96) for i in range(ctx.scale(32, 4))]
+    handler = _CountingHandler(load_cost=0.04, embed_cost=0.01, index_cost=0.002)
+    batch_size = 32
+
+    start = time.perf_counter()
+    for doc in docs:
+        chunks = handler.split(doc, handler.load(doc))
+        for i in range(0, len(chunks), batch_size):
+            batch = chunks[i : i + batch_size]
+            handler.index(doc, batch, handler.embed(doc, batch))
+    serial_cost = time.perf_counter() - start
+    ctx.record(
+        "serial",
+        {"documents": len(docs), "batch_size": batch_size},
+        docs_per_s=len(docs) / serial_cost,
+    )
+
+    for load_workers in [1, 4]:
+        pipeline = IngestionPipeline(
+            IngestionParameters(load_workers=load_workers, batch_size=batch_size)
+        )
+        try:
+            start = time.perf_counter()
+            for doc in docs:
+                pipeline.submit(doc, handler)
+            pipeline.join()
+            cost = time.perf_counter() - start
+        finally:
+            pipeline.stop()
+        ctx.record(
+            f"pipeline_load_workers_{load_workers}",
+            {
+                "documents": len(docs),
+                "batch_size": batch_size,
+                "load_workers": load_workers,
+            },
+            docs_per_s=len(docs) / cost,
+            speedup=serial_cost / cost,
+        )
+
+
+class _MemoryDocumentDao:
+    def update_knowledge_document(self, document):
+        return document.id
+
+
+class _MemoryChunkDao:
+    def __init__(self) -> None:
+        self.chunks = 0
+
+    def create_documents_chunks(self, chunks: List):
+        self.chunks += len(chunks)
+
+
+@benchmark(
+    "knowledge.service_ingestion",
+    requires=["chromadb", "langchain", "sqlalchemy"],
+)
+def bench_service_ingestion(ctx: BenchmarkContext):
+    """KnowledgeService document ingestion into Chroma with hashed embeddings"""
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+    from pilot.server.knowledge import service
+    from pilot.server.knowledge.document_db import KnowledgeDocumentEntity
+
+    rng = random.Random(42)
+    num_docs = ctx.scale(16, 2)
+    docs = [
+        KnowledgeDocumentEntity(
+            id=i,
+            doc_name=f"doc{i}",
+            doc_type="TEXT",
+            space="bench_space",
+            content="\n\n".join(_text(rng, 60) for _ in range(50)),
+        )
+        for i in range(num_docs)
+    ]
+    origin = (service.knowledge_document_dao, service.document_chunk_dao)
+    chunk_dao = _MemoryChunkDao()
+    service.knowledge_document_dao = _MemoryDocumentDao()
+    service.document_chunk_dao = chunk_dao
+    try:
+        for precomputed in [False, True]:
+            space = f"bench_space_{int(precomputed)}"
+            vector_store_config: Dict[str, Any] = {
+                "vector_store_name": space,
+                "vector_store_type": "Chroma",
+                "chroma_persist_path": ctx.work_dir,
+                "embeddings": HashEmbeddings(cost_per_text=0.0005),
+            }
+            handler = service.KnowledgeDocumentIngestion(
+                vector_store_config=vector_store_config,
+                text_splitter=RecursiveCharacterTextSplitter(
+                    chunk_size=500, chunk_overlap=50
+                ),
+            )
+            if not precomputed:
+                # Embed in the index stage, like vector stores without precomputed embeddings
+                handler.embed = lambda doc, chunks: None
+            pipeline = IngestionPipeline()
+            try:
+                start = time.perf_counter()
+                handles = [pipeline.submit(doc, handler) for doc in docs]
+                pipeline.join()
+                cost = time.perf_counter() - start
+            finally:
+                pipeline.stop()
+            failed = [h for h in handles if h.failed]
+            if failed:
+                raise failed[0].error
+            ctx.record(
+                "embed_stage" if precomputed else "embed_in_vector_store",
+                {"documents": num_docs},
+                docs_per_s=num_docs / cost,
+                chunks_per_s=pipeline.stats().chunks / cost,
+            )
+    finally:
+        service.knowledge_document_dao, service.document_chunk_dao = origin
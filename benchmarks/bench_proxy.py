@@ -0,0 +1,489 @@
+"""Benchmarks of proxy LLM requests against the mock proxy LLM server"""
+
+import asyncio
+import json
+import random
+import socket
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+from benchmarks.runner import BenchmarkContext, benchmark, latency_stats
+from pilot.model.parameter import MockProxyServerParameters
+from pilot.model.proxy.data_privacy.mask.masking import DataMasker
+from pilot.model.proxy.data_privacy.mask.recovery import StreamingRecovery
+from pilot.model.proxy.data_privacy.sensitive_detection import (
+    BUILTIN_PATTERNS,
+    SensitiveDetector,
+)
+from pilot.model.proxy.mock_server import create_mock_proxy_app
+from pilot.model.proxy.rate_limit import RateLimiter
+from pilot.model.proxy.stream_parser import stream_deltas
+from pilot.model.proxy.transport import (
+    ProxyEndpoint,
+    ProxyTransport,
+    RetryPolicy,
+)
+from pilot.utils.http_client import HttpClientPool
+
+_PAYLOAD = {
+    "model": "mock-model",
+    "messages": [{"role": "user", "content": "hello"}],
+    "stream": True,
+}
+
+
+def _mock_openai_app(
+    num_tokens: int,
+    token_interval: float,
+    error_rate: float = 0.0,
+    requests_per_minute: Optional[float] = None,
+    burst: int = 1,
+):
+    """The mock proxy LLM server streaming a token every token_interval"""
+    return create_mock_proxy_app(
+        MockProxyServerParameters(
+            ttft=token_interval,
+            tokens_per_second=1 / token_interval,
+            num_tokens=num_tokens,
+            error_rate=error_rate,
+            requests_per_minute=requests_per_minute,
+            rate_limit_burst=burst,
+            seed=0,
+        )
+    )
+
+
+@contextmanager
+def _serve(app):
+    import uvicorn
+
+    server = uvicorn.Server(
+        uvicorn.Config(app, host="127.0.0.1", port=0, log_level="error", lifespan="off")
+    )
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+    port = server.servers[0].sockets[0].getsockname()[1]
+    try:
+        yield f"http://127.0.0.1:{port}/v1/chat/completions"
+    finally:
+        server.should_exit = True
+        thread.join()
+
+
+def _closed_port_url() -> str:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    return f"http://127.0.0.1:{port}/v1/chat/completions"
+
+
+def _requests_stream(url: str) -> float:
+    """The former proxy client: a new connection per request, read in a thread"""
+    import requests
+
+    start = time.perf_counter()
+    first = None
+    with requests.post(url, json=_PAYLOAD, stream=True) as res:
+        for line in res.iter_lines():
+            if line and first is None:
+                first = time.perf_counter() - start
+    return first
+
+
+async def _transport_stream(
+    transport: ProxyTransport, endpoints: List[ProxyEndpoint]
+) -> Optional[float]:
+    start = time.perf_counter()
+    first = None
+    async for line in transport.stream_lines(endpoints):
+        if line and first is None:
+            first = time.perf_counter() - start
+    return first
+
+
+async def _run_concurrent(
+    concurrency: int, total: int, request_func
+) -> Tuple[List[float], List[float], int, float]:
+    """Run total requests, concurrency at a time, return ttft, latencies, failures, time"""
+    semaphore = asyncio.Semaphore(concurrency)
+    ttft, latencies, failures = [], [], 0
+
+    async def _one():
+        nonlocal failures
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                ttft.append(await request_func())
+                latencies.append(time.perf_counter() - start)
+            except Exception:
+                failures += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*[_one() for _ in range(total)])
+    return ttft, latencies, failures, time.perf_counter() - start
+
+
+@benchmark("proxy.transport", requires=["fastapi", "uvicorn", "httpx", "requests"])
+def bench_proxy_transport(ctx: BenchmarkContext):
+    """Concurrent streams through the pooled async transport against a fresh connection per request in threads"""
+    num_tokens = ctx.scale(64, 16)
+    token_interval = 0.005
+    concurrency = ctx.scale(64, 16)
+    total = concurrency * ctx.scale(4, 2)
+    app = _mock_openai_app(num_tokens, token_interval)
+    params = {
+        "tokens": num_tokens,
+        "token_interval_ms": token_interval * 1000,
+        "concurrency": concurrency,
+        "requests": total,
+    }
+
+    with _serve(app) as url:
+
+        async def _run_requests():
+            loop = asyncio.get_running_loop()
+            # Sync proxy streams ran in the default executor of worker manager
+            return await _run_concurrent(
+                concurrency,
+                total,
+                lambda: loop.run_in_executor(None, _requests_stream, url),
+            )
+
+        async def _run_transport():
+            pool = HttpClientPool()
+            transport = ProxyTransport(http_client_pool=pool)
+            try:
+                return await _run_concurrent(
+                    concurrency,
+                    total,
+                    lambda: _transport_stream(
+                        transport, [ProxyEndpoint(url, _PAYLOAD)]
+                    ),
+                )
+            finally:
+                await pool.aclose()
+
+        for case, run in [
+            ("requests_per_call", _run_requests),
+            ("pooled_async", _run_transport),
+        ]:
+            ttft, latencies, failures, elapsed = ctx.run_async(run())
+            ctx.record(
+                case,
+                params,
+                requests_per_s=total / elapsed,
+                failures=failures,
+                **latency_stats(ttft, "ttft_"),
+                **latency_stats(latencies, "total_"),
+            )
+
+
+@benchmark(
+    "proxy.transport_errors", requires=["fastapi", "uvicorn", "httpx", "requests"]
+)
+def bench_proxy_transport_errors(ctx: BenchmarkContext):
+    """Success rate of streams when the server rejects requests with 503 or is down"""
+    num_tokens = 8
+    error_rate = 0.3
+    concurrency = 16
+    total = ctx.scale(400, 64)
+    app = _mock_openai_app(num_tokens, 0.001, error_rate=error_rate)
+
+    with _serve(app) as url:
+
+        async def _run(max_retries: int, endpoints: List[ProxyEndpoint]):
+            pool = HttpClientPool()
+            transport = ProxyTransport(
+                retry_policy=RetryPolicy(
+                    max_retries=max_retries, backoff_base=0.01, backoff_max=0.1
+                ),
+                http_client_pool=pool,
+            )
+            try:
+                result = await _run_concurrent(
+                    concurrency, total, lambda: _transport_stream(transport, endpoints)
+                )
+            finally:
+                await pool.aclose()
+            return result, transport.stats()
+
+        primary = [ProxyEndpoint(url, _PAYLOAD)]
+        down = [ProxyEndpoint(_closed_port_url(), _PAYLOAD)]
+        cases = [
+            ("no_retry", 0, primary),
+            ("retry", 3, primary),
+            ("primary_down_no_failover", 1, down),
+            ("primary_down_failover", 1, down + primary),
+        ]
+        for case, max_retries, endpoints in cases:
+            (_, latencies, failures, _), stats = ctx.run_async(
+                _run(max_retries, endpoints)
+            )
+            ctx.record(
+                case,
+                {
+                    "error_rate": error_rate,
+                    "max_retries": max_retries,
+                    "requests": total,
+                },
+                success_rate=(total - failures) / total,
+                retries=stats.retries,
+                failovers=stats.failovers,
+                **latency_stats(latencies, "total_"),
+            )
+
+
+@benchmark("proxy.rate_limit", requires=["fastapi", "uvicorn", "httpx"])
+def bench_proxy_rate_limit(ctx: BenchmarkContext):
+    """429s and failures at twice the request rate a rate limited server allows"""
+    requests_per_minute = 1200
+    burst = 5
+    concurrency = 16
+    total = ctx.scale(200, 60)
+    # Offered 2x the allowed rate
+    interval = 60 / requests_per_minute / 2
+
+    async def _run(url: str, rate_limiter_factory):
+        pool = HttpClientPool()
+        transport = ProxyTransport(
+            retry_policy=RetryPolicy(max_retries=3, backoff_base=0.05),
+            http_client_pool=pool,
+            rate_limiter_factory=rate_limiter_factory,
+        )
+        semaphore = asyncio.Semaphore(concurrency)
+        latencies, failures = [], 0
+
+        async def _one():
+            nonlocal failures
+            async with semaphore:
+                start = time.perf_counter()
+                try:
+                    await _transport_stream(transport, [ProxyEndpoint(url, _PAYLOAD)])
+                    latencies.append(time.perf_counter() - start)
+                except Exception:
+                    failures += 1
+
+        tasks = []
+        for _ in range(total):
+            tasks.append(asyncio.create_task(_one()))
+            await asyncio.sleep(interval)
+        await asyncio.gather(*tasks)
+        await pool.aclose()
+        return latencies, failures, transport.rate_limiter_stats()
+
+    cases = [
+        ("retry_only", None),
+        ("rate_limiter", lambda: RateLimiter(max_wait=60)),
+    ]
+    for case, rate_limiter_factory in cases:
+        app = _mock_openai_app(
+            4, 0.001, requests_per_minute=requests_per_minute, burst=burst
+        )
+        with _serve(app) as url:
+            latencies, failures, limiter_stats = ctx.run_async(
+                _run(url, rate_limiter_factory)
+            )
+        limiter_stats = next(iter(limiter_stats.values()), {})
+        ctx.record(
+            case,
+            {
+                "server_requests_per_minute": requests_per_minute,
+                "server_burst": burst,
+                "offered_load": 2,
+                "requests": total,
+            },
+            rejected_429=app.state.stats.rejected,
+            failures=failures,
+            max_queue_depth=limiter_stats.get("max_queue_depth", 0),
+            mean_wait_ms=limiter_stats.get("mean_wait_seconds", 0) * 1000,
+            **latency_stats(latencies, "total_"),
+        )
+
+
+def _recorded_openai_stream(num_tokens: int, seed: int = 0) -> List[bytes]:
+    """A long OpenAI stream with full chunk objects, cut at random network boundaries"""
+    rng = random.Random(seed)
+    words = ["数据", "库", " select", " from", " where", " the", " 表", ",", "\n"]
+    events = []
+    for i in range(num_tokens):
+        chunk = {
+            "id": "chatcmpl-8mockmockmockmockmock",
+            "object": "chat.completion.chunk",
+            "created": 1700000000,
+            "model": "gpt-3.5-turbo-0613",
+            "choices": [
+                {
+                    "index": 0,
+                    "delta": {"content": rng.choice(words)},
+                    "finish_reason": None,
+                }
+            ],
+        }
+        events.append(f"data: {json.dumps(chunk)}\n\n")
+    events.append("data: [DONE]\n\n")
+    body = "".join(events).encode("utf-8")
+    chunks, start = [], 0
+    while start < len(body):
+        # Anything from a part of an event to a burst of events, split mid-character
+        end = start + rng.randint(16, 2048)
+        chunks.append(body[start:end])
+        start = end
+    return chunks
+
+
+async def _replay(chunks: List[bytes]):
+    for chunk in chunks:
+        yield chunk
+
+
+async def _line_parse_stream(chunks: List[bytes]):
+    """The former chatgpt stream: decode lines, strip the prefix, one yield per event"""
+    import httpx
+
+    res = httpx.Response(200, content=_replay(chunks))
+    text = ""
+    async for line in res.aiter_lines():
+        if line:
+            json_data = line.split(": ", 1)[1]
+            decoded_line = json_data
+            if decoded_line.lower() != "[DONE]".lower():
+                obj = json.loads(json_data)
+                if obj["choices"][0]["delta"].get("content") is not None:
+                    content = obj["choices"][0]["delta"]["content"]
+                    text += content
+                    yield text
+
+
+async def _bytes_parse_stream(chunks: List[bytes]):
+    import httpx
+
+    res = httpx.Response(200, content=_replay(chunks))
+    text = ""
+    async for delta in stream_deltas(res.aiter_bytes(), "openai"):
+        text += delta
+        yield text
+
+
+@benchmark("proxy.stream_parse", requires=["httpx"])
+def bench_proxy_stream_parse(ctx: BenchmarkContext):
+    """CPU per token of parsing a recorded long OpenAI stream, line based against incremental bytes"""
+    num_tokens = ctx.scale(20000, 4000)
+    repeats = ctx.scale(5, 2)
+    chunks = _recorded_openai_stream(num_tokens)
+
+    async def _consume(stream_func) -> Tuple[float, int, str]:
+        yields, text = 0, ""
+        start = time.process_time()
+        async for text in stream_func(chunks):
+            yields += 1
+        return time.process_time() - start, yields, text
+
+    results = {}
+    for case, stream_func in [
+        ("line_decode", _line_parse_stream),
+        ("incremental_bytes", _bytes_parse_stream),
+    ]:
+        samples = []
+        for _ in range(repeats):
+            cpu, yields, text = ctx.run_async(_consume(stream_func))
+            samples.append(cpu)
+        results[case] = text
+        ctx.record(
+            case,
+            {
+                "tokens": num_tokens,
+                "bytes": sum(len(c) for c in chunks),
+                "network_chunks": len(chunks),
+            },
+            cpu_us_per_token=min(samples) / num_tokens * 1e6,
+            yields=yields,
+        )
+    assert results["line_decode"] == results["incremental_bytes"]
+
+
+def _masking_corpus(
+    num_terms: int, size_kb: int, seed: int = 0
+) -> Tuple[Dict[str, List[str]], str]:
+    """Table and customer terms, and a prompt with schema text mentioning some of them"""
+    rng = random.Random(seed)
+    tables = [
+        f"t_{rng.choice(['sales', 'user', 'order', 'crm'])}_{i}"
+        for i in range(num_terms)
+    ]
+    customers = [f"Customer {i:05d} Ltd" for i in range(num_terms)]
+    words = ["select", "from", "where", "id", "name", "amount", "客户", "订单", "and"]
+    parts, size = [], 0
+    while size < size_kb * 1024:
+        word = rng.choice(words)
+        if rng.random() < 0.05:
+            word = rng.choice(tables)
+        elif rng.random() < 0.02:
+            word = rng.choice(customers)
+        parts.append(word)
+        size += len(word.encode("utf-8")) + 1
+    return {"table": tables, "customer": customers}, " ".join(parts)
+
+
+@benchmark("proxy.data_mask")
+def bench_proxy_data_mask(ctx: BenchmarkContext):
+    """Overhead per KB of masking prompts and recovering streamed outputs, automaton against a regex per term"""
+    num_terms = ctx.scale(2000, 500)
+    size_kb = ctx.scale(64, 16)
+    repeats = ctx.scale(5, 3)
+    terms, prompt = _masking_corpus(num_terms, size_kb)
+    kb = len(prompt.encode("utf-8")) / 1024
+    patterns = {"email": BUILTIN_PATTERNS["email"]}
+    params = {"terms": num_terms * 2, "prompt_kb": round(kb, 1)}
+
+    def _best(func) -> float:
+        samples = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            func()
+            samples.append(time.perf_counter() - start)
+        return min(samples)
+
+    def _regex_per_term():
+        """The ad-hoc layer: one substitution per term"""
+        import re
+
+        text = prompt
+        for category, values in terms.items():
+            for i, value in enumerate(values):
+                text = re.sub(re.escape(value), f"__{category.upper()}_{i}__", text)
+        for category, pattern in patterns.items():
+            text = re.sub(pattern, f"__{category.upper()}__", text)
+        return text
+
+    detector = SensitiveDetector(terms=terms, patterns=patterns)
+    masker = DataMasker(detector)
+    masked = masker.mask(prompt)
+    # Streamed like tokens of a few characters
+    chunks = [masked[i : i + 4] for i in range(0, len(masked), 4)]
+
+    def _recover():
+        recovery = StreamingRecovery(masker.mapping)
+        for chunk in chunks:
+            recovery.feed(chunk)
+        recovery.flush()
+
+    ctx.record(
+        "regex_per_term_mask",
+        params,
+        us_per_kb=_best(_regex_per_term) / kb * 1e6,
+    )
+    ctx.record(
+        "automaton_mask",
+        params,
+        us_per_kb=_best(lambda: DataMasker(detector).mask(prompt)) / kb * 1e6,
+        masked_values=len(masker.mapping),
+    )
+    ctx.record(
+        "automaton_stream_recover",
+        {**params, "chunk_chars": 4},
+        us_per_kb=_best(_recover) / kb * 1e6,
+    )
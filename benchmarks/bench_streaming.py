@@ -0,0 +1,164 @@
+"""Benchmarks of the streaming endpoints: /worker/generate_stream and /v1/chat/completions"""
+
+import json
+import os
+import time
+
+from benchmarks.fakes import (
+    FAKE_MODEL_NAME,
+    FakeModelWorker,
+    add_fake_worker,
+    fake_prompt_params,
+)
+from benchmarks.runner import BenchmarkContext, benchmark, latency_stats
+from pilot.model.cluster.stream_protocol import (
+    STREAM_PROTOCOL_DELTA_V1,
+    STREAM_PROTOCOL_FULL,
+    STREAM_PROTOCOL_HEADER,
+    DeltaStreamDecoder,
+)
+from pilot.model.cluster.worker.manager import LocalWorkerManager
+
+
+def _asgi_client(app):
+    import httpx
+
+    return httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=app), base_url="http://benchmark"
+    )
+
+
+@benchmark("streaming.worker_generate_stream", requires=["fastapi", "httpx"])
+def bench_worker_generate_stream(ctx: BenchmarkContext):
+    """Bytes on the wire and time of one stream with the full and the delta protocol"""
+    from fastapi import FastAPI
+
+    from pilot.model.cluster.worker import manager as manager_module
+
+    num_tokens = ctx.scale(2000, 200)
+    local_manager = LocalWorkerManager()
+    add_fake_worker(local_manager, FakeModelWorker(num_tokens=num_tokens))
+    app = FastAPI()
+    app.include_router(manager_module.router, prefix="/api")
+    repeat = ctx.scale(5, 1)
+
+    async def _run(protocol: str):
+        samples, wire_bytes = [], 0
+        async with _asgi_client(app) as client:
+            for _ in range(repeat):
+                start = time.perf_counter()
+                response = await client.post(
+                    "/api/worker/generate_stream",
+                    json=fake_prompt_params(messages=[], max_new_tokens=num_tokens),
+                    headers={STREAM_PROTOCOL_HEADER: protocol},
+                )
+                response.raise_for_status()
+                content = response.content
+                decoder = DeltaStreamDecoder()
+                for chunk in content.split(b"\0"):
+                    if not chunk:
+                        continue
+                    data = json.loads(chunk)
+                    if protocol == STREAM_PROTOCOL_DELTA_V1:
+                        decoder.decode(data)
+                samples.append(time.perf_counter() - start)
+                wire_bytes = len(content)
+        return samples, wire_bytes
+
+    origin = manager_module.worker_manager.worker_manager
+    manager_module.worker_manager.worker_manager = local_manager
+    try:
+        for protocol in [STREAM_PROTOCOL_FULL, STREAM_PROTOCOL_DELTA_V1]:
+            samples, wire_bytes = ctx.run_async(_run(protocol))
+            ctx.record(
+                protocol,
+                {"tokens": num_tokens, "requests": repeat},
+                wire_bytes=wire_bytes,
+                **latency_stats(samples),
+            )
+    finally:
+        manager_module.worker_manager.worker_manager = origin
+
+
+@benchmark(
+    "streaming.chat_completions",
+    requires=["fastapi", "httpx", "langchain", "chromadb", "sqlalchemy"],
+)
+def bench_chat_completions(ctx: BenchmarkContext):
+    """Time to first event and total time of /v1/chat/completions in chat_normal mode"""
+    from fastapi import FastAPI
+
+    from pilot.component import SystemApp
+    from pilot.configs.config import Config
+    from pilot.memory.chat_history import duckdb_message_history
+    from pilot.model.cluster import WorkerManagerFactory
+    from pilot.openapi.api_v1 import api_v1
+
+    class _FakeWorkerManagerFactory(WorkerManagerFactory):
+        def create(self) -> LocalWorkerManager:
+            return local_manager
+
+    cfg = Config()
+    num_tokens = ctx.scale(256, 32)
+    local_manager = LocalWorkerManager()
+    add_fake_worker(local_manager, FakeModelWorker(num_tokens=num_tokens))
+
+    system_app = SystemApp()
+    system_app.register(_FakeWorkerManagerFactory)
+    origin = (
+        cfg.SYSTEM_APP,
+        cfg.LLM_MODEL,
+        cfg.CHAT_HISTORY_STORE_TYPE,
+        duckdb_message_history.duckdb_path,
+    )
+    cfg.SYSTEM_APP = system_app
+    cfg.LLM_MODEL = FAKE_MODEL_NAME
+    cfg.CHAT_HISTORY_STORE_TYPE = "duckdb_message"
+    duckdb_message_history.duckdb_path = os.path.join(ctx.work_dir, "chat_history.db")
+
+    app = FastAPI()
+    app.include_router(api_v1.router, prefix="/api")
+    repeat = ctx.scale(20, 2)
+
+    async def _run():
+        ttft, totals, events = [], [], 0
+        async with _asgi_client(app) as client:
+            for i in range(repeat):
+                start = time.perf_counter()
+                first = None
+                async with client.stream(
+                    "POST",
+                    "/api/v1/chat/completions",
+                    json={
+                        "conv_uid": f"bench_conv_{i}",
+                        "chat_mode": "chat_normal",
+                        "user_input": "say something about the benchmark",
+                        "model_name": FAKE_MODEL_NAME,
+                    },
+                ) as response:
+                    async for line in response.aiter_lines():
+                        if not line.startswith("data:"):
+                            continue
+                        if first is None:
+                            first = time.perf_counter() - start
+                        events += 1
+                ttft.append(first or 0.0)
+                totals.append(time.perf_counter() - start)
+        return ttft, totals, events
+
+    try:
+        ttft, totals, events = ctx.run_async(_run())
+    finally:
+        (
+            cfg.SYSTEM_APP,
+            cfg.LLM_MODEL,
+            cfg.CHAT_HISTORY_STORE_TYPE,
+            duckdb_message_history.duckdb_path,
+        ) = origin
+    ctx.record(
+        "chat_normal",
+        {"tokens": num_tokens, "requests": repeat},
+        events_per_request=events / repeat,
+        **latency_stats(ttft, "ttft_"),
+        **latency_stats(totals, "total_"),
+    )
@@ -0,0 +1,201 @@
+"""Benchmarks of LocalWorkerManager: streaming, response cache, routing and admission control"""
+
+import asyncio
+import time
+from typing import List
+
+from benchmarks.fakes import (
+    FAKE_MODEL_NAME,
+    FakeModelWorker,
+    add_fake_worker,
+    fake_prompt_params,
+)
+from benchmarks.runner import BenchmarkContext, benchmark, latency_stats
+from pilot.model.base import MODEL_OVERLOADED_ERROR_CODE
+from pilot.model.cache.response_cache import create_response_cache
+from pilot.model.cluster.routing import supported_routing_policies
+from pilot.model.cluster.worker.manager import LocalWorkerManager
+from pilot.model.parameter import WorkerType
+
+
+async def _consume_stream(manager: LocalWorkerManager, params) -> List[float]:
+    """Return the time to first output and the total time of one stream"""
+    start = time.perf_counter()
+    first = None
+    async for _ in manager.generate_stream(params):
+        if first is None:
+            first = time.perf_counter() - start
+    return [first or 0.0, time.perf_counter() - start]
+
+
+async def _run_streams(manager: LocalWorkerManager, concurrency: int, total: int):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def _one(i: int):
+        async with semaphore:
+            # Different prompts, so the response cache never hits
+            return await _consume_stream(manager, fake_prompt_params(f"prompt {i}"))
+
+    start = time.perf_counter()
+    samples = await asyncio.gather(*[_one(i) for i in range(total)])
+    return samples, time.perf_counter() - start
+
+
+@benchmark("worker_manager.generate_stream")
+def bench_generate_stream(ctx: BenchmarkContext):
+    """Overhead of LocalWorkerManager.generate_stream per stream and per token"""
+    num_tokens = 128
+    for concurrency in [1, 16, 64]:
+        manager = LocalWorkerManager()
+        add_fake_worker(manager, FakeModelWorker(num_tokens=num_tokens))
+        total = ctx.scale(max(concurrency * 8, 64), concurrency)
+        samples, elapsed = ctx.run_async(_run_streams(manager, concurrency, total))
+        ctx.record(
+            f"concurrency_{concurrency}",
+            {"concurrency": concurrency, "streams": total, "tokens": num_tokens},
+            streams_per_s=total / elapsed,
+            tokens_per_s=total * num_tokens / elapsed,
+            overhead_us_per_token=elapsed / (total * num_tokens) * 1e6,
+            **latency_stats([s[0] for s in samples], "ttft_"),
+            **latency_stats([s[1] for s in samples], "total_"),
+        )
+
+    # A rate limited worker, TTFT is dominated by the manager and the event loop
+    rate = 2000
+    manager = LocalWorkerManager()
+    add_fake_worker(
+        manager, FakeModelWorker(num_tokens=num_tokens, tokens_per_second=rate)
+    )
+    concurrency = 32
+    total = ctx.scale(128, concurrency)
+    samples, elapsed = ctx.run_async(_run_streams(manager, concurrency, total))
+    ctx.record(
+        "rate_limited_worker",
+        {"concurrency": concurrency, "streams": total, "tokens_per_second": rate},
+        tokens_per_s=total * num_tokens / elapsed,
+        **latency_stats([s[0] for s in samples], "ttft_"),
+        **latency_stats([s[1] for s in samples], "total_"),
+    )
+
+
+@benchmark("worker_manager.response_cache")
+def bench_response_cache(ctx: BenchmarkContext):
+    """Latency of a response cache miss (generation) against a hit (replay)"""
+    num_tokens = 256
+    worker = FakeModelWorker(num_tokens=num_tokens, tokens_per_second=20000)
+    manager = LocalWorkerManager(response_cache=create_response_cache("memory"))
+    add_fake_worker(manager, worker)
+    repeat = ctx.scale(50, 5)
+
+    async def _run():
+        misses, hits = [], []
+        for i in range(repeat):
+            params = fake_prompt_params(f"cached prompt {i}")
+            misses.append((await _consume_stream(manager, params))[1])
+            hits.append((await _consume_stream(manager, params))[1])
+        return misses, hits
+
+    misses, hits = ctx.run_async(_run())
+    stats = manager.response_cache.stats()
+    ctx.record(
+        "miss",
+        {"tokens": num_tokens, "requests": repeat},
+        **latency_stats(misses),
+    )
+    ctx.record(
+        "hit",
+        {"tokens": num_tokens, "requests": repeat},
+        hit_rate=stats.hit_rate,
+        worker_calls=worker.calls,
+        **latency_stats(hits),
+    )
+
+
+@benchmark("worker_manager.routing")
+def bench_routing(ctx: BenchmarkContext):
+    """Latency of each routing policy over instances of different speeds"""
+    # One slow instance among fast ones
+    rates = [4000, 4000, 4000, 500]
+    concurrency = 16
+    total = ctx.scale(256, 32)
+    for policy in supported_routing_policies():
+        manager = LocalWorkerManager(routing_policy=policy)
+        for i, rate in enumerate(rates):
+            add_fake_worker(
+                manager,
+                FakeModelWorker(num_tokens=32, tokens_per_second=rate),
+                port=8000 + i,
+            )
+        samples, elapsed = ctx.run_async(_run_streams(manager, concurrency, total))
+        instances = manager.sync_get_model_instances(WorkerType.LLM, FAKE_MODEL_NAME)
+        ctx.record(
+            policy,
+            {"instances": len(rates), "concurrency": concurrency, "streams": total},
+            streams_per_s=total / elapsed,
+            slow_instance_share=instances[-1].worker.calls / total,
+            **latency_stats([s[1] for s in samples]),
+        )
+
+
+@benchmark("worker_manager.admission_control")
+def bench_admission_control(ctx: BenchmarkContext):
+    """Latency of a slow worker offered twice the load it can serve, unbounded against bounded queue"""
+    num_tokens = 32
+    rate = 1000
+    concurrency = 4
+    service_time = num_tokens / rate
+    duration = ctx.scale(3.0, 0.5)
+    cases = {
+        "unbounded_queue": {
+            "limit_model_queue_size": -1,
+            "limit_model_queue_timeout": -1,
+        },
+        "bounded_queue": {
+            "limit_model_queue_size": concurrency,
+            "limit_model_queue_timeout": service_time * 2,
+        },
+    }
+
+    async def _run(manager: LocalWorkerManager):
+        served, rejected = [], []
+
+        async def _request(i: int):
+            start = time.perf_counter()
+            output = await manager.generate(fake_prompt_params(f"prompt {i}"))
+            samples = (
+                rejected if output.error_code == MODEL_OVERLOADED_ERROR_CODE else served
+            )
+            samples.append(time.perf_counter() - start)
+
+        # Open loop, requests keep arriving whether earlier ones are served or not
+        requests = []
+        deadline = time.perf_counter() + duration
+        while time.perf_counter() < deadline:
+            for _ in range(concurrency * 2):
+                requests.append(asyncio.create_task(_request(len(requests))))
+            await asyncio.sleep(service_time)
+        await asyncio.gather(*requests)
+        return served, rejected
+
+    for case, limits in cases.items():
+        manager = LocalWorkerManager()
+        add_fake_worker(
+            manager,
+            FakeModelWorker(num_tokens=num_tokens, tokens_per_second=rate),
+            limit_model_concurrency=concurrency,
+            **limits,
+        )
+        served, rejected = ctx.run_async(_run(manager))
+        ctx.record(
+            case,
+            {
+                "concurrency": concurrency,
+                "service_time_ms": service_time * 1000,
+                "offered_load": 2,
+                **limits,
+            },
+            served=len(served),
+            rejected=len(rejected),
+            **latency_stats(served, "served_"),
+            **latency_stats(rejected, "rejected_"),
+        )
@@ -0,0 +1,213 @@
+"""Deterministic in-process fake components, no GPU and no network.
+
+``FakeModelWorker`` streams tokens at a fixed rate, ``HashEmbeddings`` and
+``FakeEmbeddingWorker`` return vectors hashed from the text, so the same text always
+has the same vector and similar search results are stable between runs.
+"""
+
+import asyncio
+import hashlib
+import math
+import struct
+import time
+from typing import Dict, Iterator, List
+
+from pilot.model.base import ModelOutput
+from pilot.model.cluster.manager_base import WorkerRunData
+from pilot.model.cluster.worker.manager import LocalWorkerManager
+from pilot.model.cluster.worker_base import ModelWorker
+from pilot.model.parameter import (
+    EmbeddingModelParameters,
+    ModelParameters,
+    ModelWorkerParameters,
+    WorkerType,
+)
+
+FAKE_MODEL_NAME = "fake-model"
+FAKE_EMBEDDING_MODEL_NAME = "fake-embedding"
+
+
+def hash_vector(text: str, dim: int = 64) -> List[float]:
+    """Unit vector hashed from text"""
+    values = []
+    seed = text.encode("utf-8")
+    counter = 0
+    while len(values) < dim:
+        digest = hashlib.sha256(seed + struct.pack("<I", counter)).digest()
+        values.extend(b / 127.5 - 1.0 for b in digest)
+        counter += 1
+    values = values[:dim]
+    norm = math.sqrt(sum(v * v for v in values)) or 1.0
+    return [v / norm for v in values]
+
+
+class HashEmbeddings:
+    """Embeddings with the interface of langchain ``Embeddings``"""
+
+    def __init__(self, dim: int = 64, cost_per_text: float = 0.0) -> None:
+        self.dim = dim
+        self.cost_per_text = cost_per_text
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if self.cost_per_text:
+            time.sleep(self.cost_per_text * len(texts))
+        return [hash_vector(text, self.dim) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+
+class FakeModelWorker(ModelWorker):
+    """Streams ``num_tokens`` tokens at ``tokens_per_second``, the output only depends on the prompt"""
+
+    def __init__(
+        self,
+        num_tokens: int = 128,
+        tokens_per_second: float = 0,
+        first_token_latency: float = 0.0,
+    ) -> None:
+        self.num_tokens = num_tokens
+        self.tokens_per_second = tokens_per_second
+        self.first_token_latency = first_token_latency
+        self.calls = 0
+
+    def parse_parameters(self, command_args: List[str] = None) -> ModelParameters:
+        return None
+
+    def load_worker(self, model_name: str, model_path: str, **kwargs) -> None:
+        pass
+
+    def start(
+        self, model_params: ModelParameters = None, command_args: List[str] = None
+    ) -> None:
+        pass
+
+    def stop(self) -> None:
+        pass
+
+    def support_async(self) -> bool:
+        return True
+
+    def _tokens(self, params: Dict) -> Iterator[str]:
+        words = (params.get("prompt") or "token").split() or ["token"]
+        max_new_tokens = int(params.get("max_new_tokens") or self.num_tokens)
+        for i in range(min(self.num_tokens, max_new_tokens)):
+            yield words[i % len(words)] + " "
+
+    def generate_stream(self, params: Dict) -> Iterator[ModelOutput]:
+        self.calls += 1
+        if self.first_token_latency:
+            time.sleep(self.first_token_latency)
+        text = ""
+        for token in self._tokens(params):
+            if self.tokens_per_second:
+                time.sleep(1 / self.tokens_per_second)
+            text += token
+            yield ModelOutput(text=text, error_code=0)
+
+    async def async_generate_stream(self, params: Dict) -> Iterator[ModelOutput]:
+        self.calls += 1
+        if self.first_token_latency:
+            await asyncio.sleep(self.first_token_latency)
+        text = ""
+        for token in self._tokens(params):
+            if self.tokens_per_second:
+                await asyncio.sleep(1 / self.tokens_per_second)
+            text += token
+            yield ModelOutput(text=text, error_code=0)
+
+    def generate(self, params: Dict) -> ModelOutput:
+        output = None
+        for output in self.generate_stream(params):
+            pass
+        return output
+
+    async def async_generate(self, params: Dict) -> ModelOutput:
+        output = None
+        async for output in self.async_generate_stream(params):
+            pass
+        return output
+
+    def embeddings(self, params: Dict) -> List[List[float]]:
+        raise NotImplementedError
+
+
+class FakeEmbeddingWorker(ModelWorker):
+    """Embedding worker returns hashed vectors, each forward pass costs a fixed time"""
+
+    def __init__(self, dim: int = 64, cost_per_batch: float = 0.0) -> None:
+        self.embeddings_model = HashEmbeddings(dim)
+        self.cost_per_batch = cost_per_batch
+        self.batches = 0
+
+    def worker_type(self) -> WorkerType:
+        return WorkerType.TEXT2VEC
+
+    def model_param_class(self):
+        return EmbeddingModelParameters
+
+    def parse_parameters(self, command_args: List[str] = None) -> ModelParameters:
+        return None
+
+    def load_worker(self, model_name: str, model_path: str, **kwargs) -> None:
+        pass
+
+    def start(
+        self, model_params: ModelParameters = None, command_args: List[str] = None
+    ) -> None:
+        pass
+
+    def stop(self) -> None:
+        pass
+
+    def generate_stream(self, params: Dict):
+        raise NotImplementedError
+
+    def generate(self, params: Dict):
+        raise NotImplementedError
+
+    def embeddings(self, params: Dict) -> List[List[float]]:
+        self.batches += 1
+        if self.cost_per_batch:
+            time.sleep(self.cost_per_batch)
+        return self.embeddings_model.embed_documents(params["input"])
+
+
+def add_fake_worker(
+    manager: LocalWorkerManager,
+    worker: ModelWorker,
+    model_name: str = FAKE_MODEL_NAME,
+    worker_type: WorkerType = WorkerType.LLM,
+    limit_model_concurrency: int = 64,
+    port: int = 8000,
+    **worker_params,
+) -> WorkerRunData:
+    """Add a started worker to manager, without loading any model"""
+    worker_key = manager._worker_key(worker_type, model_name)
+    run_data = WorkerRunData(
+        host="127.0.0.1",
+        port=port,
+        worker_key=worker_key,
+        worker=worker,
+        worker_params=ModelWorkerParameters(
+            model_name=model_name,
+            model_path="fake",
+            worker_type=WorkerType(worker_type).value,
+            limit_model_concurrency=limit_model_concurrency,
+            **worker_params,
+        ),
+        model_params=None,
+        stop_event=asyncio.Event(),
+        semaphore=asyncio.Semaphore(limit_model_concurrency),
+    )
+    manager.workers.setdefault(worker_key, []).append(run_data)
+    return run_data
+
+
+def fake_prompt_params(prompt: str = "select the answer from table", **kwargs) -> Dict:
+    return {
+        "model": FAKE_MODEL_NAME,
+        "prompt": prompt,
+        "temperature": 0,
+        **kwargs,
+    }
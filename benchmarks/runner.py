@@ -0,0 +1,253 @@
+"""Register, run and report benchmarks.
+
+A benchmark is a function taking a ``BenchmarkContext``, it records one result per
+case with ``ctx.record``. Benchmarks whose optional packages are not installed are
+reported as skipped, so the suite runs in any environment.
+"""
+
+import asyncio
+import importlib.util
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import traceback
+from dataclasses import asdict, dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+RESULT_SCHEMA_VERSION = 1
+
+
+@dataclass
+class BenchmarkResult:
+    benchmark: str
+    case: str
+    # ok, skipped or error
+    status: str
+    params: Dict[str, Any] = field(default_factory=dict)
+    metrics: Dict[str, float] = field(default_factory=dict)
+    message: Optional[str] = None
+
+
+@dataclass
+class _Benchmark:
+    name: str
+    func: Callable[["BenchmarkContext"], None]
+    requires: Sequence[str]
+    description: str
+
+
+_BENCHMARKS: Dict[str, _Benchmark] = {}
+
+
+def benchmark(name: str, requires: Sequence[str] = ()):
+    """Register a benchmark, requires are module names which must be importable"""
+
+    def decorator(func):
+        if name in _BENCHMARKS:
+            raise ValueError(f"Benchmark {name} already registered")
+        _BENCHMARKS[name] = _Benchmark(
+            name=name,
+            func=func,
+            requires=requires,
+            description=(func.__doc__ or "").strip().split("\n")[0],
+        )
+        return func
+
+    return decorator
+
+
+def registered_benchmarks() -> List[str]:
+    return list(_BENCHMARKS.keys())
+
+
+class BenchmarkContext:
+    def __init__(self, name: str, quick: bool, work_dir: str) -> None:
+        self.name = name
+        self.quick = quick
+        self.work_dir = work_dir
+        self.results: List[BenchmarkResult] = []
+
+    def scale(self, full: int, quick: int) -> int:
+        """Size of the workload, quick runs are for smoke tests"""
+        return quick if self.quick else full
+
+    def record(self, case: str, params: Dict[str, Any] = None, **metrics) -> None:
+        metrics = {
+            k: round(v, 6) if isinstance(v, float) else v for k, v in metrics.items()
+        }
+        self.results.append(
+            BenchmarkResult(
+                benchmark=self.name,
+                case=case,
+                status="ok",
+                params=params or {},
+                metrics=metrics,
+            )
+        )
+
+    def run_async(self, coro):
+        return asyncio.run(coro)
+
+
+def latency_stats(samples: List[float], prefix: str = "") -> Dict[str, float]:
+    """Mean and percentiles of latency samples in seconds, reported in milliseconds"""
+    if not samples:
+        return {}
+    ordered = sorted(samples)
+
+    def _percentile(p: float) -> float:
+        index = min(len(ordered) - 1, max(0, round(p * (len(ordered) - 1))))
+        return ordered[index] * 1000
+
+    return {
+        f"{prefix}mean_ms": statistics.fmean(ordered) * 1000,
+        f"{prefix}p50_ms": _percentile(0.5),
+        f"{prefix}p90_ms": _percentile(0.9),
+        f"{prefix}p99_ms": _percentile(0.99),
+    }
+
+
+def timed(func: Callable[[], Any], repeat: int) -> List[float]:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def _missing_modules(requires: Sequence[str]) -> List[str]:
+    missing = []
+    for module in requires:
+        try:
+            if importlib.util.find_spec(module) is None:
+                missing.append(module)
+        except (ImportError, ValueError):
+            missing.append(module)
+    return missing
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return (
+            subprocess.check_output(
+                ["git", "rev-parse", "HEAD"], stderr=subprocess.DEVNULL, text=True
+            ).strip()
+            or None
+        )
+    except Exception:
+        return None
+
+
+def run_benchmarks(
+    filters: Sequence[str] = None, quick: bool = False
+) -> List[BenchmarkResult]:
+    results: List[BenchmarkResult] = []
+    for name, bench in _BENCHMARKS.items():
+        if filters and not any(f in name for f in filters):
+            continue
+        missing = _missing_modules(bench.requires)
+        if missing:
+            results.append(
+                BenchmarkResult(
+                    benchmark=name,
+                    case="*",
+                    status="skipped",
+                    message=f"missing packages: {', '.join(missing)}",
+                )
+            )
+            continue
+        logger.info(f"Run benchmark {name}")
+        with tempfile.TemporaryDirectory(prefix=f"dbgpt_bench_{name}_") as work_dir:
+            ctx = BenchmarkContext(name, quick, work_dir)
+            try:
+                bench.func(ctx)
+                results.extend(ctx.results)
+            except Exception as e:
+                logger.error(f"Benchmark {name} error: {traceback.format_exc()}")
+                results.extend(ctx.results)
+                results.append(
+                    BenchmarkResult(
+                        benchmark=name, case="*", status="error", message=str(e)
+                    )
+                )
+    return results
+
+
+def build_report(results: List[BenchmarkResult], quick: bool) -> Dict[str, Any]:
+    return {
+        "schema_version": RESULT_SCHEMA_VERSION,
+        "commit": _git_commit(),
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "quick": quick,
+        "environment": {
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+        },
+        "results": [asdict(r) for r in results],
+    }
+
+
+def compare_reports(
+    baseline: Dict[str, Any], current: Dict[str, Any]
+) -> List[Dict[str, Any]]:
+    """Ratio current / baseline of every metric both reports have"""
+    baseline_metrics = {
+        (r["benchmark"], r["case"]): r["metrics"]
+        for r in baseline.get("results", [])
+        if r["status"] == "ok"
+    }
+    rows = []
+    for r in current.get("results", []):
+        if r["status"] != "ok":
+            continue
+        before = baseline_metrics.get((r["benchmark"], r["case"]))
+        if not before:
+            continue
+        for metric, value in r["metrics"].items():
+            old = before.get(metric)
+            if not isinstance(old, (int, float)) or not isinstance(value, (int, float)):
+                continue
+            rows.append(
+                {
+                    "benchmark": r["benchmark"],
+                    "case": r["case"],
+                    "metric": metric,
+                    "baseline": old,
+                    "current": value,
+                    "ratio": value / old if old else None,
+                }
+            )
+    return rows
+
+
+def format_results(results: List[BenchmarkResult]) -> str:
+    lines = []
+    for r in results:
+        if r.status != "ok":
+            lines.append(f"{r.benchmark:<32} {r.case:<36} {r.status}: {r.message}")
+            continue
+        metrics = ", ".join(
+            f"{k}={v:.3f}" if isinstance(v, float) else f"{k}={v}"
+            for k, v in r.metrics.items()
+        )
+        lines.append(f"{r.benchmark:<32} {r.case:<36} {metrics}")
+    return "\n".join(lines)
+
+
+def dump_report(report: Dict[str, Any], output: Optional[str]) -> None:
+    content = json.dumps(report, indent=2, ensure_ascii=False)
+    if output:
+        with open(output, "w") as f:
+            f.write(content)
+    else:
+        print(content)
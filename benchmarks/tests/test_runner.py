@@ -0,0 +1,55 @@
+"""Run unit test with command: pytest benchmarks/tests/test_runner.py"""
+
+from benchmarks.runner import (
+    _BENCHMARKS,
+    BenchmarkContext,
+    benchmark,
+    build_report,
+    compare_reports,
+    latency_stats,
+    run_benchmarks,
+)
+
+
+def _register(name, func, requires=()):
+    benchmark(name, requires=requires)(func)
+    return name
+
+
+def test_run_and_compare():
+    def _bench(ctx: BenchmarkContext):
+        ctx.record("case", {"size": ctx.scale(100, 10)}, ops_per_s=10.0)
+
+    def _broken(ctx: BenchmarkContext):
+        raise RuntimeError("broken")
+
+    names = [
+        _register("test.ok", _bench),
+        _register("test.missing", _bench, requires=["not_installed_package"]),
+        _register("test.error", _broken),
+    ]
+    try:
+        results = run_benchmarks(filters=["test."], quick=True)
+    finally:
+        for name in names:
+            _BENCHMARKS.pop(name)
+    assert [(r.benchmark, r.status) for r in results] == [
+        ("test.ok", "ok"),
+        ("test.missing", "skipped"),
+        ("test.error", "error"),
+    ]
+    assert results[0].params == {"size": 10}
+
+    baseline = build_report(results, quick=True)
+    current = build_report(results, quick=True)
+    current["results"][0]["metrics"]["ops_per_s"] = 15.0
+    rows = compare_reports(baseline, current)
+    assert len(rows) == 1
+    assert rows[0]["ratio"] == 1.5
+
+
+def test_latency_stats():
+    stats = latency_stats([i / 1000 for i in range(1, 101)])
+    assert round(stats["p50_ms"]) == 51
+    assert round(stats["p99_ms"]) == 99
+    assert latency_stats([]) == {}
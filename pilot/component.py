@@ -46,6 +46,8 @@ class ComponentType(str, Enum):
     WORKER_MANAGER = "dbgpt_worker_manager"
     WORKER_MANAGER_FACTORY = "dbgpt_worker_manager_factory"
     MODEL_CONTROLLER = "dbgpt_model_controller"
+    HTTP_CLIENT_POOL = "dbgpt_http_client_pool"
+    DUCKDB_CONNECTION_POOL = "dbgpt_duckdb_connection_pool"
 
 
 class BaseComponent(LifeCycle, ABC):
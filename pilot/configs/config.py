@@ -144,6 +144,31 @@ class Config(metaclass=Singleton):
 
         self.LOCAL_DB_MANAGE = None
 
+        ### Database connector cache and connection pool configuration
+        self.DB_CONNECT_CACHE_SIZE = int(os.getenv("DB_CONNECT_CACHE_SIZE", 32))
+        self.DB_CONNECT_POOL_SIZE = int(os.getenv("DB_CONNECT_POOL_SIZE", 5))
+        self.DB_CONNECT_MAX_OVERFLOW = int(os.getenv("DB_CONNECT_MAX_OVERFLOW", 10))
+        self.DB_CONNECT_POOL_RECYCLE = int(os.getenv("DB_CONNECT_POOL_RECYCLE", 3600))
+
+        ### Pooled HTTP clients to model controller, workers and proxy LLM servers
+        self.HTTP_CLIENT_MAX_CONNECTIONS_PER_HOST = int(
+            os.getenv("HTTP_CLIENT_MAX_CONNECTIONS_PER_HOST", 100)
+        )
+        self.HTTP_CLIENT_MAX_KEEPALIVE_CONNECTIONS_PER_HOST = int(
+            os.getenv("HTTP_CLIENT_MAX_KEEPALIVE_CONNECTIONS_PER_HOST", 20)
+        )
+        self.HTTP_CLIENT_KEEPALIVE_EXPIRY = float(
+            os.getenv("HTTP_CLIENT_KEEPALIVE_EXPIRY", 60)
+        )
+        self.HTTP_CLIENT_CONNECT_TIMEOUT = float(
+            os.getenv("HTTP_CLIENT_CONNECT_TIMEOUT", 10)
+        )
+        self.HTTP_CLIENT_TIMEOUT = float(os.getenv("HTTP_CLIENT_TIMEOUT", 180))
+
+        ### Chat history storage, duckdb (one row per conversation) or duckdb_message
+        ### (one row per round, faster appends for long conversations)
+        self.CHAT_HISTORY_STORE_TYPE = os.getenv("CHAT_HISTORY_STORE_TYPE", "duckdb")
+
         ### LLM Model Service Configuration
         self.LLM_MODEL = os.getenv("LLM_MODEL", "vicuna-13b-v1.5")
         ### Proxy llm backend, this configuration is only valid when "LLM_MODEL=proxyllm"
@@ -185,6 +210,25 @@ class Config(metaclass=Singleton):
         self.KNOWLEDGE_SEARCH_MAX_TOKEN = int(
             os.getenv("KNOWLEDGE_SEARCH_MAX_TOKEN", 2000)
         )
+        ### Knowledge document ingestion, parallelism of each stage and batch size
+        self.KNOWLEDGE_INGEST_LOAD_WORKERS = int(
+            os.getenv("KNOWLEDGE_INGEST_LOAD_WORKERS", 4)
+        )
+        self.KNOWLEDGE_INGEST_SPLIT_WORKERS = int(
+            os.getenv("KNOWLEDGE_INGEST_SPLIT_WORKERS", 2)
+        )
+        self.KNOWLEDGE_INGEST_EMBED_WORKERS = int(
+            os.getenv("KNOWLEDGE_INGEST_EMBED_WORKERS", 2)
+        )
+        self.KNOWLEDGE_INGEST_INDEX_WORKERS = int(
+            os.getenv("KNOWLEDGE_INGEST_INDEX_WORKERS", 1)
+        )
+        self.KNOWLEDGE_INGEST_BATCH_SIZE = int(
+            os.getenv("KNOWLEDGE_INGEST_BATCH_SIZE", 64)
+        )
+        self.KNOWLEDGE_INGEST_QUEUE_SIZE = int(
+            os.getenv("KNOWLEDGE_INGEST_QUEUE_SIZE", 8)
+        )
         ### Control whether to display the source document of knowledge on the front end.
         self.KNOWLEDGE_CHAT_SHOW_RELATIONS = False
 
@@ -0,0 +1,139 @@
+import logging
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, asdict
+from typing import Callable, Dict, Hashable, Optional, Tuple
+
+from pilot.connections.base import BaseConnect
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ConnectCacheStats:
+    """Hit/miss statistics of the connector cache"""
+
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    invalidations: int = 0
+    size: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def to_dict(self) -> Dict:
+        data = asdict(self)
+        data["hit_rate"] = self.hit_rate
+        return data
+
+
+class ConnectCache:
+    """Process-wide LRU cache of database connectors.
+
+    Every connector owns one SQLAlchemy engine (with its connection pool) and the
+    reflected table metadata, both are expensive to build, so a connector is created
+    once per connection config and shared by all requests to the same database.
+
+    The cache key contains the full connection config, a changed config never hits
+    a stale connector even if it was not invalidated explicitly.
+    """
+
+    def __init__(self, max_size: int = 32):
+        self.max_size = max_size
+        self._connects: "OrderedDict[str, Tuple[Hashable, BaseConnect]]" = OrderedDict()
+        self._lock = threading.RLock()
+        # One lock per database, so that a slow reflection of one database does not
+        # block the other databases, and concurrent misses only create one connector
+        self._create_locks: Dict[str, threading.Lock] = {}
+        self._stats = ConnectCacheStats()
+
+    def get_or_create(
+        self,
+        db_name: str,
+        config_key: Hashable,
+        create_func: Callable[[], BaseConnect],
+    ) -> BaseConnect:
+        """Return the cached connector of db_name, create it with create_func on miss"""
+        connect = self._get(db_name, config_key)
+        if connect is not None:
+            return connect
+        with self._lock:
+            create_lock = self._create_locks.setdefault(db_name, threading.Lock())
+        with create_lock:
+            # Double check, another thread may have created it while we were waiting
+            connect = self._get(db_name, config_key, count_stats=False)
+            if connect is not None:
+                return connect
+            connect = create_func()
+            self._put(db_name, config_key, connect)
+            return connect
+
+    def _get(
+        self, db_name: str, config_key: Hashable, count_stats: bool = True
+    ) -> Optional[BaseConnect]:
+        with self._lock:
+            cached = self._connects.get(db_name)
+            if cached is not None and cached[0] == config_key:
+                self._connects.move_to_end(db_name)
+                if count_stats:
+                    self._stats.hits += 1
+                return cached[1]
+            if count_stats:
+                self._stats.misses += 1
+            return None
+
+    def _put(self, db_name: str, config_key: Hashable, connect: BaseConnect) -> None:
+        with self._lock:
+            old = self._connects.pop(db_name, None)
+            self._connects[db_name] = (config_key, connect)
+            expired = []
+            while len(self._connects) > self.max_size:
+                _, (_, evicted) = self._connects.popitem(last=False)
+                self._stats.evictions += 1
+                expired.append(evicted)
+        if old is not None:
+            # Connection config changed without invalidation
+            expired.append(old[1])
+        for connect in expired:
+            _dispose_connect(connect)
+
+    def invalidate(self, db_name: str) -> bool:
+        """Drop the cached connector of db_name and release its pooled connections"""
+        with self._lock:
+            cached = self._connects.pop(db_name, None)
+            if cached is None:
+                return False
+            self._stats.invalidations += 1
+        logger.info(f"Invalidate cached connector of database {db_name}")
+        _dispose_connect(cached[1])
+        return True
+
+    def clear(self) -> None:
+        with self._lock:
+            connects = [c for _, c in self._connects.values()]
+            self._connects.clear()
+        for connect in connects:
+            _dispose_connect(connect)
+
+    def stats(self) -> ConnectCacheStats:
+        with self._lock:
+            return ConnectCacheStats(
+                hits=self._stats.hits,
+                misses=self._stats.misses,
+                evictions=self._stats.evictions,
+                invalidations=self._stats.invalidations,
+                size=len(self._connects),
+            )
+
+
+def _dispose_connect(connect: BaseConnect) -> None:
+    engine = getattr(connect, "_engine", None)
+    if engine is None:
+        return
+    try:
+        engine.dispose()
+    except Exception as e:
+        logger.warning(f"Dispose engine {engine} error: {str(e)}")
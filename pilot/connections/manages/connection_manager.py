@@ -3,6 +3,7 @@ import asyncio
 
 from pilot.configs.config import Config
 from pilot.connections.manages.connect_storage_duckdb import DuckdbConnectConfig
+from pilot.connections.manages.connect_cache import ConnectCache, ConnectCacheStats
 from pilot.common.schema import DBType
 from pilot.component import SystemApp
 from pilot.connections.rdbms.conn_mysql import MySQLConnect
@@ -21,6 +22,9 @@ from pilot.summary.db_summary_client import DBSummaryClient
 
 CFG = Config()
 
+# Shared by all ConnectManager in current process
+_connect_cache = ConnectCache(max_size=CFG.DB_CONNECT_CACHE_SIZE)
+
 
 class ConnectManager:
     def get_all_subclasses(self, cls):
@@ -49,6 +53,7 @@ class ConnectManager:
 
     def __init__(self, system_app: SystemApp):
         self.storage = DuckdbConnectConfig()
+        self.connect_cache = _connect_cache
         self.db_summary_client = DBSummaryClient(system_app)
         self.__load_config_db()
 
@@ -126,6 +131,12 @@ class ConnectManager:
 
     def get_connect(self, db_name):
         db_config = self.storage.get_db_config(db_name)
+        config_key = self._connect_config_key(db_config)
+        return self.connect_cache.get_or_create(
+            db_name, config_key, lambda: self._create_connect(db_name, db_config)
+        )
+
+    def _create_connect(self, db_name, db_config):
         db_type = DBType.of_db_type(db_config.get("db_type"))
         connect_instance = self.get_cls_by_dbtype(db_type.value())
         if db_type.is_file_db():
@@ -137,9 +148,36 @@ class ConnectManager:
             db_user = db_config.get("db_user")
             db_pwd = db_config.get("db_pwd")
             return connect_instance.from_uri_db(
-                host=db_host, port=db_port, user=db_user, pwd=db_pwd, db_name=db_name
+                host=db_host,
+                port=db_port,
+                user=db_user,
+                pwd=db_pwd,
+                db_name=db_name,
+                engine_args={
+                    "pool_size": CFG.DB_CONNECT_POOL_SIZE,
+                    "max_overflow": CFG.DB_CONNECT_MAX_OVERFLOW,
+                    "pool_recycle": CFG.DB_CONNECT_POOL_RECYCLE,
+                    "pool_pre_ping": True,
+                },
             )
 
+    @staticmethod
+    def _connect_config_key(db_config):
+        return tuple(
+            db_config.get(k)
+            for k in (
+                "db_type",
+                "db_path",
+                "db_host",
+                "db_port",
+                "db_user",
+                "db_pwd",
+            )
+        )
+
+    def connect_cache_stats(self) -> ConnectCacheStats:
+        return self.connect_cache.stats()
+
     def test_connect(self, db_info: DBConfig):
         try:
             db_type = DBType.of_db_type(db_info.db_type)
@@ -171,9 +209,11 @@ class ConnectManager:
         return self.storage.get_db_names()
 
     def delete_db(self, db_name: str):
+        self.connect_cache.invalidate(db_name)
         return self.storage.delete_db(db_name)
 
     def edit_db(self, db_info: DBConfig):
+        self.connect_cache.invalidate(db_info.db_name)
         return self.storage.update_db_info(
             db_info.db_name,
             db_info.db_type,
@@ -191,6 +231,7 @@ class ConnectManager:
 
     def add_db(self, db_info: DBConfig):
         print(f"add_db:{db_info.__dict__}")
+        self.connect_cache.invalidate(db_info.db_name)
         try:
             db_type = DBType.of_db_type(db_info.db_type)
             if db_type.is_file_db():
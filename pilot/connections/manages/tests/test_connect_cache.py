@@ -0,0 +1,133 @@
+"""
+Run unit test with command: pytest pilot/connections/manages/tests/test_connect_cache.py
+"""
+
+import os
+import tempfile
+import threading
+
+import pytest
+from sqlalchemy import text
+
+from pilot.connections.manages.connect_cache import ConnectCache
+from pilot.connections.rdbms.conn_sqlite import SQLiteConnect
+
+
+@pytest.fixture
+def db_file():
+    temp_db_file = tempfile.NamedTemporaryFile(delete=False)
+    temp_db_file.close()
+    yield temp_db_file.name
+    os.unlink(temp_db_file.name)
+
+
+def test_reuse_connect(db_file):
+    cache = ConnectCache()
+    key = ("sqlite", db_file)
+    conn1 = cache.get_or_create(
+        "test", key, lambda: SQLiteConnect.from_file_path(db_file)
+    )
+    conn2 = cache.get_or_create(
+        "test", key, lambda: SQLiteConnect.from_file_path(db_file)
+    )
+    assert conn1 is conn2
+    stats = cache.stats()
+    assert stats.hits == 1
+    assert stats.misses == 1
+    assert stats.size == 1
+
+
+def test_config_changed(db_file):
+    cache = ConnectCache()
+    conn1 = cache.get_or_create(
+        "test", ("sqlite", "old"), lambda: SQLiteConnect.from_file_path(db_file)
+    )
+    conn2 = cache.get_or_create(
+        "test", ("sqlite", "new"), lambda: SQLiteConnect.from_file_path(db_file)
+    )
+    assert conn1 is not conn2
+    assert cache.stats().size == 1
+
+
+def test_invalidate(db_file):
+    cache = ConnectCache()
+    key = ("sqlite", db_file)
+    conn1 = cache.get_or_create(
+        "test", key, lambda: SQLiteConnect.from_file_path(db_file)
+    )
+    assert cache.invalidate("test")
+    assert not cache.invalidate("test")
+    conn2 = cache.get_or_create(
+        "test", key, lambda: SQLiteConnect.from_file_path(db_file)
+    )
+    assert conn1 is not conn2
+    assert cache.stats().invalidations == 1
+
+
+def test_lru_eviction(db_file):
+    cache = ConnectCache(max_size=2)
+    for name in ["db1", "db2", "db3"]:
+        cache.get_or_create(name, name, lambda: SQLiteConnect.from_file_path(db_file))
+    stats = cache.stats()
+    assert stats.size == 2
+    assert stats.evictions == 1
+
+
+def test_concurrent_miss_create_once(db_file):
+    cache = ConnectCache()
+    created = []
+
+    def create():
+        created.append(1)
+        return SQLiteConnect.from_file_path(db_file)
+
+    threads = [
+        threading.Thread(target=cache.get_or_create, args=("test", "key", create))
+        for _ in range(8)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(created) == 1
+
+
+def test_shared_connect_releases_connections(db_file):
+    # More threads than pooled connections, each keeps running after its query
+    pool_size = 2
+    num_threads = pool_size * 4
+    conn = SQLiteConnect.from_file_path(
+        db_file,
+        engine_args={"pool_size": pool_size, "max_overflow": 0, "pool_timeout": 2},
+    )
+    with conn._engine.begin() as connection:
+        connection.execute(
+            text("CREATE TABLE user (id INTEGER PRIMARY KEY, name TEXT)")
+        )
+        connection.execute(text("INSERT INTO user (id, name) VALUES (1, 'a')"))
+    queried = threading.Barrier(num_threads + 1)
+    done = threading.Event()
+    results, errors = [], []
+
+    def query():
+        try:
+            results.append(conn.run("SELECT name FROM user"))
+            # A failed query doesn't leave the session of thread invalid
+            with pytest.raises(Exception):
+                conn.run("SELECT missing FROM user")
+            results.append(conn.run("SELECT name FROM user"))
+        except Exception as e:
+            errors.append(e)
+        queried.wait()
+        done.wait()
+
+    threads = [threading.Thread(target=query) for _ in range(num_threads)]
+    for t in threads:
+        t.start()
+    queried.wait(timeout=30)
+    assert conn._engine.pool.checkedout() == 0
+    done.set()
+    for t in threads:
+        t.join()
+    assert not errors
+    assert results == [[("name",), ("a",)]] * num_threads * 2
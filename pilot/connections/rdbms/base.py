@@ -1,4 +1,6 @@
 from __future__ import annotations
+import functools
+import threading
 from urllib.parse import quote
 import warnings
 import sqlparse
@@ -28,6 +30,29 @@ from pilot.configs.config import Config
 CFG = Config()
 
 
+def release_session(func):
+    """Close the session of current thread when the outermost call returns.
+
+    Connectors are cached and shared by request threads, a session left open would
+    hold a pooled connection in a transaction (with a stale snapshot) until the thread
+    runs its next query, and stay invalid after an error.
+    """
+
+    @functools.wraps(func)
+    def wrapper(self, *args, **kwargs):
+        local = self._session_local
+        local.depth = getattr(local, "depth", 0) + 1
+        try:
+            return func(self, *args, **kwargs)
+        finally:
+            local.depth -= 1
+            if not local.depth:
+                # Rolls back what is not committed, returns the connection to pool
+                self._db_sessions.remove()
+
+    return wrapper
+
+
 def _format_index(index: sqlalchemy.engine.interfaces.ReflectedIndex) -> str:
     return (
         f'Name: {index["name"]}, Unique: {index["unique"]},'
@@ -62,7 +87,7 @@ class RDBMSDatabase(BaseConnect):
         session_factory = sessionmaker(bind=engine)
         Session_Manages = scoped_session(session_factory)
         self._db_sessions = Session_Manages
-        self.session = self.get_session()
+        self._session_local = threading.local()
 
         self._all_tables = set()
         self.view_support = False
@@ -155,9 +180,19 @@ class RDBMSDatabase(BaseConnect):
 
         return session
 
+    @property
+    def session(self):
+        """Session of current thread, connector can be shared between threads.
+
+        Methods using it are decorated with ``release_session``.
+        """
+        return self.get_session()
+
+    @release_session
     def get_current_db_name(self) -> str:
         return self.session.execute(text("SELECT DATABASE()")).scalar()
 
+    @release_session
     def table_simple_info(self):
         _sql = f"""
                 select concat(table_name, "(" , group_concat(column_name), ")") as schema_info from information_schema.COLUMNS where table_schema="{self.get_current_db_name()}" group by TABLE_NAME;
@@ -262,16 +297,21 @@ class RDBMSDatabase(BaseConnect):
             """Format the error message"""
             return f"Error: {e}"
 
+    @release_session
     def __write(self, write_sql):
         print(f"Write[{write_sql}]")
         db_cache = self._engine.url.database
-        result = self.session.execute(text(write_sql))
-        self.session.commit()
+        session = self.session
+        result = session.execute(text(write_sql))
+        session.commit()
         # TODO  Subsequent optimization of dynamically specified database submission loss target problem
-        self.session.execute(text(f"use `{db_cache}`"))
+        if self.dialect == "mysql" and db_cache:
+            # Restore the database of the connection before it goes back to pool
+            session.execute(text(f"use `{db_cache}`"))
         print(f"SQL[{write_sql}], result:{result.rowcount}")
         return result.rowcount
 
+    @release_session
     def __query(self, query, fetch: str = "all"):
         """
         only for query
@@ -300,6 +340,7 @@ class RDBMSDatabase(BaseConnect):
             result.insert(0, field_names)
             return result
 
+    @release_session
     def query_ex(self, query, fetch: str = "all"):
         """
         only for query
@@ -326,6 +367,7 @@ class RDBMSDatabase(BaseConnect):
             return field_names, result
         return []
 
+    @release_session
     def run(self, command: str, fetch: str = "all") -> List:
         """Execute a SQL command and return a string representing the results."""
         print("SQL:" + command)
@@ -371,6 +413,7 @@ class RDBMSDatabase(BaseConnect):
             """Format the error message"""
             return f"Error: {e}"
 
+    @release_session
     def get_database_list(self):
         session = self._db_sessions()
         cursor = session.execute(text(" show databases;"))
@@ -444,6 +487,7 @@ class RDBMSDatabase(BaseConnect):
         print(f"SQL:{sql}, ttype:{ttype}, sql_type:{sql_type}, table:{table_name}")
         return parsed, ttype, sql_type, table_name
 
+    @release_session
     def get_indexes(self, table_name):
         """Get table indexes about specified table."""
         session = self._db_sessions()
@@ -451,6 +495,7 @@ class RDBMSDatabase(BaseConnect):
         indexes = cursor.fetchall()
         return [(index[2], index[4]) for index in indexes]
 
+    @release_session
     def get_show_create_table(self, table_name):
         """Get table show create table about specified table."""
         session = self._db_sessions()
@@ -458,6 +503,7 @@ class RDBMSDatabase(BaseConnect):
         ans = cursor.fetchall()
         return ans[0][1]
 
+    @release_session
     def get_fields(self, table_name):
         """Get column fields about specified table."""
         session = self._db_sessions()
@@ -471,6 +517,7 @@ class RDBMSDatabase(BaseConnect):
         fields = cursor.fetchall()
         return [(field[0], field[1], field[2], field[3], field[4]) for field in fields]
 
+    @release_session
     def get_charset(self):
         """Get character_set."""
         session = self._db_sessions()
@@ -478,6 +525,7 @@ class RDBMSDatabase(BaseConnect):
         character_set = cursor.fetchone()[0]
         return character_set
 
+    @release_session
     def get_collation(self):
         """Get collation."""
         session = self._db_sessions()
@@ -485,6 +533,7 @@ class RDBMSDatabase(BaseConnect):
         collation = cursor.fetchone()[0]
         return collation
 
+    @release_session
     def get_grants(self):
         """Get grant info."""
         session = self._db_sessions()
@@ -492,6 +541,7 @@ class RDBMSDatabase(BaseConnect):
         grants = cursor.fetchall()
         return grants
 
+    @release_session
     def get_users(self):
         """Get user info."""
         try:
@@ -501,6 +551,7 @@ class RDBMSDatabase(BaseConnect):
         except Exception as e:
             return []
 
+    @release_session
     def get_table_comments(self, db_name):
         cursor = self.session.execute(
             text(
@@ -514,6 +565,7 @@ class RDBMSDatabase(BaseConnect):
             (table_comment[0], table_comment[1]) for table_comment in table_comments
         ]
 
+    @release_session
     def get_database_list(self):
         session = self._db_sessions()
         cursor = session.execute(text(" show databases;"))
@@ -524,6 +576,7 @@ class RDBMSDatabase(BaseConnect):
             if d[0] not in ["information_schema", "performance_schema", "sys", "mysql"]
         ]
 
+    @release_session
     def get_database_names(self):
         session = self._db_sessions()
         cursor = session.execute(text(" show databases;"))
@@ -2,7 +2,7 @@ import re
 from typing import Optional, Any
 from sqlalchemy import text
 
-from pilot.connections.rdbms.base import RDBMSDatabase
+from pilot.connections.rdbms.base import RDBMSDatabase, release_session
 
 
 class ClickhouseConnect(RDBMSDatabase):
@@ -48,6 +48,7 @@ class ClickhouseConnect(RDBMSDatabase):
         """Get table indexes about specified table."""
         return ""
 
+    @release_session
     def get_show_create_table(self, table_name):
         """Get table show create table about specified table."""
         session = self._db_sessions()
@@ -61,6 +62,7 @@ class ClickhouseConnect(RDBMSDatabase):
         ans = re.sub(r"\s*SETTINGS\s*\s*\w+\s*", " ", ans, flags=re.IGNORECASE)
         return ans
 
+    @release_session
     def get_fields(self, table_name):
         """Get column fields about specified table."""
         session = self._db_sessions()
@@ -93,6 +95,7 @@ class ClickhouseConnect(RDBMSDatabase):
     def get_database_names(self):
         return []
 
+    @release_session
     def get_table_comments(self, db_name):
         session = self._db_sessions()
         cursor = session.execute(
@@ -9,7 +9,7 @@ from sqlalchemy import (
 )
 from sqlalchemy.ext.declarative import declarative_base
 
-from pilot.connections.rdbms.base import RDBMSDatabase
+from pilot.connections.rdbms.base import RDBMSDatabase, release_session
 
 
 class DuckDbConnect(RDBMSDatabase):
@@ -29,6 +29,7 @@ class DuckDbConnect(RDBMSDatabase):
         _engine_args = engine_args or {}
         return cls(create_engine("duckdb:///" + file_path, **_engine_args), **kwargs)
 
+    @release_session
     def get_users(self):
         cursor = self.session.execute(
             text(
@@ -48,6 +49,7 @@ class DuckDbConnect(RDBMSDatabase):
     def get_charset(self):
         return "UTF-8"
 
+    @release_session
     def get_table_comments(self, db_name):
         cursor = self.session.execute(
             text(
@@ -61,6 +63,7 @@ class DuckDbConnect(RDBMSDatabase):
             (table_comment[0], table_comment[1]) for table_comment in table_comments
         ]
 
+    @release_session
     def table_simple_info(self) -> Iterable[str]:
         _tables_sql = f"""
                 SELECT name FROM sqlite_master WHERE type='table'
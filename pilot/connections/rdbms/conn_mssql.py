@@ -10,7 +10,7 @@ from sqlalchemy import (
     select,
     text,
 )
-from pilot.connections.rdbms.base import RDBMSDatabase
+from pilot.connections.rdbms.base import RDBMSDatabase, release_session
 
 
 class MSSQLConnect(RDBMSDatabase):
@@ -25,6 +25,7 @@ class MSSQLConnect(RDBMSDatabase):
 
     default_db = ["master", "model", "msdb", "tempdb", "modeldb", "resource", "sys"]
 
+    @release_session
     def table_simple_info(self) -> Iterable[str]:
         _tables_sql = f"""
                 SELECT TABLE_NAME FROM INFORMATION_SCHEMA.TABLES WHERE TABLE_TYPE='BASE TABLE'
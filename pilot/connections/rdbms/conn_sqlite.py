@@ -5,7 +5,7 @@ import os
 from typing import Optional, Any, Iterable
 from sqlalchemy import create_engine, text
 
-from pilot.connections.rdbms.base import RDBMSDatabase
+from pilot.connections.rdbms.base import RDBMSDatabase, release_session
 
 
 class SQLiteConnect(RDBMSDatabase):
@@ -30,12 +30,14 @@ class SQLiteConnect(RDBMSDatabase):
             os.makedirs(directory)
         return cls(create_engine("sqlite:///" + file_path, **_engine_args), **kwargs)
 
+    @release_session
     def get_indexes(self, table_name):
         """Get table indexes about specified table."""
         cursor = self.session.execute(text(f"PRAGMA index_list({table_name})"))
         indexes = cursor.fetchall()
         return [(index[1], index[3]) for index in indexes]
 
+    @release_session
     def get_show_create_table(self, table_name):
         """Get table show create table about specified table."""
         cursor = self.session.execute(
@@ -46,6 +48,7 @@ class SQLiteConnect(RDBMSDatabase):
         ans = cursor.fetchall()
         return ans[0][0]
 
+    @release_session
     def get_fields(self, table_name):
         """Get column fields about specified table."""
         cursor = self.session.execute(text(f"PRAGMA table_info('{table_name}')"))
@@ -72,6 +75,7 @@ class SQLiteConnect(RDBMSDatabase):
     def get_database_names(self):
         return []
 
+    @release_session
     def _sync_tables_from_db(self) -> Iterable[str]:
         table_results = self.session.execute(
             text("SELECT name FROM sqlite_master WHERE type='table'")
@@ -93,6 +97,7 @@ class SQLiteConnect(RDBMSDatabase):
         print(f"SQL[{write_sql}], result:{result.rowcount}")
         return result.rowcount
 
+    @release_session
     def get_table_comments(self, db_name=None):
         cursor = self.session.execute(
             text(
@@ -106,6 +111,7 @@ class SQLiteConnect(RDBMSDatabase):
             (table_comment[0], table_comment[1]) for table_comment in table_comments
         ]
 
+    @release_session
     def table_simple_info(self) -> Iterable[str]:
         _tables_sql = f"""
                 SELECT name FROM sqlite_master WHERE type='table'
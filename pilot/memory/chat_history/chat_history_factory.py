@@ -0,0 +1,29 @@
+from typing import Dict, Type
+
+from pilot.configs.config import Config
+from pilot.memory.chat_history.base import BaseChatHistoryMemory
+from pilot.memory.chat_history.duckdb_history import DuckdbHistoryMemory
+from pilot.memory.chat_history.duckdb_message_history import (
+    DuckdbMessageHistoryMemory,
+)
+
+CFG = Config()
+
+_STORE_CLASSES: Dict[str, Type[BaseChatHistoryMemory]] = {
+    cls.store_type: cls for cls in [DuckdbHistoryMemory, DuckdbMessageHistoryMemory]
+}
+
+
+def get_store_cls(store_type: str = None) -> Type[BaseChatHistoryMemory]:
+    """Return the chat history class of store type, default is CHAT_HISTORY_STORE_TYPE"""
+    store_type = store_type or CFG.CHAT_HISTORY_STORE_TYPE
+    store_cls = _STORE_CLASSES.get(store_type)
+    if not store_cls:
+        raise ValueError(
+            f"Unsupported chat history store type: {store_type}, supported: {list(_STORE_CLASSES.keys())}"
+        )
+    return store_cls
+
+
+def get_store_instance(chat_session_id: str) -> BaseChatHistoryMemory:
+    return get_store_cls()(chat_session_id)
@@ -10,6 +10,7 @@ from pilot.scene.message import (
     _conversation_to_dic,
 )
 from pilot.common.formatting import MyEncoder
+from pilot.utils.duckdb_pool import get_duckdb_pool
 
 default_db_path = os.path.join(os.getcwd(), "message")
 duckdb_path = os.getenv("DB_DUCKDB_PATH", default_db_path + "/chat_history.db")
@@ -19,10 +20,13 @@ CFG = Config()
 
 
 class DuckdbHistoryMemory(BaseChatHistoryMemory):
+    store_type: str = "duckdb"
+
     def __init__(self, chat_session_id: str):
         self.chat_seesion_id = chat_session_id
         os.makedirs(default_db_path, exist_ok=True)
-        self.connect = duckdb.connect(duckdb_path)
+        # A cursor of the shared connection, opening the database again is slow
+        self.connect = get_duckdb_pool().cursor(duckdb_path).cursor()
         self.__init_chat_history_tables()
 
     def __init_chat_history_tables(self):
@@ -118,9 +122,9 @@ class DuckdbHistoryMemory(BaseChatHistoryMemory):
         return True
 
     @staticmethod
-    def conv_list(cls, user_name: str = None) -> None:
+    def conv_list(user_name: str = None) -> None:
         if os.path.isfile(duckdb_path):
-            cursor = duckdb.connect(duckdb_path).cursor()
+            cursor = get_duckdb_pool().cursor(duckdb_path).cursor()
             if user_name:
                 cursor.execute(
                     "SELECT * FROM chat_history where user_name=? order by id desc limit 20",
@@ -0,0 +1,288 @@
+"""Append-only chat history storage for DuckDB.
+
+Each round of a conversation is one row of ``chat_message_round``, appending a round
+inserts one row instead of rewriting the whole conversation. ``chat_conversation``
+holds one row per conversation written when the conversation starts, the round count
+and the latest round of the dialogue list are read from the rounds of the listed
+conversations only.
+"""
+
+import json
+import logging
+import os
+from typing import Dict, List
+
+import duckdb
+
+from pilot.common.custom_data_structure import FixedSizeDict
+from pilot.memory.chat_history.base import BaseChatHistoryMemory
+from pilot.scene.message import OnceConversation, _conversation_to_dic
+from pilot.utils.duckdb_pool import get_duckdb_pool
+
+logger = logging.getLogger(__name__)
+
+default_db_path = os.path.join(os.getcwd(), "message")
+duckdb_path = os.getenv("DB_DUCKDB_PATH", default_db_path + "/chat_history.db")
+
+_conversation_table = "chat_conversation"
+_round_table = "chat_message_round"
+_meta_table = "chat_history_meta"
+_legacy_table = "chat_history"
+
+# Database paths whose tables are ready in current process
+_initialized_paths = set()
+# (db_path, conv_uid) of conversations whose row is saved, appends only insert rounds
+_saved_conversations = FixedSizeDict(10000)
+
+
+def _init_tables(db_path: str) -> None:
+    if db_path in _initialized_paths:
+        return
+    cursor = get_duckdb_pool().cursor(db_path)
+    cursor.execute(
+        f"CREATE SEQUENCE IF NOT EXISTS seq_{_conversation_table}_id START 1"
+    )
+    cursor.execute(
+        f"""CREATE TABLE IF NOT EXISTS {_conversation_table} (
+            id BIGINT DEFAULT nextval('seq_{_conversation_table}_id'),
+            conv_uid VARCHAR PRIMARY KEY,
+            chat_mode VARCHAR,
+            summary VARCHAR,
+            user_name VARCHAR,
+            gmt_created TIMESTAMP DEFAULT current_timestamp
+        )"""
+    )
+    cursor.execute(f"CREATE SEQUENCE IF NOT EXISTS seq_{_round_table}_id START 1")
+    cursor.execute(
+        f"""CREATE TABLE IF NOT EXISTS {_round_table} (
+            id BIGINT PRIMARY KEY DEFAULT nextval('seq_{_round_table}_id'),
+            conv_uid VARCHAR,
+            chat_order INTEGER,
+            round TEXT
+        )"""
+    )
+    cursor.execute(
+        f"CREATE INDEX IF NOT EXISTS idx_{_round_table}_conv_uid ON {_round_table}(conv_uid)"
+    )
+    cursor.execute(
+        f"CREATE TABLE IF NOT EXISTS {_meta_table} (key VARCHAR PRIMARY KEY, value VARCHAR)"
+    )
+    _migrate_legacy_history(cursor)
+    _initialized_paths.add(db_path)
+
+
+def _migrate_legacy_history(cursor) -> int:
+    """Copy the conversations of the legacy ``chat_history`` table once, keep the legacy table"""
+    migrated = cursor.execute(
+        f"SELECT value FROM {_meta_table} WHERE key='legacy_migrated'"
+    ).fetchone()
+    if migrated:
+        return 0
+    legacy = cursor.execute(
+        "SELECT name FROM sqlite_master WHERE type='table' AND name=?", [_legacy_table]
+    ).fetchall()
+    count = 0
+    cursor.execute("BEGIN TRANSACTION")
+    try:
+        if legacy:
+            rows = cursor.execute(
+                f"SELECT conv_uid, chat_mode, summary, user_name, messages FROM {_legacy_table} ORDER BY id"
+            ).fetchall()
+            for conv_uid, chat_mode, summary, user_name, messages in rows:
+                rounds = json.loads(messages) if messages else []
+                exist = cursor.execute(
+                    f"SELECT 1 FROM {_conversation_table} WHERE conv_uid=?", [conv_uid]
+                ).fetchone()
+                if exist:
+                    continue
+                for once in rounds:
+                    cursor.execute(
+                        f"INSERT INTO {_round_table}(conv_uid, chat_order, round) VALUES(?,?,?)",
+                        [
+                            conv_uid,
+                            once.get("chat_order"),
+                            json.dumps(once, ensure_ascii=False),
+                        ],
+                    )
+                cursor.execute(
+                    f"INSERT INTO {_conversation_table}(conv_uid, chat_mode, summary, user_name) VALUES(?,?,?,?)",
+                    [conv_uid, chat_mode, summary, user_name],
+                )
+                count += 1
+        cursor.execute(
+            f"INSERT INTO {_meta_table}(key, value) VALUES('legacy_migrated', '1')"
+        )
+        cursor.execute("COMMIT")
+    except Exception:
+        cursor.execute("ROLLBACK")
+        raise
+    if count:
+        logger.info(f"Migrate {count} conversations from table {_legacy_table}")
+    return count
+
+
+def _query_conversations(cursor, where: str, params: List) -> List[Dict]:
+    """Conversation rows with the round count and the latest round of each one"""
+    cursor.execute(
+        f"""WITH conv AS (
+            SELECT id, conv_uid, chat_mode, summary, user_name FROM {_conversation_table}
+            {where} ORDER BY id DESC LIMIT 20
+        ), stat AS (
+            SELECT conv_uid, count(*) AS rounds, max(id) AS last_id FROM {_round_table}
+            WHERE conv_uid IN (SELECT conv_uid FROM conv) GROUP BY conv_uid
+        )
+        SELECT conv.conv_uid, conv.chat_mode, conv.summary, conv.user_name,
+            coalesce(stat.rounds, 0) AS rounds, r.round AS last_round
+        FROM conv LEFT JOIN stat ON conv.conv_uid = stat.conv_uid
+        LEFT JOIN {_round_table} r ON r.id = stat.last_id
+        ORDER BY conv.id DESC""",
+        params,
+    )
+    fields = [field[0] for field in cursor.description]
+    items = []
+    for row in cursor.fetchall():
+        item = dict(zip(fields, row))
+        last_round = json.loads(item["last_round"]) if item["last_round"] else {}
+        item["model_name"] = last_round.get("model_name")
+        items.append(item)
+    return items
+
+
+class DuckdbMessageHistoryMemory(BaseChatHistoryMemory):
+    """Chat history with one row per round, appending costs the same for any conversation length"""
+
+    store_type: str = "duckdb_message"
+
+    def __init__(self, chat_session_id: str, db_path: str = None):
+        self.chat_seesion_id = chat_session_id
+        self.db_path = db_path or duckdb_path
+        _init_tables(self.db_path)
+
+    @property
+    def connect(self):
+        return get_duckdb_pool().cursor(self.db_path)
+
+    def messages(self) -> List[OnceConversation]:
+        return self.get_messages() or []
+
+    def create(self, chat_mode, summary: str, user_name: str) -> None:
+        try:
+            self.connect.execute(
+                f"INSERT INTO {_conversation_table}(conv_uid, chat_mode, summary, user_name) VALUES(?,?,?,?)",
+                [self.chat_seesion_id, chat_mode, summary, user_name],
+            )
+        except duckdb.ConstraintException:
+            # The conversation exists already
+            pass
+        _saved_conversations[(self.db_path, self.chat_seesion_id)] = True
+
+    def append(self, once_message: OnceConversation) -> None:
+        """Insert one round, the first append of a conversation also inserts its row
+
+        Only a conversation not seen by current process pays for its row, a plain
+        insert that fails on the primary key is cheaper than a lookup or an upsert.
+        """
+        cursor = self.connect
+        round_params = [
+            self.chat_seesion_id,
+            once_message.chat_order,
+            json.dumps(_conversation_to_dic(once_message), ensure_ascii=False),
+        ]
+        round_sql = (
+            f"INSERT INTO {_round_table}(conv_uid, chat_order, round) VALUES(?,?,?)"
+        )
+        key = (self.db_path, self.chat_seesion_id)
+        if key in _saved_conversations:
+            cursor.execute(round_sql, round_params)
+            return
+        cursor.execute("BEGIN TRANSACTION")
+        try:
+            cursor.execute(
+                f"INSERT INTO {_conversation_table}(conv_uid, chat_mode, summary, user_name) VALUES(?,?,?,?)",
+                [
+                    self.chat_seesion_id,
+                    once_message.chat_mode,
+                    once_message.get_user_conv().content,
+                    "",
+                ],
+            )
+            cursor.execute(round_sql, round_params)
+            cursor.execute("COMMIT")
+        except duckdb.ConstraintException:
+            # The conversation was saved by an earlier process
+            cursor.execute("ROLLBACK")
+            cursor.execute(round_sql, round_params)
+        except Exception:
+            cursor.execute("ROLLBACK")
+            raise
+        _saved_conversations[key] = True
+
+    def update(self, messages: List[OnceConversation]) -> None:
+        """Replace all rounds of the conversation, rounds are dicts like get_messages returns"""
+        cursor = self.connect
+        cursor.execute("BEGIN TRANSACTION")
+        try:
+            cursor.execute(
+                f"DELETE FROM {_round_table} WHERE conv_uid=?", [self.chat_seesion_id]
+            )
+            for once in messages:
+                cursor.execute(
+                    f"INSERT INTO {_round_table}(conv_uid, chat_order, round) VALUES(?,?,?)",
+                    [
+                        self.chat_seesion_id,
+                        once.get("chat_order"),
+                        json.dumps(once, ensure_ascii=False),
+                    ],
+                )
+            cursor.execute("COMMIT")
+        except Exception:
+            cursor.execute("ROLLBACK")
+            raise
+
+    def clear(self) -> None:
+        self.delete()
+
+    def delete(self) -> bool:
+        cursor = self.connect
+        cursor.execute("BEGIN TRANSACTION")
+        try:
+            cursor.execute(
+                f"DELETE FROM {_round_table} WHERE conv_uid=?", [self.chat_seesion_id]
+            )
+            cursor.execute(
+                f"DELETE FROM {_conversation_table} WHERE conv_uid=?",
+                [self.chat_seesion_id],
+            )
+            cursor.execute("COMMIT")
+        except Exception:
+            cursor.execute("ROLLBACK")
+            raise
+        _saved_conversations.pop((self.db_path, self.chat_seesion_id), None)
+        return True
+
+    @staticmethod
+    def conv_list(user_name: str = None, db_path: str = None) -> List[Dict]:
+        """Latest created conversations with their last round, only the last rounds are read"""
+        db_path = db_path or duckdb_path
+        _init_tables(db_path)
+        cursor = get_duckdb_pool().cursor(db_path)
+        if user_name:
+            return _query_conversations(cursor, "WHERE user_name=?", [user_name])
+        return _query_conversations(cursor, "", [])
+
+    def conv_info(self, conv_uid: str = None) -> Dict:
+        items = _query_conversations(
+            self.connect, "WHERE conv_uid=?", [conv_uid or self.chat_seesion_id]
+        )
+        return items[0] if items else {}
+
+    def get_messages(self) -> List[OnceConversation]:
+        cursor = self.connect
+        cursor.execute(
+            f"SELECT round FROM {_round_table} WHERE conv_uid=? ORDER BY id",
+            [self.chat_seesion_id],
+        )
+        rows = cursor.fetchall()
+        if not rows:
+            return None
+        return [json.loads(row[0]) for row in rows]
@@ -0,0 +1,110 @@
+"""Run unit test with command: pytest pilot/memory/chat_history/tests/test_duckdb_message_history.py"""
+
+import json
+import os
+import time
+
+import pytest
+
+from pilot.memory.chat_history.duckdb_message_history import (
+    DuckdbMessageHistoryMemory,
+)
+from pilot.scene.message import OnceConversation, _conversation_to_dic
+from pilot.utils.duckdb_pool import get_duckdb_pool
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return os.path.join(str(tmp_path), "chat_history.db")
+
+
+def _round(chat_order: int, question: str = "question", answer: str = "answer"):
+    once = OnceConversation("chat_normal")
+    once.chat_order = chat_order
+    once.model_name = "vicuna-13b-v1.5"
+    once.param_value = f"param_{chat_order}"
+    once.add_user_message(f"{question} {chat_order}")
+    once.add_ai_message(f"{answer} {chat_order}")
+    return once
+
+
+def test_append_and_read(db_path):
+    memory = DuckdbMessageHistoryMemory("conv_1", db_path=db_path)
+    assert memory.messages() == []
+    for i in range(1, 4):
+        memory.append(_round(i))
+    messages = memory.get_messages()
+    assert [m["chat_order"] for m in messages] == [1, 2, 3]
+    assert messages[0] == _conversation_to_dic(_round(1))
+
+    conv = memory.conv_info()
+    assert conv["rounds"] == 3
+    assert conv["summary"] == "question 1"
+    assert json.loads(conv["last_round"])["param_value"] == "param_3"
+
+
+def test_conv_list(db_path):
+    for conv_uid in ["conv_1", "conv_2"]:
+        DuckdbMessageHistoryMemory(conv_uid, db_path=db_path).append(_round(1))
+    DuckdbMessageHistoryMemory("conv_1", db_path=db_path).append(_round(2))
+    items = DuckdbMessageHistoryMemory.conv_list(db_path=db_path)
+    assert [item["conv_uid"] for item in items] == ["conv_2", "conv_1"]
+    assert json.loads(items[1]["last_round"])["chat_order"] == 2
+    assert items[1]["rounds"] == 2
+    assert items[1]["model_name"] == "vicuna-13b-v1.5"
+    assert "messages" not in items[0]
+
+
+def test_update_and_delete(db_path):
+    memory = DuckdbMessageHistoryMemory("conv_1", db_path=db_path)
+    memory.append(_round(1))
+    memory.append(_round(2))
+    messages = memory.get_messages()
+    messages[1]["param_value"] = "edited"
+    memory.update(messages)
+    assert memory.get_messages() == messages
+    assert json.loads(memory.conv_info()["last_round"])["param_value"] == "edited"
+
+    memory.delete()
+    assert memory.get_messages() is None
+    assert memory.conv_info() == {}
+    # A deleted conversation is saved again by its next append
+    memory.append(_round(1))
+    assert memory.conv_info()["rounds"] == 1
+
+
+def test_migrate_legacy_history(db_path):
+    cursor = get_duckdb_pool().cursor(db_path)
+    cursor.execute(
+        "CREATE TABLE chat_history (id integer primary key, conv_uid VARCHAR(100) UNIQUE, chat_mode VARCHAR(50), summary VARCHAR(255),  user_name VARCHAR(100), messages TEXT)"
+    )
+    legacy_rounds = [_conversation_to_dic(_round(i)) for i in range(1, 3)]
+    cursor.execute(
+        "INSERT INTO chat_history VALUES(1, 'legacy_conv', 'chat_normal', 'question 1', '', ?)",
+        [json.dumps(legacy_rounds)],
+    )
+
+    memory = DuckdbMessageHistoryMemory("legacy_conv", db_path=db_path)
+    assert memory.get_messages() == legacy_rounds
+    assert memory.conv_info()["rounds"] == 2
+    memory.append(_round(3))
+    assert len(memory.get_messages()) == 3
+    # The legacy table is kept
+    assert cursor.execute("SELECT count(*) FROM chat_history").fetchone()[0] == 1
+
+
+def test_append_cost_does_not_grow_with_rounds(db_path):
+    memory = DuckdbMessageHistoryMemory("conv_long", db_path=db_path)
+    answer = "a long answer " * 200
+
+    def _append_cost(start: int, count: int = 20) -> float:
+        begin = time.perf_counter()
+        for i in range(start, start + count):
+            memory.append(_round(i, answer=answer))
+        return (time.perf_counter() - begin) / count
+
+    first = _append_cost(1)
+    for i in range(21, 300):
+        memory.append(_round(i, answer=answer))
+    later = _append_cost(300)
+    assert later < first * 3
@@ -28,6 +28,12 @@ class ModelInstance:
     enabled: Optional[bool] = True
     prompt_template: Optional[str] = None
     last_heartbeat: Optional[datetime] = None
+    # False if restored by a restarted model controller and no heartbeat received yet
+    verified: Optional[bool] = True
+    # Load report of the instance in last heartbeat, see pilot.model.cluster.load
+    load: Optional[Dict] = None
+    # Context length of the model served by the instance, None if unknown
+    context_len: Optional[int] = None
 
 
 class WorkerApplyType(str, Enum):
@@ -37,6 +43,14 @@ class WorkerApplyType(str, Enum):
     UPDATE_PARAMS = "update_params"
 
 
+# error_code of ModelOutput when a worker rejects a request without running it, because
+# its wait queue is full or the request waited too long, retry it on another instance
+MODEL_OVERLOADED_ERROR_CODE = 503
+# error_code of ModelOutput when a prompt does not fit in the context of model and the
+# worker rejects it without running it
+MODEL_CONTEXT_OVERFLOW_ERROR_CODE = 413
+
+
 @dataclass
 class ModelOutput:
     text: str
@@ -0,0 +1,361 @@
+"""
+Continuous batching (iteration-level scheduling) for Hugging Face decoder-only models.
+
+Concurrent requests are merged into one batched forward pass per decode step, new
+requests are admitted and finished ones retired between decode steps, so one slow long
+answer does not hold the whole batch. Every request still gets its own stream with the
+same output as ``pilot.model.inference.generate_stream``.
+"""
+
+import logging
+import queue
+import threading
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import torch
+
+from pilot.model.cancellation import cancellation_counter
+from pilot.model.detokenizer import IncrementalDetokenizer, StopStringScanner
+from pilot.model.inference import prepare_logits_processor
+from pilot.model.prefix_cache import (
+    PrefixKVCache,
+    from_legacy_cache,
+    prefill,
+    to_legacy_cache,
+)
+
+logger = logging.getLogger(__name__)
+
+# Put into the output queue of a request when it is finished
+_FINISHED = object()
+
+
+@dataclass
+class _Sequence:
+    params: Dict
+    output_queue: queue.Queue
+    output_ids: List[int] = field(default_factory=list)
+    temperature: float = 1.0
+    repetition_penalty: float = 1.0
+    top_p: float = 1.0
+    max_new_tokens: int = 2048
+    echo: bool = True
+    stop_token_ids: List[int] = field(default_factory=list)
+    detokenizer: Optional[IncrementalDetokenizer] = None
+    stop_scanner: Optional[StopStringScanner] = None
+    logits_processor: Optional[object] = None
+    # Number of tokens generated
+    num_generated: int = 0
+    output: str = ""
+    cancelled: bool = False
+
+
+class ContinuousBatchingScheduler:
+    """Iteration-level scheduler running in a background thread.
+
+    Args:
+        model: Hugging Face decoder-only causal LM
+        tokenizer: Tokenizer of the model
+        device (str): Device of the model
+        context_len (int): Context length of the model
+        max_batch_size (int): Maximum number of sequences decoded together
+        stream_interval (int): Emit output every stream_interval tokens
+        prefix_cache (PrefixKVCache): Reuse the KV of cached prompt prefixes in prefill
+    """
+
+    def __init__(
+        self,
+        model,
+        tokenizer,
+        device: str,
+        context_len: int,
+        max_batch_size: int = 8,
+        stream_interval: int = 2,
+        prefix_cache: Optional[PrefixKVCache] = None,
+    ) -> None:
+        if model.config.is_encoder_decoder:
+            raise ValueError("Continuous batching only supports decoder-only models")
+        self.model = model
+        self.tokenizer = tokenizer
+        self.device = device
+        self.context_len = context_len
+        self.max_batch_size = max_batch_size
+        self.stream_interval = stream_interval
+        self.prefix_cache = prefix_cache
+        self._pending: "queue.Queue[_Sequence]" = queue.Queue()
+        self._running: List[_Sequence] = []
+        # Legacy format cache of the running batch, left padded to the same length
+        self._past_key_values: Optional[Tuple] = None
+        self._attention_mask: Optional[torch.Tensor] = None
+        self._cache_cls = None
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(
+            target=self._run_loop, name="continuous-batching", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        # Wake up the loop
+        self._pending.put(None)
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+
+    def generate_stream(self, params: Dict) -> Iterator[str]:
+        """Submit a request and stream its output, compatible with generate_stream"""
+        seq = self._build_sequence(params)
+        self._pending.put(seq)
+        try:
+            while True:
+                output = seq.output_queue.get()
+                if output is _FINISHED:
+                    return
+                if isinstance(output, BaseException):
+                    raise output
+                yield output
+        finally:
+            # Consumer closed the stream, retire it at the next decode step
+            seq.cancelled = True
+
+    def _build_sequence(self, params: Dict) -> _Sequence:
+        prompt = params["prompt"]
+        temperature = float(params.get("temperature", 1.0))
+        repetition_penalty = float(params.get("repetition_penalty", 1.0))
+        top_p = float(params.get("top_p", 1.0))
+        top_k = int(params.get("top_k", -1))  # -1 means disable
+        max_new_tokens = int(params.get("max_new_tokens", 2048))
+        stop_token_ids = list(params.get("stop_token_ids", None) or [])
+        stop_token_ids.append(self.tokenizer.eos_token_id)
+
+        input_ids = self.tokenizer(prompt).input_ids
+        # Same truncation as generate_stream
+        max_src_len = self.context_len - max_new_tokens - 1
+        input_ids = input_ids[-max_src_len:]
+        echo = bool(params.get("echo", True))
+        return _Sequence(
+            params=params,
+            output_queue=queue.Queue(),
+            output_ids=list(input_ids),
+            temperature=temperature,
+            repetition_penalty=repetition_penalty,
+            top_p=top_p,
+            max_new_tokens=max_new_tokens,
+            echo=echo,
+            stop_token_ids=stop_token_ids,
+            detokenizer=IncrementalDetokenizer(self.tokenizer, input_ids, echo),
+            stop_scanner=StopStringScanner(
+                params.get("stop", None), len(prompt) if echo else 0
+            ),
+            logits_processor=prepare_logits_processor(
+                temperature, repetition_penalty, top_p, top_k
+            ),
+        )
+
+    def _run_loop(self) -> None:
+        while not self._stop_event.is_set():
+            try:
+                self._admit()
+                if self._running:
+                    self._decode_step()
+            except Exception as e:
+                logger.exception("Continuous batching step error")
+                for seq in self._running:
+                    seq.output_queue.put(e)
+                self._reset_batch()
+        for seq in self._running:
+            seq.output_queue.put(RuntimeError("Continuous batching scheduler stopped"))
+        self._reset_batch()
+
+    def _reset_batch(self) -> None:
+        self._running = []
+        self._past_key_values = None
+        self._attention_mask = None
+
+    def _admit(self) -> None:
+        """Prefill pending requests and merge them into the running batch"""
+        while len(self._running) < self.max_batch_size:
+            try:
+                # Block only when nothing is running
+                seq = self._pending.get(block=not self._running)
+            except queue.Empty:
+                return
+            if seq is None:
+                # Wake up from stop
+                return
+            if seq.cancelled:
+                cancellation_counter.record(0, seq.max_new_tokens)
+                continue
+            try:
+                self._prefill(seq)
+            except Exception as e:
+                logger.exception("Prefill error")
+                seq.output_queue.put(e)
+
+    @torch.inference_mode()
+    def _prefill(self, seq: _Sequence) -> None:
+        out = prefill(self.model, seq.output_ids, self.device, self.prefix_cache)
+        if self._cache_cls is None:
+            self._cache_cls = type(out.past_key_values)
+        token = self._sample(seq, out.logits[:, -1, :])
+        if self._on_token(seq, token):
+            # Finished by the first token, never join the batch
+            return
+        past = to_legacy_cache(out.past_key_values)
+        mask = torch.ones((1, len(seq.output_ids) - 1), dtype=torch.long)
+        mask = mask.to(past[0][0].device)
+        if not self._running:
+            self._past_key_values, self._attention_mask = past, mask
+        else:
+            self._past_key_values, self._attention_mask = _merge_cache(
+                self._past_key_values, self._attention_mask, past, mask
+            )
+        self._running.append(seq)
+
+    @torch.inference_mode()
+    def _decode_step(self) -> None:
+        cancelled = [seq for seq in self._running if seq.cancelled]
+        self._retire(cancelled)
+        for seq in cancelled:
+            cancellation_counter.record(seq.num_generated, seq.max_new_tokens)
+        if not self._running:
+            return
+        mask_device = self._attention_mask.device
+        input_ids = torch.as_tensor(
+            [[seq.output_ids[-1]] for seq in self._running], device=self.device
+        )
+        # The position of the new token is the number of real tokens in the cache
+        position_ids = torch.as_tensor(
+            [[len(seq.output_ids) - 1] for seq in self._running], device=self.device
+        )
+        attention_mask = torch.cat(
+            [
+                self._attention_mask,
+                torch.ones((len(self._running), 1), dtype=torch.long).to(mask_device),
+            ],
+            dim=1,
+        )
+        out = self.model(
+            input_ids=input_ids,
+            attention_mask=attention_mask.to(self.device),
+            position_ids=position_ids,
+            past_key_values=self._wrap_cache(self._past_key_values),
+            use_cache=True,
+        )
+        self._past_key_values = to_legacy_cache(out.past_key_values)
+        self._attention_mask = attention_mask
+        finished = []
+        for row, seq in enumerate(self._running):
+            token = self._sample(seq, out.logits[row : row + 1, -1, :])
+            if self._on_token(seq, token):
+                finished.append(seq)
+        self._retire(finished)
+
+    def _wrap_cache(self, past_key_values: Tuple):
+        return from_legacy_cache(self._cache_cls, past_key_values)
+
+    def _retire(self, sequences: List[_Sequence]) -> None:
+        if not sequences:
+            return
+        retired = set(id(seq) for seq in sequences)
+        keep = [i for i, seq in enumerate(self._running) if id(seq) not in retired]
+        self._running = [self._running[i] for i in keep]
+        if not keep:
+            self._past_key_values = None
+            self._attention_mask = None
+            return
+        index = torch.as_tensor(keep, device=self._attention_mask.device)
+        mask = self._attention_mask.index_select(0, index)
+        # Drop the left padding columns which no remaining sequence uses
+        used = (mask.sum(dim=0) > 0).nonzero()
+        start = int(used[0]) if len(used) else 0
+        self._attention_mask = mask[:, start:]
+        self._past_key_values = tuple(
+            tuple(t.index_select(0, index.to(t.device))[:, :, start:, :] for t in layer)
+            for layer in self._past_key_values
+        )
+
+    def _sample(self, seq: _Sequence, logits: torch.Tensor) -> int:
+        if seq.logits_processor:
+            if seq.repetition_penalty > 1.0:
+                tmp_output_ids = torch.as_tensor([seq.output_ids], device=logits.device)
+            else:
+                tmp_output_ids = None
+            last_token_logits = seq.logits_processor(tmp_output_ids, logits)[0]
+        else:
+            last_token_logits = logits[0]
+
+        if self.device == "mps":
+            # Switch to CPU by avoiding some bugs in mps backend.
+            last_token_logits = last_token_logits.float().to("cpu")
+
+        if seq.temperature < 1e-5 or seq.top_p < 1e-8:  # greedy
+            _, indices = torch.topk(last_token_logits, 2)
+        else:
+            probs = torch.softmax(last_token_logits, dim=-1)
+            indices = torch.multinomial(probs, num_samples=2)
+        return int(indices.tolist()[0])
+
+    def _on_token(self, seq: _Sequence, token: int) -> bool:
+        """Append the new token and emit output, return True if the sequence is finished"""
+        i = seq.num_generated
+        seq.num_generated += 1
+        seq.output_ids.append(token)
+        stopped = token in seq.stop_token_ids
+
+        if i % self.stream_interval == 0 or i == seq.max_new_tokens - 1 or stopped:
+            output = seq.detokenizer.decode(
+                seq.output_ids, final=stopped or i == seq.max_new_tokens - 1
+            )
+            pos, partially_stopped = seq.stop_scanner.scan(output)
+            if pos != -1:
+                output = output[:pos]
+                stopped = True
+            seq.output = output
+            # Prevent yielding partial stop sequence
+            if not partially_stopped:
+                seq.output_queue.put(output)
+
+        if stopped or seq.num_generated >= seq.max_new_tokens:
+            # The last output is yielded again, same as generate_stream
+            seq.output_queue.put(seq.output)
+            seq.output_queue.put(_FINISHED)
+            return True
+        return False
+
+
+def _merge_cache(
+    past_a: Tuple, mask_a: torch.Tensor, past_b: Tuple, mask_b: torch.Tensor
+) -> Tuple[Tuple, torch.Tensor]:
+    """Concatenate two caches on the batch dimension, left pad the shorter one"""
+    length = max(mask_a.shape[1], mask_b.shape[1])
+
+    def _pad_mask(mask: torch.Tensor) -> torch.Tensor:
+        pad = length - mask.shape[1]
+        if pad == 0:
+            return mask
+        return torch.nn.functional.pad(mask, (pad, 0), value=0)
+
+    def _pad_kv(t: torch.Tensor) -> torch.Tensor:
+        # Shape: [batch, heads, seq_len, head_dim]
+        pad = length - t.shape[2]
+        if pad == 0:
+            return t
+        return torch.nn.functional.pad(t, (0, 0, pad, 0), value=0)
+
+    past = tuple(
+        tuple(
+            torch.cat([_pad_kv(ta), _pad_kv(tb.to(ta.device))], dim=0)
+            for ta, tb in zip(layer_a, layer_b)
+        )
+        for layer_a, layer_b in zip(past_a, past_b)
+    )
+    mask = torch.cat([_pad_mask(mask_a), _pad_mask(mask_b.to(mask_a.device))], dim=0)
+    return past, mask
@@ -1,11 +1,13 @@
-from typing import Dict, Any
+from collections import OrderedDict
+from typing import Any, Optional
 from pilot.model.cache import Cache
 
 
 class InMemoryCache(Cache):
-    def __init__(self) -> None:
-        "Initialize that stores things in memory."
-        self._cache: Dict[str, Any] = {}
+    def __init__(self, max_size: Optional[int] = None) -> None:
+        "Initialize that stores things in memory, evict the least recently used items beyond max_size."
+        self.max_size = max_size
+        self._cache: "OrderedDict[str, Any]" = OrderedDict()
 
     def create(self, key: str) -> bool:
         pass
@@ -15,9 +17,15 @@ class InMemoryCache(Cache):
 
     def __setitem__(self, key: str, value: str) -> None:
         self._cache[key] = value
+        self._cache.move_to_end(key)
+        if self.max_size is not None:
+            while len(self._cache) > self.max_size:
+                self._cache.popitem(last=False)
 
     def __getitem__(self, key: str) -> str:
-        return self._cache[key]
+        value = self._cache[key]
+        self._cache.move_to_end(key)
+        return value
 
     def __contains__(self, key: str) -> bool:
         return self._cache.get(key, None) is not None
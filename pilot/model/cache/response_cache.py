@@ -0,0 +1,193 @@
+"""LLM response cache in front of the worker manager.
+
+Identical deterministic requests (same model, prompt and sampling parameters with
+temperature 0) produce the same answer, so the streamed chunks of the first answer are
+stored and replayed for the following requests instead of running inference again.
+"""
+
+import hashlib
+import json
+import logging
+from dataclasses import asdict, dataclass, is_dataclass
+from typing import Any, Dict, List, Optional
+
+from pilot.model.base import ModelOutput
+from pilot.model.cache.base import Cache
+
+logger = logging.getLogger(__name__)
+
+# Request parameters which change the output of model
+_KEY_PARAMS = [
+    "model",
+    "prompt",
+    "messages",
+    "temperature",
+    "top_p",
+    "top_k",
+    "max_new_tokens",
+    "stop",
+    "stop_token_ids",
+    "echo",
+    "repetition_penalty",
+    "presence_penalty",
+    "frequency_penalty",
+    "seed",
+]
+
+_ERROR_TEXT_PREFIXES = (
+    "**LLMServer Generate Error",
+    "**GPU OutOfMemory",
+)
+
+
+@dataclass
+class ResponseCacheStats:
+    """Hit/miss statistics of the response cache"""
+
+    hits: int = 0
+    misses: int = 0
+    # Requests which are not cacheable, e.g. temperature > 0
+    skipped: int = 0
+    stores: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def to_dict(self) -> Dict:
+        data = asdict(self)
+        data["hit_rate"] = self.hit_rate
+        return data
+
+
+def _normalize_prompt(prompt: str) -> str:
+    lines = prompt.strip().replace("\r\n", "\n").split("\n")
+    return "\n".join(line.rstrip() for line in lines)
+
+
+def _json_default(obj: Any):
+    if hasattr(obj, "dict"):
+        # pydantic model, e.g. ModelMessage
+        return obj.dict()
+    if is_dataclass(obj):
+        return asdict(obj)
+    return str(obj)
+
+
+def build_request_key(params: Dict, non_deterministic: bool = False) -> Optional[str]:
+    """Return the hash of the request parameters which change the output of model.
+
+    Args:
+        params (Dict): Parameters of generate request
+        non_deterministic (bool): Build the key of sampling requests (temperature > 0)
+            too, by default None is returned for them
+    """
+    if not non_deterministic:
+        temperature = params.get("temperature")
+        if temperature is None or float(temperature) > 0:
+            return None
+    key_params = {k: params[k] for k in _KEY_PARAMS if params.get(k) is not None}
+    if isinstance(key_params.get("prompt"), str):
+        key_params["prompt"] = _normalize_prompt(key_params["prompt"])
+    if "temperature" in key_params:
+        key_params["temperature"] = float(key_params["temperature"])
+    raw_key = json.dumps(
+        key_params, sort_keys=True, ensure_ascii=False, default=_json_default
+    )
+    return hashlib.sha256(raw_key.encode()).hexdigest()
+
+
+def _is_error_output(output: ModelOutput) -> bool:
+    if output.error_code != 0:
+        return True
+    return bool(output.text) and output.text.startswith(_ERROR_TEXT_PREFIXES)
+
+
+class ModelResponseCache:
+    """Cache the streamed outputs of LLM requests in a ``Cache`` backend.
+
+    Chunks are stored as delta frames of the stream protocol, so a cached stream costs
+    the size of its final text instead of the sum of all cumulative chunks.
+    """
+
+    def __init__(self, cache: Cache, cache_non_deterministic: bool = False) -> None:
+        self.cache = cache
+        self.cache_non_deterministic = cache_non_deterministic
+        self._stats = ResponseCacheStats()
+
+    def build_key(self, params: Dict) -> Optional[str]:
+        """Return the cache key of request, None if the request is not cacheable"""
+        key = build_request_key(params, self.cache_non_deterministic)
+        if key is None:
+            self._stats.skipped += 1
+        return key
+
+    def get(self, key: str) -> Optional[List[ModelOutput]]:
+        """Return the cached stream outputs of key"""
+        from pilot.model.cluster.stream_protocol import DeltaStreamDecoder
+
+        try:
+            value = self.cache[key] if key in self.cache else None
+        except Exception as e:
+            logger.warning(f"Read response cache error: {str(e)}")
+            value = None
+        if value is None:
+            self._stats.misses += 1
+            return None
+        self._stats.hits += 1
+        decoder = DeltaStreamDecoder()
+        return [decoder.decode(frame) for frame in json.loads(value)]
+
+    def put(self, key: str, outputs: List[ModelOutput]) -> bool:
+        """Store the complete stream outputs of key, error outputs are not stored"""
+        from pilot.model.cluster.stream_protocol import DeltaStreamEncoder
+
+        if not outputs or any(_is_error_output(output) for output in outputs):
+            return False
+        encoder = DeltaStreamEncoder()
+        value = json.dumps(
+            [encoder.encode(output) for output in outputs],
+            ensure_ascii=False,
+            default=_json_default,
+        )
+        try:
+            self.cache[key] = value
+        except Exception as e:
+            logger.warning(f"Write response cache error: {str(e)}")
+            return False
+        self._stats.stores += 1
+        return True
+
+    def clear(self) -> None:
+        self.cache.clear()
+
+    def stats(self) -> ResponseCacheStats:
+        return ResponseCacheStats(**asdict(self._stats))
+
+
+def create_response_cache(
+    cache_type: Optional[str],
+    cache_name: str = "model_response",
+    max_memory_items: Optional[int] = None,
+    cache_non_deterministic: bool = False,
+) -> Optional[ModelResponseCache]:
+    """Create response cache with the backend cache type, None means disabled"""
+    if not cache_type:
+        return None
+    if cache_type == "memory":
+        from pilot.model.cache.memory_cache import InMemoryCache
+
+        cache = InMemoryCache(max_size=max_memory_items)
+    elif cache_type == "disk":
+        from pilot.model.cache.disk_cache import DiskCache
+
+        cache = DiskCache(cache_name)
+    else:
+        # No semantic backend (gptcache): keys are hashes of the exact requests, similar
+        # keys are different prompts
+        raise ValueError(
+            f"Unsupported response cache type: {cache_type}, supported: memory, disk"
+        )
+    logger.info(f"Enable model response cache with {cache_type} backend")
+    return ModelResponseCache(cache, cache_non_deterministic=cache_non_deterministic)
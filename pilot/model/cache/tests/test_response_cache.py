@@ -0,0 +1,114 @@
+"""Run unit test with command: pytest pilot/model/cache/tests/test_response_cache.py"""
+
+import pytest
+
+from pilot.model.base import ModelOutput
+from pilot.model.cache.memory_cache import InMemoryCache
+from pilot.model.cache.response_cache import ModelResponseCache, create_response_cache
+
+
+def _params(**kwargs):
+    params = {
+        "model": "vicuna-13b-v1.5",
+        "prompt": "Describe table users",
+        "temperature": 0,
+        "max_new_tokens": 512,
+    }
+    params.update(kwargs)
+    return params
+
+
+def test_build_key():
+    response_cache = ModelResponseCache(InMemoryCache())
+    key = response_cache.build_key(_params())
+    assert key == response_cache.build_key(
+        _params(prompt="  Describe table users  \r\n", temperature=0.0)
+    )
+    # Parameters which don't change the output are not a part of key
+    assert key == response_cache.build_key(_params(span_id="abc"))
+    assert key != response_cache.build_key(_params(model="chatglm2-6b"))
+    assert key != response_cache.build_key(_params(max_new_tokens=1024))
+    assert key != response_cache.build_key(_params(stop="###"))
+    assert response_cache.build_key(_params(temperature=0.7)) is None
+    assert response_cache.build_key(_params(temperature=None)) is None
+
+
+def test_cache_non_deterministic():
+    response_cache = ModelResponseCache(InMemoryCache(), cache_non_deterministic=True)
+    assert response_cache.build_key(_params(temperature=0.7))
+
+
+def test_put_and_get():
+    response_cache = ModelResponseCache(InMemoryCache())
+    key = response_cache.build_key(_params())
+    outputs = [
+        ModelOutput(text="users", error_code=0, model_context={"echo": 0}),
+        ModelOutput(text="users table", error_code=0, model_context={"echo": 0}),
+    ]
+    assert response_cache.get(key) is None
+    assert response_cache.put(key, outputs)
+    assert response_cache.get(key) == outputs
+
+
+def test_error_outputs_are_not_cached():
+    response_cache = ModelResponseCache(InMemoryCache())
+    key = response_cache.build_key(_params())
+    assert not response_cache.put(key, [ModelOutput(text="oom", error_code=1)])
+    assert not response_cache.put(
+        key,
+        [
+            ModelOutput(
+                text="**LLMServer Generate Error, Please CheckErrorInfo.**: timeout",
+                error_code=0,
+            )
+        ],
+    )
+    assert response_cache.get(key) is None
+
+
+def test_memory_cache_max_size():
+    cache = InMemoryCache(max_size=2)
+    cache["a"], cache["b"] = "1", "2"
+    assert cache["a"] == "1"
+    cache["c"] = "3"
+    assert "a" in cache and "c" in cache and "b" not in cache
+
+
+def test_create_response_cache():
+    assert create_response_cache(None) is None
+    assert isinstance(create_response_cache("memory"), ModelResponseCache)
+    with pytest.raises(ValueError):
+        create_response_cache("redis")
+    with pytest.raises(ValueError):
+        # Similarity lookups on the hashed keys return the answers of other prompts
+        create_response_cache("gptcache")
+
+
+@pytest.mark.parametrize("cache_type", ["memory", "disk"])
+def test_different_prompts_never_share_response(cache_type):
+    if cache_type == "disk":
+        pytest.importorskip("diskcache")
+    response_cache = create_response_cache(
+        cache_type, cache_name="test_different_prompts"
+    )
+    response_cache.clear()
+    prompts = [
+        "Describe table users",
+        "Describe table user",
+        "Describe table orders",
+        "describe table users",
+    ]
+    try:
+        for prompt in prompts:
+            key = response_cache.build_key(_params(prompt=prompt))
+            assert response_cache.get(key) is None
+            response_cache.put(
+                key, [ModelOutput(text=f"answer of {prompt}", error_code=0)]
+            )
+        for prompt in prompts:
+            outputs = response_cache.get(
+                response_cache.build_key(_params(prompt=prompt))
+            )
+            assert [output.text for output in outputs] == [f"answer of {prompt}"]
+    finally:
+        response_cache.clear()
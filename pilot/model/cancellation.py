@@ -0,0 +1,47 @@
+"""Metrics of generations cancelled before they finished.
+
+A generation is cancelled when its consumer stops reading, e.g. the browser closed the
+stream. The decoding loops record how many tokens were generated for nobody and how many
+they did not generate, counted up to ``max_new_tokens``.
+"""
+
+import threading
+from dataclasses import asdict, dataclass
+from typing import Dict
+
+
+@dataclass
+class CancellationStats:
+    # Generations cancelled before they finished
+    cancelled: int = 0
+    # Tokens generated by the cancelled generations
+    generated_tokens: int = 0
+    # Tokens not generated because of the cancellation, at most max_new_tokens each
+    saved_tokens: int = 0
+
+    def to_dict(self) -> Dict:
+        return asdict(self)
+
+
+class CancellationCounter:
+    def __init__(self) -> None:
+        self._stats = CancellationStats()
+        self._lock = threading.Lock()
+
+    def record(self, generated_tokens: int, max_new_tokens: int) -> None:
+        with self._lock:
+            self._stats.cancelled += 1
+            self._stats.generated_tokens += generated_tokens
+            self._stats.saved_tokens += max(max_new_tokens - generated_tokens, 0)
+
+    def stats(self) -> CancellationStats:
+        with self._lock:
+            return CancellationStats(**asdict(self._stats))
+
+    def reset(self) -> None:
+        with self._lock:
+            self._stats = CancellationStats()
+
+
+# Shared by the decoding loops of the process
+cancellation_counter = CancellationCounter()
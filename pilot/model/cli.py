@@ -8,6 +8,7 @@ from pilot.configs.model_config import LOGDIR
 from pilot.model.base import WorkerApplyType
 from pilot.model.parameter import (
     ModelControllerParameters,
+    MockProxyServerParameters,
     ModelWorkerParameters,
     ModelParameters,
     BaseParameters,
@@ -70,6 +71,7 @@ def list(model_name: str, model_type: str):
     """List model instances"""
     from prettytable import PrettyTable
     from pilot.model.cluster import ModelRegistryClient
+    from pilot.model.cluster.load import format_load
 
     loop = get_or_create_event_loop()
     registry = ModelRegistryClient(MODEL_CONTROLLER_ADDRESS)
@@ -91,9 +93,11 @@ def list(model_name: str, model_type: str):
         "Host",
         "Port",
         "Healthy",
+        "Verified",
         "Enabled",
         "Prompt Template",
         "Last Heartbeat",
+        "Load",
     ]
     for instance in instances:
         model_name, model_type = instance.model_name.split("@")
@@ -104,9 +108,11 @@ def list(model_name: str, model_type: str):
                 instance.host,
                 instance.port,
                 instance.healthy,
+                instance.verified,
                 instance.enabled,
                 instance.prompt_template if instance.prompt_template else "",
                 instance.last_heartbeat,
+                format_load(instance.load),
             ]
         )
 
@@ -452,7 +458,29 @@ def stop_apiserver(**kwargs):
     raise NotImplementedError
 
 
+@click.command(name="mockllm")
+@EnvArgumentParser.create_click_option(MockProxyServerParameters)
+def start_mock_proxy_server(**kwargs):
+    """Start mock proxy LLM server, an OpenAI compatible server for load testing"""
+    if kwargs["daemon"]:
+        port = kwargs["port"]
+        log_file = os.path.join(LOGDIR, f"mock_proxy_server_{port}_uvicorn.log")
+        _run_current_with_daemon("MockProxyServer", log_file)
+    else:
+        from pilot.model.proxy.mock_server import run_mock_proxy_server
+
+        run_mock_proxy_server()
+
+
+@click.command(name="mockllm")
+@add_stop_server_options
+def stop_mock_proxy_server(port: int):
+    """Stop mock proxy LLM server"""
+    _stop_service("mockllm", "MockProxyServer", port=port)
+
+
 def _stop_all_model_server(**kwargs):
     """Stop all server"""
     _stop_service("worker", "ModelWorker")
     _stop_service("controller", "ModelController")
+    _stop_service("mockllm", "MockProxyServer")
@@ -10,6 +10,10 @@ WORKER_MANAGER_SERVICE_TYPE = "service"
 WORKER_MANAGER_SERVICE_NAME = "WorkerManager"
 
 
+class WorkerOverloadedError(Exception):
+    """The worker rejected the request before running it, it can be retried on another instance"""
+
+
 class PromptRequest(BaseModel):
     messages: List[ModelMessage]
     model: str
@@ -18,11 +22,14 @@ class PromptRequest(BaseModel):
     max_new_tokens: int = None
     stop: str = None
     echo: bool = True
+    # interactive or batch, see pilot.model.cluster.priority
+    priority: str = None
 
 
 class EmbeddingsRequest(BaseModel):
     model: str
     input: List[str]
+    priority: str = None
 
 
 class WorkerApplyRequest(BaseModel):
@@ -0,0 +1,137 @@
+"""Single-flight coalescing of identical concurrent LLM requests.
+
+Dashboards and multi-user deployments often send the same deterministic request at the
+same moment, e.g. the same chart question. The first request runs the inference, the
+identical requests arriving while it is in flight subscribe to its stream. Outputs are
+cumulative (the text so far), so a subscriber joining late starts from the latest one.
+
+The inference runs in its own task, not in the stream of the first request, so it goes
+on when the first client leaves and is only cancelled when all subscribers left.
+"""
+
+import asyncio
+import dataclasses
+import logging
+from contextlib import aclosing
+from dataclasses import asdict, dataclass, field
+from typing import AsyncIterator, Callable, Dict, Optional
+
+from pilot.model.base import ModelOutput
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class CoalescingStats:
+    # Requests which ran an inference
+    leaders: int = 0
+    # Requests which subscribed to the inference of an identical request
+    coalesced: int = 0
+    # Inferences cancelled because all subscribers left
+    cancelled: int = 0
+
+    def to_dict(self) -> Dict:
+        return asdict(self)
+
+
+@dataclass
+class _Flight:
+    # Only the latest cumulative output is kept, and the number of outputs so far
+    latest: Optional[ModelOutput] = None
+    version: int = 0
+    done: bool = False
+    error: Optional[BaseException] = None
+    subscribers: int = 0
+    task: Optional[asyncio.Task] = None
+    # Set and replaced when a new output arrives or the flight is done
+    changed: asyncio.Event = field(default_factory=asyncio.Event)
+
+    def notify(self) -> None:
+        self.changed.set()
+        self.changed = asyncio.Event()
+
+
+def _copy_output(output: ModelOutput) -> ModelOutput:
+    model_context = output.model_context
+    if isinstance(model_context, dict):
+        model_context = dict(model_context)
+    return dataclasses.replace(output, model_context=model_context)
+
+
+class RequestCoalescer:
+    """Share the output stream of in-flight requests with the same key.
+
+    Keys are built by the caller, only requests with the same output (deterministic
+    sampling parameters) may share a key. A finished flight is forgotten, later requests
+    run again, use a response cache to reuse finished answers.
+    """
+
+    def __init__(self) -> None:
+        self._flights: Dict[str, _Flight] = {}
+        self._stats = CoalescingStats()
+
+    def in_flight(self) -> int:
+        return len(self._flights)
+
+    async def stream(
+        self, key: str, stream_factory: Callable[[], AsyncIterator[ModelOutput]]
+    ) -> AsyncIterator[ModelOutput]:
+        """Stream the outputs of the in-flight request of key, start one with
+        stream_factory if there is none."""
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = _Flight()
+            self._flights[key] = flight
+            flight.task = asyncio.create_task(
+                self._run_flight(key, flight, stream_factory())
+            )
+            self._stats.leaders += 1
+        else:
+            self._stats.coalesced += 1
+        flight.subscribers += 1
+        try:
+            seen = 0
+            while True:
+                if flight.version > seen:
+                    seen = flight.version
+                    # Subscribers may change their outputs, never share them
+                    yield _copy_output(flight.latest)
+                elif flight.done:
+                    break
+                else:
+                    await flight.changed.wait()
+            if flight.error is not None:
+                raise flight.error
+        finally:
+            flight.subscribers -= 1
+            if flight.subscribers == 0 and not flight.done:
+                # Nobody reads it anymore, later requests start a new flight
+                self._forget(key, flight)
+                self._stats.cancelled += 1
+                flight.task.cancel()
+
+    async def _run_flight(
+        self, key: str, flight: _Flight, stream: AsyncIterator[ModelOutput]
+    ) -> None:
+        try:
+            async with aclosing(stream):
+                async for output in stream:
+                    flight.latest = output
+                    flight.version += 1
+                    flight.notify()
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            logger.warning(f"Coalesced request failed: {str(e)}")
+            flight.error = e
+        finally:
+            flight.done = True
+            self._forget(key, flight)
+            flight.notify()
+
+    def _forget(self, key: str, flight: _Flight) -> None:
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+
+    def stats(self) -> CoalescingStats:
+        return CoalescingStats(**asdict(self._stats))
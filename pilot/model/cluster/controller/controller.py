@@ -1,13 +1,17 @@
 from abc import ABC, abstractmethod
 
 import logging
-from typing import List
+from typing import Dict, List
 
-from fastapi import APIRouter, FastAPI
+from fastapi import APIRouter, FastAPI, HTTPException
 from pilot.component import BaseComponent, ComponentType, SystemApp
 from pilot.model.base import ModelInstance
 from pilot.model.parameter import ModelControllerParameters
-from pilot.model.cluster.registry import EmbeddedModelRegistry, ModelRegistry
+from pilot.model.cluster.registry import (
+    EmbeddedModelRegistry,
+    ModelRegistry,
+    create_model_registry,
+)
 from pilot.utils.parameter_utils import EnvArgumentParser
 from pilot.utils.api_utils import (
     _api_remote as api_remote,
@@ -39,6 +43,10 @@ class BaseModelController(BaseComponent, ABC):
     async def send_heartbeat(self, instance: ModelInstance) -> bool:
         """Send a heartbeat for a given model instance. This can be used to verify if the instance is still alive and functioning."""
 
+    async def watch_instances(self, version: int = -1, timeout: float = 30) -> Dict:
+        """Wait until the instances of any model change after version, return the version and all instances"""
+        raise NotImplementedError
+
     async def model_apply(self) -> bool:
         raise NotImplementedError
 
@@ -70,6 +78,9 @@ class LocalModelController(BaseModelController):
     async def send_heartbeat(self, instance: ModelInstance) -> bool:
         return await self.registry.send_heartbeat(instance)
 
+    async def watch_instances(self, version: int = -1, timeout: float = 30) -> Dict:
+        return await self.registry.watch_instances(version, timeout)
+
 
 class _RemoteModelController(BaseModelController):
     def __init__(self, base_url: str) -> None:
@@ -93,6 +104,10 @@ class _RemoteModelController(BaseModelController):
     async def send_heartbeat(self, instance: ModelInstance) -> bool:
         pass
 
+    @api_remote(path="/api/controller/models/watch")
+    async def watch_instances(self, version: int = -1, timeout: float = 30) -> Dict:
+        pass
+
 
 class ModelRegistryClient(_RemoteModelController, ModelRegistry):
     async def get_all_model_instances(self) -> List[ModelInstance]:
@@ -123,6 +138,9 @@ class ModelControllerAdapter(BaseModelController):
     async def send_heartbeat(self, instance: ModelInstance) -> bool:
         return await self.backend.send_heartbeat(instance)
 
+    async def watch_instances(self, version: int = -1, timeout: float = 30) -> Dict:
+        return await self.backend.watch_instances(version, timeout)
+
     async def model_apply(self) -> bool:
         return await self.backend.model_apply()
 
@@ -133,13 +151,20 @@ controller = ModelControllerAdapter()
 
 
 def initialize_controller(
-    app=None, remote_controller_addr: str = None, host: str = None, port: int = None
+    app=None,
+    remote_controller_addr: str = None,
+    host: str = None,
+    port: int = None,
+    registry_type: str = None,
+    registry_db_path: str = None,
 ):
     global controller
     if remote_controller_addr:
         controller.backend = _RemoteModelController(remote_controller_addr)
     else:
-        controller.backend = LocalModelController()
+        controller.backend = LocalModelController(
+            create_model_registry(registry_type, registry_db_path)
+        )
 
     if app:
         app.include_router(router, prefix="/api")
@@ -167,6 +192,15 @@ async def api_get_all_instances(model_name: str = None, healthy_only: bool = Fal
     return await controller.get_all_instances(model_name, healthy_only=healthy_only)
 
 
+@router.get("/controller/models/watch")
+async def api_watch_instances(version: int = -1, timeout: float = 30):
+    try:
+        # Keep the long-poll shorter than the timeout of http clients
+        return await controller.watch_instances(version, min(max(timeout, 0), 60))
+    except NotImplementedError:
+        raise HTTPException(status_code=501, detail="Model registry can't be watched")
+
+
 @router.post("/controller/heartbeat")
 async def api_model_heartbeat(request: ModelInstance):
     return await controller.send_heartbeat(request)
@@ -178,7 +212,12 @@ def run_model_controller():
     controller_params: ModelControllerParameters = parser.parse_args_into_dataclass(
         ModelControllerParameters, env_prefix=env_prefix
     )
-    initialize_controller(host=controller_params.host, port=controller_params.port)
+    initialize_controller(
+        host=controller_params.host,
+        port=controller_params.port,
+        registry_type=controller_params.registry_type,
+        registry_db_path=controller_params.registry_db_path,
+    )
 
 
 if __name__ == "__main__":
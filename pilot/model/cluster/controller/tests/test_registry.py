@@ -140,3 +140,70 @@ async def test_same_model_name_different_ip_port(model_registry):
     assert len(instances) == 2
     assert instances[0].host != instances[1].host
     assert instances[0].port != instances[1].port
+
+
+@pytest.mark.asyncio
+async def test_watch_instances_returns_immediately_for_old_version(
+    model_registry, model_instance
+):
+    """
+    Test if watch returns the current snapshot when the caller's version is stale
+    """
+    await model_registry.register_instance(model_instance)
+    result = await model_registry.watch_instances(-1, timeout=5)
+    assert result["version"] > 0
+    assert [ins.host for ins in result["instances"]] == [model_instance.host]
+
+
+@pytest.mark.asyncio
+async def test_watch_instances_wakes_up_on_change(model_registry, model_instance):
+    """
+    Test if a pending watch is woken up by a registry change
+    """
+    version = (await model_registry.watch_instances())["version"]
+    watch = asyncio.create_task(model_registry.watch_instances(version, timeout=5))
+    await asyncio.sleep(0.05)
+    assert not watch.done()
+    await model_registry.register_instance(model_instance)
+    result = await asyncio.wait_for(watch, 1)
+    assert result["version"] > version
+    assert len(result["instances"]) == 1
+
+
+@pytest.mark.asyncio
+async def test_watch_instances_timeout(model_registry, model_instance):
+    """
+    Test if watch returns the same version on timeout, and heartbeats don't wake it up
+    """
+    await model_registry.register_instance(model_instance)
+    version = (await model_registry.watch_instances())["version"]
+    watch = asyncio.create_task(model_registry.watch_instances(version, timeout=0.2))
+    await model_registry.send_heartbeat(model_instance)
+    result = await watch
+    assert result["version"] == version
+    assert not model_registry._watchers
+
+
+@pytest.mark.asyncio
+async def test_heartbeat_load_wakes_watch_when_saturated(
+    model_registry, model_instance
+):
+    """
+    Test if the load in heartbeats is stored, and only saturation changes wake up watchers
+    """
+    await model_registry.register_instance(model_instance)
+    version = model_registry._version
+    heartbeat = ModelInstance(
+        model_name=model_instance.model_name,
+        host=model_instance.host,
+        port=model_instance.port,
+        load={"running": 1, "queued": 0},
+    )
+    await model_registry.send_heartbeat(heartbeat)
+    assert model_registry._version == version
+    instances = await model_registry.get_all_instances(model_instance.model_name)
+    assert instances[0].load == {"running": 1, "queued": 0}
+
+    heartbeat.load = {"running": 4, "queued": 2}
+    await model_registry.send_heartbeat(heartbeat)
+    assert model_registry._version > version
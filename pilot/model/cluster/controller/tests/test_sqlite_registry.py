@@ -0,0 +1,136 @@
+"""Run unit test with command: pytest pilot/model/cluster/controller/tests/test_sqlite_registry.py"""
+
+import asyncio
+import os
+import sqlite3
+import time
+
+import pytest
+
+from pilot.model.base import ModelInstance
+from pilot.model.cluster.registry import SQLiteModelRegistry, create_model_registry
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return os.path.join(str(tmp_path), "registry", "model_registry.db")
+
+
+def _instance(port: int = 5000, model_name: str = "test_model@llm"):
+    return ModelInstance(model_name=model_name, host="192.168.1.1", port=port)
+
+
+@pytest.mark.asyncio
+async def test_register_and_lookup(db_path):
+    registry = SQLiteModelRegistry(db_path)
+    await registry.register_instance(_instance(5000))
+    await registry.register_instance(_instance(5001))
+    await registry.register_instance(_instance(5000, model_name="other@llm"))
+    await registry.register_instance(_instance(5000))
+
+    instances = await registry.get_all_instances("test_model@llm")
+    assert sorted(ins.port for ins in instances) == [5000, 5001]
+    assert all(ins.healthy and ins.verified for ins in instances)
+    assert len(await registry.get_all_model_instances()) == 3
+
+    await registry.deregister_instance(_instance(5001))
+    instances = await registry.get_all_instances("test_model@llm", healthy_only=True)
+    assert [ins.port for ins in instances] == [5000]
+    assert (await registry.select_one_health_instance("test_model@llm")).port == 5000
+
+
+@pytest.mark.asyncio
+async def test_warm_restart(db_path):
+    registry = SQLiteModelRegistry(db_path)
+    await registry.register_instance(_instance(5000))
+    await registry.register_instance(_instance(5001))
+    await registry.register_instance(_instance(5002))
+    await registry.deregister_instance(_instance(5001))
+    # The worker on 5002 stopped sending heartbeats long ago
+    with registry._conn:
+        registry._conn.execute(
+            "UPDATE model_instance SET last_heartbeat = ? WHERE port = 5002",
+            (time.time() - 1000,),
+        )
+    registry.close()
+
+    restarted = SQLiteModelRegistry(db_path)
+    instances = await restarted.get_all_instances("test_model@llm", healthy_only=True)
+    assert [(ins.port, ins.verified) for ins in instances] == [(5000, False)]
+    # Routable before any heartbeat
+    assert (await restarted.select_one_health_instance("test_model@llm")).port == 5000
+
+    await restarted.send_heartbeat(_instance(5000))
+    instances = await restarted.get_all_instances("test_model@llm", healthy_only=True)
+    assert [(ins.port, ins.verified) for ins in instances] == [(5000, True)]
+
+
+@pytest.mark.asyncio
+async def test_heartbeat_timeout_and_revive(db_path):
+    registry = SQLiteModelRegistry(db_path, heartbeat_timeout_secs=120)
+    await registry.register_instance(_instance(5000))
+    version = registry._version
+    with registry._conn:
+        registry._conn.execute(
+            "UPDATE model_instance SET last_heartbeat = ?", (time.time() - 1000,)
+        )
+    assert registry._check_heartbeats()
+    assert not registry._check_heartbeats()
+    assert not await registry.get_all_instances("test_model@llm", healthy_only=True)
+
+    watch = asyncio.create_task(registry.watch_instances(version, timeout=5))
+    await registry.send_heartbeat(_instance(5000))
+    result = await asyncio.wait_for(watch, 1)
+    assert result["version"] > version
+    assert result["instances"][0].healthy
+
+
+@pytest.mark.asyncio
+async def test_load_persisted_until_restart(db_path):
+    registry = SQLiteModelRegistry(db_path)
+    instance = _instance(5000)
+    await registry.register_instance(instance)
+    instance.load = {"running": 2, "queued": 1}
+    await registry.send_heartbeat(instance)
+    assert (await registry.get_all_model_instances())[0].load == instance.load
+    registry.close()
+
+    restarted = SQLiteModelRegistry(db_path)
+    assert (await restarted.get_all_model_instances())[0].load is None
+
+
+@pytest.mark.asyncio
+async def test_context_len_published(db_path):
+    # Table created by an older version, without the context_len column
+    os.makedirs(os.path.dirname(db_path))
+    conn = sqlite3.connect(db_path)
+    conn.execute(
+        """CREATE TABLE model_instance (
+            model_name TEXT NOT NULL, host TEXT NOT NULL, port INTEGER NOT NULL,
+            weight REAL, check_healthy INTEGER NOT NULL DEFAULT 1,
+            healthy INTEGER NOT NULL DEFAULT 0, enabled INTEGER NOT NULL DEFAULT 1,
+            prompt_template TEXT, last_heartbeat REAL,
+            verified INTEGER NOT NULL DEFAULT 1, load TEXT,
+            PRIMARY KEY (model_name, host, port)
+        )"""
+    )
+    conn.close()
+
+    registry = SQLiteModelRegistry(db_path)
+    instance = _instance(5000)
+    instance.context_len = 4096
+    await registry.register_instance(instance)
+    # Heartbeats without context_len keep the registered one
+    await registry.send_heartbeat(_instance(5000))
+    assert (await registry.get_all_model_instances())[0].context_len == 4096
+    registry.close()
+
+    restarted = SQLiteModelRegistry(db_path)
+    assert (await restarted.get_all_model_instances())[0].context_len == 4096
+
+
+def test_create_model_registry(db_path):
+    assert isinstance(create_model_registry("sqlite", db_path), SQLiteModelRegistry)
+    assert not isinstance(create_model_registry(), SQLiteModelRegistry)
+    with pytest.raises(ValueError):
+        create_model_registry("etcd")
@@ -0,0 +1,148 @@
+"""Dynamic micro-batching of embedding requests.
+
+Concurrent requests (knowledge queries, ingestion jobs) usually embed a few texts each,
+encoding them one by one wastes the parallelism of the model. The batcher encodes one
+batch at a time: the requests queued while a batch is encoded, up to ``max_batch_size``
+texts, form the next batch, which runs as one batched encode and fans the results back
+out to the callers. A request to an idle batcher is encoded at once.
+"""
+
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass
+from typing import Callable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+EmbedFunc = Callable[[List[str]], List[List[float]]]
+
+
+@dataclass
+class _EmbeddingRequest:
+    texts: List[str]
+    future: Future
+
+
+class EmbeddingMicroBatcher:
+    """Merge concurrent embedding requests into batched calls of embed_func.
+
+    A request with more texts than ``max_batch_size`` is encoded alone, requests are
+    never split. ``max_wait_ms`` is an extra wait for more requests when requests are
+    already queued (a busy batcher), never for a request to an idle batcher.
+    """
+
+    def __init__(
+        self,
+        embed_func: EmbedFunc,
+        max_batch_size: int = 64,
+        max_wait_ms: float = 0,
+    ) -> None:
+        self.embed_func = embed_func
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self._queue: "queue.Queue[Optional[_EmbeddingRequest]]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._stopped = False
+        # The request which did not fit into the previous batch
+        self._pending: Optional[_EmbeddingRequest] = None
+        self.batches = 0
+        self.requests = 0
+
+    def start(self) -> None:
+        with self._lock:
+            if self._thread:
+                return
+            self._stopped = False
+            self._thread = threading.Thread(
+                target=self._run, name="embedding-batcher", daemon=True
+            )
+            self._thread.start()
+
+    def stop(self) -> None:
+        with self._lock:
+            thread, self._thread = self._thread, None
+            self._stopped = True
+        if thread:
+            self._queue.put(None)
+            thread.join()
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        """Embed texts in a shared batch, block until the result is ready"""
+        if not texts:
+            return []
+        future = Future()
+        with self._lock:
+            # Requests are enqueued before the stop sentinel, or not at all
+            running = self._thread is not None and not self._stopped
+            if running:
+                self._queue.put(_EmbeddingRequest(texts=texts, future=future))
+        if not running:
+            return self.embed_func(texts)
+        return future.result()
+
+    def _next_batch(self) -> Optional[List[_EmbeddingRequest]]:
+        first, wait_ms = self._pending, self.max_wait_ms
+        self._pending = None
+        if first is None:
+            try:
+                first = self._queue.get_nowait()
+            except queue.Empty:
+                # Idle, nothing came while the last batch was encoded, don't delay it
+                first, wait_ms = self._queue.get(), 0
+        if first is None:
+            return None
+        batch, size = [first], len(first.texts)
+        deadline = time.monotonic() + (wait_ms or 0) / 1000
+        while size < self.max_batch_size:
+            timeout = deadline - time.monotonic()
+            try:
+                request = (
+                    self._queue.get(timeout=timeout)
+                    if timeout > 0
+                    else self._queue.get_nowait()
+                )
+            except queue.Empty:
+                break
+            if request is None:
+                # Stop after the current batch
+                self._queue.put(None)
+                break
+            if size + len(request.texts) > self.max_batch_size:
+                self._pending = request
+                break
+            batch.append(request)
+            size += len(request.texts)
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                break
+            texts = [text for request in batch for text in request.texts]
+            try:
+                embeddings = self.embed_func(texts)
+            except Exception as e:
+                for request in batch:
+                    request.future.set_exception(e)
+                continue
+            self.batches += 1
+            self.requests += len(batch)
+            offset = 0
+            for request in batch:
+                end = offset + len(request.texts)
+                request.future.set_result(embeddings[offset:end])
+                offset = end
+        # Fail the requests left behind
+        while True:
+            try:
+                request = self._pending or self._queue.get_nowait()
+            except queue.Empty:
+                break
+            self._pending = None
+            if request is not None:
+                request.future.set_exception(RuntimeError("Embedding batcher stopped"))
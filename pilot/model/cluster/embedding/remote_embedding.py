@@ -2,6 +2,7 @@ from typing import List
 from langchain.embeddings.base import Embeddings
 
 from pilot.model.cluster.manager_base import WorkerManager
+from pilot.model.cluster.priority import get_request_priority
 
 
 class RemoteEmbeddings(Embeddings):
@@ -11,7 +12,11 @@ class RemoteEmbeddings(Embeddings):
 
     def embed_documents(self, texts: List[str]) -> List[List[float]]:
         """Embed search docs."""
-        params = {"model": self.model_name, "input": texts}
+        params = {
+            "model": self.model_name,
+            "input": texts,
+            "priority": get_request_priority(),
+        }
         return self.worker_manager.sync_embeddings(params)
 
     def embed_query(self, text: str) -> List[float]:
@@ -20,9 +25,13 @@ class RemoteEmbeddings(Embeddings):
 
     async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
         """Asynchronous Embed search docs."""
-        params = {"model": self.model_name, "input": texts}
+        params = {
+            "model": self.model_name,
+            "input": texts,
+            "priority": get_request_priority(),
+        }
         return await self.worker_manager.embeddings(params)
 
     async def aembed_query(self, text: str) -> List[float]:
         """Asynchronous Embed query text."""
-        return await self.aembed_documents([text])[0]
+        return (await self.aembed_documents([text]))[0]
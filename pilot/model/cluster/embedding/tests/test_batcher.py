@@ -0,0 +1,117 @@
+"""Run unit test with command: pytest pilot/model/cluster/embedding/tests/test_batcher.py"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+
+import pytest
+
+from pilot.model.cluster.embedding.batcher import EmbeddingMicroBatcher
+
+
+class _FakeEncoder:
+    """Fixed cost per forward pass, one forward pass at a time like a model on device"""
+
+    def __init__(self, cost: float = 0.01) -> None:
+        self.cost = cost
+        self.batch_sizes: List[int] = []
+        self._lock = threading.Lock()
+
+    def __call__(self, texts: List[str]) -> List[List[float]]:
+        with self._lock:
+            time.sleep(self.cost)
+            self.batch_sizes.append(len(texts))
+        return [[float(len(text)), float(ord(text[0]))] for text in texts]
+
+
+@pytest.fixture
+def encoder():
+    return _FakeEncoder()
+
+
+def _run_concurrently(func, args_list):
+    with ThreadPoolExecutor(max_workers=len(args_list)) as executor:
+        return list(executor.map(func, args_list))
+
+
+def test_results_fan_out_to_callers(encoder):
+    batcher = EmbeddingMicroBatcher(encoder, max_batch_size=64, max_wait_ms=20)
+    batcher.start()
+    try:
+        inputs = [[f"{chr(97 + i % 26)}" * (i + 1)] for i in range(32)]
+        results = _run_concurrently(batcher.embed, inputs)
+    finally:
+        batcher.stop()
+    assert results == [
+        [[float(len(text)), float(ord(text[0]))] for text in texts] for texts in inputs
+    ]
+    assert batcher.requests == 32
+    assert batcher.batches < 32
+
+
+def test_max_batch_size(encoder):
+    batcher = EmbeddingMicroBatcher(encoder, max_batch_size=4, max_wait_ms=20)
+    batcher.start()
+    try:
+        _run_concurrently(batcher.embed, [["a", "b"]] * 8 + [["c"] * 10])
+    finally:
+        batcher.stop()
+    # Requests are never split, a large request is encoded alone
+    assert 10 in encoder.batch_sizes
+    assert all(size <= 4 for size in encoder.batch_sizes if size != 10)
+    assert sum(encoder.batch_sizes) == 26
+
+
+def test_errors_are_raised_to_all_callers_of_batch():
+    def _fail(texts):
+        raise ValueError("encode error")
+
+    batcher = EmbeddingMicroBatcher(_fail, max_wait_ms=20)
+    batcher.start()
+    try:
+        for texts in [["a"], ["b"]]:
+            with pytest.raises(ValueError):
+                batcher.embed(texts)
+    finally:
+        batcher.stop()
+
+
+def test_embed_after_stop(encoder):
+    batcher = EmbeddingMicroBatcher(encoder)
+    batcher.start()
+    batcher.stop()
+    assert batcher.embed(["a"]) == [[1.0, 97.0]]
+    assert batcher.embed([]) == []
+
+
+def test_throughput_with_concurrent_callers():
+    encoder = _FakeEncoder(cost=0.01)
+    start = time.perf_counter()
+    _run_concurrently(encoder, [["query"]] * 32)
+    serial_cost = time.perf_counter() - start
+
+    batcher = EmbeddingMicroBatcher(_FakeEncoder(cost=0.01), max_wait_ms=5)
+    batcher.start()
+    try:
+        start = time.perf_counter()
+        _run_concurrently(batcher.embed, [["query"]] * 32)
+        batched_cost = time.perf_counter() - start
+    finally:
+        batcher.stop()
+    assert batcher.batches <= 8
+    assert batched_cost * 3 < serial_cost
+
+
+def test_lone_request_is_not_delayed(encoder):
+    batcher = EmbeddingMicroBatcher(encoder, max_wait_ms=200)
+    batcher.start()
+    try:
+        for _ in range(3):
+            start = time.perf_counter()
+            assert batcher.embed(["a"]) == [[1.0, 97.0]]
+            # Encoded at once, no wait for other requests
+            assert time.perf_counter() - start < encoder.cost + 0.1
+    finally:
+        batcher.stop()
+    assert encoder.batch_sizes == [1, 1, 1]
@@ -0,0 +1,125 @@
+"""Load reports of workers, sent to model controller in heartbeats.
+
+The report is a plain dict in ``ModelInstance.load``, so it passes through the http
+api and the model registry as is. Routing policies read it from instances.
+"""
+
+import sys
+import threading
+import time
+from collections import deque
+from dataclasses import asdict, dataclass
+from typing import Dict, Optional, Tuple
+
+
+@dataclass
+class WorkerLoad:
+    # Max concurrent requests of the worker, None if unlimited
+    concurrency: Optional[int]
+    # Requests holding a concurrency slot
+    running: int
+    # Requests waiting for a concurrency slot
+    queued: int
+    # Requests finished per second in the rolling window
+    requests_per_s: float
+    # Characters of output text generated per second in the rolling window
+    output_chars_per_s: float
+    # Allocated GPU memory of the worker process
+    memory_used_mb: Optional[float] = None
+    # Requests rejected because the wait queue is full or timeout, since started
+    rejected: int = 0
+
+    def to_dict(self) -> Dict:
+        return asdict(self)
+
+
+class ThroughputCounter:
+    """Count finished requests and output characters in a rolling window of seconds"""
+
+    def __init__(self, window_secs: int = 60) -> None:
+        self.window_secs = window_secs
+        # [second, requests, chars]
+        self._buckets = deque()
+        self._lock = threading.Lock()
+
+    def add(self, requests: int = 0, chars: int = 0) -> None:
+        second = int(time.monotonic())
+        with self._lock:
+            if self._buckets and self._buckets[-1][0] == second:
+                bucket = self._buckets[-1]
+                bucket[1] += requests
+                bucket[2] += chars
+            else:
+                self._buckets.append([second, requests, chars])
+                self._expire(second)
+
+    def rates(self) -> Tuple[float, float]:
+        """Return requests per second and characters per second"""
+        with self._lock:
+            self._expire(int(time.monotonic()))
+            requests = sum(b[1] for b in self._buckets)
+            chars = sum(b[2] for b in self._buckets)
+        return requests / self.window_secs, chars / self.window_secs
+
+    def _expire(self, second: int) -> None:
+        while self._buckets and self._buckets[0][0] <= second - self.window_secs:
+            self._buckets.popleft()
+
+
+def _memory_used_mb() -> Optional[float]:
+    # Don't import torch or initialize cuda for a report
+    torch = sys.modules.get("torch")
+    if torch is None or not torch.cuda.is_initialized():
+        return None
+    allocated = sum(
+        torch.cuda.memory_allocated(i) for i in range(torch.cuda.device_count())
+    )
+    return round(allocated / 1024 / 1024, 1)
+
+
+def build_load_report(
+    concurrency: Optional[int],
+    in_flight: int,
+    running: int,
+    counter: ThroughputCounter,
+    rejected: int = 0,
+) -> WorkerLoad:
+    requests_per_s, chars_per_s = counter.rates()
+    return WorkerLoad(
+        concurrency=concurrency,
+        running=running,
+        queued=max(in_flight - running, 0),
+        requests_per_s=round(requests_per_s, 3),
+        output_chars_per_s=round(chars_per_s, 1),
+        memory_used_mb=_memory_used_mb(),
+        rejected=rejected,
+    )
+
+
+def load_in_flight(load: Optional[Dict]) -> int:
+    """Requests running or queued on the instance in a load report"""
+    if not load:
+        return 0
+    return load.get("running", 0) + load.get("queued", 0)
+
+
+def is_saturated(load: Optional[Dict]) -> bool:
+    """Whether requests wait for a concurrency slot of the instance"""
+    return bool(load) and load.get("queued", 0) > 0
+
+
+def format_load(load: Optional[Dict]) -> str:
+    if not load:
+        return ""
+    concurrency = load.get("concurrency") or "-"
+    text = (
+        f"{load.get('running', 0)}/{concurrency} running, "
+        f"{load.get('queued', 0)} queued, "
+        f"{load.get('requests_per_s', 0):.2f} req/s, "
+        f"{load.get('output_chars_per_s', 0):.0f} chars/s"
+    )
+    if load.get("memory_used_mb") is not None:
+        text += f", {load['memory_used_mb']:.0f} MB"
+    if load.get("rejected"):
+        text += f", {load['rejected']} rejected"
+    return text
@@ -1,14 +1,15 @@
 import asyncio
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from typing import List, Optional, Dict, Iterator, Callable
 from abc import ABC, abstractmethod
 from datetime import datetime
 from concurrent.futures import Future
 from pilot.component import BaseComponent, ComponentType, SystemApp
 from pilot.model.base import WorkerSupportedModel, ModelOutput, WorkerApplyOutput
+from pilot.model.cluster.load import ThroughputCounter
 from pilot.model.cluster.worker_base import ModelWorker
 from pilot.model.cluster.base import WorkerStartupRequest, WorkerApplyRequest
-from pilot.model.parameter import ModelWorkerParameters, ModelParameters
+from pilot.model.parameter import ModelWorkerParameters, ModelParameters, WorkerType
 from pilot.utils.parameter_utils import ParameterDescription
 
 
@@ -23,6 +24,18 @@ class WorkerRunData:
     stop_event: asyncio.Event
     semaphore: asyncio.Semaphore = None
     command_args: List[str] = None
+    weight: Optional[float] = 1.0
+    # Requests holding or waiting for the semaphore, used by routing policies
+    in_flight: int = 0
+    # Requests holding the semaphore
+    running: int = 0
+    # Batch requests waiting for the semaphore, they have their own wait queue
+    queued_batch: int = 0
+    # Requests rejected by admission control since started
+    rejected: int = 0
+    throughput: ThroughputCounter = field(default_factory=ThroughputCounter)
+    # Load reported by a remote instance in heartbeats, None for local workers
+    load: Optional[Dict] = None
     _heartbeat_future: Optional[Future] = None
     _last_heartbeat: Optional[datetime] = None
 
@@ -46,6 +59,12 @@ class WorkerManager(ABC):
     ) -> List[WorkerRunData]:
         """Asynchronous get model instances by worker type and model name"""
 
+    async def get_model_context_len(
+        self, model_name: str, worker_type: str = WorkerType.LLM.value
+    ) -> Optional[int]:
+        """Context length of model published by its workers, None if unknown"""
+        return None
+
     @abstractmethod
     def sync_get_model_instances(
         self, worker_type: str, model_name: str, healthy_only: bool = True
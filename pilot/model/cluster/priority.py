@@ -0,0 +1,147 @@
+"""Priority classes of LLM requests.
+
+Interactive requests (chats of users) are served before batch requests (background jobs
+like db summary and knowledge ingestion), batch requests still get a min share of the
+concurrency slots. Background callers tag their requests with ``request_priority``, the
+priority is sent in the ``priority`` field of generate and embeddings params.
+"""
+
+import asyncio
+import functools
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Deque, Dict, Optional
+
+PRIORITY_INTERACTIVE = "interactive"
+PRIORITY_BATCH = "batch"
+
+_current_priority: ContextVar[str] = ContextVar(
+    "request_priority", default=PRIORITY_INTERACTIVE
+)
+
+
+def normalize_priority(priority: Optional[str]) -> str:
+    """Unknown priorities are interactive"""
+    return PRIORITY_BATCH if priority == PRIORITY_BATCH else PRIORITY_INTERACTIVE
+
+
+def get_request_priority() -> str:
+    """Priority of the LLM requests sent in current context"""
+    return _current_priority.get()
+
+
+@contextmanager
+def request_priority(priority: str):
+    """Send the LLM requests in this context with priority.
+
+    Asyncio tasks created in the context inherit it, ``threading.Thread`` and
+    ``run_in_executor`` don't: run the work there with ``contextvars.copy_context().run``
+    or decorate it with ``batch_priority``.
+
+    Examples:
+
+        .. code-block:: python
+
+            with request_priority(PRIORITY_BATCH):
+                summary_all_tables()
+    """
+    token = _current_priority.set(normalize_priority(priority))
+    try:
+        yield
+    finally:
+        _current_priority.reset(token)
+
+
+def batch_priority(func):
+    """Decorator, the LLM requests sent by func are batch requests"""
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with request_priority(PRIORITY_BATCH):
+            return func(*args, **kwargs)
+
+    return wrapper
+
+
+class PrioritySemaphore:
+    """Semaphore which grants free slots to interactive waiters first.
+
+    While both classes wait, batch waiters get ``batch_min_share`` of the granted slots,
+    so a long batch job makes progress but never holds up users for long. Without
+    interactive waiters, batch waiters get all free slots.
+    """
+
+    def __init__(self, value: int = 1, batch_min_share: float = 0.2) -> None:
+        if value < 0:
+            raise ValueError("Semaphore initial value must be >= 0")
+        self._value = value
+        self.batch_min_share = min(max(batch_min_share or 0.0, 0.0), 1.0)
+        self._waiters: Dict[str, Deque[asyncio.Future]] = {
+            PRIORITY_INTERACTIVE: deque(),
+            PRIORITY_BATCH: deque(),
+        }
+        self._batch_credit = 0.0
+
+    def locked(self) -> bool:
+        return self._value == 0 or self.waiting() > 0
+
+    def waiting(self, priority: str = None) -> int:
+        """Number of waiters of priority, or of all priorities if None"""
+        if priority is None:
+            return sum(self.waiting(p) for p in self._waiters)
+        return sum(
+            1 for fut in self._waiters[normalize_priority(priority)] if not fut.done()
+        )
+
+    async def acquire(self, priority: str = PRIORITY_INTERACTIVE) -> bool:
+        if self._value > 0 and not self.waiting():
+            self._value -= 1
+            return True
+        waiters = self._waiters[normalize_priority(priority)]
+        fut = asyncio.get_running_loop().create_future()
+        waiters.append(fut)
+        try:
+            await fut
+        except asyncio.CancelledError:
+            if fut.done() and not fut.cancelled():
+                # Granted a slot after cancelled, pass it on
+                self.release()
+            raise
+        finally:
+            try:
+                waiters.remove(fut)
+            except ValueError:
+                pass
+        return True
+
+    def release(self) -> None:
+        self._value += 1
+        while self._value > 0:
+            fut = self._next_waiter()
+            if fut is None:
+                break
+            self._value -= 1
+            fut.set_result(True)
+
+    def _next_waiter(self) -> Optional[asyncio.Future]:
+        interactive = self._first_waiting(PRIORITY_INTERACTIVE)
+        batch = self._first_waiting(PRIORITY_BATCH)
+        if interactive and batch:
+            self._batch_credit += self.batch_min_share
+            if self._batch_credit >= 1:
+                self._batch_credit -= 1
+                return self._waiters[PRIORITY_BATCH].popleft()
+            return self._waiters[PRIORITY_INTERACTIVE].popleft()
+        if interactive:
+            return self._waiters[PRIORITY_INTERACTIVE].popleft()
+        if batch:
+            return self._waiters[PRIORITY_BATCH].popleft()
+        return None
+
+    def _first_waiting(self, priority: str) -> bool:
+        waiters = self._waiters[priority]
+        # Drop the cancelled waiters
+        while waiters and waiters[0].done():
+            waiters.popleft()
+        return bool(waiters)
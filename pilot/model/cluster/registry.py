@@ -1,13 +1,25 @@
-import random
+import asyncio
+import json
+import logging
+import os
+import sqlite3
 import threading
 import time
 from abc import ABC, abstractmethod
 from collections import defaultdict
 from datetime import datetime, timedelta
-from typing import Dict, List, Tuple
+from typing import Dict, List, Optional, Tuple
 import itertools
 
 from pilot.model.base import ModelInstance
+from pilot.model.cluster.load import is_saturated
+from pilot.model.cluster.routing import (
+    RoutingPolicy,
+    WeightedRandomPolicy,
+    create_routing_policy,
+)
+
+logger = logging.getLogger(__name__)
 
 
 class ModelRegistry(ABC):
@@ -17,6 +29,8 @@ class ModelRegistry(ABC):
     for instances.
     """
 
+    default_routing_policy: str = WeightedRandomPolicy.name
+
     @abstractmethod
     async def register_instance(self, instance: ModelInstance) -> bool:
         """
@@ -81,13 +95,31 @@ class ModelRegistry(ABC):
         - model_name (str): Name of the model.
 
         Returns:
-        - ModelInstance: One randomly selected healthy and enabled instance, or None if no such instance exists.
+        - ModelInstance: One healthy and enabled instance selected by the routing policy of the model, or None if no such instance exists.
         """
         instances = await self.get_all_instances(model_name, healthy_only=True)
         instances = [i for i in instances if i.enabled]
         if not instances:
             return None
-        return random.choice(instances)
+        return self._get_routing_policy(model_name).select(instances)
+
+    def set_routing_policy(self, model_name: str, policy_name: str) -> None:
+        """Set the policy used by select_one_health_instance for a given model."""
+        self._routing_policies()[model_name] = create_routing_policy(policy_name)
+
+    def _get_routing_policy(self, model_name: str) -> RoutingPolicy:
+        policies = self._routing_policies()
+        policy = policies.get(model_name)
+        if not policy:
+            policy = create_routing_policy(self.default_routing_policy)
+            policies[model_name] = policy
+        return policy
+
+    def _routing_policies(self) -> Dict[str, RoutingPolicy]:
+        # Subclasses don't need to call super().__init__()
+        if "_model_routing_policies" not in self.__dict__:
+            self._model_routing_policies = {}
+        return self._model_routing_policies
 
     @abstractmethod
     async def send_heartbeat(self, instance: ModelInstance) -> bool:
@@ -102,6 +134,20 @@ class ModelRegistry(ABC):
         - bool: True if heartbeat is successful, False otherwise.
         """
 
+    async def watch_instances(self, version: int = -1, timeout: float = 30) -> Dict:
+        """
+        Wait until the instances of any model change, long-poll for clients which cache instances.
+
+        Args:
+        - version (int): The version the caller has seen, -1 returns immediately.
+        - timeout (float): Max seconds to wait for a change.
+
+        Returns:
+        - Dict: {"version": current version, "instances": all instances of all models},
+                the version is unchanged if timeout.
+        """
+        raise NotImplementedError
+
 
 class EmbeddedModelRegistry(ModelRegistry):
     def __init__(
@@ -110,6 +156,10 @@ class EmbeddedModelRegistry(ModelRegistry):
         self.registry: Dict[str, List[ModelInstance]] = defaultdict(list)
         self.heartbeat_interval_secs = heartbeat_interval_secs
         self.heartbeat_timeout_secs = heartbeat_timeout_secs
+        # Start from current time, so clients never see an old version after restart
+        self._version = int(time.time() * 1000)
+        self._watchers: List[Tuple[asyncio.AbstractEventLoop, asyncio.Event]] = []
+        self._version_lock = threading.Lock()
         self.heartbeat_thread = threading.Thread(target=self._heartbeat_checker)
         self.heartbeat_thread.daemon = True
         self.heartbeat_thread.start()
@@ -123,18 +173,43 @@ class EmbeddedModelRegistry(ModelRegistry):
         exist_ins = [ins for ins in instances if ins.host == host and ins.port == port]
         return instances, exist_ins
 
+    def _changed(self):
+        """Bump the version and wake up watchers, can be called from any thread"""
+        with self._version_lock:
+            self._version += 1
+            watchers = self._watchers
+            self._watchers = []
+        for loop, event in watchers:
+            try:
+                loop.call_soon_threadsafe(event.set)
+            except RuntimeError:
+                # The loop of watcher is closed
+                pass
+
     def _heartbeat_checker(self):
         while True:
-            for instances in self.registry.values():
-                for instance in instances:
-                    if (
-                        instance.check_healthy
-                        and datetime.now() - instance.last_heartbeat
-                        > timedelta(seconds=self.heartbeat_timeout_secs)
-                    ):
-                        instance.healthy = False
+            try:
+                if self._check_heartbeats():
+                    self._changed()
+            except Exception as e:
+                logger.warning(f"Check heartbeats of model instances error: {str(e)}")
             time.sleep(self.heartbeat_interval_secs)
 
+    def _check_heartbeats(self) -> bool:
+        """Mark the instances without heartbeats in time unhealthy, return True if any changed"""
+        changed = False
+        for instances in self.registry.values():
+            for instance in instances:
+                if (
+                    instance.check_healthy
+                    and instance.healthy
+                    and datetime.now() - instance.last_heartbeat
+                    > timedelta(seconds=self.heartbeat_timeout_secs)
+                ):
+                    instance.healthy = False
+                    changed = True
+        return changed
+
     async def register_instance(self, instance: ModelInstance) -> bool:
         model_name = instance.model_name.strip()
         host = instance.host.strip()
@@ -146,15 +221,26 @@ class EmbeddedModelRegistry(ModelRegistry):
         if exist_ins:
             # One exist instance at most
             ins = exist_ins[0]
+            changed = (
+                ins.weight != instance.weight
+                or not ins.healthy
+                or ins.prompt_template != instance.prompt_template
+                or ins.context_len != instance.context_len
+            )
             # Update instance
             ins.weight = instance.weight
             ins.healthy = True
             ins.prompt_template = instance.prompt_template
+            ins.load = instance.load
+            ins.context_len = instance.context_len
             ins.last_heartbeat = datetime.now()
         else:
             instance.healthy = True
             instance.last_heartbeat = datetime.now()
             instances.append(instance)
+            changed = True
+        if changed:
+            self._changed()
         return True
 
     async def deregister_instance(self, instance: ModelInstance) -> bool:
@@ -164,7 +250,9 @@ class EmbeddedModelRegistry(ModelRegistry):
         _, exist_ins = self._get_instances(model_name, host, port, healthy_only=False)
         if exist_ins:
             ins = exist_ins[0]
-            ins.healthy = False
+            if ins.healthy:
+                ins.healthy = False
+                self._changed()
         return True
 
     async def get_all_instances(
@@ -181,9 +269,27 @@ class EmbeddedModelRegistry(ModelRegistry):
         return instances
 
     async def get_all_model_instances(self) -> List[ModelInstance]:
-        print(self.registry)
         return list(itertools.chain(*self.registry.values()))
 
+    async def watch_instances(self, version: int = -1, timeout: float = 30) -> Dict:
+        if version == self._version:
+            event = asyncio.Event()
+            with self._version_lock:
+                # Changed after checked
+                if version == self._version:
+                    self._watchers.append((asyncio.get_running_loop(), event))
+                else:
+                    event.set()
+            try:
+                await asyncio.wait_for(event.wait(), timeout)
+            except asyncio.TimeoutError:
+                with self._version_lock:
+                    self._watchers = [w for w in self._watchers if w[1] is not event]
+        return {
+            "version": self._version,
+            "instances": await self.get_all_model_instances(),
+        }
+
     async def send_heartbeat(self, instance: ModelInstance) -> bool:
         _, exist_ins = self._get_instances(
             instance.model_name, instance.host, instance.port, healthy_only=False
@@ -195,5 +301,270 @@ class EmbeddedModelRegistry(ModelRegistry):
 
         ins = exist_ins[0]
         ins.last_heartbeat = datetime.now()
+        # Clients only need to know when an instance starts or stops queueing requests
+        changed = (
+            not ins.healthy
+            or is_saturated(ins.load) != is_saturated(instance.load)
+            or (instance.context_len and ins.context_len != instance.context_len)
+        )
         ins.healthy = True
+        ins.load = instance.load
+        if instance.context_len:
+            ins.context_len = instance.context_len
+        if changed:
+            self._changed()
         return True
+
+
+_INSTANCE_COLUMNS = [
+    "model_name",
+    "host",
+    "port",
+    "weight",
+    "check_healthy",
+    "healthy",
+    "enabled",
+    "prompt_template",
+    "last_heartbeat",
+    "verified",
+    "load",
+    "context_len",
+]
+
+
+class SQLiteModelRegistry(EmbeddedModelRegistry):
+    """Model registry stored in SQLite, the cluster view survives restarts of model controller.
+
+    Registrations and heartbeats are committed to the write-ahead log before they are
+    acknowledged, lookups use the index of (model_name, host, port). On start, instances
+    which sent heartbeats within the heartbeat timeout are restored unverified and stay
+    routable, their next heartbeat verifies them, or the heartbeat checker marks them
+    unhealthy like any other instance.
+    """
+
+    def __init__(
+        self,
+        db_path: str,
+        heartbeat_interval_secs: int = 60,
+        heartbeat_timeout_secs: int = 120,
+    ):
+        db_dir = os.path.dirname(db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        self.db_path = db_path
+        self._db_lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._create_tables()
+        self.heartbeat_timeout_secs = heartbeat_timeout_secs
+        self._restore()
+        # Start the heartbeat checker after the database is ready
+        super().__init__(heartbeat_interval_secs, heartbeat_timeout_secs)
+
+    def _create_tables(self):
+        with self._db_lock, self._conn:
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS model_instance (
+                    model_name TEXT NOT NULL,
+                    host TEXT NOT NULL,
+                    port INTEGER NOT NULL,
+                    weight REAL,
+                    check_healthy INTEGER NOT NULL DEFAULT 1,
+                    healthy INTEGER NOT NULL DEFAULT 0,
+                    enabled INTEGER NOT NULL DEFAULT 1,
+                    prompt_template TEXT,
+                    last_heartbeat REAL,
+                    verified INTEGER NOT NULL DEFAULT 1,
+                    load TEXT,
+                    context_len INTEGER,
+                    PRIMARY KEY (model_name, host, port)
+                )"""
+            )
+            columns = [
+                row[1]
+                for row in self._conn.execute("PRAGMA table_info(model_instance)")
+            ]
+            if "context_len" not in columns:
+                # Database created by an older version
+                self._conn.execute(
+                    "ALTER TABLE model_instance ADD COLUMN context_len INTEGER"
+                )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_model_instance_host ON model_instance (host, port)"
+            )
+
+    def _restore(self):
+        expired_before = time.time() - self.heartbeat_timeout_secs
+        with self._db_lock, self._conn:
+            self._conn.execute(
+                "UPDATE model_instance SET healthy = 0 "
+                "WHERE healthy = 1 AND check_healthy = 1 AND last_heartbeat < ?",
+                (expired_before,),
+            )
+            restored = self._conn.execute(
+                # The load reported before restart is outdated
+                "UPDATE model_instance SET verified = 0, load = NULL WHERE healthy = 1"
+            ).rowcount
+        logger.info(
+            f"Restored {restored} model instances from {self.db_path}, wait for their heartbeats"
+        )
+
+    @staticmethod
+    def _to_instance(row: Tuple) -> ModelInstance:
+        return ModelInstance(
+            model_name=row[0],
+            host=row[1],
+            port=row[2],
+            weight=row[3],
+            check_healthy=bool(row[4]),
+            healthy=bool(row[5]),
+            enabled=bool(row[6]),
+            prompt_template=row[7],
+            last_heartbeat=datetime.fromtimestamp(row[8]) if row[8] else None,
+            verified=bool(row[9]),
+            load=json.loads(row[10]) if row[10] else None,
+            context_len=row[11],
+        )
+
+    def _query(self, where: str = "", params: Tuple = ()) -> List[ModelInstance]:
+        sql = f"SELECT {', '.join(_INSTANCE_COLUMNS)} FROM model_instance {where}"
+        with self._db_lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [self._to_instance(row) for row in rows]
+
+    def _get_instance(
+        self, model_name: str, host: str, port: int
+    ) -> Optional[ModelInstance]:
+        instances = self._query(
+            "WHERE model_name = ? AND host = ? AND port = ?", (model_name, host, port)
+        )
+        return instances[0] if instances else None
+
+    def _check_heartbeats(self) -> bool:
+        expired_before = time.time() - self.heartbeat_timeout_secs
+        with self._db_lock, self._conn:
+            return (
+                self._conn.execute(
+                    "UPDATE model_instance SET healthy = 0 "
+                    "WHERE healthy = 1 AND check_healthy = 1 AND last_heartbeat < ?",
+                    (expired_before,),
+                ).rowcount
+                > 0
+            )
+
+    async def register_instance(self, instance: ModelInstance) -> bool:
+        model_name = instance.model_name.strip()
+        host = instance.host.strip()
+        port = instance.port
+        exist_ins = self._get_instance(model_name, host, port)
+        with self._db_lock, self._conn:
+            # Keep check_healthy and enabled of the exist instance
+            self._conn.execute(
+                f"INSERT INTO model_instance ({', '.join(_INSTANCE_COLUMNS)}) "
+                "VALUES (?, ?, ?, ?, ?, 1, ?, ?, ?, 1, ?, ?) "
+                "ON CONFLICT (model_name, host, port) DO UPDATE SET "
+                "weight = excluded.weight, healthy = 1, "
+                "prompt_template = excluded.prompt_template, "
+                "last_heartbeat = excluded.last_heartbeat, verified = 1, "
+                "load = excluded.load, context_len = excluded.context_len",
+                (
+                    model_name,
+                    host,
+                    port,
+                    instance.weight,
+                    instance.check_healthy,
+                    instance.enabled,
+                    instance.prompt_template,
+                    time.time(),
+                    json.dumps(instance.load) if instance.load else None,
+                    instance.context_len,
+                ),
+            )
+        if (
+            not exist_ins
+            or exist_ins.weight != instance.weight
+            or not exist_ins.healthy
+            or not exist_ins.verified
+            or exist_ins.prompt_template != instance.prompt_template
+            or exist_ins.context_len != instance.context_len
+        ):
+            self._changed()
+        return True
+
+    async def deregister_instance(self, instance: ModelInstance) -> bool:
+        with self._db_lock, self._conn:
+            changed = self._conn.execute(
+                "UPDATE model_instance SET healthy = 0 "
+                "WHERE model_name = ? AND host = ? AND port = ? AND healthy = 1",
+                (instance.model_name.strip(), instance.host.strip(), instance.port),
+            ).rowcount
+        if changed:
+            self._changed()
+        return True
+
+    def sync_get_all_instances(
+        self, model_name: str, healthy_only: bool = False
+    ) -> List[ModelInstance]:
+        if healthy_only:
+            return self._query(
+                "WHERE model_name = ? AND healthy = 1", (model_name.strip(),)
+            )
+        return self._query("WHERE model_name = ?", (model_name.strip(),))
+
+    async def get_all_model_instances(self) -> List[ModelInstance]:
+        return self._query()
+
+    async def send_heartbeat(self, instance: ModelInstance) -> bool:
+        exist_ins = self._get_instance(
+            instance.model_name, instance.host, instance.port
+        )
+        if not exist_ins:
+            # register new install from heartbeat
+            return await self.register_instance(instance)
+        with self._db_lock, self._conn:
+            self._conn.execute(
+                "UPDATE model_instance SET last_heartbeat = ?, healthy = 1, verified = 1, "
+                "load = ?, context_len = COALESCE(?, context_len) "
+                "WHERE model_name = ? AND host = ? AND port = ?",
+                (
+                    time.time(),
+                    json.dumps(instance.load) if instance.load else None,
+                    instance.context_len,
+                    instance.model_name,
+                    instance.host,
+                    instance.port,
+                ),
+            )
+        if (
+            not exist_ins.healthy
+            or not exist_ins.verified
+            or is_saturated(exist_ins.load) != is_saturated(instance.load)
+            or (instance.context_len and exist_ins.context_len != instance.context_len)
+        ):
+            self._changed()
+        return True
+
+    def close(self):
+        with self._db_lock:
+            self._conn.close()
+
+
+def create_model_registry(
+    registry_type: str = None,
+    db_path: str = None,
+    heartbeat_interval_secs: int = 60,
+    heartbeat_timeout_secs: int = 120,
+) -> ModelRegistry:
+    """Create the model registry of model controller, memory by default"""
+    if not registry_type or registry_type == "memory":
+        return EmbeddedModelRegistry(heartbeat_interval_secs, heartbeat_timeout_secs)
+    if registry_type == "sqlite":
+        if not db_path:
+            from pilot.configs.model_config import DATA_DIR
+
+            db_path = os.path.join(DATA_DIR, "model_registry.db")
+        return SQLiteModelRegistry(
+            db_path, heartbeat_interval_secs, heartbeat_timeout_secs
+        )
+    raise ValueError(f"Unsupported model registry type: {registry_type}")
@@ -0,0 +1,157 @@
+"""Routing policies, select one instance from the instances of a model.
+
+The instances can be WorkerRunData (worker manager) or ModelInstance (registry),
+policies only read their ``weight``, ``in_flight`` and ``load`` attributes if they exist.
+"""
+
+import random
+import threading
+from abc import ABC, abstractmethod
+from typing import Callable, Dict, List, Optional, Sequence, TypeVar
+
+from pilot.model.cluster.load import load_in_flight
+
+T = TypeVar("T")
+
+
+def _instance_key(instance) -> str:
+    return f"{getattr(instance, 'host', None)}:{getattr(instance, 'port', None)}"
+
+
+def _instance_weight(instance) -> float:
+    weight = getattr(instance, "weight", None)
+    if weight is None:
+        return 1.0
+    return max(float(weight), 0.0)
+
+
+def _instance_load(instance) -> float:
+    in_flight = getattr(instance, "in_flight", None) or 0
+    # The reported load includes requests of other clients, but it is not real time
+    return max(in_flight, load_in_flight(getattr(instance, "load", None)))
+
+
+class RoutingPolicy(ABC):
+    """Select one instance from a non-empty sequence of candidate instances"""
+
+    name: str = None
+
+    @abstractmethod
+    def select(self, instances: Sequence[T]) -> T:
+        """Select one instance"""
+
+
+class RandomPolicy(RoutingPolicy):
+    name = "random"
+
+    def select(self, instances: Sequence[T]) -> T:
+        return random.choice(instances)
+
+
+class WeightedRandomPolicy(RoutingPolicy):
+    name = "weighted_random"
+
+    def select(self, instances: Sequence[T]) -> T:
+        weights = [_instance_weight(ins) for ins in instances]
+        if sum(weights) <= 0:
+            return random.choice(instances)
+        return random.choices(instances, weights=weights, k=1)[0]
+
+
+class WeightedRoundRobinPolicy(RoutingPolicy):
+    """Smooth weighted round-robin, spreads picks of heavy instances evenly"""
+
+    name = "weighted_round_robin"
+
+    def __init__(self):
+        self._current_weights: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def select(self, instances: Sequence[T]) -> T:
+        with self._lock:
+            keys = [_instance_key(ins) for ins in instances]
+            # Forget instances which are gone
+            for key in set(self._current_weights) - set(keys):
+                del self._current_weights[key]
+            total = 0.0
+            best, best_key, best_weight = None, None, None
+            for ins, key in zip(instances, keys):
+                weight = _instance_weight(ins)
+                total += weight
+                current = self._current_weights.get(key, 0.0) + weight
+                self._current_weights[key] = current
+                if best is None or current > best_weight:
+                    best, best_key, best_weight = ins, key, current
+            self._current_weights[best_key] -= total
+            return best
+
+
+class LeastInFlightPolicy(RoutingPolicy):
+    """Select the instance with the fewest in-flight requests per unit of weight"""
+
+    name = "least_in_flight"
+
+    def select(self, instances: Sequence[T]) -> T:
+        best_score, candidates = None, []
+        for ins in instances:
+            score = _load_score(ins)
+            if best_score is None or score < best_score:
+                best_score, candidates = score, [ins]
+            elif score == best_score:
+                candidates.append(ins)
+        return random.choice(candidates)
+
+
+class PowerOfTwoChoicesPolicy(RoutingPolicy):
+    """Sample two instances by weight, keep the less loaded one"""
+
+    name = "power_of_two"
+
+    def __init__(self):
+        self._sampler = WeightedRandomPolicy()
+
+    def select(self, instances: Sequence[T]) -> T:
+        if len(instances) == 1:
+            return instances[0]
+        first = self._sampler.select(instances)
+        second = self._sampler.select([ins for ins in instances if ins is not first])
+        return first if _load_score(first) <= _load_score(second) else second
+
+
+def _load_score(instance) -> float:
+    weight = _instance_weight(instance)
+    if weight <= 0:
+        return float("inf")
+    # Count the new request, so a heavier idle instance wins over a lighter idle one
+    return (_instance_load(instance) + 1) / weight
+
+
+_POLICIES: Dict[str, Callable[[], RoutingPolicy]] = {
+    cls.name: cls
+    for cls in [
+        RandomPolicy,
+        WeightedRandomPolicy,
+        WeightedRoundRobinPolicy,
+        LeastInFlightPolicy,
+        PowerOfTwoChoicesPolicy,
+    ]
+}
+
+
+def register_routing_policy(name: str, factory: Callable[[], RoutingPolicy]):
+    """Register a custom routing policy"""
+    _POLICIES[name] = factory
+
+
+def supported_routing_policies() -> List[str]:
+    return list(_POLICIES.keys())
+
+
+def create_routing_policy(name: Optional[str]) -> RoutingPolicy:
+    """Create a routing policy by name, policies keep state, create one per model"""
+    factory = _POLICIES.get(name)
+    if not factory:
+        raise ValueError(
+            f"Unsupported routing policy: {name}, supported: {supported_routing_policies()}"
+        )
+    return factory()
@@ -0,0 +1,101 @@
+"""Streaming protocol between model workers and worker manager clients.
+
+The legacy protocol sends every ``ModelOutput`` with the full cumulative text, so a
+long answer costs O(n^2) bytes and JSON work end to end. With the delta protocol each
+frame only carries the new text and the offset it starts at, the receiver rebuilds the
+cumulative text.
+
+The client asks for the delta protocol with the ``X-DBGPT-Stream-Protocol`` request
+header, a worker which supports it answers with the same response header. Old workers
+ignore the header and keep sending full frames.
+"""
+
+from typing import Dict, Optional
+
+from pilot.model.base import ModelOutput
+
+STREAM_PROTOCOL_HEADER = "X-DBGPT-Stream-Protocol"
+STREAM_PROTOCOL_FULL = "full"
+STREAM_PROTOCOL_DELTA_V1 = "delta-v1"
+
+_DELTA_VERSION = 1
+
+
+def negotiate_stream_protocol(requested: Optional[str]) -> str:
+    """Return the protocol the worker will use for the requested protocol"""
+    if requested == STREAM_PROTOCOL_DELTA_V1:
+        return STREAM_PROTOCOL_DELTA_V1
+    return STREAM_PROTOCOL_FULL
+
+
+def _common_prefix_len(a: str, b: str) -> int:
+    # Binary search with C-level comparisons, only used when the text is rewritten
+    lo, hi = 0, min(len(a), len(b))
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if a[:mid] == b[:mid]:
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
+
+
+class DeltaStreamEncoder:
+    """Convert the cumulative outputs of one stream to delta frames"""
+
+    def __init__(self) -> None:
+        self._text = ""
+        self._model_context = None
+        self._first = True
+
+    def encode(self, output: ModelOutput) -> Dict:
+        text = output.text or ""
+        if text.startswith(self._text):
+            offset = len(self._text)
+        else:
+            # Text was rewritten, e.g. a stop string was cut off
+            offset = _common_prefix_len(self._text, text)
+        frame = {
+            "v": _DELTA_VERSION,
+            "offset": offset,
+            "delta": text[offset:],
+            "error_code": output.error_code,
+        }
+        if self._first or output.model_context != self._model_context:
+            frame["model_context"] = output.model_context
+            self._model_context = output.model_context
+            self._first = False
+        self._text = text
+        return frame
+
+
+class DeltaStreamDecoder:
+    """Rebuild cumulative outputs from the delta frames of one stream"""
+
+    def __init__(self) -> None:
+        self._text = ""
+        self._model_context = None
+
+    @property
+    def text(self) -> str:
+        return self._text
+
+    def decode(self, frame: Dict) -> ModelOutput:
+        version = frame.get("v")
+        if version != _DELTA_VERSION:
+            raise ValueError(f"Unsupported delta stream frame version: {version}")
+        offset = frame["offset"]
+        if offset > len(self._text):
+            raise ValueError(
+                f"Invalid delta stream frame, offset {offset} is beyond the received text length {len(self._text)}"
+            )
+        if offset < len(self._text):
+            self._text = self._text[:offset]
+        self._text += frame["delta"]
+        if "model_context" in frame:
+            self._model_context = frame["model_context"]
+        return ModelOutput(
+            text=self._text,
+            error_code=frame["error_code"],
+            model_context=self._model_context,
+        )
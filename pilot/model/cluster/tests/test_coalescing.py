@@ -0,0 +1,132 @@
+"""Run unit test with command: pytest pilot/model/cluster/tests/test_coalescing.py"""
+
+import asyncio
+from typing import List
+
+import pytest
+
+from pilot.model.base import ModelOutput
+from pilot.model.cluster.coalescing import RequestCoalescer
+
+
+class _Source:
+    """Stream of outputs which records how many times it runs and whether it closed"""
+
+    def __init__(self, num_outputs: int = 5, delay: float = 0.01) -> None:
+        self.num_outputs = num_outputs
+        self.delay = delay
+        self.runs = 0
+        self.closed = 0
+
+    async def stream(self):
+        self.runs += 1
+        text = ""
+        try:
+            for i in range(self.num_outputs):
+                await asyncio.sleep(self.delay)
+                text += str(i)
+                yield ModelOutput(text=text, error_code=0)
+        finally:
+            self.closed += 1
+
+
+async def _collect(stream) -> List[ModelOutput]:
+    return [output async for output in stream]
+
+
+@pytest.mark.asyncio
+async def test_followers_get_latest_and_following_chunks():
+    coalescer = RequestCoalescer()
+    source = _Source()
+    first = asyncio.create_task(_collect(coalescer.stream("key", source.stream)))
+    await asyncio.sleep(0.025)
+    # Joins in the middle, starts from the latest cumulative output
+    results = await asyncio.gather(
+        first, *[_collect(coalescer.stream("key", source.stream)) for _ in range(3)]
+    )
+    assert source.runs == 1
+    texts = ["0", "01", "012", "0123", "01234"]
+    assert [output.text for output in results[0]] == texts
+    for result in results[1:]:
+        assert result[0].text in ("01", "012")
+        assert [output.text for output in result] == texts[-len(result) :]
+    assert coalescer.stats().to_dict() == {"leaders": 1, "coalesced": 3, "cancelled": 0}
+    assert coalescer.in_flight() == 0
+
+    # Finished flights are not reused
+    await _collect(coalescer.stream("key", source.stream))
+    assert source.runs == 2
+
+
+@pytest.mark.asyncio
+async def test_leader_leaves_followers_continue():
+    coalescer = RequestCoalescer()
+    source = _Source()
+    leader = coalescer.stream("key", source.stream)
+    await leader.__anext__()
+    follower = asyncio.create_task(_collect(coalescer.stream("key", source.stream)))
+    await asyncio.sleep(0)
+    await leader.aclose()
+    outputs = await follower
+    assert outputs[-1].text == "01234"
+    assert source.runs == 1
+    assert coalescer.stats().cancelled == 0
+
+
+@pytest.mark.asyncio
+async def test_cancel_when_all_subscribers_leave():
+    coalescer = RequestCoalescer()
+    source = _Source(num_outputs=100)
+    streams = [coalescer.stream("key", source.stream) for _ in range(2)]
+    for stream in streams:
+        await stream.__anext__()
+    for stream in streams:
+        await stream.aclose()
+    await asyncio.sleep(0.02)
+    assert source.closed == 1
+    assert coalescer.stats().cancelled == 1
+    # A new request runs a new inference
+    outputs = await _collect(coalescer.stream("key", _Source(num_outputs=2).stream))
+    assert outputs[-1].text == "01"
+
+
+@pytest.mark.asyncio
+async def test_error_raised_to_all_subscribers():
+    coalescer = RequestCoalescer()
+
+    async def _failed_stream():
+        await asyncio.sleep(0.01)
+        yield ModelOutput(text="partial", error_code=0)
+        raise ValueError("worker died")
+
+    results = await asyncio.gather(
+        *[_collect(coalescer.stream("key", _failed_stream)) for _ in range(3)],
+        return_exceptions=True,
+    )
+    assert all(isinstance(result, ValueError) for result in results)
+    assert coalescer.in_flight() == 0
+
+
+@pytest.mark.asyncio
+async def test_subscribers_get_own_outputs():
+    coalescer = RequestCoalescer()
+
+    async def _stream():
+        for text in ["a", "ab"]:
+            await asyncio.sleep(0.01)
+            yield ModelOutput(text=text, error_code=0, model_context={"echo": 0})
+
+    async def _collect_and_change(stream) -> List[ModelOutput]:
+        outputs = []
+        async for output in stream:
+            output.text += "!"
+            output.model_context["echo"] += 1
+            outputs.append(output)
+        return outputs
+
+    results = await asyncio.gather(
+        *[_collect_and_change(coalescer.stream("key", _stream)) for _ in range(3)]
+    )
+    for outputs in results:
+        assert [output.text for output in outputs] == ["a!", "ab!"]
+        assert all(output.model_context == {"echo": 1} for output in outputs)
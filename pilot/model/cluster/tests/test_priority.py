@@ -0,0 +1,104 @@
+"""Run unit test with command: pytest pilot/model/cluster/tests/test_priority.py"""
+
+import asyncio
+
+import pytest
+
+from pilot.model.cluster.priority import (
+    PRIORITY_BATCH,
+    PRIORITY_INTERACTIVE,
+    PrioritySemaphore,
+    batch_priority,
+    get_request_priority,
+    request_priority,
+)
+
+
+def test_request_priority_context():
+    assert get_request_priority() == PRIORITY_INTERACTIVE
+    with request_priority(PRIORITY_BATCH):
+        assert get_request_priority() == PRIORITY_BATCH
+        with request_priority("unknown"):
+            assert get_request_priority() == PRIORITY_INTERACTIVE
+        assert get_request_priority() == PRIORITY_BATCH
+    assert get_request_priority() == PRIORITY_INTERACTIVE
+
+    @batch_priority
+    def _summary():
+        return get_request_priority()
+
+    assert _summary() == PRIORITY_BATCH
+    assert get_request_priority() == PRIORITY_INTERACTIVE
+
+
+@pytest.mark.asyncio
+async def test_batch_priority_in_thread():
+    @batch_priority
+    def _summary():
+        return get_request_priority()
+
+    assert await asyncio.get_running_loop().run_in_executor(None, _summary) == (
+        PRIORITY_BATCH
+    )
+
+
+async def _grant_order(semaphore: PrioritySemaphore, priorities):
+    order = []
+
+    async def _acquire(i, priority):
+        await semaphore.acquire(priority)
+        order.append(i)
+
+    tasks = []
+    for i, priority in enumerate(priorities):
+        tasks.append(asyncio.create_task(_acquire(i, priority)))
+        await asyncio.sleep(0)
+    for _ in priorities:
+        semaphore.release()
+        await asyncio.sleep(0)
+    await asyncio.gather(*tasks)
+    return order
+
+
+@pytest.mark.asyncio
+async def test_interactive_first():
+    semaphore = PrioritySemaphore(1, batch_min_share=0)
+    await semaphore.acquire(PRIORITY_BATCH)
+    priorities = [PRIORITY_BATCH] * 3 + [PRIORITY_INTERACTIVE] * 3
+    assert await _grant_order(semaphore, priorities) == [3, 4, 5, 0, 1, 2]
+
+
+@pytest.mark.asyncio
+async def test_batch_min_share():
+    semaphore = PrioritySemaphore(1, batch_min_share=0.25)
+    await semaphore.acquire()
+    priorities = [PRIORITY_BATCH] * 4 + [PRIORITY_INTERACTIVE] * 8
+    order = await _grant_order(semaphore, priorities)
+    # One of four slots goes to batch while both classes wait
+    assert order[:10] == [4, 5, 6, 0, 7, 8, 9, 1, 10, 11]
+    assert order[10:] == [2, 3]
+
+
+@pytest.mark.asyncio
+async def test_cancelled_waiter():
+    semaphore = PrioritySemaphore(1)
+    await semaphore.acquire()
+    cancelled = asyncio.create_task(semaphore.acquire())
+    waiter = asyncio.create_task(semaphore.acquire(PRIORITY_BATCH))
+    await asyncio.sleep(0)
+    assert semaphore.waiting() == 2
+    cancelled.cancel()
+    await asyncio.sleep(0)
+    assert semaphore.waiting(PRIORITY_INTERACTIVE) == 0
+    semaphore.release()
+    assert await waiter
+    assert semaphore.locked()
+
+    # Granted and cancelled before running, the slot is passed on
+    granted = asyncio.create_task(semaphore.acquire())
+    await asyncio.sleep(0)
+    semaphore.release()
+    granted.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await granted
+    assert not semaphore.locked()
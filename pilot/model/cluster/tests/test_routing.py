@@ -0,0 +1,136 @@
+import heapq
+import random
+from dataclasses import dataclass
+from typing import List
+
+import pytest
+
+from pilot.model.base import ModelInstance
+from pilot.model.cluster.registry import EmbeddedModelRegistry
+from pilot.model.cluster.routing import (
+    LeastInFlightPolicy,
+    PowerOfTwoChoicesPolicy,
+    RandomPolicy,
+    RoutingPolicy,
+    WeightedRoundRobinPolicy,
+    create_routing_policy,
+)
+
+
+@dataclass
+class _FakeInstance:
+    host: str
+    port: int
+    weight: float = 1.0
+    in_flight: int = 0
+
+
+def _simulate(
+    policy: RoutingPolicy,
+    service_times: List[float],
+    arrival_rate: float,
+    num_requests: int = 20000,
+    seed: int = 42,
+) -> float:
+    """Discrete-event simulation of FIFO workers, return the p99 latency"""
+    random.seed(seed)
+    instances = [
+        _FakeInstance("127.0.0.1", 8000 + i) for i in range(len(service_times))
+    ]
+    free_at = [0.0] * len(instances)
+    completions = []
+    latencies = []
+    now = 0.0
+    for _ in range(num_requests):
+        now += random.expovariate(arrival_rate)
+        while completions and completions[0][0] <= now:
+            _, idx = heapq.heappop(completions)
+            instances[idx].in_flight -= 1
+        ins = policy.select(instances)
+        idx = instances.index(ins)
+        start = max(now, free_at[idx])
+        free_at[idx] = start + service_times[idx]
+        ins.in_flight += 1
+        heapq.heappush(completions, (free_at[idx], idx))
+        latencies.append(free_at[idx] - now)
+    latencies.sort()
+    return latencies[int(len(latencies) * 0.99)]
+
+
+def test_load_aware_policies_improve_p99_with_skewed_workers():
+    # One worker is 4x slower than the others, total load is about 60% of capacity
+    service_times = [1.0, 1.0, 1.0, 4.0]
+    arrival_rate = 0.6 * sum(1 / t for t in service_times)
+    random_p99 = _simulate(RandomPolicy(), service_times, arrival_rate)
+    least_p99 = _simulate(LeastInFlightPolicy(), service_times, arrival_rate)
+    p2c_p99 = _simulate(PowerOfTwoChoicesPolicy(), service_times, arrival_rate)
+    assert least_p99 < random_p99 / 2
+    assert p2c_p99 < random_p99 / 2
+
+
+def test_weighted_round_robin():
+    policy = WeightedRoundRobinPolicy()
+    instances = [
+        _FakeInstance("127.0.0.1", 8000, weight=3),
+        _FakeInstance("127.0.0.1", 8001, weight=1),
+    ]
+    selected = [policy.select(instances).port for _ in range(8)]
+    assert selected.count(8000) == 6
+    assert selected.count(8001) == 2
+    # Smooth, the heavy instance is not selected three times in a row
+    assert selected[:4] == [8000, 8000, 8001, 8000]
+
+
+def test_least_in_flight_respects_weight():
+    policy = LeastInFlightPolicy()
+    instances = [
+        _FakeInstance("127.0.0.1", 8000, weight=1, in_flight=2),
+        _FakeInstance("127.0.0.1", 8001, weight=4, in_flight=4),
+    ]
+    assert policy.select(instances).port == 8001
+
+
+def test_unsupported_policy():
+    with pytest.raises(ValueError):
+        create_routing_policy("not_exist_policy")
+
+
+@pytest.mark.asyncio
+async def test_registry_select_by_weight():
+    registry = EmbeddedModelRegistry()
+    registry.set_routing_policy("test_model", WeightedRoundRobinPolicy.name)
+    await registry.register_instance(
+        ModelInstance(model_name="test_model", host="192.168.1.1", port=5000, weight=1)
+    )
+    await registry.register_instance(
+        ModelInstance(model_name="test_model", host="192.168.1.2", port=5000, weight=0)
+    )
+    for _ in range(4):
+        instance = await registry.select_one_health_instance("test_model")
+        assert instance.host == "192.168.1.1"
+
+
+@pytest.mark.asyncio
+async def test_registry_select_by_reported_load():
+    registry = EmbeddedModelRegistry()
+    registry.set_routing_policy("test_model", LeastInFlightPolicy.name)
+    for host, running, queued in [("192.168.1.1", 4, 3), ("192.168.1.2", 1, 0)]:
+        await registry.send_heartbeat(
+            ModelInstance(
+                model_name="test_model",
+                host=host,
+                port=5000,
+                load={"concurrency": 4, "running": running, "queued": queued},
+            )
+        )
+    for _ in range(4):
+        instance = await registry.select_one_health_instance("test_model")
+        assert instance.host == "192.168.1.2"
+
+
+def test_reported_load_adds_to_local_in_flight():
+    policy = LeastInFlightPolicy()
+    hot = _FakeInstance("127.0.0.1", 8000, in_flight=1)
+    hot.load = {"running": 5, "queued": 2}
+    idle = _FakeInstance("127.0.0.1", 8001, in_flight=2)
+    assert policy.select([hot, idle]).port == 8001
@@ -0,0 +1,113 @@
+"""Run unit test with command: pytest pilot/model/cluster/tests/test_stream_protocol.py"""
+
+import json
+from typing import Dict, Iterator, List
+
+import pytest
+
+from pilot.model.base import ModelOutput
+from pilot.model.cluster.stream_protocol import (
+    STREAM_PROTOCOL_DELTA_V1,
+    STREAM_PROTOCOL_FULL,
+    DeltaStreamDecoder,
+    DeltaStreamEncoder,
+    negotiate_stream_protocol,
+)
+from pilot.model.cluster.worker import manager as worker_manager_module
+
+
+def _roundtrip(outputs: List[ModelOutput]) -> List[ModelOutput]:
+    encoder, decoder = DeltaStreamEncoder(), DeltaStreamDecoder()
+    # Frames go through json like on the wire
+    return [
+        decoder.decode(json.loads(json.dumps(encoder.encode(output))))
+        for output in outputs
+    ]
+
+
+def test_negotiate_stream_protocol():
+    assert negotiate_stream_protocol(STREAM_PROTOCOL_DELTA_V1) == "delta-v1"
+    assert negotiate_stream_protocol(None) == STREAM_PROTOCOL_FULL
+    assert negotiate_stream_protocol("delta-v99") == STREAM_PROTOCOL_FULL
+
+
+def test_roundtrip_append_only():
+    outputs = [
+        ModelOutput(text="Hello", error_code=0, model_context={"k": 1}),
+        ModelOutput(text="Hello wor", error_code=0, model_context={"k": 1}),
+        ModelOutput(text="Hello world", error_code=0, model_context={"k": 1}),
+        ModelOutput(text="Hello world", error_code=0, model_context={"k": 1}),
+    ]
+    assert _roundtrip(outputs) == outputs
+
+
+def test_frames_only_carry_new_text():
+    encoder = DeltaStreamEncoder()
+    first = encoder.encode(ModelOutput(text="abc", error_code=0, model_context={}))
+    second = encoder.encode(ModelOutput(text="abcdef", error_code=0, model_context={}))
+    assert first == {
+        "v": 1,
+        "offset": 0,
+        "delta": "abc",
+        "error_code": 0,
+        "model_context": {},
+    }
+    # Unchanged model context is not sent again
+    assert second == {"v": 1, "offset": 3, "delta": "def", "error_code": 0}
+
+
+def test_roundtrip_rewritten_text():
+    outputs = [
+        ModelOutput(text="The answer ###", error_code=0),
+        # Stop string cut off, then the text grows again from the shorter prefix
+        ModelOutput(text="The answer", error_code=0),
+        ModelOutput(text="The answer is 42", error_code=0),
+        ModelOutput(text="Error: oom", error_code=1),
+    ]
+    assert _roundtrip(outputs) == outputs
+
+
+def test_decode_invalid_frames():
+    decoder = DeltaStreamDecoder()
+    with pytest.raises(ValueError):
+        decoder.decode({"v": 2, "offset": 0, "delta": "a", "error_code": 0})
+    with pytest.raises(ValueError):
+        decoder.decode({"v": 1, "offset": 5, "delta": "a", "error_code": 0})
+
+
+class _FakeWorkerManager:
+    def __init__(self, outputs: List[ModelOutput]):
+        self.outputs = outputs
+
+    async def generate_stream(self, params: Dict, **kwargs) -> Iterator[ModelOutput]:
+        for output in self.outputs:
+            yield output
+
+
+async def _collect_frames(protocol: str) -> List[bytes]:
+    return [
+        frame
+        async for frame in worker_manager_module.generate_json_stream({}, protocol)
+    ]
+
+
+@pytest.mark.asyncio
+async def test_generate_json_stream_delta(monkeypatch):
+    text = "token " * 200
+    outputs = [
+        ModelOutput(text=text[: i * 6], error_code=0, model_context={})
+        for i in range(1, 201)
+    ]
+    monkeypatch.setattr(
+        worker_manager_module.worker_manager,
+        "worker_manager",
+        _FakeWorkerManager(outputs),
+    )
+    full_frames = await _collect_frames(STREAM_PROTOCOL_FULL)
+    delta_frames = await _collect_frames(STREAM_PROTOCOL_DELTA_V1)
+
+    assert [ModelOutput(**json.loads(f[:-1])) for f in full_frames] == outputs
+    decoder = DeltaStreamDecoder()
+    assert [decoder.decode(json.loads(f[:-1])) for f in delta_frames] == outputs
+    # Cumulative frames grow quadratically, delta frames linearly
+    assert sum(map(len, delta_frames)) * 10 < sum(map(len, full_frames))
@@ -1,12 +1,19 @@
 import logging
-from typing import Dict, Iterator, List
+from typing import Dict, Iterator, List, Tuple
 
 from pilot.configs.model_config import get_device
 from pilot.model.adapter import get_llm_model_adapter, BaseLLMAdaper
-from pilot.model.base import ModelOutput
+from pilot.model.base import MODEL_CONTEXT_OVERFLOW_ERROR_CODE, ModelOutput
 from pilot.model.loader import ModelLoader, _get_model_real_path
 from pilot.model.parameter import ModelParameters
 from pilot.model.cluster.worker_base import ModelWorker
+from pilot.model.context_window import (
+    DEFAULT_CONTEXT_LEN,
+    ContextOverflowError,
+    create_context_overflow_strategy,
+    discover_context_len,
+    prompt_token_budget,
+)
 from pilot.server.chat_adapter import get_llm_chat_adapter, BaseChatAdpter
 from pilot.utils.model_utils import _clear_torch_cache
 from pilot.utils.parameter_utils import EnvArgumentParser
@@ -21,6 +28,12 @@ class DefaultModelWorker(ModelWorker):
         self._model_params = None
         self.llm_adapter: BaseLLMAdaper = None
         self.llm_chat_adapter: BaseChatAdpter = None
+        self._batch_scheduler = None
+        self.prefix_cache = None
+        self.async_generate_stream_func = None
+        # Discovered from the model when it is loaded
+        self.context_len = DEFAULT_CONTEXT_LEN
+        self._overflow_strategy = None
 
     def load_worker(self, model_name: str, model_path: str, **kwargs) -> None:
         if model_path.endswith("/"):
@@ -40,16 +53,21 @@ class DefaultModelWorker(ModelWorker):
         self.generate_stream_func = self.llm_chat_adapter.get_generate_stream_func(
             self.model_path
         )
+        # Proxy models wait for the network, they stream without holding a thread
+        self.async_generate_stream_func = (
+            self.llm_chat_adapter.get_async_generate_stream_func(self.model_path)
+        )
 
         self.ml: ModelLoader = ModelLoader(
             model_path=self.model_path, model_name=self.model_name
         )
-        # TODO read context len from model config
-        self.context_len = 2048
 
     def model_param_class(self) -> ModelParameters:
         return self.param_cls
 
+    def support_async(self) -> bool:
+        return self.async_generate_stream_func is not None
+
     def parse_parameters(self, command_args: List[str] = None) -> ModelParameters:
         param_cls = self.model_param_class()
         model_args = EnvArgumentParser()
@@ -78,8 +96,121 @@ class DefaultModelWorker(ModelWorker):
         self._model_params = model_params
         logger.info(f"Begin load model, model params: {model_params}")
         self.model, self.tokenizer = self.ml.loader_with_params(model_params)
+        self.context_len = (
+            discover_context_len(self.model, self.tokenizer, model_params)
+            or DEFAULT_CONTEXT_LEN
+        )
+        if model_params.model_type != "proxy":
+            # Proxy models have no tokenizer to count the tokens of prompt
+            self._overflow_strategy = create_context_overflow_strategy(
+                getattr(model_params, "context_overflow_strategy", None)
+                or "drop_oldest"
+            )
+        logger.info(f"Context length of model {self.model_name}: {self.context_len}")
+        self._create_prefix_cache(model_params)
+        self._start_batch_scheduler(model_params)
+
+    def _support_kv_cache_reuse(self, model_params: ModelParameters) -> bool:
+        from pilot.model.inference import generate_stream
+
+        return (
+            model_params.model_type == "huggingface"
+            and self.generate_stream_func is generate_stream
+            and not self.model.config.is_encoder_decoder
+        )
+
+    def _create_prefix_cache(self, model_params: ModelParameters) -> None:
+        memory_mb = getattr(model_params, "prefix_cache_memory_mb", 0)
+        if not memory_mb:
+            return
+        if not self._support_kv_cache_reuse(model_params):
+            logger.warn(f"Prefix cache is not supported by model {self.model_name}")
+            return
+        from pilot.model.prefix_cache import PrefixKVCache
+
+        self.prefix_cache = PrefixKVCache(max_memory_mb=memory_mb)
+        logger.info(f"Prefix cache enabled, memory budget: {memory_mb} MB")
+
+    def _start_batch_scheduler(self, model_params: ModelParameters) -> None:
+        if not getattr(model_params, "continuous_batching", False):
+            return
+        if not self._support_kv_cache_reuse(model_params):
+            logger.warn(
+                f"Continuous batching is not supported by model {self.model_name}, fall back to one request at a time"
+            )
+            return
+        from pilot.model.batch_inference import ContinuousBatchingScheduler
+
+        self._batch_scheduler = ContinuousBatchingScheduler(
+            self.model,
+            self.tokenizer,
+            get_device(),
+            self.context_len,
+            max_batch_size=model_params.max_batch_size,
+            prefix_cache=self.prefix_cache,
+        )
+        self._batch_scheduler.start()
+        logger.info(
+            f"Continuous batching enabled, max_batch_size: {model_params.max_batch_size}"
+        )
+
+    def _count_tokens(self, prompt: str) -> int:
+        # Hugging Face tokenizers and LlamaCppModel
+        return len(self.tokenizer.encode(prompt))
+
+    def _prepare_params(self, params: Dict) -> Tuple[Dict, Dict]:
+        """Adapt params to the model, fit the prompt in the context of model"""
+
+        def _adapt(messages):
+            new_params = dict(params)
+            if messages is not None:
+                new_params["messages"] = messages
+            return self.llm_chat_adapter.model_adaptation(
+                new_params, self.ml.model_path, prompt_template=self.ml.prompt_template
+            )
+
+        messages = params.get("messages")
+        adapted = _adapt(messages)
+        if not self._overflow_strategy:
+            return adapted
+
+        messages = messages or []
+        message_tokens: Dict[int, int] = {}
+
+        def _message_tokens(message) -> int:
+            # Each message is tokenized once, however many rounds are dropped
+            key = id(message)
+            if key not in message_tokens:
+                content = (
+                    message["content"] if isinstance(message, dict) else message.content
+                )
+                message_tokens[key] = self._count_tokens(content)
+            return message_tokens[key]
+
+        # The tokens of the template (system prompt, roles, separators), taken as
+        # constant: those of the dropped messages are still counted, never too few
+        template_tokens = self._count_tokens(adapted[0]["prompt"]) - sum(
+            _message_tokens(m) for m in messages
+        )
+
+        def _count_tokens(messages) -> int:
+            return template_tokens + sum(_message_tokens(m) for m in messages)
+
+        max_tokens = prompt_token_budget(
+            self.context_len, int(params.get("max_new_tokens", 2048))
+        )
+        fitted = self._overflow_strategy.fit(messages, _count_tokens, max_tokens)
+        if len(fitted) == len(messages):
+            return adapted
+        return _adapt(fitted)
 
     def stop(self) -> None:
+        if self._batch_scheduler:
+            self._batch_scheduler.stop()
+            self._batch_scheduler = None
+        if self.prefix_cache:
+            self.prefix_cache.clear()
+            self.prefix_cache = None
         if not self.model:
             logger.warn("Model has been stopped!!")
             return
@@ -97,17 +228,29 @@ class DefaultModelWorker(ModelWorker):
             torch_imported = True
         except ImportError:
             pass
+        stream = None
         try:
             # params adaptation
-            params, model_context = self.llm_chat_adapter.model_adaptation(
-                params, self.ml.model_path, prompt_template=self.ml.prompt_template
-            )
+            params, model_context = self._prepare_params(params)
 
             previous_response = ""
             print("stream output:\n")
-            for output in self.generate_stream_func(
-                self.model, self.tokenizer, params, get_device(), self.context_len
-            ):
+            if self._batch_scheduler:
+                stream = self._batch_scheduler.generate_stream(params)
+            elif self.prefix_cache:
+                stream = self.generate_stream_func(
+                    self.model,
+                    self.tokenizer,
+                    params,
+                    get_device(),
+                    self.context_len,
+                    prefix_cache=self.prefix_cache,
+                )
+            else:
+                stream = self.generate_stream_func(
+                    self.model, self.tokenizer, params, get_device(), self.context_len
+                )
+            for output in stream:
                 # Please do not open the output in production!
                 # The gpt4all thread shares stdout with the parent process,
                 # and opening it may affect the frontend output.
@@ -121,6 +264,12 @@ class DefaultModelWorker(ModelWorker):
                 )
                 yield model_output
             print(f"\n\nfull stream output:\n{previous_response}")
+        except ContextOverflowError as e:
+            # Rejected before prefill
+            yield ModelOutput(
+                text=f"**LLMServer Generate Error, Please CheckErrorInfo.**: {e}",
+                error_code=MODEL_CONTEXT_OVERFLOW_ERROR_CODE,
+            )
         except Exception as e:
             # Check if the exception is a torch.cuda.CudaError and if torch was imported.
             if torch_imported and isinstance(e, torch.cuda.CudaError):
@@ -133,6 +282,10 @@ class DefaultModelWorker(ModelWorker):
                     error_code=0,
                 )
             yield model_output
+        finally:
+            if stream is not None:
+                # Stop the decoding loop when the consumer closed this stream
+                stream.close()
 
     def generate(self, params: Dict) -> ModelOutput:
         """Generate non stream result"""
@@ -141,5 +294,32 @@ class DefaultModelWorker(ModelWorker):
             output = out
         return output
 
+    async def async_generate_stream(self, params: Dict) -> Iterator[ModelOutput]:
+        stream = None
+        try:
+            params, model_context = self._prepare_params(params)
+            stream = self.async_generate_stream_func(
+                self.model, self.tokenizer, params, get_device(), self.context_len
+            )
+            async for output in stream:
+                yield ModelOutput(
+                    text=output, error_code=0, model_context=model_context
+                )
+        except Exception as e:
+            yield ModelOutput(
+                text=f"**LLMServer Generate Error, Please CheckErrorInfo.**: {e}",
+                error_code=0,
+            )
+        finally:
+            if stream is not None:
+                # Stop the proxy request when the consumer closed this stream
+                await stream.aclose()
+
+    async def async_generate(self, params: Dict) -> ModelOutput:
+        output = None
+        async for out in self.async_generate_stream(params):
+            output = out
+        return output
+
     def embeddings(self, params: Dict) -> List[List[float]]:
         raise NotImplementedError
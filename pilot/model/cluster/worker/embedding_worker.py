@@ -11,6 +11,7 @@ from pilot.model.parameter import (
 )
 from pilot.model.cluster.worker_base import ModelWorker
 from pilot.model.cluster.embedding.loader import EmbeddingLoader
+from pilot.model.cluster.embedding.batcher import EmbeddingMicroBatcher
 from pilot.utils.model_utils import _clear_torch_cache
 from pilot.utils.parameter_utils import EnvArgumentParser
 
@@ -32,6 +33,7 @@ class EmbeddingsModelWorker(ModelWorker):
         self.model_name = None
         self.model_path = None
         self._loader = EmbeddingLoader()
+        self._batcher: Optional[EmbeddingMicroBatcher] = None
 
     def load_worker(self, model_name: str, model_path: str, **kwargs) -> None:
         if model_path.endswith("/"):
@@ -70,11 +72,22 @@ class EmbeddingsModelWorker(ModelWorker):
             model_params = self.parse_parameters(command_args)
         self._model_params = model_params
         self._embeddings_impl = self._loader.load(self.model_name, model_params)
+        max_batch_size = getattr(model_params, "max_batch_size", None)
+        if max_batch_size and max_batch_size > 1:
+            self._batcher = EmbeddingMicroBatcher(
+                self._embeddings_impl.embed_documents,
+                max_batch_size=max_batch_size,
+                max_wait_ms=model_params.max_batch_wait_ms,
+            )
+            self._batcher.start()
 
     def __del__(self):
         self.stop()
 
     def stop(self) -> None:
+        if self._batcher:
+            self._batcher.stop()
+            self._batcher = None
         if not self._embeddings_impl:
             return
         del self._embeddings_impl
@@ -93,6 +106,8 @@ class EmbeddingsModelWorker(ModelWorker):
         model = params.get("model")
         logger.info(f"Receive embeddings request, model: {model}")
         input: List[str] = params["input"]
+        if self._batcher:
+            return self._batcher.embed(input)
         return self._embeddings_impl.embed_documents(input)
 
 
@@ -1,26 +1,55 @@
 import asyncio
+import contextvars
+import functools
 import itertools
 import json
 import os
 import sys
-import random
 import time
 import logging
 from concurrent.futures import ThreadPoolExecutor
+from contextlib import aclosing, asynccontextmanager
 from dataclasses import asdict
-from typing import Awaitable, Callable, Dict, Iterator, List, Optional
+from typing import Awaitable, Callable, Dict, Iterator, List, Optional, Tuple
 
-from fastapi import APIRouter, FastAPI
+from fastapi import APIRouter, FastAPI, HTTPException, Request
 from fastapi.responses import StreamingResponse
 from pilot.component import SystemApp
+from pilot.model.cancellation import cancellation_counter
 from pilot.model.base import (
+    MODEL_OVERLOADED_ERROR_CODE,
     ModelInstance,
     ModelOutput,
     WorkerApplyOutput,
     WorkerApplyType,
     WorkerSupportedModel,
 )
+from pilot.model.cluster.load import build_load_report
+from pilot.model.cluster.priority import (
+    PRIORITY_BATCH,
+    PRIORITY_INTERACTIVE,
+    PrioritySemaphore,
+    normalize_priority,
+)
 from pilot.model.cluster.registry import ModelRegistry
+from pilot.model.cluster.routing import (
+    LeastInFlightPolicy,
+    RoutingPolicy,
+    create_routing_policy,
+)
+from pilot.model.cache.response_cache import (
+    ModelResponseCache,
+    build_request_key,
+    create_response_cache,
+)
+from pilot.model.cluster.coalescing import RequestCoalescer
+from pilot.model.cluster.stream_protocol import (
+    STREAM_PROTOCOL_DELTA_V1,
+    STREAM_PROTOCOL_FULL,
+    STREAM_PROTOCOL_HEADER,
+    DeltaStreamEncoder,
+    negotiate_stream_protocol,
+)
 from pilot.model.llm_utils import list_supported_models
 from pilot.model.parameter import ModelParameters, ModelWorkerParameters, WorkerType
 from pilot.model.cluster.worker_base import ModelWorker
@@ -44,6 +73,107 @@ SendHeartbeatFunc = Callable[[WorkerRunData], Awaitable[None]]
 ApplyFunction = Callable[[WorkerRunData], Awaitable[None]]
 
 
+# Instances tried by a request rejected by overloaded workers
+_MAX_OVERLOADED_ATTEMPTS = 3
+
+
+def _in_loop(loop: asyncio.AbstractEventLoop) -> bool:
+    try:
+        return asyncio.get_running_loop() is loop
+    except RuntimeError:
+        return False
+
+
+def _admission_limits(
+    worker_run_data: WorkerRunData,
+) -> Tuple[Optional[int], Optional[float]]:
+    """Return the max wait queue size and the queue timeout of worker, None if unlimited"""
+    worker_params = worker_run_data.worker_params
+    if not worker_params:
+        return None, None
+    max_queue_size = worker_params.limit_model_queue_size
+    queue_timeout = worker_params.limit_model_queue_timeout
+    if max_queue_size is None or max_queue_size < 0:
+        max_queue_size = None
+    if queue_timeout is None or queue_timeout < 0:
+        queue_timeout = None
+    return max_queue_size, queue_timeout
+
+
+def _overloaded_output(e: WorkerOverloadedError) -> ModelOutput:
+    return ModelOutput(
+        text=f"**LLMServer Generate Error, Please CheckErrorInfo.**: Model is overloaded, please retry later. {e}",
+        error_code=MODEL_OVERLOADED_ERROR_CODE,
+    )
+
+
+# Returned by _next_output at the end of iterator, StopIteration can't pass a future
+_STREAM_END = object()
+
+
+def _next_output(iterator: Iterator):
+    try:
+        return next(iterator)
+    except StopIteration:
+        return _STREAM_END
+
+
+def _close_iterator(iterator: Iterator, step: asyncio.Future = None) -> None:
+    if step is not None and not step.cancelled():
+        # Nobody reads the result of the last step
+        step.exception()
+    close = getattr(iterator, "close", None)
+    if close:
+        try:
+            close()
+        except Exception as e:
+            logger.warning(f"Close generate stream error: {str(e)}")
+
+
+async def _iterate_in_threadpool(iterator: Iterator) -> Iterator:
+    """Iterate a sync generate stream in threads, close it when the consumer stops
+
+    Closing the generator stops the decoding loop or the proxy request behind it. If the
+    consumer is cancelled while a step is running in a thread, the generator is closed
+    right after that step. Steps run in the context of consumer, like the request
+    priority.
+    """
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    step = None
+    try:
+        while True:
+            step = loop.run_in_executor(None, context.run, _next_output, iterator)
+            # Cancelling the consumer must not abandon the running step
+            output = await asyncio.shield(step)
+            if output is _STREAM_END:
+                return
+            yield output
+    finally:
+        if step is not None and not step.done():
+            step.add_done_callback(functools.partial(_close_iterator, iterator))
+        else:
+            _close_iterator(iterator)
+
+
+def _build_worker_load(worker_run_data: WorkerRunData) -> Dict:
+    concurrency = None
+    if worker_run_data.worker_params:
+        concurrency = worker_run_data.worker_params.limit_model_concurrency
+    return build_load_report(
+        concurrency,
+        worker_run_data.in_flight,
+        worker_run_data.running,
+        worker_run_data.throughput,
+        worker_run_data.rejected,
+    ).to_dict()
+
+
+def _worker_context_len(worker_run_data: WorkerRunData) -> Optional[int]:
+    """Context length of the model of worker, None if unknown"""
+    return getattr(worker_run_data.worker, "context_len", None)
+
+
 async def _async_heartbeat_sender(
     worker_run_data: WorkerRunData,
     heartbeat_interval,
@@ -67,6 +197,9 @@ class LocalWorkerManager(WorkerManager):
         model_registry: ModelRegistry = None,
         host: str = None,
         port: int = None,
+        routing_policy: str = LeastInFlightPolicy.name,
+        response_cache: Optional[ModelResponseCache] = None,
+        request_coalescer: Optional[RequestCoalescer] = None,
     ) -> None:
         self.workers: Dict[str, List[WorkerRunData]] = dict()
         self.executor = ThreadPoolExecutor(max_workers=os.cpu_count() * 5)
@@ -77,6 +210,14 @@ class LocalWorkerManager(WorkerManager):
         self.host = host
         self.port = port
         self.start_listeners = []
+        self.default_routing_policy = routing_policy
+        # Routing policy name of each worker key
+        self._routing_policy_names: Dict[str, str] = {}
+        self._routing_policies: Dict[str, RoutingPolicy] = {}
+        self.response_cache = response_cache
+        self.request_coalescer = request_coalescer
+        # The event loop serving the requests, where the worker slots are acquired
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
 
         self.run_data = WorkerRunData(
             host=self.host,
@@ -97,11 +238,32 @@ class LocalWorkerManager(WorkerManager):
             worker_type = worker_type.value
         return f"{model_name}@{worker_type}"
 
+    def set_routing_policy(
+        self, worker_type: str, model_name: str, policy_name: str
+    ) -> None:
+        """Set the policy to select one instance of the model"""
+        # Validate policy name
+        policy = create_routing_policy(policy_name)
+        worker_key = self._worker_key(worker_type, model_name)
+        self._routing_policy_names[worker_key] = policy_name
+        self._routing_policies[worker_key] = policy
+
+    def _get_routing_policy(self, worker_key: str) -> RoutingPolicy:
+        policy = self._routing_policies.get(worker_key)
+        if not policy:
+            policy_name = self._routing_policy_names.get(
+                worker_key, self.default_routing_policy
+            )
+            policy = create_routing_policy(policy_name)
+            self._routing_policies[worker_key] = policy
+        return policy
+
     async def run_blocking_func(self, func, *args):
         loop = asyncio.get_event_loop()
         return await loop.run_in_executor(self.executor, func, *args)
 
     async def start(self):
+        self._loop = asyncio.get_running_loop()
         if len(self.workers) > 0:
             await self._start_all_worker(apply_req=None)
         if self.register_func:
@@ -157,7 +319,9 @@ class LocalWorkerManager(WorkerManager):
             worker_params=worker_params,
             model_params=model_params,
             stop_event=asyncio.Event(),
-            semaphore=asyncio.Semaphore(worker_params.limit_model_concurrency),
+            semaphore=PrioritySemaphore(
+                worker_params.limit_model_concurrency, worker_params.batch_min_share
+            ),
             command_args=command_args,
         )
         instances = self.workers.get(worker_key)
@@ -231,17 +395,32 @@ class LocalWorkerManager(WorkerManager):
         self, worker_type: str, model_name: str, healthy_only: bool = True
     ) -> List[WorkerRunData]:
         worker_key = self._worker_key(worker_type, model_name)
-        return self.workers.get(worker_key)
-
-    def _simple_select(
+        instances = self.workers.get(worker_key)
+        if healthy_only and instances:
+            # Stopped workers can't serve requests
+            instances = [ins for ins in instances if not ins.stop_event.is_set()]
+        return instances
+
+    async def get_model_context_len(
+        self, model_name: str, worker_type: str = WorkerType.LLM.value
+    ) -> Optional[int]:
+        instances = await self.get_model_instances(worker_type, model_name)
+        context_lens = [
+            _worker_context_len(ins) for ins in instances or [] if ins.worker
+        ]
+        context_lens = [n for n in context_lens if n]
+        # Prompts must fit in every instance
+        return min(context_lens) if context_lens else None
+
+    def _select_by_policy(
         self, worker_type: str, model_name: str, worker_instances: List[WorkerRunData]
     ) -> WorkerRunData:
         if not worker_instances:
             raise Exception(
                 f"Cound not found worker instances for model name {model_name} and worker type {worker_type}"
             )
-        worker_run_data = random.choice(worker_instances)
-        return worker_run_data
+        policy = self._get_routing_policy(self._worker_key(worker_type, model_name))
+        return policy.select(worker_instances)
 
     async def select_one_instance(
         self, worker_type: str, model_name: str, healthy_only: bool = True
@@ -249,7 +428,7 @@ class LocalWorkerManager(WorkerManager):
         worker_instances = await self.get_model_instances(
             worker_type, model_name, healthy_only
         )
-        return self._simple_select(worker_type, model_name, worker_instances)
+        return self._select_by_policy(worker_type, model_name, worker_instances)
 
     def sync_select_one_instance(
         self, worker_type: str, model_name: str, healthy_only: bool = True
@@ -257,13 +436,28 @@ class LocalWorkerManager(WorkerManager):
         worker_instances = self.sync_get_model_instances(
             worker_type, model_name, healthy_only
         )
-        return self._simple_select(worker_type, model_name, worker_instances)
+        return self._select_by_policy(worker_type, model_name, worker_instances)
 
-    async def _get_model(self, params: Dict, worker_type: str = "llm") -> WorkerRunData:
+    async def _get_model(
+        self,
+        params: Dict,
+        worker_type: str = "llm",
+        exclude: List[WorkerRunData] = None,
+    ) -> WorkerRunData:
         model = params.get("model")
         if not model:
             raise Exception("Model name count not be empty")
-        return await self.select_one_instance(worker_type, model, healthy_only=True)
+        if not exclude:
+            return await self.select_one_instance(worker_type, model, healthy_only=True)
+        # Retry on the instances not tried yet
+        worker_instances = [
+            ins
+            for ins in await self.get_model_instances(
+                worker_type, model, healthy_only=True
+            )
+            if all(ins is not tried for tried in exclude)
+        ]
+        return self._select_by_policy(worker_type, model, worker_instances)
 
     def _sync_get_model(self, params: Dict, worker_type: str = "llm") -> WorkerRunData:
         model = params.get("model")
@@ -271,68 +465,276 @@ class LocalWorkerManager(WorkerManager):
             raise Exception("Model name count not be empty")
         return self.sync_select_one_instance(worker_type, model, healthy_only=True)
 
+    @asynccontextmanager
+    async def _acquire_worker(
+        self, worker_run_data: WorkerRunData, priority: str = PRIORITY_INTERACTIVE
+    ):
+        """Hold the concurrency slot of the worker, count it as in-flight
+
+        Raise WorkerOverloadedError at once if the wait queue of the worker is full, or
+        if no slot is free within the queue timeout. Each priority class has its own wait
+        queue, batch requests have no queue timeout.
+        """
+        self._loop = asyncio.get_running_loop()
+        max_queue_size, queue_timeout = _admission_limits(worker_run_data)
+        semaphore = worker_run_data.semaphore
+        queued = worker_run_data.in_flight - worker_run_data.running
+        acquire = semaphore.acquire
+        is_batch = False
+        if isinstance(semaphore, PrioritySemaphore):
+            acquire = functools.partial(semaphore.acquire, normalize_priority(priority))
+            is_batch = normalize_priority(priority) == PRIORITY_BATCH
+            if is_batch:
+                queued = worker_run_data.queued_batch
+                queue_timeout = None
+            else:
+                queued -= worker_run_data.queued_batch
+        if (
+            max_queue_size is not None
+            and semaphore.locked()
+            and queued >= max_queue_size
+        ):
+            worker_run_data.rejected += 1
+            raise WorkerOverloadedError(
+                f"Too many requests waiting for {worker_run_data.worker_key}"
+            )
+        worker_run_data.in_flight += 1
+        try:
+            if is_batch:
+                worker_run_data.queued_batch += 1
+                try:
+                    await acquire()
+                finally:
+                    worker_run_data.queued_batch -= 1
+            elif not semaphore.locked() or queue_timeout is None:
+                await acquire()
+            else:
+                try:
+                    await asyncio.wait_for(acquire(), queue_timeout)
+                except asyncio.TimeoutError:
+                    worker_run_data.rejected += 1
+                    raise WorkerOverloadedError(
+                        f"Waited {queue_timeout} seconds for {worker_run_data.worker_key}"
+                    )
+            worker_run_data.running += 1
+            try:
+                yield worker_run_data
+            finally:
+                worker_run_data.running -= 1
+                semaphore.release()
+                worker_run_data.throughput.add(requests=1)
+        finally:
+            worker_run_data.in_flight -= 1
+
     async def generate_stream(
         self, params: Dict, async_wrapper=None, **kwargs
     ) -> Iterator[ModelOutput]:
         """Generate stream result, chat scene"""
-        try:
-            worker_run_data = await self._get_model(params)
-        except Exception as e:
-            yield ModelOutput(
-                text=f"**LLMServer Generate Error, Please CheckErrorInfo.**: {e}",
-                error_code=0,
-            )
-            return
-        async with worker_run_data.semaphore:
+        cache_key = (
+            self.response_cache.build_key(params) if self.response_cache else None
+        )
+        if cache_key:
+            cached_outputs = self.response_cache.get(cache_key)
+            if cached_outputs:
+                for output in cached_outputs:
+                    yield output
+                return
+
+        def _stream_factory():
+            return self._generate_stream_and_cache(params, async_wrapper, cache_key)
+
+        coalesce_key = self._coalesce_key("generate_stream", params)
+        if coalesce_key:
+            stream = self.request_coalescer.stream(coalesce_key, _stream_factory)
+        else:
+            stream = _stream_factory()
+        async with aclosing(stream):
+            async for output in stream:
+                yield output
+
+    def _coalesce_key(self, method: str, params: Dict) -> Optional[str]:
+        if not self.request_coalescer:
+            return None
+        key = build_request_key(params)
+        return f"{method}:{key}" if key else None
+
+    async def _generate_stream_and_cache(
+        self, params: Dict, async_wrapper=None, cache_key: str = None
+    ) -> Iterator[ModelOutput]:
+        outputs = []
+        async with aclosing(self._generate_stream(params, async_wrapper)) as stream:
+            async for output in stream:
+                if cache_key:
+                    outputs.append(output)
+                yield output
+        if cache_key:
+            # Only reached when the stream is complete
+            self.response_cache.put(cache_key, outputs)
+
+    async def _generate_stream(
+        self, params: Dict, async_wrapper=None
+    ) -> Iterator[ModelOutput]:
+        tried: List[WorkerRunData] = []
+        overloaded = None
+        while len(tried) < _MAX_OVERLOADED_ATTEMPTS:
+            try:
+                worker_run_data = await self._get_model(params, exclude=tried)
+            except Exception as e:
+                if overloaded:
+                    break
+                yield ModelOutput(
+                    text=f"**LLMServer Generate Error, Please CheckErrorInfo.**: {e}",
+                    error_code=0,
+                )
+                return
+            tried.append(worker_run_data)
+            try:
+                # Close the stream of worker at once if the consumer stops reading
+                async with aclosing(
+                    self._worker_generate_stream(worker_run_data, params, async_wrapper)
+                ) as stream:
+                    async for output in stream:
+                        yield output
+                return
+            except WorkerOverloadedError as e:
+                overloaded = e
+                logger.info(f"Worker overloaded, try another instance: {str(e)}")
+        yield _overloaded_output(overloaded)
+
+    async def _worker_generate_stream(
+        self, worker_run_data: WorkerRunData, params: Dict, async_wrapper=None
+    ) -> Iterator[ModelOutput]:
+        async with self._acquire_worker(worker_run_data, params.get("priority")):
             if worker_run_data.worker.support_async():
-                async for outout in worker_run_data.worker.async_generate_stream(
-                    params
-                ):
-                    yield outout
+                outputs = worker_run_data.worker.async_generate_stream(params)
             else:
                 if not async_wrapper:
-                    from starlette.concurrency import iterate_in_threadpool
-
-                    async_wrapper = iterate_in_threadpool
-                async for output in async_wrapper(
-                    worker_run_data.worker.generate_stream(params)
-                ):
+                    async_wrapper = _iterate_in_threadpool
+                outputs = async_wrapper(worker_run_data.worker.generate_stream(params))
+            text_len = 0
+            async with aclosing(outputs):
+                async for output in outputs:
+                    if (
+                        text_len == 0
+                        and output.error_code == MODEL_OVERLOADED_ERROR_CODE
+                    ):
+                        # Rejected by the remote worker, nothing generated yet
+                        raise WorkerOverloadedError(output.text)
+                    # Text of outputs is the full text generated so far
+                    if output.text and len(output.text) > text_len:
+                        worker_run_data.throughput.add(
+                            chars=len(output.text) - text_len
+                        )
+                        text_len = len(output.text)
                     yield output
 
     async def generate(self, params: Dict) -> ModelOutput:
         """Generate non stream result"""
-        try:
-            worker_run_data = await self._get_model(params)
-        except Exception as e:
-            return ModelOutput(
-                text=f"**LLMServer Generate Error, Please CheckErrorInfo.**: {e}",
-                error_code=0,
-            )
-        async with worker_run_data.semaphore:
+        cache_key = (
+            self.response_cache.build_key(params) if self.response_cache else None
+        )
+        if cache_key:
+            cached_outputs = self.response_cache.get(cache_key)
+            if cached_outputs:
+                return cached_outputs[-1]
+
+        async def _generate_and_cache():
+            output = await self._generate(params)
+            if cache_key and output:
+                self.response_cache.put(cache_key, [output])
+            yield output
+
+        coalesce_key = self._coalesce_key("generate", params)
+        if coalesce_key:
+            stream = self.request_coalescer.stream(coalesce_key, _generate_and_cache)
+        else:
+            stream = _generate_and_cache()
+        output = None
+        async with aclosing(stream):
+            async for output in stream:
+                pass
+        return output
+
+    async def _generate(self, params: Dict) -> ModelOutput:
+        tried: List[WorkerRunData] = []
+        overloaded = None
+        while len(tried) < _MAX_OVERLOADED_ATTEMPTS:
+            try:
+                worker_run_data = await self._get_model(params, exclude=tried)
+            except Exception as e:
+                if overloaded:
+                    break
+                return ModelOutput(
+                    text=f"**LLMServer Generate Error, Please CheckErrorInfo.**: {e}",
+                    error_code=0,
+                )
+            tried.append(worker_run_data)
+            try:
+                return await self._worker_generate(worker_run_data, params)
+            except WorkerOverloadedError as e:
+                overloaded = e
+                logger.info(f"Worker overloaded, try another instance: {str(e)}")
+        return _overloaded_output(overloaded)
+
+    async def _worker_generate(
+        self, worker_run_data: WorkerRunData, params: Dict
+    ) -> ModelOutput:
+        async with self._acquire_worker(worker_run_data, params.get("priority")):
             if worker_run_data.worker.support_async():
-                return await worker_run_data.worker.async_generate(params)
+                output = await worker_run_data.worker.async_generate(params)
             else:
-                return await self.run_blocking_func(
+                output = await self.run_blocking_func(
                     worker_run_data.worker.generate, params
                 )
+            if output and output.error_code == MODEL_OVERLOADED_ERROR_CODE:
+                raise WorkerOverloadedError(output.text)
+            if output and output.text:
+                worker_run_data.throughput.add(chars=len(output.text))
+            return output
 
     async def embeddings(self, params: Dict) -> List[List[float]]:
         """Embed input"""
-        try:
-            worker_run_data = await self._get_model(params, worker_type="text2vec")
-        except Exception as e:
-            raise e
-        async with worker_run_data.semaphore:
-            if worker_run_data.worker.support_async():
-                return await worker_run_data.worker.async_embeddings(params)
-            else:
-                return await self.run_blocking_func(
-                    worker_run_data.worker.embeddings, params
+        tried: List[WorkerRunData] = []
+        overloaded = None
+        while len(tried) < _MAX_OVERLOADED_ATTEMPTS:
+            try:
+                worker_run_data = await self._get_model(
+                    params, worker_type="text2vec", exclude=tried
                 )
+            except Exception:
+                if overloaded:
+                    break
+                raise
+            tried.append(worker_run_data)
+            try:
+                async with self._acquire_worker(
+                    worker_run_data, params.get("priority")
+                ):
+                    if worker_run_data.worker.support_async():
+                        return await worker_run_data.worker.async_embeddings(params)
+                    else:
+                        return await self.run_blocking_func(
+                            worker_run_data.worker.embeddings, params
+                        )
+            except WorkerOverloadedError as e:
+                overloaded = e
+                logger.info(f"Worker overloaded, try another instance: {str(e)}")
+        raise overloaded
 
     def sync_embeddings(self, params: Dict) -> List[List[float]]:
+        loop = self._loop
+        if loop is not None and loop.is_running() and not _in_loop(loop):
+            # Wait for a worker slot in the serving loop, with the priority of params
+            future = asyncio.run_coroutine_threadsafe(self.embeddings(params), loop)
+            return future.result()
+        # Nothing to queue in before start, and the loop thread itself can't block
         worker_run_data = self._sync_get_model(params, worker_type="text2vec")
-        return worker_run_data.worker.embeddings(params)
+        worker_run_data.in_flight += 1
+        try:
+            return worker_run_data.worker.embeddings(params)
+        finally:
+            worker_run_data.in_flight -= 1
+            worker_run_data.throughput.add(requests=1)
 
     async def worker_apply(self, apply_req: WorkerApplyRequest) -> WorkerApplyOutput:
         apply_func: Callable[[WorkerApplyRequest], Awaitable[str]] = None
@@ -351,7 +753,9 @@ class LocalWorkerManager(WorkerManager):
     async def parameter_descriptions(
         self, worker_type: str, model_name: str
     ) -> List[ParameterDescription]:
-        worker_instances = await self.get_model_instances(worker_type, model_name)
+        worker_instances = await self.get_model_instances(
+            worker_type, model_name, healthy_only=False
+        )
         if not worker_instances:
             raise Exception(
                 f"Not worker instances for model name {model_name} worker type {worker_type}"
@@ -515,6 +919,11 @@ class WorkerManagerAdapter(WorkerManager):
             worker_type, model_name, healthy_only
         )
 
+    async def get_model_context_len(
+        self, model_name: str, worker_type: str = WorkerType.LLM.value
+    ) -> Optional[int]:
+        return await self.worker_manager.get_model_context_len(model_name, worker_type)
+
     async def select_one_instance(
         self, worker_type: str, model_name: str, healthy_only: bool = True
     ) -> WorkerRunData:
@@ -566,20 +975,75 @@ worker_manager = WorkerManagerAdapter()
 router = APIRouter()
 
 
-async def generate_json_stream(params):
-    from starlette.concurrency import iterate_in_threadpool
-
-    async for output in worker_manager.generate_stream(
-        params, async_wrapper=iterate_in_threadpool
-    ):
-        yield json.dumps(asdict(output), ensure_ascii=False).encode() + b"\0"
+async def generate_json_stream(params, protocol: str = STREAM_PROTOCOL_FULL):
+    encoder = DeltaStreamEncoder() if protocol == STREAM_PROTOCOL_DELTA_V1 else None
+    # The StreamingResponse cancels this generator when the client disconnects
+    async with aclosing(worker_manager.generate_stream(params)) as stream:
+        async for output in stream:
+            data = encoder.encode(output) if encoder else asdict(output)
+            yield json.dumps(data, ensure_ascii=False).encode() + b"\0"
 
 
 @router.post("/worker/generate_stream")
-async def api_generate_stream(request: PromptRequest):
+async def api_generate_stream(request: PromptRequest, http_request: Request):
     params = request.dict(exclude_none=True)
-    generator = generate_json_stream(params)
-    return StreamingResponse(generator)
+    protocol = negotiate_stream_protocol(
+        http_request.headers.get(STREAM_PROTOCOL_HEADER)
+    )
+    generator = generate_json_stream(params, protocol)
+    return StreamingResponse(generator, headers={STREAM_PROTOCOL_HEADER: protocol})
+
+
+@router.get("/worker/response_cache/stats")
+async def api_response_cache_stats():
+    response_cache = getattr(worker_manager.worker_manager, "response_cache", None)
+    if not response_cache:
+        return {"enabled": False}
+    return {"enabled": True, **response_cache.stats().to_dict()}
+
+
+@router.get("/worker/coalescing/stats")
+async def api_coalescing_stats():
+    request_coalescer = getattr(
+        worker_manager.worker_manager, "request_coalescer", None
+    )
+    if not request_coalescer:
+        return {"enabled": False}
+    return {"enabled": True, **request_coalescer.stats().to_dict()}
+
+
+@router.get("/worker/cancellation/stats")
+async def api_cancellation_stats():
+    return cancellation_counter.stats().to_dict()
+
+
+@router.get("/worker/prefix_cache/stats")
+async def api_prefix_cache_stats():
+    """Prefix KV cache stats of each local model worker which enables it"""
+    stats = {}
+    for instances in getattr(worker_manager.worker_manager, "workers", {}).values():
+        for worker_run_data in instances:
+            prefix_cache = getattr(worker_run_data.worker, "prefix_cache", None)
+            if prefix_cache:
+                stats[worker_run_data.worker_key] = prefix_cache.stats().to_dict()
+    return stats
+
+
+@router.get("/worker/proxy/stats")
+async def api_proxy_stats():
+    """Retries, failovers and rate limiting of each local proxy model worker"""
+    stats = {}
+    for instances in getattr(worker_manager.worker_manager, "workers", {}).values():
+        for worker_run_data in instances:
+            model = getattr(worker_run_data.worker, "model", None)
+            if not hasattr(model, "get_transport"):
+                continue
+            transport = model.get_transport()
+            stats[worker_run_data.worker_key] = {
+                "transport": transport.stats().to_dict(),
+                "rate_limiters": transport.rate_limiter_stats(),
+            }
+    return stats
 
 
 @router.post("/worker/generate")
@@ -591,7 +1055,11 @@ async def api_generate(request: PromptRequest):
 @router.post("/worker/embeddings")
 async def api_embeddings(request: EmbeddingsRequest):
     params = request.dict(exclude_none=True)
-    return await worker_manager.embeddings(params)
+    try:
+        return await worker_manager.embeddings(params)
+    except WorkerOverloadedError as e:
+        # RemoteModelWorker raises WorkerOverloadedError for this status
+        raise HTTPException(status_code=503, detail=str(e))
 
 
 @router.post("/worker/apply")
@@ -606,6 +1074,27 @@ async def api_worker_parameter_descs(
     return await worker_manager.parameter_descriptions(worker_type, model)
 
 
+@router.get("/worker/models")
+async def api_models():
+    """Running models of this worker manager, with their context length"""
+    models = []
+    for instances in getattr(worker_manager.worker_manager, "workers", {}).values():
+        for worker_run_data in instances:
+            if worker_run_data.stop_event.is_set():
+                continue
+            model_name, worker_type = worker_run_data.worker_key.split("@", 1)
+            models.append(
+                {
+                    "model_name": model_name,
+                    "worker_type": worker_type,
+                    "host": worker_run_data.host,
+                    "port": worker_run_data.port,
+                    "context_len": _worker_context_len(worker_run_data),
+                }
+            )
+    return models
+
+
 @router.get("/worker/models/supports")
 async def api_supported_models():
     """Get all supported models.
@@ -660,7 +1149,10 @@ def _setup_fastapi(worker_params: ModelWorkerParameters, app=None):
 
     @app.on_event("shutdown")
     async def startup_event():
+        from pilot.utils.http_client import get_http_client_pool
+
         await worker_manager.stop()
+        await get_http_client_pool().aclose()
 
     return app
 
@@ -698,11 +1190,18 @@ def _create_local_model_manager(
         else _get_ip_address()
     )
     port = worker_params.port
+    response_cache = _create_response_cache(worker_params)
+    request_coalescer = _create_request_coalescer(worker_params)
     if not worker_params.register or not worker_params.controller_addr:
         logger.info(
             f"Not register current to controller, register: {worker_params.register}, controller_addr: {worker_params.controller_addr}"
         )
-        return LocalWorkerManager(host=host, port=port)
+        return LocalWorkerManager(
+            host=host,
+            port=port,
+            response_cache=response_cache,
+            request_coalescer=request_coalescer,
+        )
     else:
         from pilot.model.cluster.controller.controller import ModelRegistryClient
 
@@ -710,7 +1209,10 @@ def _create_local_model_manager(
 
         async def register_func(worker_run_data: WorkerRunData):
             instance = ModelInstance(
-                model_name=worker_run_data.worker_key, host=host, port=port
+                model_name=worker_run_data.worker_key,
+                host=host,
+                port=port,
+                context_len=_worker_context_len(worker_run_data),
             )
             return await client.register_instance(instance)
 
@@ -722,7 +1224,11 @@ def _create_local_model_manager(
 
         async def send_heartbeat_func(worker_run_data: WorkerRunData):
             instance = ModelInstance(
-                model_name=worker_run_data.worker_key, host=host, port=port
+                model_name=worker_run_data.worker_key,
+                host=host,
+                port=port,
+                load=_build_worker_load(worker_run_data),
+                context_len=_worker_context_len(worker_run_data),
             )
             return await client.send_heartbeat(instance)
 
@@ -732,9 +1238,49 @@ def _create_local_model_manager(
             send_heartbeat_func=send_heartbeat_func,
             host=host,
             port=port,
+            response_cache=response_cache,
+            request_coalescer=request_coalescer,
         )
 
 
+def _create_request_coalescer(
+    worker_params: ModelWorkerParameters,
+) -> Optional[RequestCoalescer]:
+    if not worker_params.coalesce_requests:
+        return None
+    return RequestCoalescer()
+
+
+def _configure_http_client_pool(worker_params: ModelWorkerParameters) -> None:
+    from dataclasses import replace
+
+    from pilot.utils.http_client import get_http_client_pool
+
+    overrides = {
+        "max_connections_per_host": worker_params.http_max_connections_per_host,
+        "max_keepalive_connections_per_host": (
+            worker_params.http_max_keepalive_connections_per_host
+        ),
+        "keepalive_expiry": worker_params.http_keepalive_expiry,
+        "connect_timeout": worker_params.http_connect_timeout,
+        "timeout": worker_params.http_timeout,
+    }
+    overrides = {k: v for k, v in overrides.items() if v is not None}
+    if overrides:
+        pool = get_http_client_pool()
+        pool.configure(replace(pool.params, **overrides))
+
+
+def _create_response_cache(
+    worker_params: ModelWorkerParameters,
+) -> Optional[ModelResponseCache]:
+    return create_response_cache(
+        worker_params.response_cache_type,
+        max_memory_items=worker_params.response_cache_max_items,
+        cache_non_deterministic=worker_params.response_cache_non_deterministic,
+    )
+
+
 def _build_worker(worker_params: ModelWorkerParameters):
     worker_class = worker_params.worker_class
     if worker_class:
@@ -769,6 +1315,12 @@ def _start_local_worker(
     if not worker_manager.worker_manager:
         worker_manager.worker_manager = _create_local_model_manager(worker_params)
     worker_manager.worker_manager.add_worker(worker, worker_params)
+    if worker_params.routing_policy:
+        worker_manager.worker_manager.set_routing_policy(
+            worker_params.worker_type,
+            worker_params.model_name,
+            worker_params.routing_policy,
+        )
 
 
 def _start_local_embedding_worker(
@@ -823,6 +1375,7 @@ def initialize_worker_manager_in_client(
     worker_params: ModelWorkerParameters = _parse_worker_params(
         model_name=model_name, model_path=model_path, controller_addr=controller_addr
     )
+    _configure_http_client_pool(worker_params)
 
     controller_addr = None
     if run_locally:
@@ -849,7 +1402,16 @@ def initialize_worker_manager_in_client(
         controller_addr = worker_params.controller_addr
         logger.info(f"Worker params: {worker_params}")
         client = ModelRegistryClient(worker_params.controller_addr)
-        worker_manager.worker_manager = RemoteWorkerManager(client)
+        worker_manager.worker_manager = RemoteWorkerManager(
+            client,
+            response_cache=_create_response_cache(worker_params),
+            request_coalescer=_create_request_coalescer(worker_params),
+            instance_cache_ttl=worker_params.instance_cache_ttl,
+        )
+        if worker_params.routing_policy:
+            worker_manager.worker_manager.set_routing_policy(
+                WorkerType.LLM, worker_params.model_name, worker_params.routing_policy
+            )
         worker_manager.after_start(start_listener)
         initialize_controller(
             app=app, remote_controller_addr=worker_params.controller_addr
@@ -879,6 +1441,7 @@ def run_worker_manager(
     worker_params: ModelWorkerParameters = _parse_worker_params(
         model_name=model_name, model_path=model_path, standalone=standalone, port=port
     )
+    _configure_http_client_pool(worker_params)
 
     embedded_mod = True
     logger.info(f"Worker params: {worker_params}")
@@ -1,24 +1,68 @@
 import asyncio
-from typing import Any, Callable
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional, Set, Tuple
 
-import httpx
 from pilot.model.base import ModelInstance, WorkerApplyOutput, WorkerSupportedModel
+from pilot.model.cache.response_cache import ModelResponseCache
 from pilot.model.cluster.base import *
+from pilot.model.cluster.coalescing import RequestCoalescer
+from pilot.model.cluster.priority import PrioritySemaphore
 from pilot.model.cluster.registry import ModelRegistry
 from pilot.model.cluster.worker.manager import LocalWorkerManager, WorkerRunData, logger
 from pilot.model.cluster.worker.remote_worker import RemoteModelWorker
+from pilot.utils.http_client import get_http_client_pool
+
+
+@dataclass
+class _CachedInstances:
+    # All instances of a worker key, healthy or not
+    instances: List[ModelInstance]
+    fetched_at: float
 
 
 class RemoteWorkerManager(LocalWorkerManager):
-    def __init__(self, model_registry: ModelRegistry = None) -> None:
-        super().__init__(model_registry=model_registry)
+    """Worker manager of remote workers discovered by the model registry.
+
+    Instances are cached for ``instance_cache_ttl`` seconds and refreshed in the
+    background, a long-poll on the controller keeps the cache up to date, so requests
+    don't wait for the controller. The worker of each instance is created once, its
+    concurrency limit is shared by all requests.
+    """
+
+    def __init__(
+        self,
+        model_registry: ModelRegistry = None,
+        response_cache: Optional[ModelResponseCache] = None,
+        request_coalescer: Optional[RequestCoalescer] = None,
+        instance_cache_ttl: float = 30,
+        watch_timeout: float = 30,
+        worker_concurrency: int = 100,
+    ) -> None:
+        super().__init__(
+            model_registry=model_registry,
+            response_cache=response_cache,
+            request_coalescer=request_coalescer,
+        )
+        self.instance_cache_ttl = instance_cache_ttl
+        self.watch_timeout = watch_timeout
+        self.worker_concurrency = worker_concurrency
+        self._instance_cache: Dict[str, _CachedInstances] = {}
+        self._worker_run_data: Dict[Tuple[str, str, int], WorkerRunData] = {}
+        self._refreshing: Set[str] = set()
+        self._watch_task: Optional[asyncio.Task] = None
+        # Time of the last response of watch, None if not watching
+        self._watched_at: Optional[float] = None
 
     async def start(self):
         for listener in self.start_listeners:
             listener(self)
 
     async def stop(self):
-        pass
+        if self._watch_task and not self._watch_task.done():
+            self._watch_task.cancel()
+        self._watch_task = None
+        self._watched_at = None
 
     async def _fetch_from_worker(
         self,
@@ -35,26 +79,26 @@ class RemoteWorkerManager(LocalWorkerManager):
         headers = {**worker_run_data.worker.headers, **(additional_headers or {})}
         timeout = worker_run_data.worker.timeout
 
-        async with httpx.AsyncClient() as client:
-            request = client.build_request(
-                method,
-                url,
-                json=json,  # using json for data to ensure it sends as application/json
-                params=params,
-                headers=headers,
-                timeout=timeout,
-            )
+        client = get_http_client_pool().async_client(url)
+        request = client.build_request(
+            method,
+            url,
+            json=json,  # using json for data to ensure it sends as application/json
+            params=params,
+            headers=headers,
+            timeout=timeout,
+        )
 
-            response = await client.send(request)
-            if response.status_code != 200:
-                if error_handler:
-                    return error_handler(response)
-                else:
-                    error_msg = f"Request to {url} failed, error: {response.text}"
-                    raise Exception(error_msg)
-            if success_handler:
-                return success_handler(response)
-            return response.json()
+        response = await client.send(request)
+        if response.status_code != 200:
+            if error_handler:
+                return error_handler(response)
+            else:
+                error_msg = f"Request to {url} failed, error: {response.text}"
+                raise Exception(error_msg)
+        if success_handler:
+            return success_handler(response)
+        return response.json()
 
     async def _apply_to_worker_manager_instances(self):
         pass
@@ -125,42 +169,162 @@ class RemoteWorkerManager(LocalWorkerManager):
         )
 
     def _build_worker_instances(
-        self, model_name: str, instances: List[ModelInstance]
+        self, model_name: str, instances: List[ModelInstance], healthy_only: bool
     ) -> List[WorkerRunData]:
         worker_instances = []
         for ins in instances:
-            worker = RemoteModelWorker()
-            worker.load_worker(model_name, model_name, host=ins.host, port=ins.port)
-            wr = WorkerRunData(
-                host=ins.host,
-                port=ins.port,
-                worker_key=ins.model_name,
-                worker=worker,
-                worker_params=None,
-                model_params=None,
-                stop_event=asyncio.Event(),
-                semaphore=asyncio.Semaphore(100),  # Not limit in client
-            )
+            if healthy_only and ins.healthy != True:
+                continue
+            key = (ins.model_name, ins.host, ins.port)
+            wr = self._worker_run_data.get(key)
+            if not wr:
+                worker = RemoteModelWorker()
+                worker.load_worker(model_name, model_name, host=ins.host, port=ins.port)
+                wr = WorkerRunData(
+                    host=ins.host,
+                    port=ins.port,
+                    worker_key=ins.model_name,
+                    worker=worker,
+                    worker_params=None,
+                    model_params=None,
+                    stop_event=asyncio.Event(),
+                    semaphore=PrioritySemaphore(self.worker_concurrency),
+                )
+                self._worker_run_data[key] = wr
+            wr.weight = ins.weight
+            wr.load = ins.load
+            wr.worker.context_len = ins.context_len
             worker_instances.append(wr)
         return worker_instances
 
+    def _update_cache(
+        self, worker_key: str, instances: List[ModelInstance], fetched_at: float = None
+    ) -> _CachedInstances:
+        cached = _CachedInstances(
+            instances=list(instances), fetched_at=fetched_at or time.time()
+        )
+        self._instance_cache[worker_key] = cached
+        alive = set((ins.model_name, ins.host, ins.port) for ins in instances)
+        for key in list(self._worker_run_data.keys()):
+            # Requests in flight keep the removed workers
+            if key[0] == worker_key and key not in alive:
+                del self._worker_run_data[key]
+        return cached
+
+    def _is_watching(self) -> bool:
+        """Whether the watch keeps the cache up to date"""
+        return (
+            self._watched_at is not None
+            and time.time() - self._watched_at
+            < self.watch_timeout + self.instance_cache_ttl
+        )
+
+    def _cache_state(self, worker_key: str) -> Tuple[Optional[_CachedInstances], bool]:
+        """Return the cached instances if not expired, and whether they should be refreshed"""
+        cached = self._instance_cache.get(worker_key)
+        if not cached:
+            return None, True
+        if self._is_watching():
+            return cached, False
+        age = time.time() - cached.fetched_at
+        if age > self.instance_cache_ttl:
+            return None, True
+        return cached, age > self.instance_cache_ttl / 2
+
+    async def _refresh(self, worker_key: str) -> _CachedInstances:
+        fetched_at = time.time()
+        instances: List[ModelInstance] = await self.model_registry.get_all_instances(
+            worker_key, False
+        )
+        return self._update_cache(worker_key, instances, fetched_at)
+
+    async def _background_refresh(self, worker_key: str):
+        try:
+            await self._refresh(worker_key)
+        except Exception as e:
+            logger.warning(f"Refresh instances of {worker_key} error: {str(e)}")
+        finally:
+            self._refreshing.discard(worker_key)
+
+    def _ensure_watching(self):
+        """Start the watch on the running event loop, if it is not running"""
+        if not self.watch_timeout:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        task = self._watch_task
+        if task and not task.done() and task.get_loop() is loop:
+            return
+        self._watch_task = loop.create_task(self._watch_registry())
+
+    async def _watch_registry(self):
+        version = -1
+        backoff = 1
+        try:
+            while True:
+                try:
+                    result = await self.model_registry.watch_instances(
+                        version, self.watch_timeout
+                    )
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    # Not supported by registry or controller unavailable, fall back to TTL
+                    self._watched_at = None
+                    logger.warning(
+                        f"Watch model instances error: {str(e)}, retry in {backoff} seconds"
+                    )
+                    await asyncio.sleep(backoff)
+                    backoff = min(backoff * 2, 60)
+                    continue
+                backoff = 1
+                if result["version"] != version:
+                    version = result["version"]
+                    self._apply_snapshot(result["instances"])
+                self._watched_at = time.time()
+        finally:
+            self._watched_at = None
+
+    def _apply_snapshot(self, instances: List):
+        fetched_at = time.time()
+        instances = [
+            ModelInstance(**ins) if isinstance(ins, dict) else ins for ins in instances
+        ]
+        grouped: Dict[str, List[ModelInstance]] = {
+            worker_key: [] for worker_key in self._instance_cache.keys()
+        }
+        for ins in instances:
+            grouped.setdefault(ins.model_name, []).append(ins)
+        for worker_key, model_instances in grouped.items():
+            self._update_cache(worker_key, model_instances, fetched_at)
+
     async def get_model_instances(
         self, worker_type: str, model_name: str, healthy_only: bool = True
     ) -> List[WorkerRunData]:
+        self._ensure_watching()
         worker_key = self._worker_key(worker_type, model_name)
-        instances: List[ModelInstance] = await self.model_registry.get_all_instances(
-            worker_key, healthy_only
-        )
-        return self._build_worker_instances(model_name, instances)
+        cached, need_refresh = self._cache_state(worker_key)
+        if not cached:
+            cached = await self._refresh(worker_key)
+        elif need_refresh and worker_key not in self._refreshing:
+            self._refreshing.add(worker_key)
+            asyncio.create_task(self._background_refresh(worker_key))
+        return self._build_worker_instances(model_name, cached.instances, healthy_only)
 
     def sync_get_model_instances(
         self, worker_type: str, model_name: str, healthy_only: bool = True
     ) -> List[WorkerRunData]:
         worker_key = self._worker_key(worker_type, model_name)
-        instances: List[ModelInstance] = self.model_registry.sync_get_all_instances(
-            worker_key, healthy_only
-        )
-        return self._build_worker_instances(model_name, instances)
+        cached, need_refresh = self._cache_state(worker_key)
+        if not cached or need_refresh:
+            fetched_at = time.time()
+            instances: List[ModelInstance] = self.model_registry.sync_get_all_instances(
+                worker_key, False
+            )
+            cached = self._update_cache(worker_key, instances, fetched_at)
+        return self._build_worker_instances(model_name, cached.instances, healthy_only)
 
     async def worker_apply(self, apply_req: WorkerApplyRequest) -> WorkerApplyOutput:
         async def _remote_apply_func(worker_run_data: WorkerRunData):
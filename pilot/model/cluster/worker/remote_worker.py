@@ -3,12 +3,23 @@ from typing import Dict, Iterator, List
 import logging
 from pilot.model.base import ModelOutput
 from pilot.model.parameter import ModelParameters
+from pilot.model.cluster.base import WorkerOverloadedError
 from pilot.model.cluster.worker_base import ModelWorker
-
+from pilot.model.cluster.stream_protocol import (
+    STREAM_PROTOCOL_DELTA_V1,
+    STREAM_PROTOCOL_HEADER,
+    DeltaStreamDecoder,
+)
+from pilot.utils.http_client import get_http_client_pool
 
 logger = logging.getLogger(__name__)
 
 
+def _raise_if_overloaded(status_code: int, text: str):
+    if status_code == 503:
+        raise WorkerOverloadedError(text)
+
+
 class RemoteModelWorker(ModelWorker):
     def __init__(self) -> None:
         self.headers = {}
@@ -16,6 +27,8 @@ class RemoteModelWorker(ModelWorker):
         self.timeout = 180
         self.host = None
         self.port = None
+        # Published by the remote worker in the model registry
+        self.context_len = None
 
     @property
     def worker_addr(self) -> str:
@@ -47,28 +60,34 @@ class RemoteModelWorker(ModelWorker):
 
     async def async_generate_stream(self, params: Dict) -> Iterator[ModelOutput]:
         """Asynchronous generate stream"""
-        import httpx
-
-        async with httpx.AsyncClient() as client:
-            delimiter = b"\0"
-            buffer = b""
-            url = self.worker_addr + "/generate_stream"
-            logger.debug(f"Send async_generate_stream to url {url}, params: {params}")
-            async with client.stream(
-                "POST",
-                url,
-                headers=self.headers,
-                json=params,
-                timeout=self.timeout,
-            ) as response:
-                async for raw_chunk in response.aiter_raw():
-                    buffer += raw_chunk
-                    while delimiter in buffer:
-                        chunk, buffer = buffer.split(delimiter, 1)
-                        if not chunk:
-                            continue
-                        chunk = chunk.decode()
-                        data = json.loads(chunk)
+        delimiter = b"\0"
+        buffer = b""
+        url = self.worker_addr + "/generate_stream"
+        logger.debug(f"Send async_generate_stream to url {url}, params: {params}")
+        client = get_http_client_pool().async_client(url)
+        headers = {**self.headers, STREAM_PROTOCOL_HEADER: STREAM_PROTOCOL_DELTA_V1}
+        async with client.stream(
+            "POST",
+            url,
+            headers=headers,
+            json=params,
+            timeout=self.timeout,
+        ) as response:
+            # Workers without delta support ignore the header and send full frames
+            decoder = None
+            if response.headers.get(STREAM_PROTOCOL_HEADER) == STREAM_PROTOCOL_DELTA_V1:
+                decoder = DeltaStreamDecoder()
+            async for raw_chunk in response.aiter_raw():
+                buffer += raw_chunk
+                while delimiter in buffer:
+                    chunk, buffer = buffer.split(delimiter, 1)
+                    if not chunk:
+                        continue
+                    chunk = chunk.decode()
+                    data = json.loads(chunk)
+                    if decoder:
+                        yield decoder.decode(data)
+                    else:
                         yield ModelOutput(**data)
 
     def generate(self, params: Dict) -> ModelOutput:
@@ -77,44 +96,41 @@ class RemoteModelWorker(ModelWorker):
 
     async def async_generate(self, params: Dict) -> ModelOutput:
         """Asynchronous generate non stream"""
-        import httpx
-
-        async with httpx.AsyncClient() as client:
-            url = self.worker_addr + "/generate"
-            logger.debug(f"Send async_generate to url {url}, params: {params}")
-            response = await client.post(
-                url,
-                headers=self.headers,
-                json=params,
-                timeout=self.timeout,
-            )
-            return ModelOutput(**response.json())
+        url = self.worker_addr + "/generate"
+        logger.debug(f"Send async_generate to url {url}, params: {params}")
+        client = get_http_client_pool().async_client(url)
+        response = await client.post(
+            url,
+            headers=self.headers,
+            json=params,
+            timeout=self.timeout,
+        )
+        return ModelOutput(**response.json())
 
     def embeddings(self, params: Dict) -> List[List[float]]:
         """Get embeddings for input"""
-        import requests
-
         url = self.worker_addr + "/embeddings"
         logger.debug(f"Send embeddings to url {url}, params: {params}")
-        response = requests.post(
+        session = get_http_client_pool().sync_session()
+        response = session.post(
             url,
             headers=self.headers,
             json=params,
             timeout=self.timeout,
         )
+        _raise_if_overloaded(response.status_code, response.text)
         return response.json()
 
     async def async_embeddings(self, params: Dict) -> List[List[float]]:
         """Asynchronous get embeddings for input"""
-        import httpx
-
-        async with httpx.AsyncClient() as client:
-            url = self.worker_addr + "/embeddings"
-            logger.debug(f"Send async_embeddings to url {url}")
-            response = await client.post(
-                url,
-                headers=self.headers,
-                json=params,
-                timeout=self.timeout,
-            )
-            return response.json()
+        url = self.worker_addr + "/embeddings"
+        logger.debug(f"Send async_embeddings to url {url}")
+        client = get_http_client_pool().async_client(url)
+        response = await client.post(
+            url,
+            headers=self.headers,
+            json=params,
+            timeout=self.timeout,
+        )
+        _raise_if_overloaded(response.status_code, response.text)
+        return response.json()
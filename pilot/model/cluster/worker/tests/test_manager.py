@@ -0,0 +1,653 @@
+"""Run unit test with command: pytest pilot/model/cluster/worker/tests/test_manager.py"""
+
+import asyncio
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, List
+
+import pytest
+
+from pilot.model.base import MODEL_OVERLOADED_ERROR_CODE, ModelOutput
+from pilot.model.cache.response_cache import create_response_cache
+from pilot.model.cluster.coalescing import RequestCoalescer
+from pilot.model.cluster.manager_base import WorkerRunData
+from pilot.model.cluster.priority import (
+    PRIORITY_BATCH,
+    PrioritySemaphore,
+    get_request_priority,
+    request_priority,
+)
+from pilot.model.cluster.worker import manager as worker_manager_module
+from pilot.model.cluster.worker.manager import LocalWorkerManager, _build_worker_load
+from pilot.model.cluster.worker.remote_worker import RemoteModelWorker
+from pilot.model.cluster.worker_base import ModelWorker
+from pilot.model.parameter import ModelParameters, ModelWorkerParameters, WorkerType
+
+
+class _FakeModelWorker(ModelWorker):
+    """Model worker which streams the words of the prompt back"""
+
+    def __init__(self, delay: float = 0.0) -> None:
+        self.delay = delay
+        self.calls = 0
+
+    def parse_parameters(self, command_args: List[str] = None) -> ModelParameters:
+        return None
+
+    def load_worker(self, model_name: str, model_path: str, **kwargs) -> None:
+        pass
+
+    def start(
+        self, model_params: ModelParameters = None, command_args: List[str] = None
+    ) -> None:
+        pass
+
+    def stop(self) -> None:
+        pass
+
+    def support_async(self) -> bool:
+        return True
+
+    def generate_stream(self, params: Dict) -> Iterator[ModelOutput]:
+        raise NotImplementedError
+
+    async def async_generate_stream(self, params: Dict) -> Iterator[ModelOutput]:
+        self.calls += 1
+        text = ""
+        for word in params["prompt"].split():
+            await asyncio.sleep(self.delay)
+            text += word + " "
+            yield ModelOutput(text=text, error_code=0)
+
+    def generate(self, params: Dict) -> ModelOutput:
+        raise NotImplementedError
+
+    async def async_generate(self, params: Dict) -> ModelOutput:
+        output = None
+        async for output in self.async_generate_stream(params):
+            pass
+        return output
+
+    def embeddings(self, params: Dict) -> List[List[float]]:
+        return [[float(len(text))] for text in params["input"]]
+
+
+def _add_fake_worker(
+    manager: LocalWorkerManager,
+    worker: ModelWorker,
+    model_name: str = "fake-model",
+    limit_model_concurrency: int = 5,
+    port: int = 8000,
+    worker_type: WorkerType = WorkerType.LLM,
+    **worker_params,
+) -> WorkerRunData:
+    worker_key = manager._worker_key(worker_type, model_name)
+    run_data = WorkerRunData(
+        host="127.0.0.1",
+        port=port,
+        worker_key=worker_key,
+        worker=worker,
+        worker_params=ModelWorkerParameters(
+            model_name=model_name,
+            model_path="fake",
+            limit_model_concurrency=limit_model_concurrency,
+            **worker_params,
+        ),
+        model_params=None,
+        stop_event=asyncio.Event(),
+        semaphore=PrioritySemaphore(limit_model_concurrency),
+    )
+    manager.workers.setdefault(worker_key, []).append(run_data)
+    return run_data
+
+
+def _params(prompt: str = "hello fake world", **kwargs) -> Dict:
+    return {"model": "fake-model", "prompt": prompt, "temperature": 0, **kwargs}
+
+
+@pytest.mark.asyncio
+async def test_generate_counts_in_flight():
+    manager = LocalWorkerManager()
+    run_data = _add_fake_worker(manager, _FakeModelWorker())
+    outputs = []
+    async for output in manager.generate_stream(_params()):
+        outputs.append(output)
+        assert run_data.in_flight == 1
+    assert outputs[-1].text == "hello fake world "
+    assert run_data.in_flight == 0
+    output = await manager.generate(_params())
+    assert output.text == "hello fake world "
+    assert run_data.in_flight == 0
+
+
+@pytest.mark.asyncio
+async def test_worker_load_report():
+    manager = LocalWorkerManager()
+    run_data = _add_fake_worker(manager, _FakeModelWorker(), limit_model_concurrency=1)
+    started = asyncio.Event()
+
+    async def _stream():
+        async for _ in manager.generate_stream(_params()):
+            started.set()
+            await asyncio.sleep(0.05)
+
+    tasks = [asyncio.create_task(_stream()) for _ in range(3)]
+    await started.wait()
+    load = _build_worker_load(run_data)
+    assert (load["concurrency"], load["running"], load["queued"]) == (1, 1, 2)
+    await asyncio.gather(*tasks)
+    await manager.generate(_params())
+
+    load = _build_worker_load(run_data)
+    assert (load["running"], load["queued"]) == (0, 0)
+    assert load["requests_per_s"] == pytest.approx(4 / 60, abs=0.001)
+    assert load["output_chars_per_s"] == pytest.approx(
+        4 * len("hello fake world ") / 60, abs=0.1
+    )
+
+
+@pytest.mark.asyncio
+async def test_model_context_len():
+    manager = LocalWorkerManager()
+    assert await manager.get_model_context_len("fake-model") is None
+    for port, context_len in [(8000, 4096), (8001, 2048), (8002, None)]:
+        worker = _FakeModelWorker()
+        worker.context_len = context_len
+        _add_fake_worker(manager, worker, port=port)
+    # Prompts must fit in the smallest context
+    assert await manager.get_model_context_len("fake-model") == 2048
+
+
+@pytest.mark.asyncio
+async def test_generate_stream_response_cache():
+    response_cache = create_response_cache("memory")
+    manager = LocalWorkerManager(response_cache=response_cache)
+    worker = _FakeModelWorker(delay=0.01)
+    _add_fake_worker(manager, worker)
+
+    first = [output async for output in manager.generate_stream(_params())]
+    start = time.perf_counter()
+    second = [output async for output in manager.generate_stream(_params())]
+    cached_cost = time.perf_counter() - start
+    assert second == first
+    assert worker.calls == 1
+    assert cached_cost < 0.01
+    # Same cached entry is used by non stream generate
+    assert (await manager.generate(_params())) == first[-1]
+    assert worker.calls == 1
+
+    # Sampling requests are not cached
+    for _ in range(2):
+        async for _ in manager.generate_stream(_params(temperature=0.7)):
+            pass
+    assert worker.calls == 3
+    stats = response_cache.stats()
+    assert (stats.hits, stats.misses, stats.skipped, stats.stores) == (2, 1, 2, 1)
+    assert stats.hit_rate == pytest.approx(2 / 3)
+
+
+@pytest.mark.asyncio
+async def test_response_cache_skips_incomplete_streams():
+    response_cache = create_response_cache("memory")
+    manager = LocalWorkerManager(response_cache=response_cache)
+    worker = _FakeModelWorker()
+    _add_fake_worker(manager, worker)
+
+    stream = manager.generate_stream(_params())
+    await stream.__anext__()
+    await stream.aclose()
+    async for _ in manager.generate_stream(_params()):
+        pass
+    assert worker.calls == 2
+    assert response_cache.stats().stores == 1
+
+
+@pytest.mark.asyncio
+async def test_coalesce_identical_concurrent_requests():
+    manager = LocalWorkerManager(request_coalescer=RequestCoalescer())
+    worker = _FakeModelWorker(delay=0.01)
+    _add_fake_worker(manager, worker)
+
+    async def _stream(params):
+        return [output async for output in manager.generate_stream(params)]
+
+    results = await asyncio.gather(*[_stream(_params()) for _ in range(8)])
+    assert worker.calls == 1
+    assert all(result == results[0] for result in results)
+    assert results[0][-1].text == "hello fake world "
+
+    outputs = await asyncio.gather(*[manager.generate(_params()) for _ in range(8)])
+    assert worker.calls == 2
+    assert all(output.text == "hello fake world " for output in outputs)
+
+    # Sampling requests are not coalesced
+    await asyncio.gather(*[_stream(_params(temperature=0.7)) for _ in range(3)])
+    assert worker.calls == 5
+    assert manager.request_coalescer.stats().coalesced == 14
+
+
+class _OverloadedModelWorker(_FakeModelWorker):
+    """Rejects every request like an overloaded remote worker"""
+
+    async def async_generate_stream(self, params: Dict) -> Iterator[ModelOutput]:
+        self.calls += 1
+        yield ModelOutput(text="overloaded", error_code=MODEL_OVERLOADED_ERROR_CODE)
+
+
+@pytest.mark.asyncio
+async def test_reject_when_wait_queue_full():
+    manager = LocalWorkerManager()
+    run_data = _add_fake_worker(
+        manager,
+        _FakeModelWorker(delay=0.05),
+        limit_model_concurrency=1,
+        limit_model_queue_size=1,
+    )
+
+    async def _generate():
+        start = time.perf_counter()
+        output = await manager.generate(_params())
+        return output, time.perf_counter() - start
+
+    results = await asyncio.gather(*[_generate() for _ in range(4)])
+    codes = sorted(output.error_code for output, _ in results)
+    assert codes == [0, 0, MODEL_OVERLOADED_ERROR_CODE, MODEL_OVERLOADED_ERROR_CODE]
+    # Rejected at once
+    assert all(
+        cost < 0.05
+        for output, cost in results
+        if output.error_code == MODEL_OVERLOADED_ERROR_CODE
+    )
+    assert run_data.rejected == 2
+    assert (run_data.in_flight, run_data.running) == (0, 0)
+
+
+@pytest.mark.asyncio
+async def test_reject_after_queue_timeout():
+    manager = LocalWorkerManager()
+    worker = _FakeModelWorker(delay=0.1)
+    _add_fake_worker(
+        manager, worker, limit_model_concurrency=1, limit_model_queue_timeout=0.05
+    )
+    first = asyncio.create_task(manager.generate(_params()))
+    await asyncio.sleep(0)
+    outputs = [output async for output in manager.generate_stream(_params())]
+    assert [output.error_code for output in outputs] == [MODEL_OVERLOADED_ERROR_CODE]
+    assert (await first).error_code == 0
+    assert worker.calls == 1
+
+
+@pytest.mark.asyncio
+async def test_retry_overloaded_on_another_instance():
+    manager = LocalWorkerManager(routing_policy="weighted_random")
+    overloaded = _OverloadedModelWorker()
+    run_data = _add_fake_worker(manager, overloaded, port=8000)
+    worker = _FakeModelWorker()
+    _add_fake_worker(manager, worker, port=8001).weight = 0
+
+    outputs = [output async for output in manager.generate_stream(_params())]
+    assert outputs[-1] == ModelOutput(text="hello fake world ", error_code=0)
+    assert (await manager.generate(_params())).error_code == 0
+    assert (overloaded.calls, worker.calls) == (2, 2)
+
+    # No other instance to retry
+    manager.workers[run_data.worker_key].pop()
+    output = await manager.generate(_params())
+    assert output.error_code == MODEL_OVERLOADED_ERROR_CODE
+    assert overloaded.calls == 3
+
+
+@pytest.mark.asyncio
+async def test_bounded_queue_bounds_tail_latency():
+    """A load test, three times the requests a slow worker can serve"""
+    service_time = 0.03
+    manager = LocalWorkerManager()
+    _add_fake_worker(
+        manager,
+        _FakeModelWorker(delay=service_time / 3),
+        limit_model_concurrency=2,
+        limit_model_queue_size=2,
+        limit_model_queue_timeout=0.1,
+    )
+
+    async def _client():
+        latencies = []
+        for _ in range(6):
+            start = time.perf_counter()
+            output = await manager.generate(_params())
+            if output.error_code == 0:
+                latencies.append(time.perf_counter() - start)
+            else:
+                # Back off like a client receiving 503
+                await asyncio.sleep(service_time)
+        return latencies
+
+    results = await asyncio.gather(*[_client() for _ in range(6)])
+    latencies = [latency for result in results for latency in result]
+    assert latencies
+    # Served requests waited at most for the queue ahead of them
+    assert max(latencies) < service_time * 3 + 0.1
+
+
+def _p95(samples: List[float]) -> float:
+    samples = sorted(samples)
+    return samples[int(len(samples) * 0.95) - 1]
+
+
+@pytest.mark.asyncio
+async def test_interactive_latency_with_batch_job():
+    """Users chat with a worker while a batch job sends many requests to it"""
+    service_time = 0.02
+    manager = LocalWorkerManager()
+    _add_fake_worker(
+        manager,
+        _FakeModelWorker(delay=service_time / 3),
+        limit_model_concurrency=2,
+        limit_model_queue_size=-1,
+    )
+
+    async def _interactive_client(latencies: List[float]):
+        for _ in range(8):
+            start = time.perf_counter()
+            output = await manager.generate(_params())
+            assert output.error_code == 0
+            latencies.append(time.perf_counter() - start)
+            await asyncio.sleep(service_time / 2)
+
+    async def _interactive_load() -> List[float]:
+        latencies = []
+        await asyncio.gather(*[_interactive_client(latencies) for _ in range(2)])
+        return latencies
+
+    alone = await _interactive_load()
+
+    batch_done = []
+
+    async def _batch_request():
+        output = await manager.generate(_params(priority=PRIORITY_BATCH))
+        assert output.error_code == 0
+        batch_done.append(time.perf_counter())
+
+    batch_job = [asyncio.create_task(_batch_request()) for _ in range(50)]
+    await asyncio.sleep(0)
+    start = time.perf_counter()
+    with_batch = await _interactive_load()
+    interactive_end = time.perf_counter()
+    await asyncio.gather(*batch_job)
+
+    assert _p95(with_batch) < _p95(alone) + 3 * service_time
+    # The batch job is not starved while users chat
+    assert len([t for t in batch_done if start <= t <= interactive_end]) > 0
+
+
+class _SlowEmbeddingWorker(_FakeModelWorker):
+    """Sync embedding worker, records the order the inputs are served in"""
+
+    def __init__(self, delay: float) -> None:
+        super().__init__(delay)
+        self.served: List[str] = []
+        self.started = threading.Event()
+
+    def support_async(self) -> bool:
+        return False
+
+    def embeddings(self, params: Dict) -> List[List[float]]:
+        self.started.set()
+        time.sleep(self.delay)
+        self.served.append(params["input"][0])
+        return super().embeddings(params)
+
+
+@pytest.mark.asyncio
+async def test_sync_batch_embeddings_yield_to_interactive():
+    """Knowledge ingestion embeds in threads while a user query is embedded"""
+    manager = LocalWorkerManager()
+    worker = _SlowEmbeddingWorker(delay=0.05)
+    run_data = _add_fake_worker(
+        manager,
+        worker,
+        model_name="fake-embedding",
+        limit_model_concurrency=1,
+        worker_type=WorkerType.TEXT2VEC,
+    )
+
+    def _params(text: str, priority: str = None) -> Dict:
+        return {"model": "fake-embedding", "input": [text], "priority": priority}
+
+    # The requests of the serving loop bind the manager to it
+    await manager.embeddings(_params("warmup"))
+    loop = asyncio.get_running_loop()
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        batch_job = [
+            loop.run_in_executor(
+                executor,
+                manager.sync_embeddings,
+                _params(f"batch{i}", PRIORITY_BATCH),
+            )
+            for i in range(4)
+        ]
+        await loop.run_in_executor(None, worker.started.wait)
+        deadline = time.monotonic() + 5
+        while run_data.semaphore.waiting(PRIORITY_BATCH) < 3:
+            assert (
+                time.monotonic() < deadline
+            ), "Batch embeddings bypass the worker slot"
+            await asyncio.sleep(0.005)
+        assert await manager.embeddings(_params("interactive")) == [[11.0]]
+        await asyncio.gather(*batch_job)
+
+    # Served right after the batch request running when it came
+    assert worker.served[2] == "interactive"
+    assert run_data.in_flight == 0
+
+
+class _SlowSyncModelWorker(_FakeModelWorker):
+    """Sync worker decoding one token per step, like the decoding loop of a model"""
+
+    def __init__(self, delay: float) -> None:
+        super().__init__(delay)
+        self.generated = 0
+        self.closed = threading.Event()
+
+    def support_async(self) -> bool:
+        return False
+
+    def generate_stream(self, params: Dict) -> Iterator[ModelOutput]:
+        self.calls += 1
+        text = ""
+        try:
+            for _ in range(params["max_new_tokens"]):
+                time.sleep(self.delay)
+                self.generated += 1
+                text += "token "
+                yield ModelOutput(text=text, error_code=0)
+        finally:
+            self.closed.set()
+
+
+async def _cancel_after_outputs(stream, num_outputs: int) -> float:
+    """Read some outputs then cancel the consumer like a disconnected client"""
+    received = asyncio.Event()
+
+    async def _consume():
+        count = 0
+        async for _ in stream:
+            count += 1
+            if count == num_outputs:
+                received.set()
+
+    task = asyncio.create_task(_consume())
+    await asyncio.wait_for(received.wait(), 5)
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+    return time.perf_counter()
+
+
+@pytest.mark.asyncio
+async def test_cancel_stream_releases_slot():
+    step = 0.05
+    manager = LocalWorkerManager()
+    worker = _SlowSyncModelWorker(delay=step)
+    run_data = _add_fake_worker(manager, worker, limit_model_concurrency=1)
+
+    params = _params(max_new_tokens=1000)
+    cancelled_at = await _cancel_after_outputs(manager.generate_stream(params), 2)
+    # Released at once, not after the running decode step
+    assert (run_data.in_flight, run_data.running) == (0, 0)
+    assert not run_data.semaphore.locked()
+    closed = await asyncio.get_running_loop().run_in_executor(
+        None, worker.closed.wait, 1
+    )
+    assert closed
+    assert time.perf_counter() - cancelled_at < step * 1.5
+    assert worker.generated <= 3
+
+
+@pytest.fixture
+def worker_server(monkeypatch):
+    """Worker http server in a thread, serving a slow sync worker"""
+    import uvicorn
+    from fastapi import FastAPI
+
+    manager = LocalWorkerManager()
+    monkeypatch.setattr(worker_manager_module.worker_manager, "worker_manager", manager)
+    app = FastAPI()
+    app.include_router(worker_manager_module.router, prefix="/api")
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    server = uvicorn.Server(
+        uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning")
+    )
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+    yield manager, port
+    server.should_exit = True
+    thread.join()
+
+
+async def _wait_slot_released(run_data: WorkerRunData, timeout: float = 2) -> float:
+    """Wait until nothing runs on the worker, return the time it was released"""
+    deadline = time.perf_counter() + timeout
+    while run_data.in_flight or run_data.semaphore.locked():
+        assert time.perf_counter() < deadline, "Worker slot is not released"
+        await asyncio.sleep(0.002)
+    return time.perf_counter()
+
+
+@pytest.mark.asyncio
+async def test_http_disconnect_releases_worker_slot(worker_server):
+    """A client closing the http stream of worker endpoint frees the slot of worker"""
+    import httpx
+
+    step = 0.05
+    server_manager, port = worker_server
+    worker = _SlowSyncModelWorker(delay=step)
+    server_run_data = _add_fake_worker(
+        server_manager, worker, limit_model_concurrency=1
+    )
+    url = f"http://127.0.0.1:{port}/api/worker/generate_stream"
+    params = _params(messages=[], max_new_tokens=1000)
+    async with httpx.AsyncClient() as client:
+        async with client.stream("POST", url, json=params, timeout=5) as response:
+            assert response.status_code == 200
+            received = 0
+            async for chunk in response.aiter_raw():
+                received += chunk.count(b"\0")
+                if received >= 2:
+                    break
+            assert server_run_data.semaphore.locked()
+        # Leaving the stream context closes the connection
+        disconnected_at = time.perf_counter()
+
+    released_at = await _wait_slot_released(server_run_data)
+    # Within about one decode step, the running step finishes first
+    assert released_at - disconnected_at < step * 1.5 + 0.05
+    assert await asyncio.get_running_loop().run_in_executor(None, worker.closed.wait, 1)
+    assert worker.generated <= 4
+
+    # The next request through RemoteModelWorker gets the slot at once
+    manager = LocalWorkerManager()
+    remote_worker = RemoteModelWorker()
+    remote_worker.load_worker("fake-model", "fake", host="127.0.0.1", port=port)
+    _add_fake_worker(manager, remote_worker, limit_model_concurrency=1)
+    start = time.perf_counter()
+    params = _params(messages=[], max_new_tokens=2)
+    outputs = [output async for output in manager.generate_stream(params)]
+    assert outputs[-1].text == "token token "
+    assert time.perf_counter() - start < step * 2 + 0.5
+
+
+@pytest.mark.asyncio
+async def test_cancel_stream_through_remote_worker(worker_server):
+    """Client disconnect reaches the decoding loop of the remote worker"""
+    step = 0.05
+    server_manager, port = worker_server
+    worker = _SlowSyncModelWorker(delay=step)
+    server_run_data = _add_fake_worker(
+        server_manager, worker, limit_model_concurrency=1
+    )
+    manager = LocalWorkerManager()
+    remote_worker = RemoteModelWorker()
+    remote_worker.load_worker("fake-model", "fake", host="127.0.0.1", port=port)
+    run_data = _add_fake_worker(manager, remote_worker, limit_model_concurrency=1)
+
+    params = _params(messages=[], max_new_tokens=1000)
+    cancelled_at = await _cancel_after_outputs(manager.generate_stream(params), 2)
+    assert (run_data.in_flight, run_data.running) == (0, 0)
+    closed = await asyncio.get_running_loop().run_in_executor(
+        None, worker.closed.wait, 1
+    )
+    assert closed
+    # The disconnect reaches the worker within one decode step
+    assert time.perf_counter() - cancelled_at < step * 1.5 + 0.05
+    assert worker.generated <= 4
+    released_at = await _wait_slot_released(server_run_data)
+    assert released_at - cancelled_at < step * 1.5 + 0.05
+
+    # The slot of the remote worker is free for the next request
+    params = _params(messages=[], max_new_tokens=2)
+    outputs = [output async for output in manager.generate_stream(params)]
+    assert outputs[-1].text == "token token "
+
+
+def test_configure_http_client_pool_from_worker_params():
+    from pilot.utils.http_client import (
+        HttpClientParameters,
+        HttpClientPool,
+        get_http_client_pool,
+        set_http_client_pool,
+    )
+
+    old_pool = get_http_client_pool()
+    pool = HttpClientPool(params=HttpClientParameters(timeout=120, http2=False))
+    set_http_client_pool(pool)
+    try:
+        worker_params = ModelWorkerParameters(
+            model_name="fake", model_path="fake", http_max_connections_per_host=8
+        )
+        worker_manager_module._configure_http_client_pool(worker_params)
+        assert pool.params.max_connections_per_host == 8
+        # Not given parameters are kept
+        assert pool.params.timeout == 120
+    finally:
+        set_http_client_pool(old_pool)
+
+
+@pytest.mark.asyncio
+async def test_iterate_in_threadpool_keeps_priority():
+    def _stream():
+        for _ in range(3):
+            yield get_request_priority()
+
+    with request_priority(PRIORITY_BATCH):
+        outputs = [
+            output
+            async for output in worker_manager_module._iterate_in_threadpool(_stream())
+        ]
+    assert outputs == [PRIORITY_BATCH] * 3
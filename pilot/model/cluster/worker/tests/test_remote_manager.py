@@ -0,0 +1,136 @@
+"""Run unit test with command: pytest pilot/model/cluster/worker/tests/test_remote_manager.py"""
+
+import asyncio
+import time
+from dataclasses import asdict
+from typing import Dict, List
+
+import pytest
+
+from pilot.model.base import ModelInstance
+from pilot.model.cluster.registry import EmbeddedModelRegistry
+from pilot.model.cluster.worker.remote_manager import RemoteWorkerManager
+
+_MODEL = "vicuna-13b-v1.5"
+_WORKER_KEY = f"{_MODEL}@llm"
+
+
+class _CountingRegistry(EmbeddedModelRegistry):
+    """Registry which counts the round trips of clients"""
+
+    def __init__(self, watchable: bool = True) -> None:
+        super().__init__()
+        self.watchable = watchable
+        self.fetches = 0
+        self.watches = 0
+
+    async def get_all_instances(
+        self, model_name: str, healthy_only: bool = False
+    ) -> List[ModelInstance]:
+        self.fetches += 1
+        return super().sync_get_all_instances(model_name, healthy_only)
+
+    def sync_get_all_instances(
+        self, model_name: str, healthy_only: bool = False
+    ) -> List[ModelInstance]:
+        self.fetches += 1
+        return super().sync_get_all_instances(model_name, healthy_only)
+
+    async def watch_instances(self, version: int = -1, timeout: float = 30) -> Dict:
+        self.watches += 1
+        if not self.watchable:
+            raise NotImplementedError
+        result = await super().watch_instances(version, timeout)
+        # Copy like a response of the controller
+        result["instances"] = [asdict(ins) for ins in result["instances"]]
+        return result
+
+
+async def _register(registry: EmbeddedModelRegistry, port: int, weight: float = 1.0):
+    await registry.register_instance(
+        ModelInstance(
+            model_name=_WORKER_KEY, host="127.0.0.1", port=port, weight=weight
+        )
+    )
+
+
+@pytest.mark.asyncio
+async def test_steady_state_without_round_trip():
+    registry = _CountingRegistry(watchable=False)
+    await _register(registry, 8001)
+    manager = RemoteWorkerManager(registry, instance_cache_ttl=60)
+    first = await manager.get_model_instances("llm", _MODEL)
+    for _ in range(10):
+        instances = await manager.get_model_instances("llm", _MODEL)
+        assert instances[0] is first[0]
+        assert instances[0].semaphore is first[0].semaphore
+    assert registry.fetches == 1
+    await manager.stop()
+
+
+@pytest.mark.asyncio
+async def test_ttl_expired_and_background_refresh():
+    registry = _CountingRegistry(watchable=False)
+    await _register(registry, 8001)
+    manager = RemoteWorkerManager(registry, instance_cache_ttl=60)
+    await manager.get_model_instances("llm", _MODEL)
+    await _register(registry, 8002)
+
+    # Stale but not expired, served from cache and refreshed in background
+    manager._instance_cache[_WORKER_KEY].fetched_at -= 40
+    assert len(await manager.get_model_instances("llm", _MODEL)) == 1
+    await asyncio.sleep(0.01)
+    assert registry.fetches == 2
+    assert len(await manager.get_model_instances("llm", _MODEL)) == 2
+
+    # Expired, fetched inline
+    await registry.deregister_instance(
+        ModelInstance(model_name=_WORKER_KEY, host="127.0.0.1", port=8002)
+    )
+    manager._instance_cache[_WORKER_KEY].fetched_at -= 100
+    assert len(await manager.get_model_instances("llm", _MODEL)) == 1
+    assert len(manager.sync_get_model_instances("llm", _MODEL, healthy_only=False)) == 2
+    assert registry.fetches == 3
+    await manager.stop()
+
+
+@pytest.mark.asyncio
+async def test_watch_pushes_changes():
+    registry = _CountingRegistry()
+    await _register(registry, 8001)
+    manager = RemoteWorkerManager(registry, instance_cache_ttl=0.1, watch_timeout=5)
+    first = await manager.get_model_instances("llm", _MODEL)
+    await asyncio.sleep(0.05)
+    assert manager._is_watching()
+
+    # The cache doesn't expire while watching
+    time.sleep(0.2)
+    fetches = registry.fetches
+    assert (await manager.get_model_instances("llm", _MODEL))[0] is first[0]
+    assert registry.fetches == fetches
+
+    await _register(registry, 8002, weight=2.0)
+    await registry.deregister_instance(
+        ModelInstance(model_name=_WORKER_KEY, host="127.0.0.1", port=8001)
+    )
+    await asyncio.sleep(0.05)
+    instances = await manager.get_model_instances("llm", _MODEL)
+    assert [(ins.port, ins.weight) for ins in instances] == [(8002, 2.0)]
+    assert registry.fetches == fetches
+    await manager.stop()
+    assert not manager._is_watching()
+
+
+@pytest.mark.asyncio
+async def test_removed_instance_gets_new_worker():
+    registry = _CountingRegistry(watchable=False)
+    await _register(registry, 8001)
+    manager = RemoteWorkerManager(registry, instance_cache_ttl=60)
+    first = (await manager.get_model_instances("llm", _MODEL))[0]
+    registry.registry[_WORKER_KEY].clear()
+    manager._instance_cache[_WORKER_KEY].fetched_at -= 100
+    assert await manager.get_model_instances("llm", _MODEL) == []
+    await _register(registry, 8001)
+    manager._instance_cache[_WORKER_KEY].fetched_at -= 100
+    assert (await manager.get_model_instances("llm", _MODEL))[0] is not first
+    await manager.stop()
@@ -0,0 +1,215 @@
+"""Context length of models, and what to do with prompts longer than it.
+
+The context length is discovered from the loaded model (Hugging Face config, llama.cpp
+context size), workers publish it in the model registry, so clients size their prompts
+before sending them. A prompt which still does not fit is handled by the overflow
+strategy of the worker before any prefill:
+
+- ``truncate``: keep the last tokens of the prompt
+- ``drop_oldest``: drop the oldest rounds of the chat history, then truncate
+- ``reject``: fail at once with ``ContextOverflowError``
+"""
+
+import logging
+from abc import ABC, abstractmethod
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CONTEXT_LEN = 2048
+
+# Attributes of model configs holding the max positions, by priority
+_CONFIG_CONTEXT_KEYS = [
+    "max_position_embeddings",
+    "max_sequence_length",
+    "seq_length",
+    "n_positions",
+    "max_seq_len",
+    "n_ctx",
+]
+# model_max_length of tokenizers without a limit is a huge number
+_MAX_TOKENIZER_LENGTH = 10_000_000
+
+CountTokensFunc = Callable[[List], int]
+
+
+class ContextOverflowError(ValueError):
+    """The prompt and max_new_tokens do not fit in the context of model"""
+
+
+def _config_context_len(config) -> Optional[int]:
+    for key in _CONFIG_CONTEXT_KEYS:
+        value = getattr(config, key, None)
+        if isinstance(value, int) and value > 0:
+            rope_scaling = getattr(config, "rope_scaling", None) or {}
+            scaling_type = rope_scaling.get("type") or rope_scaling.get("rope_type")
+            if scaling_type in ("linear", "dynamic") and rope_scaling.get("factor"):
+                # Position interpolation extends the trained positions
+                value = int(value * rope_scaling["factor"])
+            return value
+    return None
+
+
+def discover_context_len(model, tokenizer=None, model_params=None) -> Optional[int]:
+    """Return the context length of a loaded model, None if unknown.
+
+    Args:
+        model: Hugging Face model, ``LlamaCppModel`` or proxy model
+        tokenizer: Tokenizer of the model
+        model_params: Model parameters, ``max_context_size`` is used if the model does
+            not tell its context length (e.g. proxy models)
+    """
+    # llama.cpp model, the context size it was loaded with
+    n_ctx = getattr(getattr(model, "model", None), "n_ctx", None)
+    if callable(n_ctx):
+        try:
+            return int(n_ctx())
+        except Exception as e:
+            logger.warning(f"Read n_ctx of llama.cpp model error: {str(e)}")
+    config = getattr(model, "config", None)
+    if config is not None:
+        context_len = _config_context_len(config)
+        if context_len:
+            return context_len
+    model_max_length = getattr(tokenizer, "model_max_length", None)
+    if isinstance(model_max_length, int) and 0 < model_max_length:
+        if model_max_length < _MAX_TOKENIZER_LENGTH:
+            return model_max_length
+    max_context_size = getattr(model_params, "max_context_size", None)
+    return max_context_size if max_context_size else None
+
+
+def _role(message) -> str:
+    return message["role"] if isinstance(message, dict) else message.role
+
+
+def drop_oldest_rounds(
+    messages: List, count_tokens: CountTokensFunc, max_tokens: int
+) -> List:
+    """Drop the oldest rounds of chat history until count_tokens(messages) fits in
+    max_tokens. A round starts with a human message, system messages and the last
+    round are never dropped.
+
+    count_tokens is called for all the messages once, then for each dropped round to
+    subtract its tokens, so it must count a constant (e.g. the template) plus the
+    tokens of each message.
+
+    Returns:
+        List: Messages which fit, or the messages of the last round if they don't
+    """
+    from pilot.scene.base_message import ModelMessageRoleType
+
+    messages = list(messages)
+    num_tokens = count_tokens(messages)
+    if num_tokens <= max_tokens:
+        return messages
+    base_tokens = count_tokens([])
+    human = [
+        i for i, m in enumerate(messages) if _role(m) == ModelMessageRoleType.HUMAN
+    ]
+    dropped = set()
+    # Drop the oldest round first, from its human message to the next human message
+    for start, end in zip(human, human[1:]):
+        if num_tokens <= max_tokens:
+            break
+        round_indexes = [
+            i
+            for i in range(start, end)
+            if _role(messages[i]) != ModelMessageRoleType.SYSTEM
+        ]
+        num_tokens -= count_tokens([messages[i] for i in round_indexes]) - base_tokens
+        dropped.update(round_indexes)
+    return [m for i, m in enumerate(messages) if i not in dropped]
+
+
+class ContextOverflowStrategy(ABC):
+    """Fit the messages of a request in the context of model"""
+
+    name: str = None
+
+    @abstractmethod
+    def fit(
+        self, messages: List, count_tokens: CountTokensFunc, max_tokens: int
+    ) -> List:
+        """Return the messages to send, the tokens of their prompt should fit in
+        max_tokens. Longer prompts are truncated by the decoding loop, raise
+        ContextOverflowError to reject the request."""
+
+
+class TruncateStrategy(ContextOverflowStrategy):
+    """Keep the messages, the decoding loop keeps the last tokens of the prompt"""
+
+    name = "truncate"
+
+    def fit(
+        self, messages: List, count_tokens: CountTokensFunc, max_tokens: int
+    ) -> List:
+        return messages
+
+
+class DropOldestRoundsStrategy(ContextOverflowStrategy):
+    name = "drop_oldest"
+
+    def fit(
+        self, messages: List, count_tokens: CountTokensFunc, max_tokens: int
+    ) -> List:
+        return drop_oldest_rounds(messages, count_tokens, max_tokens)
+
+
+class RejectStrategy(ContextOverflowStrategy):
+    name = "reject"
+
+    def fit(
+        self, messages: List, count_tokens: CountTokensFunc, max_tokens: int
+    ) -> List:
+        num_tokens = count_tokens(messages)
+        if num_tokens > max_tokens:
+            raise ContextOverflowError(
+                f"The prompt has {num_tokens} tokens, max {max_tokens} tokens can be "
+                "used by the prompt of this model"
+            )
+        return messages
+
+
+_STRATEGIES: Dict[str, Callable[[], ContextOverflowStrategy]] = {
+    cls.name: cls
+    for cls in [TruncateStrategy, DropOldestRoundsStrategy, RejectStrategy]
+}
+
+
+def register_context_overflow_strategy(
+    name: str, factory: Callable[[], ContextOverflowStrategy]
+):
+    """Register a custom context overflow strategy"""
+    _STRATEGIES[name] = factory
+
+
+def supported_context_overflow_strategies() -> List[str]:
+    return list(_STRATEGIES.keys())
+
+
+def create_context_overflow_strategy(name: Optional[str]) -> ContextOverflowStrategy:
+    factory = _STRATEGIES.get(name)
+    if not factory:
+        raise ValueError(
+            f"Unsupported context overflow strategy: {name}, supported: {supported_context_overflow_strategies()}"
+        )
+    return factory()
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count of text without a tokenizer, for clients of models.
+
+    Non-ASCII characters (e.g. Chinese) are counted as one token each, ASCII text as
+    one token every 4 characters.
+    """
+    if not text:
+        return 0
+    non_ascii = sum(1 for c in text if ord(c) > 127)
+    return non_ascii + (len(text) - non_ascii + 3) // 4
+
+
+def prompt_token_budget(context_len: int, max_new_tokens: int) -> int:
+    """Max tokens of the prompt, the rest of the context is for the new tokens"""
+    # Same as the truncation of the decoding loops
+    return context_len - max_new_tokens - 1
@@ -0,0 +1,153 @@
+"""Incremental detokenization and stop string detection of streaming outputs.
+
+Decoding all output tokens and searching the whole text at every stream interval costs
+more with every token, long answers become CPU bound. ``IncrementalDetokenizer`` only
+decodes a few tokens before the new ones, and ``StopStringScanner`` only searches the
+new tail of the text, so the cost per token stays constant.
+"""
+
+from typing import Iterable, List, Tuple
+
+from pilot.model.llm_utils import is_partial_stop
+
+# Tokens decoded before the new tokens, so merges and leading spaces are decoded as in
+# the full text
+_PREFIX_TOKENS = 5
+_MAX_CHAR_BYTES = 4
+# Max length of the patterns of clean_up_tokenization after their leading space,
+# e.g. " n't", the text is cleaned up in parts split where no pattern can span
+_CLEAN_UP_SPAN = 4
+
+
+class IncrementalDetokenizer:
+    """Decode the output tokens of a stream incrementally.
+
+    The text of new tokens is the difference of decoding a window with and without
+    them, the window starts a few tokens before the new tokens. It is kept pending while
+    the new tokens end with an incomplete character (a byte fallback token of a
+    multi-byte character), or decode to nothing.
+
+    Cleaning up tokenization spaces can change the text before new tokens, so windows
+    are decoded without it, and the text is cleaned up in parts, only the part after
+    the last split is cleaned up again.
+
+    Args:
+        tokenizer: Hugging Face tokenizer
+        prompt_ids (List[int]): Token ids of the prompt
+        echo (bool): Whether the text contains the prompt
+    """
+
+    def __init__(
+        self,
+        tokenizer,
+        prompt_ids: List[int],
+        echo: bool = True,
+        skip_special_tokens: bool = True,
+        spaces_between_special_tokens: bool = False,
+        clean_up_tokenization_spaces: bool = True,
+    ) -> None:
+        self.tokenizer = tokenizer
+        self._clean_up = None
+        if clean_up_tokenization_spaces:
+            self._clean_up = getattr(tokenizer, "clean_up_tokenization", None)
+        self.decode_kwargs = dict(
+            skip_special_tokens=skip_special_tokens,
+            spaces_between_special_tokens=spaces_between_special_tokens,
+            # Tokenizers without clean_up_tokenization clean up every window
+            clean_up_tokenization_spaces=clean_up_tokenization_spaces
+            and self._clean_up is None,
+        )
+        # Cleaned up text, and the raw text after it which may still change
+        self._cleaned = ""
+        self._raw_tail = ""
+        self.text = ""
+        self.read_offset = len(prompt_ids)
+        if echo:
+            self._append(self._decode(prompt_ids))
+            self.prefix_offset = max(self.read_offset - _PREFIX_TOKENS, 0)
+        else:
+            # Same as decoding the generated tokens alone
+            self.prefix_offset = self.read_offset
+
+    def _decode(self, ids: List[int]) -> str:
+        return self.tokenizer.decode(ids, **self.decode_kwargs)
+
+    def _append(self, raw_text: str) -> None:
+        if not self._clean_up:
+            self.text += raw_text
+            return
+        tail = self._raw_tail + raw_text
+        # Split after the last characters which can't be in a pattern with later text
+        split = len(tail)
+        while split >= _CLEAN_UP_SPAN and " " in tail[split - _CLEAN_UP_SPAN : split]:
+            split = tail.rfind(" ", 0, split)
+        if split >= _CLEAN_UP_SPAN:
+            self._cleaned += self._clean_up(tail[:split])
+            tail = tail[split:]
+        self._raw_tail = tail
+        self.text = self._cleaned + self._clean_up(tail)
+
+    def decode(self, output_ids: List[int], final: bool = False) -> str:
+        """Return the text of output_ids (prompt and generated tokens), only the tokens
+        after the last call are decoded. The final call decodes incomplete characters
+        too, like decoding all tokens."""
+        # Pending tokens may be replaced or removed, never the decoded ones
+        self.read_offset = min(self.read_offset, len(output_ids))
+        if self.read_offset == len(output_ids):
+            return self.text
+        prefix_text = self._decode(output_ids[self.prefix_offset : self.read_offset])
+        # Start the window at the first byte of a multi-byte character
+        for _ in range(_MAX_CHAR_BYTES - 1):
+            if self.prefix_offset == 0 or not prefix_text.startswith("\ufffd"):
+                break
+            self.prefix_offset -= 1
+            prefix_text = self._decode(
+                output_ids[self.prefix_offset : self.read_offset]
+            )
+        new_text = self._decode(output_ids[self.prefix_offset :])
+        if len(new_text) > len(prefix_text) and (
+            final or not new_text.endswith("\ufffd")
+        ):
+            self._append(new_text[len(prefix_text) :])
+            self.prefix_offset = max(len(output_ids) - _PREFIX_TOKENS, 0)
+            self.read_offset = len(output_ids)
+        return self.text
+
+
+class StopStringScanner:
+    """Find the stop strings in the growing text of a stream.
+
+    Only the text after the last scan, and the characters before it which can start a
+    stop string, are searched.
+
+    Args:
+        stop_str: Stop string or strings, None to never stop
+        start (int): Stop strings before start are ignored, e.g. in the echoed prompt
+    """
+
+    def __init__(self, stop_str, start: int = 0) -> None:
+        if stop_str and isinstance(stop_str, str):
+            self.stop_strs = [stop_str]
+        elif stop_str and isinstance(stop_str, Iterable):
+            self.stop_strs = [s for s in stop_str]
+        elif stop_str:
+            raise ValueError("Invalid stop field type.")
+        else:
+            self.stop_strs = []
+        self.start = start
+        # Length of text searched for each stop string
+        self._scanned = [start] * len(self.stop_strs)
+
+    def scan(self, text: str) -> Tuple[int, bool]:
+        """Return the position of a stop string in text (-1 if not found) and whether
+        text ends with a partial stop string"""
+        for i, stop in enumerate(self.stop_strs):
+            begin = max(self._scanned[i] - len(stop) + 1, self.start)
+            self._scanned[i] = max(len(text), self.start)
+            pos = text.rfind(stop, begin)
+            if pos != -1:
+                return pos, False
+            # A longer tail can't be a partial stop string
+            if is_partial_stop(text[-len(stop) :], stop):
+                return -1, True
+        return -1, False
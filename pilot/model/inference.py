@@ -5,7 +5,7 @@ Fork from fastchat: https://github.com/lm-sys/FastChat/blob/main/fastchat/serve/
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 import gc
-from typing import Iterable, Dict
+from typing import Dict
 
 import torch
 
@@ -17,7 +17,10 @@ from transformers.generation.logits_process import (
     TopPLogitsWarper,
 )
 
-from pilot.model.llm_utils import is_sentence_complete, is_partial_stop
+from pilot.model.cancellation import cancellation_counter
+from pilot.model.detokenizer import IncrementalDetokenizer, StopStringScanner
+from pilot.model.llm_utils import is_sentence_complete
+from pilot.model.prefix_cache import prefill
 
 
 def prepare_logits_processor(
@@ -45,6 +48,7 @@ def generate_stream(
     context_len: int,
     stream_interval: int = 2,
     judge_sent_end: bool = False,
+    prefix_cache=None,
 ):
     # Read parameters
     prompt = params["prompt"]
@@ -84,6 +88,10 @@ def generate_stream(
             device=device,
         )
 
+    # Only decode the new tokens and search the new text at every stream interval
+    detokenizer = IncrementalDetokenizer(tokenizer, input_ids, echo)
+    stop_scanner = StopStringScanner(stop_str, len_prompt if echo else 0)
+
     past_key_values = out = None
     sent_interrupt = False
     for i in range(max_new_tokens):
@@ -96,7 +104,8 @@ def generate_stream(
                 )
                 logits = model.lm_head(out[0])
             else:
-                out = model(torch.as_tensor([input_ids], device=device), use_cache=True)
+                # Only the suffix after a cached prompt prefix is computed
+                out = prefill(model, input_ids, device, prefix_cache)
                 logits = out.logits
             past_key_values = out.past_key_values
         else:  # decoding
@@ -154,18 +163,8 @@ def generate_stream(
 
         # Yield the output tokens
         if i % stream_interval == 0 or i == max_new_tokens - 1 or stopped:
-            if echo:
-                tmp_output_ids = output_ids
-                rfind_start = len_prompt
-            else:
-                tmp_output_ids = output_ids[input_echo_len:]
-                rfind_start = 0
-
-            output = tokenizer.decode(
-                tmp_output_ids,
-                skip_special_tokens=True,
-                spaces_between_special_tokens=False,
-                clean_up_tokenization_spaces=True,
+            output = detokenizer.decode(
+                output_ids, final=stopped or i == max_new_tokens - 1
             )
             # TODO: For the issue of incomplete sentences interrupting output, apply a patch and others can also modify it to a more elegant way
             if judge_sent_end and stopped and not is_sentence_complete(output):
@@ -179,30 +178,19 @@ def generate_stream(
 
             partially_stopped = False
             if stop_str:
-                if isinstance(stop_str, str):
-                    pos = output.rfind(stop_str, rfind_start)
-                    if pos != -1:
-                        output = output[:pos]
-                        stopped = True
-                    else:
-                        partially_stopped = is_partial_stop(output, stop_str)
-                elif isinstance(stop_str, Iterable):
-                    for each_stop in stop_str:
-                        pos = output.rfind(each_stop, rfind_start)
-                        if pos != -1:
-                            output = output[:pos]
-                            stopped = True
-                            break
-                        else:
-                            partially_stopped = is_partial_stop(output, each_stop)
-                            if partially_stopped:
-                                break
-                else:
-                    raise ValueError("Invalid stop field type.")
+                pos, partially_stopped = stop_scanner.scan(output)
+                if pos != -1:
+                    output = output[:pos]
+                    stopped = True
 
             # Prevent yielding partial stop sequence
             if not partially_stopped:
-                yield output
+                try:
+                    yield output
+                except GeneratorExit:
+                    # Closed by the consumer, e.g. the client disconnected
+                    cancellation_counter.record(i + 1, max_new_tokens)
+                    raise
                 # yield {
                 #     "text": output,
                 #     "usage": {
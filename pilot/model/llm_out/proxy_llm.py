@@ -1,34 +1,109 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 import time
+from contextlib import aclosing
+from typing import AsyncIterator, Dict
 
-from pilot.model.proxy.llms.chatgpt import chatgpt_generate_stream
-from pilot.model.proxy.llms.bard import bard_generate_stream
+from pilot.model.proxy.llms.chatgpt import chatgpt_async_generate_stream
+from pilot.model.proxy.llms.bard import bard_async_generate_stream
 from pilot.model.proxy.llms.claude import claude_generate_stream
 from pilot.model.proxy.llms.wenxin import wenxin_generate_stream
 from pilot.model.proxy.llms.tongyi import tongyi_generate_stream
 from pilot.model.proxy.llms.zhipu import zhipu_generate_stream
 from pilot.model.proxy.llms.proxy_model import ProxyModel
+from pilot.model.proxy.data_privacy.mask.masking import DataMasker
+from pilot.model.proxy.data_privacy.mask.recovery import StreamingRecovery, recover
+from pilot.scene.base_message import ModelMessage
+from pilot.model.proxy.transport import iterate_in_background_loop
 
 
-def proxyllm_generate_stream(
+def _async_stream(generate_stream_func):
+    """Async generate stream of a proxy which does not send any request"""
+
+    async def _generate_stream(*args):
+        for output in generate_stream_func(*args):
+            yield output
+
+    return _generate_stream
+
+
+def _mask_params(masker: DataMasker, params: Dict) -> Dict:
+    """Copy of params with the sensitive values of messages masked"""
+    messages = params.get("messages") or []
+    masked = masker.mask_texts([message.content for message in messages])
+    return {
+        **params,
+        "messages": [
+            ModelMessage(role=message.role, content=content)
+            for message, content in zip(messages, masked)
+        ],
+    }
+
+
+async def _recover_outputs(
+    outputs: AsyncIterator[str], mapping: Dict[str, str]
+) -> AsyncIterator[str]:
+    """Recover the placeholders of the cumulative outputs of a proxy model"""
+    recovery = StreamingRecovery(mapping)
+    output, text = "", ""
+    async for new_output in outputs:
+        if not new_output.startswith(output):
+            # Not the continuation of the text, e.g. an error message
+            recovery = StreamingRecovery(mapping)
+            output, text = new_output, recover(new_output, mapping)
+            yield text
+            continue
+        delta = recovery.feed(new_output[len(output) :])
+        output = new_output
+        if delta:
+            text += delta
+            yield text
+    tail = recovery.flush()
+    if tail:
+        yield text + tail
+
+
+async def proxyllm_async_generate_stream(
     model: ProxyModel, tokenizer, params, device, context_len=2048
 ):
+    """Generate stream of proxy models, requests go through the shared proxy transport
+    of the model"""
     generator_mapping = {
-        "proxyllm": chatgpt_generate_stream,
-        "chatgpt_proxyllm": chatgpt_generate_stream,
-        "bard_proxyllm": bard_generate_stream,
-        "claude_proxyllm": claude_generate_stream,
+        "proxyllm": chatgpt_async_generate_stream,
+        "chatgpt_proxyllm": chatgpt_async_generate_stream,
+        "bard_proxyllm": bard_async_generate_stream,
+        "claude_proxyllm": _async_stream(claude_generate_stream),
         # "gpt4_proxyllm": gpt4_generate_stream, move to chatgpt_generate_stream
-        "wenxin_proxyllm": wenxin_generate_stream,
-        "tongyi_proxyllm": tongyi_generate_stream,
-        "zhipu_proxyllm": zhipu_generate_stream,
+        "wenxin_proxyllm": _async_stream(wenxin_generate_stream),
+        "tongyi_proxyllm": _async_stream(tongyi_generate_stream),
+        "zhipu_proxyllm": _async_stream(zhipu_generate_stream),
     }
     model_params = model.get_params()
     model_name = model_params.model_name
-    default_error_message = f"{model_name} LLM is not supported"
-    generator_function = generator_mapping.get(
-        model_name, lambda: default_error_message
-    )
+    generator_function = generator_mapping.get(model_name)
+    if not generator_function:
+        yield f"{model_name} LLM is not supported"
+        return
+
+    masker = None
+    detector = model.get_sensitive_detector()
+    if detector:
+        masker = DataMasker(detector)
+        params = _mask_params(masker, params)
+
+    stream = generator_function(model, tokenizer, params, device, context_len)
+    # Close the upstream connection as soon as the consumer stops
+    async with aclosing(stream):
+        outputs = stream
+        if masker and masker.mapping:
+            outputs = _recover_outputs(stream, masker.mapping)
+        async for output in outputs:
+            yield output
+
 
-    yield from generator_function(model, tokenizer, params, device, context_len)
+def proxyllm_generate_stream(
+    model: ProxyModel, tokenizer, params, device, context_len=2048
+):
+    yield from iterate_in_background_loop(
+        proxyllm_async_generate_stream(model, tokenizer, params, device, context_len)
+    )
@@ -30,6 +30,66 @@ class ModelControllerParameters(BaseParameters):
     daemon: Optional[bool] = field(
         default=False, metadata={"help": "Run Model Controller in background"}
     )
+    registry_type: Optional[str] = field(
+        default="memory",
+        metadata={
+            "valid_values": ["memory", "sqlite"],
+            "help": "The storage of model registry, sqlite keeps model instances across restarts of Model Controller",
+        },
+    )
+    registry_db_path: Optional[str] = field(
+        default=None,
+        metadata={
+            "help": "The database file of sqlite model registry, default is pilot/data/model_registry.db"
+        },
+    )
+
+
+@dataclass
+class MockProxyServerParameters(BaseParameters):
+    host: Optional[str] = field(
+        default="127.0.0.1", metadata={"help": "Mock proxy LLM server deploy host"}
+    )
+    port: Optional[int] = field(
+        default=8100, metadata={"help": "Mock proxy LLM server deploy port"}
+    )
+    daemon: Optional[bool] = field(
+        default=False, metadata={"help": "Run mock proxy LLM server in background"}
+    )
+    ttft: Optional[float] = field(
+        default=0.2, metadata={"help": "Seconds before the first token of a response"}
+    )
+    tokens_per_second: Optional[float] = field(
+        default=50, metadata={"help": "Tokens per second of a response stream"}
+    )
+    num_tokens: Optional[int] = field(
+        default=128,
+        metadata={
+            "help": "Tokens of a response, less if the max_tokens of request is smaller"
+        },
+    )
+    error_rate: Optional[float] = field(
+        default=0.0,
+        metadata={"help": "Fraction of requests failed with error_status_code"},
+    )
+    error_status_code: Optional[int] = field(
+        default=503, metadata={"help": "Status code of the injected errors"}
+    )
+    requests_per_minute: Optional[int] = field(
+        default=None,
+        metadata={
+            "help": "Requests per minute allowed, requests over it get a 429 with the x-ratelimit-* headers like OpenAI. If None, no rate limit"
+        },
+    )
+    rate_limit_burst: Optional[int] = field(
+        default=None,
+        metadata={
+            "help": "Requests allowed at once by the rate limit, default to requests_per_minute"
+        },
+    )
+    seed: Optional[int] = field(
+        default=None, metadata={"help": "Random seed of error injection"}
+    )
 
 
 @dataclass
@@ -61,6 +121,24 @@ class ModelWorkerParameters(BaseModelParameters):
     limit_model_concurrency: Optional[int] = field(
         default=5, metadata={"help": "Model concurrency limit"}
     )
+    limit_model_queue_size: Optional[int] = field(
+        default=32,
+        metadata={
+            "help": "Max requests waiting for the concurrency limit of model, more requests are rejected at once, so they can be retried on other instances. -1 means unlimited"
+        },
+    )
+    limit_model_queue_timeout: Optional[float] = field(
+        default=60,
+        metadata={
+            "help": "Max seconds a request waits for the concurrency limit of model before it is rejected. -1 means unlimited"
+        },
+    )
+    batch_min_share: Optional[float] = field(
+        default=0.2,
+        metadata={
+            "help": "Interactive requests are served before batch requests (background jobs), batch requests get this min share of the concurrency limit of model while both are waiting"
+        },
+    )
     standalone: Optional[bool] = field(
         default=False,
         metadata={"help": "Standalone mode. If True, embedded Run ModelController"},
@@ -83,6 +161,78 @@ class ModelWorkerParameters(BaseModelParameters):
     heartbeat_interval: Optional[int] = field(
         default=20, metadata={"help": "The interval for sending heartbeats (seconds)"}
     )
+    routing_policy: Optional[str] = field(
+        default=None,
+        metadata={
+            "valid_values": [
+                "random",
+                "weighted_random",
+                "weighted_round_robin",
+                "least_in_flight",
+                "power_of_two",
+            ],
+            "help": "The policy to select one instance of current model. If None, use the default policy of worker manager(least_in_flight)",
+        },
+    )
+    response_cache_type: Optional[str] = field(
+        default=None,
+        metadata={
+            "valid_values": ["memory", "disk"],
+            "help": "The backend of LLM response cache in front of worker manager. If None, the response cache is disabled",
+        },
+    )
+    response_cache_max_items: Optional[int] = field(
+        default=1024,
+        metadata={"help": "The max cached responses of memory response cache"},
+    )
+    response_cache_non_deterministic: Optional[bool] = field(
+        default=False,
+        metadata={
+            "help": "Cache the responses of requests with temperature > 0, by default only deterministic (temperature 0) requests are cached"
+        },
+    )
+    coalesce_requests: Optional[bool] = field(
+        default=True,
+        metadata={
+            "help": "Identical deterministic (temperature 0) requests in flight at the same time share one inference, the later ones subscribe to the stream of the first one"
+        },
+    )
+    instance_cache_ttl: Optional[float] = field(
+        default=30,
+        metadata={
+            "help": "Seconds the model instances fetched from model controller are cached in remote worker manager, changes are also pushed by model controller"
+        },
+    )
+    http_max_connections_per_host: Optional[int] = field(
+        default=None,
+        metadata={
+            "help": "Maximum connections of the pooled http client to each host (model controller, workers, proxy LLM server). If None, use 100, or HTTP_CLIENT_MAX_CONNECTIONS_PER_HOST in webserver"
+        },
+    )
+    http_max_keepalive_connections_per_host: Optional[int] = field(
+        default=None,
+        metadata={
+            "help": "Maximum idle keep-alive connections of the pooled http client to each host. If None, use 20, or HTTP_CLIENT_MAX_KEEPALIVE_CONNECTIONS_PER_HOST in webserver"
+        },
+    )
+    http_keepalive_expiry: Optional[float] = field(
+        default=None,
+        metadata={
+            "help": "Seconds an idle keep-alive connection is kept. If None, use 60, or HTTP_CLIENT_KEEPALIVE_EXPIRY in webserver"
+        },
+    )
+    http_connect_timeout: Optional[float] = field(
+        default=None,
+        metadata={
+            "help": "Connect timeout (seconds) of the pooled http client. If None, use 10, or HTTP_CLIENT_CONNECT_TIMEOUT in webserver"
+        },
+    )
+    http_timeout: Optional[float] = field(
+        default=None,
+        metadata={
+            "help": "Read, write and pool timeout (seconds) of the pooled http client. If None, use 180, or HTTP_CLIENT_TIMEOUT in webserver"
+        },
+    )
 
 
 @dataclass
@@ -106,6 +256,18 @@ class EmbeddingModelParameters(BaseEmbeddingModelParameters):
             "help": "Determines whether the model's embeddings should be normalized."
         },
     )
+    max_batch_size: Optional[int] = field(
+        default=64,
+        metadata={
+            "help": "The max number of texts in one micro-batch, concurrent embedding requests are merged into one batched encode. 1 disables micro-batching"
+        },
+    )
+    max_batch_wait_ms: Optional[float] = field(
+        default=0,
+        metadata={
+            "help": "The max time (milliseconds) to wait for more requests before encoding a micro-batch when requests are already queued. Requests queued while a batch is encoded always form the next batch, a request to an idle batcher is never delayed"
+        },
+    )
 
     def build_kwargs(self, **kwargs) -> Dict:
         model_kwargs, encode_kwargs = None, None
@@ -144,6 +306,13 @@ class ModelParameters(BaseModelParameters):
     max_context_size: Optional[int] = field(
         default=4096, metadata={"help": "Maximum context size"}
     )
+    context_overflow_strategy: Optional[str] = field(
+        default="drop_oldest",
+        metadata={
+            "valid_values": ["truncate", "drop_oldest", "reject"],
+            "help": "What to do with prompts longer than the context length of model: truncate keeps the last tokens, drop_oldest drops the oldest rounds of chat history then truncates, reject fails at once",
+        },
+    )
 
     num_gpus: Optional[int] = field(
         default=None,
@@ -190,6 +359,24 @@ class ModelParameters(BaseModelParameters):
     verbose: Optional[bool] = field(
         default=False, metadata={"help": "Show verbose output."}
     )
+    continuous_batching: Optional[bool] = field(
+        default=False,
+        metadata={
+            "help": "Merge concurrent requests into one batched forward pass per decode step, only valid for huggingface decoder-only models"
+        },
+    )
+    max_batch_size: Optional[int] = field(
+        default=8,
+        metadata={
+            "help": "Maximum number of requests decoded together, only valid when continuous_batching=True"
+        },
+    )
+    prefix_cache_memory_mb: Optional[int] = field(
+        default=0,
+        metadata={
+            "help": "Memory budget (MB) of the KV cache of prompt prefixes, requests starting with a cached prefix (e.g. the system prompt of a scene) only prefill their suffix. 0 disables it, only valid for huggingface decoder-only models"
+        },
+    )
 
 
 @dataclass
@@ -274,6 +461,58 @@ class ProxyModelParameters(BaseModelParameters):
     max_context_size: Optional[int] = field(
         default=4096, metadata={"help": "Maximum context size"}
     )
+    proxy_max_retries: Optional[int] = field(
+        default=3,
+        metadata={
+            "help": "Max retries of a proxy request on 429, 5xx and connection errors, only before the first byte of response"
+        },
+    )
+    proxy_timeout: Optional[float] = field(
+        default=180, metadata={"help": "Timeout in seconds of proxy requests"}
+    )
+    proxy_requests_per_minute: Optional[int] = field(
+        default=None,
+        metadata={
+            "help": "Requests per minute allowed by the proxy server, requests over it wait in line instead of being rejected. If None, learned from the x-ratelimit-* headers of responses"
+        },
+    )
+    proxy_tokens_per_minute: Optional[int] = field(
+        default=None,
+        metadata={
+            "help": "Tokens per minute allowed by the proxy server. If None, learned from the x-ratelimit-* headers of responses"
+        },
+    )
+    proxy_rate_limit_max_wait: Optional[float] = field(
+        default=60,
+        metadata={
+            "help": "Max seconds a request waits for the rate limit of proxy server, it fails after that"
+        },
+    )
+    proxy_data_mask_config: Optional[str] = field(
+        default=None,
+        metadata={
+            "help": 'Path of a json file of the sensitive values masked before requests are sent to the proxy server and recovered in the output, like {"terms": {"table": ["orders"]}, "patterns": {"account": "ACC-\\\\d{8}"}, "builtin_patterns": ["email", "phone"], "ignore_case": true}'
+        },
+    )
+    proxy_failover_server_url: Optional[str] = field(
+        default=None,
+        metadata={
+            "help": "Secondary proxy server url with the same api, requests fail over to it when the proxy server keeps failing"
+        },
+    )
+    proxy_failover_api_key: Optional[str] = field(
+        default=None,
+        metadata={
+            "tags": "privacy",
+            "help": "The api key of the failover proxy server, default to proxy_api_key",
+        },
+    )
+    proxy_failover_backend: Optional[str] = field(
+        default=None,
+        metadata={
+            "help": "The model name actually pass to the failover proxy server, default to proxyllm_backend"
+        },
+    )
 
 
 @dataclass
@@ -0,0 +1,217 @@
+"""KV cache of prompt prefixes shared by requests.
+
+Every scene of DB-GPT sends a long and mostly static system prompt (table schemas,
+instructions, examples) before the question. ``PrefixKVCache`` keeps the past_key_values
+of recently seen prompts, a new prompt starting with a cached prefix only prefills its
+suffix, which cuts the time to first token.
+
+Prefixes are matched at block granularity, the key of a prefix is the hash of its
+tokens. The KV of a prompt is stored once and indexed by the keys of all its block
+aligned prefixes, so a later prompt sharing only the system prompt reuses it too. Entries
+are evicted least recently used first under a memory budget.
+"""
+
+import hashlib
+import threading
+from array import array
+from collections import OrderedDict
+from dataclasses import asdict, dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+
+def to_legacy_cache(past_key_values) -> Tuple:
+    """Tuple of (key, value) tensors of each layer, shaped (batch, heads, seq, dim)"""
+    if hasattr(past_key_values, "to_legacy_cache"):
+        return past_key_values.to_legacy_cache()
+    return past_key_values
+
+
+def from_legacy_cache(cache_cls, past_key_values: Tuple):
+    """Wrap the legacy cache in cache_cls (e.g. DynamicCache) when the model uses it"""
+    if cache_cls is not None and hasattr(cache_cls, "from_legacy_cache"):
+        return cache_cls.from_legacy_cache(past_key_values)
+    return past_key_values
+
+
+@dataclass
+class PrefixCacheStats:
+    # Prompts looked up in the cache
+    lookups: int = 0
+    # Prompts starting with a cached prefix
+    hits: int = 0
+    # Prompt tokens of all lookups, and the tokens not prefilled because of hits
+    prompt_tokens: int = 0
+    saved_prefill_tokens: int = 0
+    evictions: int = 0
+    entries: int = 0
+    memory_bytes: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        return self.hits / self.lookups if self.lookups else 0.0
+
+    @property
+    def saved_prefill_rate(self) -> float:
+        return (
+            self.saved_prefill_tokens / self.prompt_tokens
+            if self.prompt_tokens
+            else 0.0
+        )
+
+    def to_dict(self) -> Dict:
+        data = asdict(self)
+        data["hit_rate"] = self.hit_rate
+        data["saved_prefill_rate"] = self.saved_prefill_rate
+        return data
+
+
+@dataclass
+class _Entry:
+    past_key_values: Tuple
+    cache_cls: Optional[type]
+    num_tokens: int
+    num_bytes: int
+    keys: List[bytes] = field(default_factory=list)
+
+
+def _prefix_keys(input_ids: List[int], num_tokens: int, block_size: int):
+    """Keys of the block aligned prefixes of input_ids[:num_tokens], shortest first"""
+    hasher = hashlib.blake2b(digest_size=16)
+    keys = []
+    for end in range(block_size, num_tokens + 1, block_size):
+        hasher.update(array("q", input_ids[end - block_size : end]).tobytes())
+        keys.append(hasher.digest())
+    return keys
+
+
+def _slice_cache(past_key_values: Tuple, num_tokens: int, clone: bool) -> Tuple:
+    layers = []
+    for layer in past_key_values:
+        tensors = tuple(t[:, :, :num_tokens, :] for t in layer)
+        if clone:
+            # Not a view, the KV of the whole prompt is released
+            tensors = tuple(t.clone() for t in tensors)
+        layers.append(tensors)
+    return tuple(layers)
+
+
+class PrefixKVCache:
+    """LRU cache of the past_key_values of prompt prefixes, for one model.
+
+    Args:
+        max_memory_mb (float): Memory budget of the cached tensors
+        block_size (int): Prefixes are cached and matched in blocks of tokens
+    """
+
+    def __init__(self, max_memory_mb: float = 1024, block_size: int = 16) -> None:
+        if block_size < 1:
+            raise ValueError("block_size must be >= 1")
+        self.max_memory_bytes = int(max_memory_mb * 1024 * 1024)
+        self.block_size = block_size
+        self._entries: "OrderedDict[int, _Entry]" = OrderedDict()
+        # Key of a block aligned prefix -> the entry with its KV
+        self._index: Dict[bytes, _Entry] = {}
+        self._stats = PrefixCacheStats()
+        self._lock = threading.Lock()
+
+    def _max_prefix_len(self, num_tokens: int) -> int:
+        # The last prompt token is always prefilled, its logits sample the first token
+        return (num_tokens - 1) // self.block_size * self.block_size
+
+    def match(self, input_ids: List[int]) -> Tuple[int, Optional[object]]:
+        """Return the length of the longest cached prefix of input_ids and its
+        past_key_values (0 and None if not found), shorter than input_ids."""
+        keys = _prefix_keys(
+            input_ids, self._max_prefix_len(len(input_ids)), self.block_size
+        )
+        with self._lock:
+            self._stats.lookups += 1
+            self._stats.prompt_tokens += len(input_ids)
+            for i in range(len(keys) - 1, -1, -1):
+                entry = self._index.get(keys[i])
+                if entry is None:
+                    continue
+                num_tokens = (i + 1) * self.block_size
+                self._entries.move_to_end(id(entry))
+                self._stats.hits += 1
+                self._stats.saved_prefill_tokens += num_tokens
+                past = entry.past_key_values
+                if num_tokens < entry.num_tokens:
+                    past = _slice_cache(past, num_tokens, clone=False)
+                # The model appends to a new cache object, the cached tensors are
+                # never changed
+                return num_tokens, from_legacy_cache(entry.cache_cls, past)
+        return 0, None
+
+    def put(self, input_ids: List[int], past_key_values) -> None:
+        """Cache the KV of the longest block aligned prefix of input_ids.
+
+        Args:
+            input_ids (List[int]): Prompt tokens
+            past_key_values: Cache returned by the prefill of the whole prompt
+        """
+        num_tokens = self._max_prefix_len(len(input_ids))
+        if num_tokens <= 0:
+            return
+        keys = _prefix_keys(input_ids, num_tokens, self.block_size)
+        with self._lock:
+            entry = self._index.get(keys[-1])
+            if entry is not None:
+                self._entries.move_to_end(id(entry))
+                return
+        past = _slice_cache(to_legacy_cache(past_key_values), num_tokens, clone=True)
+        num_bytes = sum(t.numel() * t.element_size() for layer in past for t in layer)
+        if num_bytes > self.max_memory_bytes:
+            return
+        entry = _Entry(past, type(past_key_values), num_tokens, num_bytes, keys)
+        with self._lock:
+            if keys[-1] in self._index:
+                # Cached by a concurrent request
+                return
+            while (
+                self._entries
+                and self._stats.memory_bytes + num_bytes > self.max_memory_bytes
+            ):
+                self._evict()
+            self._entries[id(entry)] = entry
+            for key in keys:
+                self._index[key] = entry
+            self._stats.entries += 1
+            self._stats.memory_bytes += num_bytes
+
+    def _evict(self) -> None:
+        _, entry = self._entries.popitem(last=False)
+        for key in entry.keys:
+            if self._index.get(key) is entry:
+                del self._index[key]
+        self._stats.evictions += 1
+        self._stats.entries -= 1
+        self._stats.memory_bytes -= entry.num_bytes
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._index.clear()
+            self._stats.entries = 0
+            self._stats.memory_bytes = 0
+
+    def stats(self) -> PrefixCacheStats:
+        with self._lock:
+            return PrefixCacheStats(**asdict(self._stats))
+
+
+def prefill(model, input_ids: List[int], device: str, prefix_cache=None):
+    """Forward pass of the prompt of a decoder-only model, only the tokens after the
+    longest cached prefix are computed when prefix_cache is given."""
+    import torch
+
+    if prefix_cache is None:
+        return model(torch.as_tensor([input_ids], device=device), use_cache=True)
+    num_cached, past_key_values = prefix_cache.match(input_ids)
+    out = model(
+        input_ids=torch.as_tensor([input_ids[num_cached:]], device=device),
+        past_key_values=past_key_values,
+        use_cache=True,
+    )
+    prefix_cache.put(input_ids, out.past_key_values)
+    return out
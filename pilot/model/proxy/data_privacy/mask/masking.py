@@ -1,3 +1,69 @@
 """
     mask the sensitive data before upload LLM inference service
 """
+
+import re
+from typing import Dict, List
+
+from pilot.model.proxy.data_privacy.sensitive_detection import SensitiveDetector
+
+_NON_WORD = re.compile(r"[^A-Z0-9]+")
+
+
+def _placeholder_category(category: str) -> str:
+    # No double underscore inside, so no placeholder is a substring of another
+    return _NON_WORD.sub("_", category.upper()).strip("_") or "VALUE"
+
+
+class DataMasker:
+    """Replace the sensitive values with placeholders like ``__TABLE_1__``
+
+    Placeholders are valid identifiers so the generated SQL stays valid. Use one masker
+    per request: a value always gets the same placeholder in all the texts masked by
+    a masker, and ``mapping`` recovers the values from the output of LLM.
+    """
+
+    def __init__(self, detector: SensitiveDetector) -> None:
+        self._detector = detector
+        # Value to placeholder and placeholder to value
+        self._placeholders: Dict[str, str] = {}
+        self.mapping: Dict[str, str] = {}
+        self._counters: Dict[str, int] = {}
+
+    def _placeholder(self, value: str, category: str, texts: List[str]) -> str:
+        placeholder = self._placeholders.get(value)
+        if placeholder:
+            return placeholder
+        category = _placeholder_category(category)
+        while True:
+            index = self._counters.get(category, 0) + 1
+            self._counters[category] = index
+            placeholder = f"__{category}_{index}__"
+            # A placeholder already in the text could not be told apart when recovering
+            if not any(placeholder in text for text in texts):
+                break
+        self._placeholders[value] = placeholder
+        self.mapping[placeholder] = value
+        return placeholder
+
+    def mask_texts(self, texts: List[str]) -> List[str]:
+        masked_texts = []
+        for text in texts:
+            matches = self._detector.detect(text)
+            if not matches:
+                masked_texts.append(text)
+                continue
+            parts = []
+            last_end = 0
+            for m in matches:
+                parts.append(text[last_end : m.start])
+                parts.append(
+                    self._placeholder(text[m.start : m.end], m.category, texts)
+                )
+                last_end = m.end
+            parts.append(text[last_end:])
+            masked_texts.append("".join(parts))
+        return masked_texts
+
+    def mask(self, text: str) -> str:
+        return self.mask_texts([text])[0]
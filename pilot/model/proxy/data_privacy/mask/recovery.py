@@ -1,3 +1,58 @@
 """
     recovery the data after LLM inference
 """
+
+from typing import Dict
+
+from pilot.model.proxy.data_privacy.sensitive_detection import AhoCorasick
+
+
+class StreamingRecovery:
+    """Replace the placeholders of a streamed output with the original values
+
+    A placeholder may be split across chunks, so the end of a chunk which may start a
+    placeholder is held back until the next chunk tells whether it is one.
+
+    Args:
+        mapping: Placeholder to original value, see ``DataMasker.mapping``
+    """
+
+    def __init__(self, mapping: Dict[str, str]) -> None:
+        self._mapping = mapping
+        self._automaton = AhoCorasick(mapping.keys())
+        self._state = 0
+        self._pending = ""
+
+    def feed(self, chunk: str) -> str:
+        """Recover a chunk of output, return the text which can be emitted"""
+        if not self._state and self._automaton.first_chars.isdisjoint(chunk):
+            # Most tokens are far from any placeholder
+            return chunk
+        text = self._pending + chunk
+        matches, self._state = self._automaton.scan(chunk, self._state)
+        offset = len(self._pending)
+        parts = []
+        last_end = 0
+        for end, length in matches:
+            end += offset
+            start = end - length
+            if start < last_end:
+                continue
+            parts.append(text[last_end:start])
+            parts.append(self._mapping[text[start:end]])
+            last_end = end
+        emit_end = max(last_end, len(text) - self._automaton.depth(self._state))
+        parts.append(text[last_end:emit_end])
+        self._pending = text[emit_end:]
+        return "".join(parts)
+
+    def flush(self) -> str:
+        """The output ended, return the text held back"""
+        pending, self._pending, self._state = self._pending, "", 0
+        return pending
+
+
+def recover(text: str, mapping: Dict[str, str]) -> str:
+    """Replace the placeholders of a complete text with the original values"""
+    recovery = StreamingRecovery(mapping)
+    return recovery.feed(text) + recovery.flush()
@@ -1,3 +1,222 @@
 """
     a tool to discovery sensitive data
+
+Sensitive values are dictionary terms (table names, customer identifiers, ...) and
+regular expressions (emails, phone numbers, ...). All the terms are matched at once by
+an Aho-Corasick automaton, so the cost is linear in the length of text whatever the
+number of terms.
 """
+
+import json
+import re
+from collections import deque
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
+
+BUILTIN_PATTERNS: Dict[str, str] = {
+    "email": r"[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}",
+    # Mobile phone number of mainland China
+    "phone": r"(?<!\d)1[3-9]\d{9}(?!\d)",
+    # Resident identity card number of mainland China
+    "id_card": r"(?<!\d)\d{17}[\dXx](?!\d)",
+    "ipv4": r"(?<![\d.])(?:(?:25[0-5]|2[0-4]\d|1?\d?\d)\.){3}(?:25[0-5]|2[0-4]\d|1?\d?\d)(?![\d.])",
+}
+
+
+class AhoCorasick:
+    """Multi-pattern string matching automaton
+
+    ``scan`` can be called chunk after chunk with the state it returned, matches
+    spanning chunks are found.
+    """
+
+    def __init__(self, patterns: Iterable[str]) -> None:
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        # Lengths of the patterns ending at a state, including by its fail states
+        self._outputs: List[Tuple[int, ...]] = [()]
+        self._depth: List[int] = [0]
+        for pattern in patterns:
+            if pattern:
+                self._add(pattern)
+        self._build()
+        # Text without any of them matches nothing from the initial state
+        self.first_chars = frozenset(self._goto[0].keys())
+
+    def _add(self, pattern: str) -> None:
+        state = 0
+        for ch in pattern:
+            nxt = self._goto[state].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[state][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._outputs.append(())
+                self._depth.append(self._depth[state] + 1)
+            state = nxt
+        self._outputs[state] = (len(pattern),)
+
+    def _build(self) -> None:
+        goto, fail, outputs = self._goto, self._fail, self._outputs
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in goto[state].items():
+                queue.append(nxt)
+                f = fail[state]
+                while f and ch not in goto[f]:
+                    f = fail[f]
+                fail[nxt] = goto[f].get(ch, 0)
+                if outputs[fail[nxt]]:
+                    outputs[nxt] = outputs[nxt] + outputs[fail[nxt]]
+
+    def depth(self, state: int) -> int:
+        """Length of the longest suffix of the scanned text which may start a match"""
+        return self._depth[state]
+
+    def scan(self, text: str, state: int = 0) -> Tuple[List[Tuple[int, int]], int]:
+        """Find the matches ending in text.
+
+        Returns:
+            The (end, length) of matches, end is the index in text after the match and
+            the match may start in a previous chunk, and the state for the next chunk.
+        """
+        goto, fail, outputs = self._goto, self._fail, self._outputs
+        root = goto[0]
+        matches = []
+        for i, ch in enumerate(text):
+            if state:
+                nxt = goto[state].get(ch)
+                while nxt is None and state:
+                    state = fail[state]
+                    nxt = goto[state].get(ch)
+                state = nxt or 0
+            else:
+                # Most characters of text start no pattern
+                state = root.get(ch, 0)
+                if not state:
+                    continue
+            if outputs[state]:
+                end = i + 1
+                matches.extend((end, length) for length in outputs[state])
+        return matches, state
+
+    def find(self, text: str) -> List[Tuple[int, int]]:
+        """Leftmost longest non-overlapping matches of text, as (start, end)"""
+        matches, _ = self.scan(text)
+        return select_matches([(end - length, end) for end, length in matches])
+
+
+def select_matches(spans: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    """Leftmost longest non-overlapping spans"""
+    selected: List[Tuple[int, int]] = []
+    last_end = 0
+    for start, end in sorted(spans, key=lambda span: (span[0], -span[1])):
+        if start >= last_end:
+            selected.append((start, end))
+            last_end = end
+    return selected
+
+
+@dataclass
+class SensitiveMatch:
+    start: int
+    end: int
+    category: str
+
+
+class SensitiveDetector:
+    """Detect the sensitive values of text
+
+    Args:
+        terms: Dictionary terms by category, e.g. {"table": ["orders", "users"]}
+        patterns: Regular expressions by category, e.g. {"account": r"ACC-\\d{8}"}
+        ignore_case: Match the terms case insensitively, like the table names of
+            most databases
+    """
+
+    def __init__(
+        self,
+        terms: Optional[Dict[str, Iterable[str]]] = None,
+        patterns: Optional[Dict[str, str]] = None,
+        ignore_case: bool = False,
+    ) -> None:
+        self.ignore_case = ignore_case
+        self._term_categories: Dict[str, str] = {}
+        for category, values in (terms or {}).items():
+            for value in values:
+                key = value.lower() if ignore_case else value
+                if key:
+                    self._term_categories.setdefault(key, category)
+        self._automaton = AhoCorasick(self._term_categories.keys())
+        self._patterns = [
+            (category, re.compile(pattern))
+            for category, pattern in (patterns or {}).items()
+        ]
+
+    @classmethod
+    def from_config(cls, config: Dict) -> "SensitiveDetector":
+        """Create from a config like::
+
+        {
+            "terms": {"table": ["orders"], "customer": ["ACME Corp"]},
+            "patterns": {"account": "ACC-\\\\d{8}"},
+            "builtin_patterns": ["email", "phone"],
+            "ignore_case": true
+        }
+        """
+        patterns = {}
+        for name in config.get("builtin_patterns", []):
+            if name not in BUILTIN_PATTERNS:
+                raise ValueError(
+                    f"Unsupported builtin pattern: {name}, supported: "
+                    f"{list(BUILTIN_PATTERNS.keys())}"
+                )
+            patterns[name] = BUILTIN_PATTERNS[name]
+        patterns.update(config.get("patterns", {}))
+        return cls(
+            terms=config.get("terms"),
+            patterns=patterns,
+            ignore_case=config.get("ignore_case", False),
+        )
+
+    @classmethod
+    def from_file(cls, path: str) -> "SensitiveDetector":
+        with open(path, "r", encoding="utf-8") as f:
+            return cls.from_config(json.load(f))
+
+    def detect(self, text: str) -> List[SensitiveMatch]:
+        """Non-overlapping sensitive values of text, in order"""
+        search_text = text
+        if self.ignore_case:
+            search_text = text.lower()
+            if len(search_text) != len(text):
+                # A few characters change length when lowered, match them as is
+                search_text = text
+        categories: Dict[Tuple[int, int], str] = {}
+        matches, _ = self._automaton.scan(search_text)
+        for end, length in matches:
+            start = end - length
+            if _is_word_boundary(text, start) and _is_word_boundary(text, end):
+                categories[(start, end)] = self._term_categories[search_text[start:end]]
+        for category, pattern in self._patterns:
+            for m in pattern.finditer(text):
+                if m.end() > m.start():
+                    categories.setdefault((m.start(), m.end()), category)
+        return [
+            SensitiveMatch(start, end, categories[(start, end)])
+            for start, end in select_matches(list(categories.keys()))
+        ]
+
+
+def _is_ascii_word(ch: str) -> bool:
+    return ch.isascii() and (ch.isalnum() or ch == "_")
+
+
+def _is_word_boundary(text: str, index: int) -> bool:
+    """Terms don't match inside identifiers, e.g. table user in username. Scripts
+    without spaces between words (Chinese, ...) have no boundaries."""
+    if index <= 0 or index >= len(text):
+        return True
+    return not (_is_ascii_word(text[index - 1]) and _is_ascii_word(text[index]))
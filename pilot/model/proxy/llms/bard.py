@@ -1,10 +1,11 @@
-import requests
+import asyncio
 from typing import List
 from pilot.scene.base_message import ModelMessage, ModelMessageRoleType
-from pilot.model.proxy.llms.proxy_model import ProxyModel
+from pilot.model.proxy.llms.proxy_model import ProxyModel, build_proxy_endpoints
+from pilot.model.proxy.transport import ProxyRequestError, iterate_in_background_loop
 
 
-def bard_generate_stream(
+async def bard_async_generate_stream(
     model: ProxyModel, tokenizer, params, device, context_len=2048
 ):
     model_params = model.get_params()
@@ -41,21 +42,33 @@ def bard_generate_stream(
             msgs.append(msg["content"])
 
     if proxy_server_url is not None:
-        headers = {"Content-Type": "application/json"}
         payloads = {"input": "\n".join(msgs)}
-        response = requests.post(
-            proxy_server_url, headers=headers, json=payloads, stream=False
+        endpoints = build_proxy_endpoints(
+            model_params,
+            payloads,
+            build_headers=lambda _: {"Content-Type": "application/json"},
         )
-        if response.ok:
-            yield response.text
-        else:
-            yield f"bard proxy url request failed!, response = {str(response)}"
+        try:
+            yield await model.get_transport().post(endpoints)
+        except ProxyRequestError as e:
+            yield f"bard proxy url request failed!, response = {str(e)}"
     else:
         import bardapi
 
-        response = bardapi.core.Bard(proxy_api_key).get_answer("\n".join(msgs))
+        # bardapi is blocking, do not block the event loop
+        response = await asyncio.get_running_loop().run_in_executor(
+            None, bardapi.core.Bard(proxy_api_key).get_answer, "\n".join(msgs)
+        )
 
         if response is not None and response.get("content") is not None:
             yield str(response["content"])
         else:
             yield f"bard response error: {str(response)}"
+
+
+def bard_generate_stream(
+    model: ProxyModel, tokenizer, params, device, context_len=2048
+):
+    yield from iterate_in_background_loop(
+        bard_async_generate_stream(model, tokenizer, params, device, context_len)
+    )
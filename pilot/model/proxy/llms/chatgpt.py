@@ -1,32 +1,18 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
-import json
-import requests
-from typing import List
+from contextlib import aclosing
+from typing import Dict, List
 from pilot.scene.base_message import ModelMessage, ModelMessageRoleType
-from pilot.model.proxy.llms.proxy_model import ProxyModel
+from pilot.model.context_window import estimate_tokens
+from pilot.model.proxy.llms.proxy_model import ProxyModel, build_proxy_endpoints
+from pilot.model.proxy.stream_parser import StreamError, stream_deltas
+from pilot.model.proxy.transport import iterate_in_background_loop
 
 
-def chatgpt_generate_stream(
-    model: ProxyModel, tokenizer, params, device, context_len=2048
-):
+def _build_history(params: Dict) -> List[Dict]:
     history = []
 
-    model_params = model.get_params()
-    print(f"Model: {model}, model_params: {model_params}")
-
-    proxy_api_key = model_params.proxy_api_key
-    proxy_server_url = model_params.proxy_server_url
-    proxyllm_backend = model_params.proxyllm_backend
-    if not proxyllm_backend:
-        proxyllm_backend = "gpt-3.5-turbo"
-
-    headers = {
-        "Authorization": "Bearer " + proxy_api_key,
-        "Token": proxy_api_key,
-    }
-
     messages: List[ModelMessage] = params["messages"]
     # Add history conversation
     for message in messages:
@@ -49,7 +35,28 @@ def chatgpt_generate_stream(
     if last_user_input:
         history.remove(last_user_input)
         history.append(last_user_input)
+    return history
+
+
+def _build_headers(api_key: str) -> Dict[str, str]:
+    return {
+        "Authorization": "Bearer " + api_key,
+        "Token": api_key,
+    }
+
 
+async def chatgpt_async_generate_stream(
+    model: ProxyModel, tokenizer, params, device, context_len=2048
+):
+    model_params = model.get_params()
+    print(f"Model: {model}, model_params: {model_params}")
+
+    proxy_server_url = model_params.proxy_server_url
+    proxyllm_backend = model_params.proxyllm_backend
+    if not proxyllm_backend:
+        proxyllm_backend = "gpt-3.5-turbo"
+
+    history = _build_history(params)
     payloads = {
         "model": proxyllm_backend,  # just for test, remove this later
         "messages": history,
@@ -57,23 +64,36 @@ def chatgpt_generate_stream(
         "max_tokens": params.get("max_new_tokens"),
         "stream": True,
     }
-
-    res = requests.post(proxy_server_url, headers=headers, json=payloads, stream=True)
+    # Servers count max_tokens against the token budget before generating
+    estimated_tokens = sum(estimate_tokens(m["content"]) for m in history) + int(
+        params.get("max_new_tokens") or 0
+    )
+    endpoints = build_proxy_endpoints(
+        model_params,
+        payloads,
+        build_headers=_build_headers,
+        model_key="model",
+        estimated_tokens=estimated_tokens,
+    )
 
     print(f"Send request to {proxy_server_url} with real model {proxyllm_backend}")
 
     text = ""
-    for line in res.iter_lines():
-        if line:
-            if not line.startswith(b"data: "):
-                error_message = line.decode("utf-8")
-                yield error_message
-            else:
-                json_data = line.split(b": ", 1)[1]
-                decoded_line = json_data.decode("utf-8")
-                if decoded_line.lower() != "[DONE]".lower():
-                    obj = json.loads(json_data)
-                    if obj["choices"][0]["delta"].get("content") is not None:
-                        content = obj["choices"][0]["delta"]["content"]
-                        text += content
+    # Closing the generator closes the connection, the proxy server stops generating
+    deltas = stream_deltas(model.get_transport().stream_bytes(endpoints), "openai")
+    async with aclosing(deltas):
+        try:
+            async for delta in deltas:
+                text += delta
                 yield text
+        except StreamError as e:
+            # e.g. the json error body of server
+            yield str(e)
+
+
+def chatgpt_generate_stream(
+    model: ProxyModel, tokenizer, params, device, context_len=2048
+):
+    yield from iterate_in_background_loop(
+        chatgpt_async_generate_stream(model, tokenizer, params, device, context_len)
+    )
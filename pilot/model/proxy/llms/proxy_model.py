@@ -1,9 +1,90 @@
+from typing import Callable, Dict, List, Optional
+
 from pilot.model.parameter import ProxyModelParameters
+from pilot.model.proxy.data_privacy.sensitive_detection import SensitiveDetector
+from pilot.model.proxy.rate_limit import RateLimiter
+from pilot.model.proxy.transport import ProxyEndpoint, ProxyTransport, RetryPolicy
 
 
 class ProxyModel:
     def __init__(self, model_params: ProxyModelParameters) -> None:
         self._model_params = model_params
+        self._transport = None
+        self._sensitive_detector = None
 
     def get_params(self) -> ProxyModelParameters:
         return self._model_params
+
+    def get_transport(self) -> ProxyTransport:
+        """The transport shared by all requests to this proxy model"""
+        if self._transport is None:
+            max_retries = getattr(self._model_params, "proxy_max_retries", None)
+            self._transport = ProxyTransport(
+                retry_policy=RetryPolicy(
+                    max_retries=3 if max_retries is None else max_retries
+                ),
+                timeout=getattr(self._model_params, "proxy_timeout", None),
+                rate_limiter_factory=self._create_rate_limiter,
+            )
+        return self._transport
+
+    def get_sensitive_detector(self) -> Optional[SensitiveDetector]:
+        """Detector of the values to mask, None if data masking is not configured"""
+        config_path = getattr(self._model_params, "proxy_data_mask_config", None)
+        if config_path and self._sensitive_detector is None:
+            self._sensitive_detector = SensitiveDetector.from_file(config_path)
+        return self._sensitive_detector
+
+    def _create_rate_limiter(self) -> RateLimiter:
+        params = self._model_params
+        return RateLimiter(
+            requests_per_minute=getattr(params, "proxy_requests_per_minute", None),
+            tokens_per_minute=getattr(params, "proxy_tokens_per_minute", None),
+            max_wait=getattr(params, "proxy_rate_limit_max_wait", 60),
+        )
+
+
+def build_proxy_endpoints(
+    model_params: ProxyModelParameters,
+    payload: Dict,
+    build_headers: Optional[Callable[[str], Dict[str, str]]] = None,
+    model_key: Optional[str] = None,
+    estimated_tokens: int = 0,
+) -> List[ProxyEndpoint]:
+    """Endpoints of a proxy request, the proxy server then the failover one if any
+
+    Args:
+        model_params: Parameters of the proxy model
+        payload: Json body of the request
+        build_headers: Build the request headers from an api key
+        model_key: Key of the backend model name in payload, replaced by
+            proxy_failover_backend in the request to the failover server
+        estimated_tokens: Tokens of prompt and completion, for the rate limiter
+    """
+
+    def _headers(api_key: str) -> Dict[str, str]:
+        return build_headers(api_key) if build_headers else {}
+
+    endpoints = [
+        ProxyEndpoint(
+            model_params.proxy_server_url,
+            payload,
+            _headers(model_params.proxy_api_key),
+            estimated_tokens,
+        )
+    ]
+    failover_url = getattr(model_params, "proxy_failover_server_url", None)
+    if failover_url:
+        api_key = model_params.proxy_failover_api_key or model_params.proxy_api_key
+        failover_payload = payload
+        if model_key and model_params.proxy_failover_backend:
+            failover_payload = {
+                **payload,
+                model_key: model_params.proxy_failover_backend,
+            }
+        endpoints.append(
+            ProxyEndpoint(
+                failover_url, failover_payload, _headers(api_key), estimated_tokens
+            )
+        )
+    return endpoints
@@ -0,0 +1,190 @@
+"""A mock OpenAI compatible LLM server, the stand-in backend of proxy models.
+
+It speaks the chat completions protocol the chatgpt proxy expects, with a configurable
+time to first token, tokens per second, injected errors and an OpenAI like rate limit,
+so the whole cluster can be load tested without GPU or api key::
+
+    dbgpt start mockllm --ttft 0.5 --tokens_per_second 30 --error_rate 0.01
+
+Then start a proxy model worker with ``--proxy_server_url
+http://127.0.0.1:8100/v1/chat/completions``.
+"""
+
+import asyncio
+import json
+import random
+import time
+import uuid
+from dataclasses import asdict, dataclass
+from typing import Dict, List
+
+from pilot.model.context_window import estimate_tokens
+from pilot.model.parameter import MockProxyServerParameters
+from pilot.model.proxy.rate_limit import TokenBucket
+from pilot.utils.parameter_utils import EnvArgumentParser
+
+MOCK_MODEL_NAME = "mock-model"
+
+
+@dataclass
+class MockProxyServerStats:
+    requests: int = 0
+    # Rejected by the rate limit
+    rejected: int = 0
+    # Injected errors
+    errors: int = 0
+    completed: int = 0
+    tokens: int = 0
+
+    def to_dict(self) -> Dict:
+        return asdict(self)
+
+
+def _prompt_tokens(body: Dict) -> int:
+    return sum(estimate_tokens(str(m.get("content", ""))) for m in body["messages"])
+
+
+def create_mock_proxy_app(params: MockProxyServerParameters):
+    """The FastAPI app of mock server, ``app.state.stats`` counts the requests"""
+    from fastapi import FastAPI, Request
+    from fastapi.responses import JSONResponse, StreamingResponse
+
+    app = FastAPI()
+    app.state.stats = stats = MockProxyServerStats()
+    rng = random.Random(params.seed)
+    bucket = None
+    if params.requests_per_minute:
+        bucket = TokenBucket(params.requests_per_minute, burst=params.rate_limit_burst)
+    token_interval = 1 / params.tokens_per_second if params.tokens_per_second else 0
+
+    def _rate_limit_headers() -> Dict[str, str]:
+        reset = max(0.0, (1 - bucket.tokens) / bucket.rate)
+        return {
+            "x-ratelimit-limit-requests": str(params.requests_per_minute),
+            "x-ratelimit-remaining-requests": str(max(int(bucket.tokens), 0)),
+            "x-ratelimit-reset-requests": f"{reset * 1000:.0f}ms",
+        }
+
+    def _tokens(num_tokens: int) -> List[str]:
+        return [f"tok{i} " for i in range(num_tokens)]
+
+    def _chunk(completion_id: str, model: str, delta: Dict, finish_reason=None) -> str:
+        chunk = {
+            "id": completion_id,
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+        }
+        return f"data: {json.dumps(chunk)}\n\n"
+
+    async def _stream(completion_id: str, model: str, tokens: List[str]):
+        start = time.monotonic()
+        yield _chunk(completion_id, model, {"role": "assistant", "content": ""})
+        for i, token in enumerate(tokens):
+            # Scheduled from the start of response, so sleeps don't accumulate drift
+            delay = start + params.ttft + i * token_interval - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            stats.tokens += 1
+            yield _chunk(completion_id, model, {"content": token})
+        yield _chunk(completion_id, model, {}, finish_reason="stop")
+        yield "data: [DONE]\n\n"
+        stats.completed += 1
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        stats.requests += 1
+        headers = {}
+        if bucket:
+            wait = bucket.reserve(1)
+            if wait > 0:
+                bucket.refund(1)
+                stats.rejected += 1
+                headers = _rate_limit_headers()
+                headers["retry-after"] = f"{wait:.3f}"
+                return JSONResponse(
+                    {"error": {"message": "Rate limit reached", "type": "requests"}},
+                    status_code=429,
+                    headers=headers,
+                )
+            headers = _rate_limit_headers()
+        if params.error_rate and rng.random() < params.error_rate:
+            stats.errors += 1
+            return JSONResponse(
+                {"error": {"message": "Injected error", "type": "server_error"}},
+                status_code=params.error_status_code,
+                headers=headers,
+            )
+
+        body = await request.json()
+        model = body.get("model") or MOCK_MODEL_NAME
+        num_tokens = params.num_tokens
+        if body.get("max_tokens"):
+            num_tokens = min(num_tokens, int(body["max_tokens"]))
+        tokens = _tokens(num_tokens)
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        if body.get("stream"):
+            return StreamingResponse(
+                _stream(completion_id, model, tokens),
+                media_type="text/event-stream",
+                headers=headers,
+            )
+
+        await asyncio.sleep(params.ttft + num_tokens * token_interval)
+        stats.tokens += num_tokens
+        stats.completed += 1
+        prompt_tokens = _prompt_tokens(body)
+        return JSONResponse(
+            {
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [
+                    {
+                        "index": 0,
+                        "message": {"role": "assistant", "content": "".join(tokens)},
+                        "finish_reason": "stop",
+                    }
+                ],
+                "usage": {
+                    "prompt_tokens": prompt_tokens,
+                    "completion_tokens": num_tokens,
+                    "total_tokens": prompt_tokens + num_tokens,
+                },
+            },
+            headers=headers,
+        )
+
+    @app.get("/v1/models")
+    async def list_models():
+        return {
+            "object": "list",
+            "data": [{"id": MOCK_MODEL_NAME, "object": "model", "owned_by": "dbgpt"}],
+        }
+
+    @app.get("/mock/stats")
+    async def mock_stats():
+        return stats.to_dict()
+
+    return app
+
+
+def initialize_mock_proxy_server(params: MockProxyServerParameters):
+    import uvicorn
+
+    app = create_mock_proxy_app(params)
+    uvicorn.run(app, host=params.host, port=params.port, log_level="info")
+
+
+def run_mock_proxy_server():
+    parser = EnvArgumentParser()
+    params: MockProxyServerParameters = parser.parse_args_into_dataclass(
+        MockProxyServerParameters, env_prefix="mock_proxy_"
+    )
+    initialize_mock_proxy_server(params)
+
+
+if __name__ == "__main__":
+    run_mock_proxy_server()
@@ -0,0 +1,228 @@
+"""Client side rate limiting of proxy LLM backends.
+
+Each backend (server url and model) has a request bucket and a token bucket. A request
+reserves one request and its estimated tokens, then waits in line until the buckets
+have refilled, instead of being sent and rejected with 429. The budgets come from the
+configured limits, and are corrected by the rate limit headers of responses
+(``x-ratelimit-*`` of OpenAI compatible servers). A 429 with ``Retry-After`` pauses
+all requests to the backend.
+"""
+
+import asyncio
+import re
+import threading
+import time
+from dataclasses import asdict, dataclass
+from typing import Dict, Mapping, Optional
+
+from pilot.model.proxy.transport import ProxyRequestError
+
+# e.g. 1s, 6m0s, 20ms, 1h2m3.5s
+_DURATION_PATTERN = re.compile(r"(\d+(?:\.\d+)?)(ms|s|m|h)")
+_DURATION_UNITS = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+
+
+def parse_reset_duration(value: Optional[str]) -> Optional[float]:
+    """Seconds of a ``x-ratelimit-reset-*`` header value, None if it can't be parsed"""
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = _DURATION_PATTERN.findall(value)
+    if not parts:
+        return None
+    return sum(float(n) * _DURATION_UNITS[unit] for n, unit in parts)
+
+
+def _header_number(headers: Mapping[str, str], name: str) -> Optional[float]:
+    value = headers.get(name)
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return None
+
+
+class RateLimitTimeoutError(ProxyRequestError):
+    """The request would wait longer than the max wait of the rate limiter"""
+
+    def __init__(self, message: str) -> None:
+        super().__init__(message, status_code=429)
+
+
+class TokenBucket:
+    """Token bucket with reservations, the amount may go negative.
+
+    A negative amount is the debt of the requests waiting in line, so every new request
+    waits behind them: the line is first in, first out without any lock held while
+    waiting, and works with any event loop.
+    """
+
+    def __init__(
+        self, per_minute: Optional[float] = None, burst: Optional[float] = None
+    ) -> None:
+        self._lock = threading.Lock()
+        # Amount available at once, default to per_minute
+        self._burst = burst
+        self.capacity: Optional[float] = None
+        self.rate: Optional[float] = None
+        self.tokens = 0.0
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        if per_minute:
+            self.set_limit(per_minute)
+
+    def set_limit(self, per_minute: float) -> None:
+        with self._lock:
+            self._refill(time.monotonic())
+            capacity = self._burst or per_minute
+            if self.capacity is None:
+                # Start full
+                self.tokens = capacity
+            self.capacity = capacity
+            self.rate = per_minute / 60
+            self.tokens = min(self.tokens, self.capacity)
+
+    def _refill(self, now: float) -> None:
+        if self.rate:
+            self.tokens = min(
+                self.capacity, self.tokens + (now - self._updated) * self.rate
+            )
+        self._updated = now
+
+    def reserve(self, amount: float) -> float:
+        """Take amount from the bucket, return seconds to wait before using it"""
+        with self._lock:
+            now = time.monotonic()
+            wait = max(0.0, self._paused_until - now)
+            if not self.rate:
+                return wait
+            self._refill(now)
+            # A request larger than the bucket must still be able to go
+            amount = min(amount, self.capacity)
+            self.tokens -= amount
+            if self.tokens < 0:
+                wait = max(wait, -self.tokens / self.rate)
+            return wait
+
+    def refund(self, amount: float) -> None:
+        with self._lock:
+            if self.rate:
+                self.tokens = min(
+                    self.capacity, self.tokens + min(amount, self.capacity)
+                )
+
+    def correct(
+        self, remaining: Optional[float], reset_after: Optional[float] = None
+    ) -> None:
+        """Correct the bucket with the remaining budget the server reports"""
+        if remaining is None:
+            return
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self.tokens = min(self.tokens, remaining)
+            if remaining < 1 and reset_after and not self.rate:
+                # Unknown limit, wait until the server resets it
+                self._paused_until = max(self._paused_until, now + reset_after)
+
+    def pause(self, seconds: float) -> None:
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+
+@dataclass
+class RateLimiterStats:
+    requests: int = 0
+    delayed: int = 0
+    throttled: int = 0
+    timeouts: int = 0
+    queue_depth: int = 0
+    max_queue_depth: int = 0
+    total_wait_seconds: float = 0.0
+    max_wait_seconds: float = 0.0
+
+    def to_dict(self) -> Dict:
+        data = asdict(self)
+        data["mean_wait_seconds"] = (
+            self.total_wait_seconds / self.requests if self.requests else 0.0
+        )
+        return data
+
+
+class RateLimiter:
+    """Request and token budgets of one proxy backend"""
+
+    def __init__(
+        self,
+        requests_per_minute: Optional[float] = None,
+        tokens_per_minute: Optional[float] = None,
+        max_wait: Optional[float] = None,
+    ) -> None:
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        # Limits configured by users are not overwritten by headers
+        self._configured_requests = bool(requests_per_minute)
+        self._configured_tokens = bool(tokens_per_minute)
+        self.max_wait = max_wait
+        self._stats = RateLimiterStats()
+
+    async def acquire(self, estimated_tokens: int = 0) -> float:
+        """Wait until the request can be sent, return the seconds waited
+
+        Raises:
+            RateLimitTimeoutError: The request would wait longer than max_wait
+        """
+        wait = max(
+            self.requests.reserve(1), self.tokens.reserve(max(estimated_tokens, 0))
+        )
+        if self.max_wait is not None and wait > self.max_wait:
+            self.requests.refund(1)
+            self.tokens.refund(estimated_tokens)
+            self._stats.timeouts += 1
+            raise RateLimitTimeoutError(
+                f"Rate limited, the request would wait {wait:.1f}s, max wait is "
+                f"{self.max_wait}s"
+            )
+        stats = self._stats
+        stats.requests += 1
+        if wait > 0:
+            stats.delayed += 1
+            stats.queue_depth += 1
+            stats.max_queue_depth = max(stats.max_queue_depth, stats.queue_depth)
+            try:
+                await asyncio.sleep(wait)
+            except asyncio.CancelledError:
+                self.requests.refund(1)
+                self.tokens.refund(estimated_tokens)
+                raise
+            finally:
+                stats.queue_depth -= 1
+            stats.total_wait_seconds += wait
+            stats.max_wait_seconds = max(stats.max_wait_seconds, wait)
+        return wait
+
+    def update_from_headers(self, headers: Mapping[str, str]) -> None:
+        """Learn the budgets from the ``x-ratelimit-*`` headers of a response"""
+        for kind, bucket, configured in [
+            ("requests", self.requests, self._configured_requests),
+            ("tokens", self.tokens, self._configured_tokens),
+        ]:
+            limit = _header_number(headers, f"x-ratelimit-limit-{kind}")
+            if limit and not configured and limit != bucket.capacity:
+                bucket.set_limit(limit)
+            bucket.correct(
+                _header_number(headers, f"x-ratelimit-remaining-{kind}"),
+                parse_reset_duration(headers.get(f"x-ratelimit-reset-{kind}")),
+            )
+
+    def throttled(self, retry_after: float) -> None:
+        """The backend rejected a request with 429, hold all requests for a while"""
+        self._stats.throttled += 1
+        self.requests.pause(retry_after)
+
+    def stats(self) -> RateLimiterStats:
+        return RateLimiterStats(**asdict(self._stats))
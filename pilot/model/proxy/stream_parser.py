@@ -0,0 +1,341 @@
+"""Incremental parsing of the streaming responses of proxy LLMs.
+
+The parsers work on the raw bytes of the response. The complete lines of a network chunk
+are split in one pass over the buffer, the common SSE lines are handled inline, and an
+event is decoded once right before its json is parsed, so there is no per-line decode
+or per-line method call.
+
+Each provider frames its stream differently (``[DONE]`` sentinel, named events,
+cumulative instead of incremental text, plain text data, ...). These quirks live in the
+delta extractors below, which turn events into text deltas. ``stream_deltas`` yields
+the deltas of all the events received in one network chunk as one delta, so a burst of
+small events costs one yield.
+"""
+
+import json
+from abc import ABC, abstractmethod
+from contextlib import aclosing
+from dataclasses import dataclass
+from typing import AsyncIterator, Callable, Dict, List, Optional
+
+
+@dataclass
+class StreamEvent:
+    """One event of a stream.
+
+    ``event`` is the SSE event name, ``"raw"`` for lines which are not SSE fields
+    (e.g. a json error body returned by a server instead of a stream).
+    """
+
+    data: bytes
+    event: Optional[str] = None
+
+
+class StreamParser(ABC):
+    @abstractmethod
+    def feed(self, chunk: bytes) -> List[StreamEvent]:
+        """Parse a chunk of bytes, return the events completed by it"""
+
+    @abstractmethod
+    def close(self) -> List[StreamEvent]:
+        """The stream ended, return the pending event if any"""
+
+
+class _LineParser(StreamParser):
+    def __init__(self) -> None:
+        self._buffer = bytearray()
+
+    def _lines(self, chunk: bytes) -> List[bytes]:
+        """Complete lines of the buffer, split in one pass, line breaks removed"""
+        buffer = self._buffer
+        buffer += chunk
+        end = buffer.rfind(b"\n")
+        if end < 0:
+            return []
+        lines = buffer[:end]
+        del buffer[: end + 1]
+        if b"\r" in lines:
+            lines = lines.replace(b"\r\n", b"\n")
+            if lines.endswith(b"\r"):
+                lines = lines[:-1]
+        return bytes(lines).split(b"\n")
+
+    def feed(self, chunk: bytes) -> List[StreamEvent]:
+        events: List[StreamEvent] = []
+        for line in self._lines(chunk):
+            self._on_line(line, events)
+        return events
+
+    def close(self) -> List[StreamEvent]:
+        events: List[StreamEvent] = []
+        if self._buffer:
+            # Last line without line break
+            line = bytes(self._buffer)
+            self._buffer.clear()
+            self._on_line(line[:-1] if line.endswith(b"\r") else line, events)
+        self._on_end(events)
+        return events
+
+    @abstractmethod
+    def _on_line(self, line: bytes, events: List[StreamEvent]) -> None:
+        """Handle a line without line break"""
+
+    def _on_end(self, events: List[StreamEvent]) -> None:
+        pass
+
+
+class SSEParser(_LineParser):
+    """Server-sent events, see https://html.spec.whatwg.org/multipage/server-sent-events.html"""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._data: List[bytes] = []
+        self._event: Optional[str] = None
+
+    def feed(self, chunk: bytes) -> List[StreamEvent]:
+        # The hot loop of streaming, the common lines are handled inline
+        events: List[StreamEvent] = []
+        data = self._data
+        for line in self._lines(chunk):
+            if not line:
+                if data:
+                    self._dispatch(events)
+                    data = self._data
+                else:
+                    self._event = None
+            elif line.startswith(b"data:"):
+                data.append(line[6:] if line[5:6] == b" " else line[5:])
+            else:
+                self._on_line(line, events)
+        return events
+
+    def _on_line(self, line: bytes, events: List[StreamEvent]) -> None:
+        if not line:
+            self._dispatch(events)
+        elif line.startswith(b"data:"):
+            self._data.append(line[6:] if line[5:6] == b" " else line[5:])
+        elif line.startswith(b"event:"):
+            value = line[7:] if line[6:7] == b" " else line[6:]
+            self._event = value.decode("utf-8")
+        elif line.startswith((b":", b"id:", b"retry:")):
+            # Comments (keep-alive) and fields we don't need
+            pass
+        else:
+            events.append(StreamEvent(line, "raw"))
+
+    def _dispatch(self, events: List[StreamEvent]) -> None:
+        if self._data:
+            data = self._data[0] if len(self._data) == 1 else b"\n".join(self._data)
+            events.append(StreamEvent(data, self._event))
+        self._data = []
+        self._event = None
+
+    def _on_end(self, events: List[StreamEvent]) -> None:
+        self._dispatch(events)
+
+
+class NDJSONParser(_LineParser):
+    """Newline delimited json, one event per line"""
+
+    def _on_line(self, line: bytes, events: List[StreamEvent]) -> None:
+        if line:
+            events.append(StreamEvent(line))
+
+
+class DeltaExtractor(ABC):
+    """Turn the events of a provider into text deltas"""
+
+    # sse or ndjson
+    framing: str = "sse"
+
+    def __init__(self) -> None:
+        self.finished = False
+
+    @abstractmethod
+    def extract(self, event: StreamEvent) -> Optional[str]:
+        """Return the text delta of event, None if it has no text.
+
+        Raises:
+            StreamError: The provider reported an error in the stream
+        """
+
+
+class StreamError(Exception):
+    """Error reported by the provider in the body of a stream"""
+
+
+_JSON_DECODER = json.JSONDecoder()
+
+
+def _loads(data: bytes):
+    """json of an event, cheaper than ``json.loads`` on bytes for small objects"""
+    text = data.decode("utf-8")
+    try:
+        return _JSON_DECODER.raw_decode(text)[0]
+    except json.JSONDecodeError:
+        # e.g. leading whitespace, json.loads handles it or raises the right error
+        return json.loads(text)
+
+
+def _raw_error(event: StreamEvent) -> StreamError:
+    return StreamError(event.data.decode("utf-8", "replace"))
+
+
+class OpenAIDeltaExtractor(DeltaExtractor):
+    """OpenAI compatible chat completions, ``data: [DONE]`` ends the stream"""
+
+    def extract(self, event: StreamEvent) -> Optional[str]:
+        if event.event == "raw":
+            raise _raw_error(event)
+        if event.data == b"[DONE]":
+            self.finished = True
+            return None
+        obj = _loads(event.data)
+        if "error" in obj:
+            raise StreamError(str(obj["error"]))
+        choices = obj.get("choices")
+        if not choices:
+            return None
+        return choices[0].get("delta", {}).get("content")
+
+
+class ClaudeDeltaExtractor(DeltaExtractor):
+    """Anthropic messages api, text in content_block_delta events"""
+
+    def extract(self, event: StreamEvent) -> Optional[str]:
+        if event.event == "raw" or event.event == "error":
+            raise _raw_error(event)
+        if event.event == "message_stop":
+            self.finished = True
+            return None
+        if event.event != "content_block_delta":
+            return None
+        return _loads(event.data).get("delta", {}).get("text")
+
+
+class WenxinDeltaExtractor(DeltaExtractor):
+    """Baidu wenxin (ERNIE Bot), ``is_end`` ends the stream, errors are json bodies"""
+
+    def extract(self, event: StreamEvent) -> Optional[str]:
+        obj = _loads(event.data)
+        if "error_code" in obj:
+            raise StreamError(f"{obj['error_code']}: {obj.get('error_msg')}")
+        if obj.get("is_end"):
+            self.finished = True
+        return obj.get("result")
+
+
+class TongyiDeltaExtractor(DeltaExtractor):
+    """Alibaba tongyi (DashScope), each event has the full text generated so far"""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._text = ""
+
+    def extract(self, event: StreamEvent) -> Optional[str]:
+        if event.event == "raw" or event.event == "error":
+            raise _raw_error(event)
+        output = _loads(event.data).get("output", {})
+        if output.get("finish_reason") not in (None, "null"):
+            self.finished = True
+        text = output.get("text")
+        if not text or not text.startswith(self._text):
+            return None
+        delta, self._text = text[len(self._text) :], text
+        return delta
+
+
+class ZhipuDeltaExtractor(DeltaExtractor):
+    """Zhipu ai, plain text data in ``add`` events, ``finish`` ends the stream"""
+
+    def extract(self, event: StreamEvent) -> Optional[str]:
+        if event.event in ("error", "interrupted", "raw"):
+            raise _raw_error(event)
+        if event.event == "finish":
+            self.finished = True
+            return None
+        return event.data.decode("utf-8")
+
+
+class NDJSONDeltaExtractor(DeltaExtractor):
+    """One json object per line with the delta in ``text``, e.g. DB-GPT model workers"""
+
+    framing = "ndjson"
+
+    def extract(self, event: StreamEvent) -> Optional[str]:
+        obj = _loads(event.data)
+        if obj.get("error"):
+            raise StreamError(str(obj["error"]))
+        if obj.get("done"):
+            self.finished = True
+        return obj.get("text")
+
+
+_STREAM_FORMATS: Dict[str, Callable[[], DeltaExtractor]] = {
+    "openai": OpenAIDeltaExtractor,
+    "claude": ClaudeDeltaExtractor,
+    "wenxin": WenxinDeltaExtractor,
+    "tongyi": TongyiDeltaExtractor,
+    "zhipu": ZhipuDeltaExtractor,
+    "ndjson": NDJSONDeltaExtractor,
+}
+_PARSERS: Dict[str, Callable[[], StreamParser]] = {
+    "sse": SSEParser,
+    "ndjson": NDJSONParser,
+}
+
+
+def register_stream_format(name: str, factory: Callable[[], DeltaExtractor]):
+    """Register the delta extractor of a custom provider"""
+    _STREAM_FORMATS[name] = factory
+
+
+def supported_stream_formats() -> List[str]:
+    return list(_STREAM_FORMATS.keys())
+
+
+def create_delta_extractor(name: str) -> DeltaExtractor:
+    factory = _STREAM_FORMATS.get(name)
+    if not factory:
+        raise ValueError(
+            f"Unsupported stream format: {name}, supported: {supported_stream_formats()}"
+        )
+    return factory()
+
+
+async def stream_deltas(
+    chunks: AsyncIterator[bytes], stream_format: str = "openai"
+) -> AsyncIterator[str]:
+    """Yield the text deltas of a streaming response.
+
+    Args:
+        chunks: Raw bytes of the response, e.g. ``ProxyTransport.stream_bytes``
+        stream_format: The provider, see ``supported_stream_formats``
+
+    Raises:
+        StreamError: The provider reported an error in the stream
+    """
+    extractor = create_delta_extractor(stream_format)
+    parser = _PARSERS[extractor.framing]()
+
+    def _deltas(events: List[StreamEvent]) -> str:
+        parts = []
+        for event in events:
+            delta = extractor.extract(event)
+            if delta:
+                parts.append(delta)
+            if extractor.finished:
+                break
+        return "".join(parts)
+
+    async with aclosing(chunks):
+        async for chunk in chunks:
+            # All the events of one network chunk are yielded together
+            delta = _deltas(parser.feed(chunk))
+            if delta:
+                yield delta
+            if extractor.finished:
+                return
+        delta = _deltas(parser.close())
+        if delta:
+            yield delta
@@ -0,0 +1,103 @@
+"""Run unit test with command: pytest pilot/model/proxy/tests/test_data_masking.py"""
+
+import json
+
+import pytest
+
+from pilot.model.proxy.data_privacy.mask.masking import DataMasker
+from pilot.model.proxy.data_privacy.mask.recovery import StreamingRecovery, recover
+from pilot.model.proxy.data_privacy.sensitive_detection import (
+    AhoCorasick,
+    SensitiveDetector,
+)
+
+
+def test_aho_corasick():
+    automaton = AhoCorasick(["he", "she", "his", "hers", "ushers"])
+    assert automaton.find("ushers said his") == [(0, 6), (12, 15)]
+    # Matches spanning chunks
+    matches, state = automaton.scan("us")
+    assert matches == [] and automaton.depth(state) == 2
+    matches, state = automaton.scan("hers", state)
+    assert (4, 6) in matches and (4, 4) in matches
+
+
+def _detector() -> SensitiveDetector:
+    return SensitiveDetector.from_config(
+        {
+            "terms": {"table": ["orders", "user"], "customer": ["ACME Corp", "华为"]},
+            "patterns": {"account": r"ACC-\d{8}"},
+            "builtin_patterns": ["email"],
+            "ignore_case": True,
+        }
+    )
+
+
+def test_detect():
+    text = (
+        "SELECT * FROM ORDERS o JOIN user u, username WHERE 华为公司 ACC-12345678 a@b.com"
+    )
+    matches = [(text[m.start : m.end], m.category) for m in _detector().detect(text)]
+    assert matches == [
+        ("ORDERS", "table"),
+        ("user", "table"),
+        ("华为", "customer"),
+        ("ACC-12345678", "account"),
+        ("a@b.com", "email"),
+    ]
+    with pytest.raises(ValueError):
+        SensitiveDetector.from_config({"builtin_patterns": ["unknown"]})
+
+
+def test_mask_and_recover():
+    masker = DataMasker(_detector())
+    system, question = masker.mask_texts(
+        ["Tables: orders, user. __TABLE_1__", "Orders of ACME Corp in orders"]
+    )
+    # __TABLE_1__ is already in the text
+    assert system == "Tables: __TABLE_2__, __TABLE_3__. __TABLE_1__"
+    assert question == "__TABLE_4__ of __CUSTOMER_1__ in __TABLE_2__"
+    assert masker.mask("user") == "__TABLE_3__"
+    assert recover(question, masker.mapping) == "Orders of ACME Corp in orders"
+
+    output = "SELECT * FROM __TABLE_2__ WHERE name = '__CUSTOMER_1__' -- __TABLE_9__ __"
+    expected = "SELECT * FROM orders WHERE name = 'ACME Corp' -- __TABLE_9__ __"
+    # Placeholders split at every position
+    for size in range(1, 12):
+        recovery = StreamingRecovery(masker.mapping)
+        chunks = [output[i : i + size] for i in range(0, len(output), size)]
+        assert "".join(recovery.feed(c) for c in chunks) + recovery.flush() == expected
+
+
+@pytest.mark.asyncio
+async def test_proxy_stream_masked(tmp_path):
+    httpx = pytest.importorskip("httpx")
+    from pilot.model.llm_out.proxy_llm import proxyllm_async_generate_stream
+    from pilot.model.proxy.tests.test_transport import (
+        _PARAMS,
+        _chunks,
+        _MockPool,
+        _proxy_model,
+        _sse,
+    )
+    from pilot.scene.base_message import ModelMessage
+
+    config_path = tmp_path / "mask.json"
+    config_path.write_text(json.dumps({"terms": {"table": ["orders"]}}))
+    pool = _MockPool(
+        lambda request: httpx.Response(
+            200,
+            content=_chunks(_sse("FROM __TA", done=False), _sse("BLE_1__;")),
+        )
+    )
+    model = _proxy_model(pool)
+    model.get_params().proxy_data_mask_config = str(config_path)
+    params = {**_PARAMS, "messages": [ModelMessage(role="human", content="orders")]}
+    outputs = [
+        output
+        async for output in proxyllm_async_generate_stream(model, None, params, None)
+    ]
+    assert outputs == ["FROM ", "FROM orders;"]
+    sent = json.loads(pool.requests[0].content)["messages"]
+    assert sent == [{"role": "user", "content": "__TABLE_1__"}]
+    assert params["messages"][0].content == "orders"
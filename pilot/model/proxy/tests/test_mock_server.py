@@ -0,0 +1,74 @@
+"""Run unit test with command: pytest pilot/model/proxy/tests/test_mock_server.py"""
+
+import pytest
+
+httpx = pytest.importorskip("httpx")
+pytest.importorskip("fastapi")
+
+from pilot.model.parameter import MockProxyServerParameters
+from pilot.model.proxy.llms.chatgpt import chatgpt_async_generate_stream
+from pilot.model.proxy.mock_server import create_mock_proxy_app
+from pilot.model.proxy.tests.test_transport import PRIMARY_URL, _PARAMS, _proxy_model
+
+_BODY = {"model": "gpt-4", "messages": [{"role": "user", "content": "hi"}]}
+
+
+def _app(**kwargs):
+    return create_mock_proxy_app(
+        MockProxyServerParameters(
+            ttft=0, tokens_per_second=None, num_tokens=8, **kwargs
+        )
+    )
+
+
+class _AppPool:
+    """HttpClientPool whose clients send the requests to the app"""
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    def async_client(self, url: str) -> httpx.AsyncClient:
+        return httpx.AsyncClient(transport=httpx.ASGITransport(app=self.app))
+
+
+@pytest.mark.asyncio
+async def test_chatgpt_stream():
+    app = _app()
+    model = _proxy_model(_AppPool(app))
+    params = {**_PARAMS, "max_new_tokens": 3}
+    outputs = [
+        output
+        async for output in chatgpt_async_generate_stream(model, None, params, None)
+    ]
+    assert outputs[-1] == "tok0 tok1 tok2 "
+    assert app.state.stats.to_dict() == {
+        "requests": 1,
+        "rejected": 0,
+        "errors": 0,
+        "completed": 1,
+        "tokens": 3,
+    }
+
+
+@pytest.mark.asyncio
+async def test_completion_errors_and_rate_limit():
+    app = _app(
+        error_rate=1.0,
+        error_status_code=500,
+        requests_per_minute=60,
+        rate_limit_burst=1,
+    )
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app)) as client:
+        res = await client.post(PRIMARY_URL, json=_BODY)
+        assert res.status_code == 500
+        assert res.headers["x-ratelimit-remaining-requests"] == "0"
+        res = await client.post(PRIMARY_URL, json=_BODY)
+        assert res.status_code == 429
+        assert 0 < float(res.headers["retry-after"]) <= 1
+    assert app.state.stats.errors == 1
+    assert app.state.stats.rejected == 1
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=_app())) as client:
+        res = (await client.post(PRIMARY_URL, json=_BODY)).json()
+    assert res["choices"][0]["message"]["content"].startswith("tok0 tok1")
+    assert res["usage"]["completion_tokens"] == 8
@@ -0,0 +1,115 @@
+"""Run unit test with command: pytest pilot/model/proxy/tests/test_rate_limit.py"""
+
+import time
+
+import pytest
+
+httpx = pytest.importorskip("httpx")
+
+from pilot.model.proxy.rate_limit import (
+    RateLimiter,
+    RateLimitTimeoutError,
+    TokenBucket,
+    parse_reset_duration,
+)
+from pilot.model.proxy.tests.test_transport import PRIMARY_URL, _MockPool, _sse
+from pilot.model.proxy.transport import ProxyEndpoint, ProxyTransport, RetryPolicy
+
+
+def test_parse_reset_duration():
+    assert parse_reset_duration("6m0s") == 360
+    assert parse_reset_duration("1h2m3.5s") == 3723.5
+    assert parse_reset_duration("20ms") == pytest.approx(0.02)
+    assert parse_reset_duration("1.5") == 1.5
+    assert parse_reset_duration("soon") is None
+    assert parse_reset_duration(None) is None
+
+
+def test_token_bucket_reservations():
+    # 1 request per second, up to 60 at once
+    bucket = TokenBucket(per_minute=60)
+    assert all(bucket.reserve(1) == 0 for _ in range(60))
+    # Waits in line behind each other
+    assert bucket.reserve(1) == pytest.approx(1, abs=0.01)
+    assert bucket.reserve(1) == pytest.approx(2, abs=0.01)
+    bucket.refund(1)
+    assert bucket.reserve(1) == pytest.approx(2, abs=0.01)
+    # Requests larger than the bucket can still go
+    assert TokenBucket(per_minute=100).reserve(1000) == 0
+    # No limit
+    assert TokenBucket().reserve(1000) == 0
+
+
+@pytest.mark.asyncio
+async def test_limits_learned_from_headers():
+    limiter = RateLimiter()
+    assert await limiter.acquire(100) == 0
+    limiter.update_from_headers(
+        {
+            "x-ratelimit-limit-requests": "600",
+            "x-ratelimit-remaining-requests": "0",
+            "x-ratelimit-reset-requests": "100ms",
+            "x-ratelimit-limit-tokens": "6000",
+            "x-ratelimit-remaining-tokens": "5000",
+        }
+    )
+    assert limiter.requests.capacity == 600
+    assert limiter.tokens.capacity == 6000
+    assert limiter.tokens.tokens <= 5000
+    # 10 requests per second
+    assert 0.05 < await limiter.acquire(100) <= 0.1
+
+    # Limits configured by users are kept
+    limiter = RateLimiter(requests_per_minute=30)
+    limiter.update_from_headers({"x-ratelimit-limit-requests": "60"})
+    assert limiter.requests.capacity == 30
+
+
+@pytest.mark.asyncio
+async def test_max_wait():
+    limiter = RateLimiter(requests_per_minute=60, max_wait=0.5)
+    for _ in range(60):
+        await limiter.acquire()
+    with pytest.raises(RateLimitTimeoutError):
+        await limiter.acquire()
+    stats = limiter.stats().to_dict()
+    assert (stats["requests"], stats["delayed"], stats["timeouts"]) == (60, 0, 1)
+    # The rejected request did not take the budget
+    assert limiter.requests.reserve(1) == pytest.approx(1, abs=0.01)
+
+
+def _throttling_handler(num_throttled: int):
+    state = {"throttled": 0}
+
+    def _handler(request):
+        if state["throttled"] < num_throttled:
+            state["throttled"] += 1
+            return httpx.Response(429, headers={"retry-after": "0.02"})
+        return httpx.Response(200, content=_sse("ok"))
+
+    return _handler
+
+
+@pytest.mark.asyncio
+async def test_throttled_requests_wait_instead_of_failing():
+    endpoints = [ProxyEndpoint(PRIMARY_URL, {"model": "gpt-4"})]
+    transport = ProxyTransport(
+        retry_policy=RetryPolicy(max_retries=0),
+        http_client_pool=_MockPool(_throttling_handler(3)),
+        rate_limiter_factory=lambda: RateLimiter(max_wait=5),
+    )
+    start = time.perf_counter()
+    lines = [line async for line in transport.stream_lines(endpoints) if line]
+    assert lines[-1] == "data: [DONE]"
+    assert time.perf_counter() - start >= 0.06
+    stats = transport.rate_limiter_stats()[f"gpt-4@{PRIMARY_URL}"]
+    assert stats["throttled"] == 3
+    assert transport.stats().failed == 0
+
+    # Without rate limiter, a 429 is a failed attempt
+    transport = ProxyTransport(
+        retry_policy=RetryPolicy(max_retries=0),
+        http_client_pool=_MockPool(_throttling_handler(1)),
+    )
+    with pytest.raises(Exception):
+        [line async for line in transport.stream_lines(endpoints)]
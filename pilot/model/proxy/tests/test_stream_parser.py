@@ -0,0 +1,112 @@
+"""Run unit test with command: pytest pilot/model/proxy/tests/test_stream_parser.py"""
+
+import json
+from typing import List
+
+import pytest
+
+from pilot.model.proxy.stream_parser import (
+    NDJSONParser,
+    SSEParser,
+    StreamError,
+    create_delta_extractor,
+    stream_deltas,
+)
+
+_SSE = (
+    b": keep-alive\r\n"
+    b"id: 1\r\n"
+    b"data: first\r\n"
+    b"\r\n"
+    b"event: add\n"
+    b"data:second\n"
+    b"data: line\n"
+    b"\n"
+    b'{"error": "not a stream"}\n'
+)
+
+
+def _events(parser, chunks) -> List:
+    events = []
+    for chunk in chunks:
+        events.extend(parser.feed(chunk))
+    events.extend(parser.close())
+    return [(bytes(e.data), e.event) for e in events]
+
+
+def test_sse_parser():
+    expected = [
+        (b"first", None),
+        (b"second\nline", "add"),
+        (b'{"error": "not a stream"}', "raw"),
+    ]
+    assert _events(SSEParser(), [_SSE]) == expected
+    # Any chunk boundary, even in the middle of \r\n
+    assert _events(SSEParser(), [_SSE[i : i + 1] for i in range(len(_SSE))]) == expected
+    # Pending event at the end of stream
+    assert _events(SSEParser(), [b"data: last"]) == [(b"last", None)]
+
+
+def test_ndjson_parser():
+    chunks = [b'{"text": "a"}\n{"te', b'xt": "b"}\n\n{"done": true}']
+    assert [json.loads(data) for data, _ in _events(NDJSONParser(), chunks)] == [
+        {"text": "a"},
+        {"text": "b"},
+        {"done": True},
+    ]
+
+
+async def _chunks(*chunks: bytes):
+    for chunk in chunks:
+        yield chunk
+
+
+async def _deltas(stream_format: str, *chunks: bytes) -> List[str]:
+    return [d async for d in stream_deltas(_chunks(*chunks), stream_format)]
+
+
+def _openai_event(content: str) -> bytes:
+    obj = {"choices": [{"delta": {"content": content}}]}
+    return b"data: " + json.dumps(obj).encode("utf-8") + b"\n\n"
+
+
+@pytest.mark.asyncio
+async def test_openai_deltas_batched_per_chunk():
+    chunks = [
+        _openai_event("Hello") + _openai_event(","),
+        _openai_event(" 世界")[:20],
+        _openai_event(" 世界")[20:] + b"data: [DONE]\n\n",
+        _openai_event("after done"),
+    ]
+    assert await _deltas("openai", *chunks) == ["Hello,", " 世界"]
+    with pytest.raises(StreamError, match="invalid api key"):
+        await _deltas("openai", b'{"error": {"message": "invalid api key"}}\n')
+
+
+@pytest.mark.asyncio
+async def test_provider_framings():
+    claude = (
+        b"event: message_start\ndata: {}\n\n"
+        b'event: content_block_delta\ndata: {"delta": {"text": "Hi"}}\n\n'
+        b"event: message_stop\ndata: {}\n\n"
+    )
+    assert await _deltas("claude", claude) == ["Hi"]
+    # Tongyi sends the full text generated so far
+    tongyi = [
+        b'data:{"output": {"text": "Hel", "finish_reason": "null"}}\n\n',
+        b'data:{"output": {"text": "Hello", "finish_reason": "stop"}}\n\n',
+    ]
+    assert await _deltas("tongyi", *tongyi) == ["Hel", "lo"]
+    zhipu = (
+        b"event: add\ndata: Hi\n\nevent: add\ndata:  there\n\nevent: finish\ndata:\n\n"
+    )
+    assert await _deltas("zhipu", zhipu) == ["Hi there"]
+    wenxin = b'data: {"result": "Hi", "is_end": true}\n\n'
+    assert await _deltas("wenxin", wenxin) == ["Hi"]
+    with pytest.raises(StreamError, match="110"):
+        await _deltas("wenxin", b'{"error_code": 110, "error_msg": "token"}')
+    assert await _deltas("ndjson", b'{"text": "a"}\n{"text": "b", "done": true}\n') == [
+        "ab"
+    ]
+    with pytest.raises(ValueError):
+        create_delta_extractor("unknown")
@@ -0,0 +1,169 @@
+"""Run unit test with command: pytest pilot/model/proxy/tests/test_transport.py"""
+
+import json
+from typing import Callable, List
+
+import pytest
+
+httpx = pytest.importorskip("httpx")
+
+from pilot.model.parameter import ProxyModelParameters
+from pilot.model.proxy.llms.chatgpt import (
+    chatgpt_async_generate_stream,
+    chatgpt_generate_stream,
+)
+from pilot.model.proxy.llms.proxy_model import ProxyModel
+from pilot.model.proxy.transport import (
+    ProxyEndpoint,
+    ProxyRequestError,
+    ProxyTransport,
+    RetryPolicy,
+)
+from pilot.scene.base_message import ModelMessage
+
+PRIMARY_URL = "http://primary/v1/chat/completions"
+FAILOVER_URL = "http://failover/v1/chat/completions"
+
+
+class _MockPool:
+    """HttpClientPool whose clients send the requests to handler"""
+
+    def __init__(self, handler: Callable[[httpx.Request], httpx.Response]) -> None:
+        self.handler = handler
+        self.requests: List[httpx.Request] = []
+
+    def _handle(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(request)
+        return self.handler(request)
+
+    def async_client(self, url: str) -> httpx.AsyncClient:
+        return httpx.AsyncClient(transport=httpx.MockTransport(self._handle))
+
+
+def _sse(*contents: str, done: bool = True) -> bytes:
+    lines = [
+        "data: " + json.dumps({"choices": [{"delta": {"content": content}}]})
+        for content in contents
+    ]
+    if done:
+        lines.append("data: [DONE]")
+    return ("\n\n".join(lines) + "\n\n").encode("utf-8")
+
+
+def _transport(pool: _MockPool, max_retries: int = 3) -> ProxyTransport:
+    return ProxyTransport(
+        retry_policy=RetryPolicy(max_retries=max_retries, backoff_base=0.001),
+        http_client_pool=pool,
+    )
+
+
+async def _lines(transport: ProxyTransport, endpoints) -> List[str]:
+    return [line async for line in transport.stream_lines(endpoints) if line]
+
+
+@pytest.mark.asyncio
+async def test_retry_before_first_byte():
+    statuses = [429, 503]
+
+    def _handler(request):
+        if statuses:
+            return httpx.Response(statuses.pop(0), text="busy")
+        return httpx.Response(200, content=_sse("hello"))
+
+    pool = _MockPool(_handler)
+    transport = _transport(pool)
+    lines = await _lines(transport, [ProxyEndpoint(PRIMARY_URL, {})])
+    assert lines[-1] == "data: [DONE]"
+    assert len(pool.requests) == 3
+    stats = transport.stats().to_dict()
+    assert stats == {"requests": 1, "retries": 2, "failovers": 0, "failed": 0}
+
+
+@pytest.mark.asyncio
+async def test_fail_over_to_secondary():
+    def _handler(request):
+        if request.url.host == "primary":
+            raise httpx.ConnectError("connection refused")
+        return httpx.Response(200, text="answer from failover")
+
+    pool = _MockPool(_handler)
+    transport = _transport(pool, max_retries=1)
+    endpoints = [ProxyEndpoint(PRIMARY_URL, {}), ProxyEndpoint(FAILOVER_URL, {})]
+    assert await transport.post(endpoints) == "answer from failover"
+    assert [r.url.host for r in pool.requests] == ["primary", "primary", "failover"]
+    assert transport.stats().failovers == 1
+
+
+@pytest.mark.asyncio
+async def test_client_errors_not_retried():
+    pool = _MockPool(lambda request: httpx.Response(401, text="invalid api key"))
+    transport = _transport(pool)
+    with pytest.raises(ProxyRequestError) as exc_info:
+        await _lines(transport, [ProxyEndpoint(PRIMARY_URL, {})])
+    assert exc_info.value.status_code == 401
+    assert "invalid api key" in str(exc_info.value)
+    assert len(pool.requests) == 1
+    assert transport.stats().failed == 1
+
+
+def _proxy_model(pool: _MockPool) -> ProxyModel:
+    model = ProxyModel(
+        ProxyModelParameters(
+            model_name="chatgpt_proxyllm",
+            model_path="chatgpt_proxyllm",
+            proxy_server_url=PRIMARY_URL,
+            proxy_api_key="primary-key",
+            proxyllm_backend="gpt-4",
+            proxy_failover_server_url=FAILOVER_URL,
+            proxy_failover_api_key="failover-key",
+            proxy_failover_backend="gpt-3.5-turbo",
+        )
+    )
+    model._transport = _transport(pool, max_retries=0)
+    return model
+
+
+_PARAMS = {
+    "messages": [ModelMessage(role="human", content="hi")],
+    "temperature": 0.7,
+    "max_new_tokens": 16,
+}
+
+
+@pytest.mark.asyncio
+async def test_chatgpt_stream_fails_over():
+    def _handler(request):
+        if request.url.host == "primary":
+            return httpx.Response(502)
+        return httpx.Response(200, content=_sse("Hello", " world"))
+
+    pool = _MockPool(_handler)
+    model = _proxy_model(pool)
+    outputs = [
+        output
+        async for output in chatgpt_async_generate_stream(model, None, _PARAMS, None)
+    ]
+    assert outputs[-1] == "Hello world"
+    failover_request = pool.requests[-1]
+    assert failover_request.headers["Authorization"] == "Bearer failover-key"
+    assert json.loads(failover_request.content)["model"] == "gpt-3.5-turbo"
+
+
+async def _chunks(*chunks: bytes):
+    for chunk in chunks:
+        yield chunk
+
+
+def test_sync_generate_stream():
+    pool = _MockPool(
+        lambda request: httpx.Response(
+            200, content=_chunks(_sse("a", done=False), _sse("b"))
+        )
+    )
+    model = _proxy_model(pool)
+    outputs = list(chatgpt_generate_stream(model, None, _PARAMS, None))
+    assert outputs[-1] == "ab"
+    # Closing the sync stream in the middle closes the async one
+    stream = chatgpt_generate_stream(model, None, _PARAMS, None)
+    assert next(stream) == "a"
+    stream.close()
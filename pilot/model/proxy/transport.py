@@ -0,0 +1,308 @@
+"""Shared HTTP transport of proxy LLMs.
+
+Requests go through the pooled keep-alive ``httpx.AsyncClient`` of
+:mod:`pilot.utils.http_client`, so a stream does not pay a TCP/TLS handshake and
+does not hold a thread while it waits for tokens. Until the first byte of the response
+has been received, 429, 5xx and connection errors are retried with exponential
+backoff, then the request fails over to the next configured endpoint. After the first
+byte nothing is retried, the caller has already seen a part of the answer.
+"""
+
+import asyncio
+import logging
+import random
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+from typing import (
+    TYPE_CHECKING,
+    AsyncIterator,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+)
+
+from pilot.utils.http_client import HttpClientPool, get_http_client_pool
+
+if TYPE_CHECKING:
+    from pilot.model.proxy.rate_limit import RateLimiter
+
+logger = logging.getLogger(__name__)
+
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+
+class ProxyRequestError(Exception):
+    """All endpoints of a proxy request failed before the first byte"""
+
+    def __init__(self, message: str, status_code: Optional[int] = None) -> None:
+        super().__init__(message)
+        self.status_code = status_code
+
+
+@dataclass
+class ProxyEndpoint:
+    """One backend which can serve a request, e.g. the primary or the failover one"""
+
+    url: str
+    payload: Dict
+    headers: Dict[str, str] = field(default_factory=dict)
+    # Tokens of prompt and completion, for the token budget of rate limiter
+    estimated_tokens: int = 0
+
+    @property
+    def backend_key(self) -> Tuple[str, Optional[str]]:
+        """Rate limits are per server and model"""
+        return self.url, self.payload.get("model")
+
+
+@dataclass
+class RetryPolicy:
+    max_retries: int = 3
+    backoff_base: float = 0.5
+    backoff_max: float = 8.0
+    retry_status_codes: tuple = RETRY_STATUS_CODES
+
+    def backoff(self, attempt: int, retry_after: Optional[str] = None) -> float:
+        """Seconds to wait before the retry after ``attempt`` failed attempts"""
+        if retry_after:
+            try:
+                return min(float(retry_after), self.backoff_max)
+            except ValueError:
+                # HTTP date, use our own backoff
+                pass
+        delay = min(self.backoff_max, self.backoff_base * (2 ** (attempt - 1)))
+        # Full jitter, clients rejected together do not retry together
+        return random.uniform(delay / 2, delay)
+
+
+@dataclass
+class ProxyTransportStats:
+    requests: int = 0
+    retries: int = 0
+    failovers: int = 0
+    failed: int = 0
+
+    def to_dict(self) -> Dict:
+        return asdict(self)
+
+
+class _RetryableError(Exception):
+    def __init__(self, message: str, status_code: Optional[int] = None, response=None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.response = response
+
+
+class ProxyTransport:
+    """Send proxy LLM requests with retries and failover over pooled connections"""
+
+    def __init__(
+        self,
+        retry_policy: Optional[RetryPolicy] = None,
+        timeout: Optional[float] = None,
+        http_client_pool: Optional[HttpClientPool] = None,
+        rate_limiter_factory: Optional[Callable[[], "RateLimiter"]] = None,
+    ) -> None:
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.timeout = timeout
+        self._http_client_pool = http_client_pool
+        self._rate_limiter_factory = rate_limiter_factory
+        self._rate_limiters: Dict[Tuple[str, Optional[str]], "RateLimiter"] = {}
+        self._stats = ProxyTransportStats()
+
+    def _rate_limiter(self, endpoint: ProxyEndpoint) -> Optional["RateLimiter"]:
+        if not self._rate_limiter_factory:
+            return None
+        key = endpoint.backend_key
+        limiter = self._rate_limiters.get(key)
+        if limiter is None:
+            limiter = self._rate_limiter_factory()
+            self._rate_limiters[key] = limiter
+        return limiter
+
+    def _client(self, url: str):
+        pool = self._http_client_pool or get_http_client_pool()
+        return pool.async_client(url)
+
+    async def _send(self, endpoint: ProxyEndpoint, stream: bool):
+        import httpx
+
+        limiter = self._rate_limiter(endpoint)
+        if limiter:
+            # Wait in line instead of being rejected by the backend
+            await limiter.acquire(endpoint.estimated_tokens)
+        client = self._client(endpoint.url)
+        kwargs = {"timeout": self.timeout} if self.timeout else {}
+        request = client.build_request(
+            "POST",
+            endpoint.url,
+            json=endpoint.payload,
+            headers=endpoint.headers,
+            **kwargs,
+        )
+        try:
+            response = await client.send(request, stream=stream)
+        except httpx.TransportError as e:
+            raise _RetryableError(f"{type(e).__name__}: {e}") from e
+        if limiter:
+            limiter.update_from_headers(response.headers)
+        if response.status_code >= 400:
+            body = await response.aread()
+            await response.aclose()
+            message = (
+                f"Proxy request to {endpoint.url} failed, status code: "
+                f"{response.status_code}, body: {body[:512].decode('utf-8', 'replace')}"
+            )
+            if response.status_code in self.retry_policy.retry_status_codes:
+                raise _RetryableError(message, response.status_code, response)
+            raise ProxyRequestError(message, response.status_code)
+        return response
+
+    async def _with_retries(self, endpoints: List[ProxyEndpoint], attempt_func):
+        """Run attempt_func(endpoint) with retries on each endpoint in order"""
+        if not endpoints:
+            raise ValueError("No proxy endpoint to send the request")
+        self._stats.requests += 1
+        last_error: Optional[Exception] = None
+        for index, endpoint in enumerate(endpoints):
+            if index > 0:
+                self._stats.failovers += 1
+                logger.warning(
+                    f"Fail over to {endpoint.url} after error: {str(last_error)}"
+                )
+            attempt, throttled_deadline = 0, None
+            while True:
+                try:
+                    return await attempt_func(endpoint)
+                except _RetryableError as e:
+                    last_error = e
+                    logger.info(f"Proxy request attempt {attempt + 1} failed: {e}")
+                except ProxyRequestError as e:
+                    # Not worth retrying, maybe the next endpoint accepts it
+                    last_error = e
+                    break
+                retry_after = None
+                if last_error.response is not None:
+                    retry_after = last_error.response.headers.get("retry-after")
+                limiter = self._rate_limiter(endpoint)
+                if (
+                    last_error.status_code == 429
+                    and limiter
+                    and limiter.max_wait is not None
+                ):
+                    # Throttled, wait in the line of rate limiter until max_wait
+                    now = time.monotonic()
+                    throttled_deadline = throttled_deadline or now + limiter.max_wait
+                    if now < throttled_deadline:
+                        self._stats.retries += 1
+                        limiter.throttled(
+                            self.retry_policy.backoff(attempt + 1, retry_after)
+                        )
+                        continue
+                attempt += 1
+                if attempt > self.retry_policy.max_retries:
+                    break
+                self._stats.retries += 1
+                await asyncio.sleep(self.retry_policy.backoff(attempt, retry_after))
+        self._stats.failed += 1
+        raise ProxyRequestError(
+            str(last_error), getattr(last_error, "status_code", None)
+        ) from last_error
+
+    async def post(self, endpoints: List[ProxyEndpoint]) -> str:
+        """Send a non-streaming request, return the text of response"""
+
+        async def _attempt(endpoint: ProxyEndpoint) -> str:
+            response = await self._send(endpoint, stream=False)
+            return response.text
+
+        return await self._with_retries(endpoints, _attempt)
+
+    async def _stream(self, endpoints: List[ProxyEndpoint], iter_func):
+        async def _attempt(endpoint: ProxyEndpoint):
+            import httpx
+
+            response = await self._send(endpoint, stream=True)
+            items = iter_func(response)
+            try:
+                # The first chunk is still retryable
+                first = await items.__anext__()
+            except StopAsyncIteration:
+                first = None
+            except httpx.TransportError as e:
+                await response.aclose()
+                raise _RetryableError(f"{type(e).__name__}: {e}") from e
+            return response, items, first
+
+        response, items, first = await self._with_retries(endpoints, _attempt)
+        try:
+            if first is None:
+                return
+            yield first
+            async for item in items:
+                yield item
+        finally:
+            await response.aclose()
+
+    def stream_bytes(self, endpoints: List[ProxyEndpoint]) -> AsyncIterator[bytes]:
+        """Send a streaming request, yield the chunks of response as they arrive.
+
+        Closing this generator closes the connection, so the proxy server stops
+        generating. See ``stream_parser.stream_deltas`` to parse the chunks.
+        """
+        return self._stream(endpoints, lambda response: response.aiter_bytes())
+
+    def stream_lines(self, endpoints: List[ProxyEndpoint]) -> AsyncIterator[str]:
+        """Send a streaming request, yield the lines of response"""
+        return self._stream(endpoints, lambda response: response.aiter_lines())
+
+    def stats(self) -> ProxyTransportStats:
+        return ProxyTransportStats(**asdict(self._stats))
+
+    def rate_limiter_stats(self) -> Dict[str, Dict]:
+        """Queue depth and wait time of the rate limiter of each backend"""
+        return {
+            f"{model}@{url}" if model else url: limiter.stats().to_dict()
+            for (url, model), limiter in list(self._rate_limiters.items())
+        }
+
+
+_background_loop: Optional[asyncio.AbstractEventLoop] = None
+_background_loop_lock = threading.Lock()
+
+
+def _get_background_loop() -> asyncio.AbstractEventLoop:
+    global _background_loop
+    if _background_loop is None:
+        with _background_loop_lock:
+            if _background_loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(
+                    target=loop.run_forever, name="proxy-transport", daemon=True
+                ).start()
+                _background_loop = loop
+    return _background_loop
+
+
+def iterate_in_background_loop(stream: AsyncIterator) -> Iterator:
+    """Iterate an async stream from sync code.
+
+    All sync callers share one background event loop, so they also share the pooled
+    connections of that loop. Closing the returned generator closes the async stream.
+    """
+    loop = _get_background_loop()
+    try:
+        while True:
+            try:
+                yield asyncio.run_coroutine_threadsafe(
+                    stream.__anext__(), loop
+                ).result()
+            except StopAsyncIteration:
+                return
+    finally:
+        # Not waited, a stream closed at interpreter exit must not block it
+        asyncio.run_coroutine_threadsafe(stream.aclose(), loop)
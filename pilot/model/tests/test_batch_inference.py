@@ -0,0 +1,150 @@
+"""
+Run unit test with command: pytest pilot/model/tests/test_batch_inference.py
+"""
+
+import threading
+import time
+
+import pytest
+
+torch = pytest.importorskip("torch")
+transformers = pytest.importorskip("transformers")
+
+from pilot.model.batch_inference import ContinuousBatchingScheduler
+from pilot.model.cancellation import cancellation_counter
+from pilot.model.inference import generate_stream
+
+
+class _CharTokenizer:
+    """Tokenizer maps every character to one token, 0 is the eos token"""
+
+    eos_token_id = 0
+
+    class _Encoding:
+        def __init__(self, input_ids):
+            self.input_ids = input_ids
+
+    def __call__(self, text: str):
+        return self._Encoding([1 + ord(c) % 200 for c in text])
+
+    def decode(self, ids, **kwargs) -> str:
+        return "".join(chr(ord("a") + i % 26) for i in ids if i != self.eos_token_id)
+
+
+@pytest.fixture(scope="module")
+def model():
+    from transformers import LlamaConfig, LlamaForCausalLM
+
+    torch.manual_seed(0)
+    config = LlamaConfig(
+        vocab_size=256,
+        hidden_size=64,
+        intermediate_size=128,
+        num_hidden_layers=2,
+        num_attention_heads=4,
+        num_key_value_heads=4,
+    )
+    return LlamaForCausalLM(config).eval()
+
+
+def _params(prompt: str, max_new_tokens: int = 32):
+    return {
+        "prompt": prompt,
+        "temperature": 0,
+        "max_new_tokens": max_new_tokens,
+        "echo": False,
+    }
+
+
+def _run_concurrently(scheduler, params_list):
+    results = [None] * len(params_list)
+
+    def _run(i):
+        results[i] = list(scheduler.generate_stream(params_list[i]))
+
+    threads = [threading.Thread(target=_run, args=(i,)) for i in range(len(results))]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results
+
+
+@pytest.fixture
+def scheduler(model):
+    scheduler = ContinuousBatchingScheduler(
+        model, _CharTokenizer(), "cpu", 2048, max_batch_size=4
+    )
+    scheduler.start()
+    yield scheduler
+    scheduler.stop()
+
+
+def test_same_output_as_generate_stream(model, scheduler):
+    # Different prompt lengths and output lengths, more requests than max_batch_size
+    params_list = [
+        _params("hello world " * (i + 1), max_new_tokens=8 + 4 * i) for i in range(6)
+    ]
+    expected = [
+        list(generate_stream(model, _CharTokenizer(), params, "cpu", 2048))
+        for params in params_list
+    ]
+    assert _run_concurrently(scheduler, params_list) == expected
+
+
+def test_stop_str(model, scheduler):
+    params = _params("hello world")
+    output = list(generate_stream(model, _CharTokenizer(), params, "cpu", 2048))[-1]
+    stop = output[5:7]
+    params["stop"] = stop
+    expected = list(generate_stream(model, _CharTokenizer(), params, "cpu", 2048))
+    assert list(scheduler.generate_stream(params)) == expected
+    assert expected[-1] == output[: output.find(stop)]
+
+
+def test_close_stream_retire_sequence(scheduler):
+    cancellation_counter.reset()
+    stream = scheduler.generate_stream(_params("hello world", max_new_tokens=1000))
+    next(stream)
+    stream.close()
+    # The cancelled sequence is retired at the next decode step
+    for _ in range(100):
+        if cancellation_counter.stats().cancelled:
+            break
+        time.sleep(0.01)
+    assert not scheduler._running
+    stats = cancellation_counter.stats()
+    assert stats.cancelled == 1
+    assert 0 < stats.generated_tokens < 100
+    assert stats.saved_tokens == 1000 - stats.generated_tokens
+
+
+def test_close_generate_stream_records_saved_tokens(model):
+    cancellation_counter.reset()
+    stream = generate_stream(
+        model, _CharTokenizer(), _params("hello world", 100), "cpu", 2048
+    )
+    next(stream)
+    next(stream)
+    stream.close()
+    # Outputs are yielded every two tokens
+    assert cancellation_counter.stats().to_dict() == {
+        "cancelled": 1,
+        "generated_tokens": 3,
+        "saved_tokens": 97,
+    }
+
+
+def test_throughput_higher_than_serial_loop(model, scheduler):
+    params_list = [
+        _params("hello world " * (i + 1), max_new_tokens=32) for i in range(4)
+    ]
+    start = time.perf_counter()
+    for params in params_list:
+        list(generate_stream(model, _CharTokenizer(), params, "cpu", 2048))
+    serial_cost = time.perf_counter() - start
+
+    start = time.perf_counter()
+    _run_concurrently(scheduler, params_list)
+    batch_cost = time.perf_counter() - start
+    assert batch_cost < serial_cost
@@ -0,0 +1,170 @@
+"""
+Run unit test with command: pytest pilot/model/tests/test_context_window.py
+"""
+
+from types import SimpleNamespace
+
+import pytest
+
+from pilot.model.base import MODEL_CONTEXT_OVERFLOW_ERROR_CODE
+from pilot.model.context_window import (
+    ContextOverflowError,
+    create_context_overflow_strategy,
+    discover_context_len,
+    drop_oldest_rounds,
+    estimate_tokens,
+)
+from pilot.scene.base_message import ModelMessage
+
+
+def _message(role: str, content: str) -> ModelMessage:
+    return ModelMessage(role=role, content=content)
+
+
+_MESSAGES = [
+    _message("system", "You are a database expert"),
+    _message("human", "round one"),
+    _message("ai", "answer one"),
+    _message("human", "round two"),
+    _message("ai", "answer two"),
+    _message("human", "the question"),
+]
+
+
+def _count_words(messages) -> int:
+    return sum(len(m.content.split()) for m in messages)
+
+
+def test_discover_context_len():
+    config = SimpleNamespace(max_position_embeddings=4096)
+    assert discover_context_len(SimpleNamespace(config=config)) == 4096
+    config = SimpleNamespace(
+        max_position_embeddings=4096, rope_scaling={"type": "linear", "factor": 2.0}
+    )
+    assert discover_context_len(SimpleNamespace(config=config)) == 8192
+    # e.g. chatglm
+    config = SimpleNamespace(seq_length=32768)
+    assert discover_context_len(SimpleNamespace(config=config)) == 32768
+
+    # llama.cpp model, loaded with n_ctx
+    llama_cpp_model = SimpleNamespace(model=SimpleNamespace(n_ctx=lambda: 3072))
+    assert discover_context_len(llama_cpp_model) == 3072
+
+    model = SimpleNamespace(config=SimpleNamespace())
+    assert discover_context_len(model, SimpleNamespace(model_max_length=1024)) == 1024
+    # Tokenizers without a limit
+    tokenizer = SimpleNamespace(model_max_length=int(1e30))
+    assert discover_context_len(model, tokenizer) is None
+    model_params = SimpleNamespace(max_context_size=8000)
+    assert discover_context_len(object(), None, model_params) == 8000
+
+
+def test_drop_oldest_rounds():
+    assert drop_oldest_rounds(_MESSAGES, _count_words, 100) == _MESSAGES
+    assert (
+        drop_oldest_rounds(_MESSAGES, _count_words, 12)
+        == [_MESSAGES[0]] + _MESSAGES[3:]
+    )
+    # The system message and the last round are never dropped
+    assert drop_oldest_rounds(_MESSAGES, _count_words, 1) == [
+        _MESSAGES[0],
+        _MESSAGES[-1],
+    ]
+
+
+def test_overflow_strategies():
+    truncate = create_context_overflow_strategy("truncate")
+    assert truncate.fit(_MESSAGES, _count_words, 1) == _MESSAGES
+    drop_oldest = create_context_overflow_strategy("drop_oldest")
+    assert len(drop_oldest.fit(_MESSAGES, _count_words, 12)) == 4
+    reject = create_context_overflow_strategy("reject")
+    assert reject.fit(_MESSAGES, _count_words, 100) == _MESSAGES
+    with pytest.raises(ContextOverflowError):
+        reject.fit(_MESSAGES, _count_words, 10)
+    with pytest.raises(ValueError):
+        create_context_overflow_strategy("summarize")
+
+
+def test_estimate_tokens():
+    assert estimate_tokens("") == 0
+    assert estimate_tokens("select") == 2
+    assert estimate_tokens("数据库") == 3
+
+
+class _WordTokenizer:
+    def __init__(self) -> None:
+        self.encoded_words = 0
+
+    def encode(self, text: str):
+        words = text.split()
+        self.encoded_words += len(words)
+        return words
+
+
+class _ChatAdapter:
+    """Joins the contents of messages into the prompt"""
+
+    def __init__(self) -> None:
+        self.calls = 0
+
+    def model_adaptation(self, params, model_path, prompt_template=None):
+        self.calls += 1
+        if params.get("messages"):
+            params["prompt"] = " ".join(m.content for m in params["messages"])
+        return params, {}
+
+
+def _worker(strategy: str, context_len: int):
+    from pilot.model.cluster.worker.default_worker import DefaultModelWorker
+
+    worker = DefaultModelWorker()
+    worker.llm_chat_adapter = _ChatAdapter()
+    worker.ml = SimpleNamespace(model_path="fake", prompt_template=None)
+    worker.tokenizer = _WordTokenizer()
+    worker.context_len = context_len
+    worker._overflow_strategy = create_context_overflow_strategy(strategy)
+    return worker
+
+
+def test_worker_fits_prompt_before_generation():
+    params = {"prompt": "", "messages": _MESSAGES, "max_new_tokens": 5}
+    # 12 prompt tokens at most
+    worker = _worker("drop_oldest", 18)
+    adapted, _ = worker._prepare_params(dict(params))
+    assert (
+        adapted["prompt"]
+        == "You are a database expert round two answer two the question"
+    )
+
+    worker = _worker("reject", 18)
+    worker.generate_stream_func = lambda *args: pytest.fail("Must not generate")
+    worker._batch_scheduler = None
+    outputs = list(worker.generate_stream(dict(params)))
+    assert len(outputs) == 1
+    assert outputs[0].error_code == MODEL_CONTEXT_OVERFLOW_ERROR_CODE
+
+    # Fits in a larger context
+    worker = _worker("reject", 64)
+    adapted, _ = worker._prepare_params(dict(params))
+    assert adapted["prompt"].startswith("You are a database expert round one")
+
+
+def test_worker_drops_many_rounds_in_linear_time():
+    rounds = 200
+    messages = [_message("system", "You are a database expert")]
+    for i in range(rounds):
+        messages += [_message("human", f"question {i}"), _message("ai", f"answer {i}")]
+    messages.append(_message("human", "the question"))
+    params = {"prompt": "", "messages": messages, "max_new_tokens": 5}
+    # The system message, the last question and the last 3 rounds
+    worker = _worker("drop_oldest", 5 + 5 + 2 + 3 * 4 + 1)
+    adapted, _ = worker._prepare_params(dict(params))
+    assert adapted["prompt"] == (
+        "You are a database expert question 197 answer 197 question 198 "
+        "answer 198 question 199 answer 199 the question"
+    )
+    # Adapted once to count the tokens of template, once for the fitted messages
+    assert worker.llm_chat_adapter.calls == 2
+    total_words = sum(len(m.content.split()) for m in messages)
+    # The full prompt and each message are tokenized once
+    assert worker.tokenizer.encoded_words == total_words * 2
@@ -0,0 +1,142 @@
+"""
+Run unit test with command: pytest pilot/model/tests/test_detokenizer.py
+"""
+
+import json
+import random
+
+import pytest
+
+tokenizers = pytest.importorskip("tokenizers")
+transformers = pytest.importorskip("transformers")
+
+from pilot.model.detokenizer import IncrementalDetokenizer, StopStringScanner
+from pilot.model.llm_utils import is_partial_stop
+
+_CORPUS = [
+    "The quick brown fox jumps over the lazy dog. SELECT name, sum(amount) FROM "
+    "orders GROUP BY name; 数据库 查询 表格 émigré naïve ✅ 🚀 It's done, isn't it?"
+] * 20
+
+_DECODE_KWARGS = dict(
+    skip_special_tokens=True,
+    spaces_between_special_tokens=False,
+    clean_up_tokenization_spaces=True,
+)
+
+
+def _byte_level_tokenizer():
+    from tokenizers import Tokenizer, decoders, models, pre_tokenizers, trainers
+
+    tokenizer = Tokenizer(models.BPE())
+    tokenizer.pre_tokenizer = pre_tokenizers.ByteLevel(add_prefix_space=False)
+    tokenizer.decoder = decoders.ByteLevel()
+    trainer = trainers.BpeTrainer(
+        vocab_size=400,
+        special_tokens=["</s>"],
+        initial_alphabet=pre_tokenizers.ByteLevel.alphabet(),
+    )
+    tokenizer.train_from_iterator(_CORPUS, trainer)
+    return transformers.PreTrainedTokenizerFast(
+        tokenizer_object=tokenizer, eos_token="</s>"
+    )
+
+
+def _sentencepiece_tokenizer():
+    """Llama style tokenizer, metaspace and byte fallback for unknown characters"""
+    from tokenizers import Tokenizer, decoders, models, normalizers, pre_tokenizers
+    from tokenizers import trainers
+
+    tokenizer = Tokenizer(models.BPE(unk_token="<unk>"))
+    tokenizer.normalizer = normalizers.Replace(" ", "▁")
+    tokenizer.pre_tokenizer = pre_tokenizers.Metaspace(
+        replacement="▁", prepend_scheme="first", split=False
+    )
+    tokenizer.decoder = decoders.Sequence(
+        [
+            decoders.Replace("▁", " "),
+            decoders.ByteFallback(),
+            decoders.Fuse(),
+            decoders.Strip(" ", 1, 0),
+        ]
+    )
+    trainer = trainers.BpeTrainer(vocab_size=400, special_tokens=["<unk>", "</s>"])
+    tokenizer.train_from_iterator(_CORPUS, trainer)
+    # Byte tokens are normal tokens of the vocab, not special ones
+    model = json.loads(tokenizer.to_str())["model"]
+    vocab = model["vocab"]
+    for i in range(256):
+        vocab[f"<0x{i:02X}>"] = len(vocab)
+    tokenizer.model = models.BPE(
+        vocab,
+        [tuple(merge) for merge in model["merges"]],
+        unk_token="<unk>",
+        byte_fallback=True,
+    )
+    return transformers.PreTrainedTokenizerFast(
+        tokenizer_object=tokenizer, eos_token="</s>", unk_token="<unk>"
+    )
+
+
+@pytest.fixture(
+    scope="module", params=[_byte_level_tokenizer, _sentencepiece_tokenizer]
+)
+def tokenizer(request):
+    return request.param()
+
+
+@pytest.mark.parametrize("echo", [True, False])
+def test_same_text_as_full_decode(tokenizer, echo):
+    rng = random.Random(42)
+    # Characters out of the corpus are split into bytes
+    words = _CORPUS[0].split() + ["€", "日本語", "😀😀", "...", " .", "\n"]
+    prompt_ids = tokenizer("Question: 数据库 🚀").input_ids
+    for _ in range(20):
+        text = " ".join(rng.choice(words) for _ in range(60))
+        output_ids = list(prompt_ids)
+        detokenizer = IncrementalDetokenizer(tokenizer, prompt_ids, echo)
+        generated = tokenizer(text).input_ids + [tokenizer.eos_token_id]
+        for i, token in enumerate(generated):
+            output_ids.append(token)
+            final = i == len(generated) - 1
+            if final or rng.random() < 0.5:
+                output = detokenizer.decode(output_ids, final=final)
+                assert "�" not in output
+        expected = tokenizer.decode(
+            output_ids if echo else output_ids[len(prompt_ids) :], **_DECODE_KWARGS
+        )
+        assert output == expected
+
+
+def _full_scan(output: str, stop_str, start: int):
+    """Stop string search of the whole text, as the decoding loops did before"""
+    stop_strs = [stop_str] if isinstance(stop_str, str) else stop_str
+    for stop in stop_strs:
+        pos = output.rfind(stop, start)
+        if pos != -1:
+            return pos, False
+        if is_partial_stop(output, stop):
+            return -1, True
+    return -1, False
+
+
+@pytest.mark.parametrize("stop_str", ["###", ["</s>", "Human:", "\n\n"]])
+def test_stop_scanner_same_as_full_scan(stop_str):
+    rng = random.Random(7)
+    pieces = ["a", "b ", "#", "##", "Hu", "man", ":", "</", "s>", "\n", " ok"]
+    for _ in range(200):
+        start = rng.randint(0, 3)
+        scanner = StopStringScanner(stop_str, start)
+        text = "".join(rng.choice(pieces) for _ in range(start))
+        while True:
+            text += "".join(rng.choice(pieces) for _ in range(rng.randint(1, 3)))
+            result = scanner.scan(text)
+            assert result == _full_scan(text, stop_str, start)
+            if result[0] != -1 or len(text) > 200:
+                break
+
+
+def test_stop_scanner_invalid_stop():
+    with pytest.raises(ValueError):
+        StopStringScanner(42)
+    assert StopStringScanner(None).scan("anything") == (-1, False)
@@ -0,0 +1,146 @@
+"""
+Run unit test with command: pytest pilot/model/tests/test_prefix_cache.py
+"""
+
+import statistics
+import time
+
+import pytest
+
+torch = pytest.importorskip("torch")
+transformers = pytest.importorskip("transformers")
+
+from pilot.model.batch_inference import ContinuousBatchingScheduler
+from pilot.model.inference import generate_stream
+from pilot.model.prefix_cache import PrefixKVCache
+from pilot.model.tests.test_batch_inference import _CharTokenizer, _params
+
+_SYSTEM_PROMPT = (
+    "You are a database expert. Use the following tables to answer the question. "
+    "CREATE TABLE orders (id int, region text, amount float, month int); "
+) * 12
+
+
+@pytest.fixture(scope="module")
+def model():
+    from transformers import LlamaConfig, LlamaForCausalLM
+
+    torch.manual_seed(0)
+    config = LlamaConfig(
+        vocab_size=256,
+        hidden_size=128,
+        intermediate_size=256,
+        num_hidden_layers=4,
+        num_attention_heads=4,
+        num_key_value_heads=4,
+        max_position_embeddings=4096,
+    )
+    return LlamaForCausalLM(config).eval()
+
+
+def _fake_cache(num_tokens: int, num_layers: int = 2):
+    """Legacy cache, the values are the token positions"""
+    positions = torch.arange(num_tokens, dtype=torch.float32)
+    tensor = positions.view(1, 1, num_tokens, 1).expand(1, 2, num_tokens, 4)
+    return tuple((tensor.clone(), tensor.clone()) for _ in range(num_layers))
+
+
+def test_match_longest_block_aligned_prefix():
+    cache = PrefixKVCache(block_size=4)
+    cache.put(list(range(11)), _fake_cache(11))
+    # The last prompt token is never cached
+    assert cache.match(list(range(11)))[0] == 8
+    assert cache.match(list(range(9)))[0] == 8
+    assert cache.match(list(range(8)))[0] == 4
+    num_tokens, past = cache.match(list(range(6)) + [100, 101, 102])
+    assert num_tokens == 4
+    assert past[0][0].shape[2] == 4
+    assert past[0][0][0, 0, :, 0].tolist() == [0, 1, 2, 3]
+    assert cache.match([100] + list(range(10))) == (0, None)
+
+    stats = cache.stats()
+    assert stats.lookups == 5 and stats.hits == 4
+    assert stats.prompt_tokens == 11 + 9 + 8 + 9 + 11
+    assert stats.saved_prefill_tokens == 8 + 8 + 4 + 4
+    assert stats.to_dict()["hit_rate"] == 0.8
+
+
+def test_lru_eviction_under_memory_budget():
+    # 2 layers * (key, value) * 2 heads * 8 tokens * 4 dims * 4 bytes
+    entry_bytes = 2 * 2 * 2 * 8 * 4 * 4
+    cache = PrefixKVCache(max_memory_mb=2.5 * entry_bytes / 1024 / 1024, block_size=4)
+    prompts = [[i] * 9 for i in range(3)]
+    cache.put(prompts[0], _fake_cache(9))
+    cache.put(prompts[1], _fake_cache(9))
+    # Recently used, prompts[1] is evicted instead
+    assert cache.match(prompts[0])[0] == 8
+    cache.put(prompts[2], _fake_cache(9))
+    assert cache.match(prompts[0])[0] == 8
+    assert cache.match(prompts[1])[0] == 0
+    assert cache.match(prompts[2])[0] == 8
+    stats = cache.stats()
+    assert stats.entries == 2 and stats.evictions == 1
+    assert stats.memory_bytes == 2 * entry_bytes
+
+    # Larger than the whole budget, never cached
+    cache.put([7] * 100, _fake_cache(100))
+    assert cache.match([7] * 100)[0] == 0
+
+
+def test_same_output_as_without_cache(model):
+    cache = PrefixKVCache(block_size=16)
+    questions = ["sum of sales by region", "top 3 months", "sum of sales by month"]
+    for question in questions:
+        params = _params(_SYSTEM_PROMPT + "Question: " + question)
+        expected = list(generate_stream(model, _CharTokenizer(), params, "cpu", 4096))
+        outputs = list(
+            generate_stream(
+                model, _CharTokenizer(), params, "cpu", 4096, prefix_cache=cache
+            )
+        )
+        assert outputs == expected
+    stats = cache.stats()
+    # The first request prefills the whole prompt
+    assert stats.lookups == 3 and stats.hits == 2
+    assert stats.saved_prefill_tokens >= 2 * (len(_SYSTEM_PROMPT) // 16 * 16)
+
+
+def test_batch_scheduler_same_output(model):
+    cache = PrefixKVCache(block_size=16)
+    scheduler = ContinuousBatchingScheduler(
+        model, _CharTokenizer(), "cpu", 4096, max_batch_size=4, prefix_cache=cache
+    )
+    scheduler.start()
+    try:
+        for question in ["sum of sales", "top 3 months"]:
+            params = _params(_SYSTEM_PROMPT + "Question: " + question)
+            expected = list(
+                generate_stream(model, _CharTokenizer(), params, "cpu", 4096)
+            )
+            assert list(scheduler.generate_stream(params)) == expected
+    finally:
+        scheduler.stop()
+    assert cache.stats().hits == 1
+
+
+def _time_to_first_token(model, params, prefix_cache) -> float:
+    start = time.perf_counter()
+    stream = generate_stream(
+        model, _CharTokenizer(), params, "cpu", 4096, prefix_cache=prefix_cache
+    )
+    next(stream)
+    cost = time.perf_counter() - start
+    stream.close()
+    return cost
+
+
+def test_time_to_first_token_reduced(model):
+    cache = PrefixKVCache(block_size=16)
+    cold, warm = [], []
+    for i in range(5):
+        params = _params(_SYSTEM_PROMPT + f"Question {i}: sum of sales by region")
+        cold.append(_time_to_first_token(model, params, None))
+        _time_to_first_token(model, params, cache)
+        params = _params(_SYSTEM_PROMPT + f"Question {i}: top months")
+        warm.append(_time_to_first_token(model, params, cache))
+    assert statistics.median(warm) < 0.7 * statistics.median(cold)
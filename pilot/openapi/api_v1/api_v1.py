@@ -38,7 +38,10 @@ from pilot.scene.chat_factory import ChatFactory
 from pilot.configs.model_config import LOGDIR
 from pilot.utils import build_logger
 from pilot.common.schema import DBType
-from pilot.memory.chat_history.duckdb_history import DuckdbHistoryMemory
+from pilot.memory.chat_history.chat_history_factory import (
+    get_store_cls,
+    get_store_instance,
+)
 from pilot.scene.message import OnceConversation
 from pilot.configs.model_config import LLM_MODEL_CONFIG, KNOWLEDGE_UPLOAD_ROOT_PATH
 from pilot.summary.db_summary_client import DBSummaryClient
@@ -151,6 +154,11 @@ async def db_connect_delete(db_name: str = None):
     return Result.succ(CFG.LOCAL_DB_MANAGE.delete_db(db_name))
 
 
+@router.get("/v1/chat/db/cache/stats", response_model=Result[dict])
+async def db_connect_cache_stats():
+    return Result.succ(CFG.LOCAL_DB_MANAGE.connect_cache_stats().to_dict())
+
+
 async def async_db_summary_embedding(db_name, db_type):
     # 在这里执行需要异步运行的代码
     db_summary_client = DBSummaryClient(system_app=CFG.SYSTEM_APP)
@@ -187,15 +195,19 @@ async def db_support_types():
 @router.get("/v1/chat/dialogue/list", response_model=Result[ConversationVo])
 async def dialogue_list(user_id: str = None):
     dialogues: List = []
-    datas = DuckdbHistoryMemory.conv_list(user_id)
+    datas = get_store_cls().conv_list(user_id)
     for item in datas:
         conv_uid = item.get("conv_uid")
         summary = item.get("summary")
         chat_mode = item.get("chat_mode")
-        model_name = item.get("model_name", CFG.LLM_MODEL)
+        model_name = item.get("model_name") or CFG.LLM_MODEL
 
-        messages = json.loads(item.get("messages"))
-        last_round = max(messages, key=lambda x: x["chat_order"])
+        if "last_round" in item:
+            # Summary row of the conversation, no need to parse all rounds
+            last_round = json.loads(item["last_round"]) if item["last_round"] else {}
+        else:
+            messages = json.loads(item.get("messages"))
+            last_round = max(messages, key=lambda x: x["chat_order"])
         if "param_value" in last_round:
             select_param = last_round["param_value"]
         else:
@@ -300,14 +312,14 @@ async def params_load(
 
 @router.post("/v1/chat/dialogue/delete")
 async def dialogue_delete(con_uid: str):
-    history_mem = DuckdbHistoryMemory(con_uid)
+    history_mem = get_store_instance(con_uid)
     history_mem.delete()
     return Result.succ(None)
 
 
 def get_hist_messages(conv_uid: str):
     message_vos: List[MessageVo] = []
-    history_mem = DuckdbHistoryMemory(conv_uid)
+    history_mem = get_store_instance(conv_uid)
     history_messages: List[OnceConversation] = history_mem.get_messages()
     if history_messages:
         for once in history_messages:
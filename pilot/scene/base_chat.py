@@ -2,15 +2,21 @@ import datetime
 import traceback
 import warnings
 from abc import ABC, abstractmethod
-from typing import Any, List, Dict
+from typing import Any, List, Dict, Optional
 
 from pilot.configs.config import Config
 from pilot.configs.model_config import LOGDIR
 from pilot.component import ComponentType
 from pilot.memory.chat_history.base import BaseChatHistoryMemory
-from pilot.memory.chat_history.duckdb_history import DuckdbHistoryMemory
+from pilot.memory.chat_history.chat_history_factory import get_store_instance
 from pilot.memory.chat_history.file_history import FileHistoryMemory
 from pilot.memory.chat_history.mem_history import MemHistoryMemory
+from pilot.model.cluster.priority import get_request_priority
+from pilot.model.context_window import (
+    drop_oldest_rounds,
+    estimate_tokens,
+    prompt_token_budget,
+)
 from pilot.prompts.prompt_new import PromptTemplate
 from pilot.scene.base_message import ModelMessage, ModelMessageRoleType
 from pilot.scene.message import OnceConversation
@@ -56,7 +62,7 @@ class BaseChat(ABC):
         )
 
         ### can configurable storage methods
-        self.memory = DuckdbHistoryMemory(chat_param["chat_session_id"])
+        self.memory = get_store_instance(chat_param["chat_session_id"])
 
         self.history_message: List[OnceConversation] = self.memory.messages()
         self.current_message: OnceConversation = OnceConversation(
@@ -68,6 +74,8 @@ class BaseChat(ABC):
                 self.current_message.param_type = self.chat_mode.param_types()[0]
             self.current_message.param_value = chat_param["select_param"]
         self.current_tokens_used: int = 0
+        # Context length of model published by its workers, None if unknown
+        self.model_context_len: Optional[int] = None
 
     class Config:
         """Configuration for this pydantic object."""
@@ -132,11 +140,13 @@ class BaseChat(ABC):
             "max_new_tokens": int(self.prompt_template.max_new_tokens),
             "stop": self.prompt_template.sep,
             "echo": self.llm_echo,
+            "priority": get_request_priority(),
         }
         return payload
 
     async def stream_call(self):
         # TODO Retry when server connection error
+        await self._load_model_context_len()
         payload = self.__call_base()
 
         self.skip_echo_len = len(payload.get("prompt").replace("</s>", " ")) + 11
@@ -160,6 +170,7 @@ class BaseChat(ABC):
             self.memory.append(self.current_message)
 
     async def nostream_call(self):
+        await self._load_model_context_len()
         payload = self.__call_base()
         logger.info(f"Request: \n{payload}")
         ai_response_text = ""
@@ -333,7 +344,6 @@ class BaseChat(ABC):
         return example_text if str_message else example_messages
 
     def __load_histroy_messages(self, str_message: bool = True):
-        history_text = ""
         history_messages = []
         if self.prompt_template.need_historical_messages:
             if self.history_message:
@@ -345,12 +355,6 @@ class BaseChat(ABC):
                     if not first_message["type"] in [ModelMessageRoleType.VIEW]:
                         message_type = first_message["type"]
                         message_content = first_message["data"]["content"]
-                        history_text += (
-                            message_type
-                            + ":"
-                            + message_content
-                            + self.prompt_template.sep
-                        )
                         history_messages.append(
                             ModelMessage(role=message_type, content=message_content)
                         )
@@ -364,12 +368,6 @@ class BaseChat(ABC):
                             ]:
                                 message_type = round_message["type"]
                                 message_content = round_message["data"]["content"]
-                                history_text += (
-                                    message_type
-                                    + ":"
-                                    + message_content
-                                    + self.prompt_template.sep
-                                )
                                 history_messages.append(
                                     ModelMessage(
                                         role=message_type, content=message_content
@@ -387,17 +385,68 @@ class BaseChat(ABC):
                         ]:
                             message_type = message["type"]
                             message_content = message["data"]["content"]
-                            history_text += (
-                                message_type
-                                + ":"
-                                + message_content
-                                + self.prompt_template.sep
-                            )
                             history_messages.append(
                                 ModelMessage(role=message_type, content=message_content)
                             )
 
-        return history_text if str_message else history_messages
+        history_messages = self.__fit_history_messages(history_messages)
+        if not str_message:
+            return history_messages
+        return "".join(
+            message.role + ":" + message.content + self.prompt_template.sep
+            for message in history_messages
+        )
+
+    def __fit_history_messages(
+        self, history_messages: List[ModelMessage]
+    ) -> List[ModelMessage]:
+        """Drop the oldest rounds of history which don't fit in the context length of
+        model, the other parts of prompt are always kept"""
+        if not self.model_context_len or not history_messages:
+            return history_messages
+        other_text = self.__load_system_message() + self.__load_example_messages()
+        if self.prompt_template.template_define:
+            other_text += self.prompt_template.template_define
+        user_conv = self.current_message.get_user_conv()
+        if user_conv:
+            other_text += user_conv.content
+        max_tokens = prompt_token_budget(
+            self.model_context_len, int(self.prompt_template.max_new_tokens)
+        ) - estimate_tokens(other_text)
+
+        def _count_tokens(messages: List[ModelMessage]) -> int:
+            return sum(
+                estimate_tokens(m.role + ":" + m.content + self.prompt_template.sep)
+                for m in messages
+            )
+
+        # History ends with a complete round, every round of it can be dropped
+        fitted = drop_oldest_rounds(
+            history_messages
+            + [ModelMessage(role=ModelMessageRoleType.HUMAN, content="")],
+            _count_tokens,
+            max_tokens,
+        )[:-1]
+        if len(fitted) < len(history_messages):
+            logger.info(
+                f"Dropped {len(history_messages) - len(fitted)} history messages to fit in the context length {self.model_context_len} of model {self.llm_model}"
+            )
+        return fitted
+
+    async def _load_model_context_len(self) -> None:
+        """Read the context length published by the workers of model, prompts are
+        sized to fit in it"""
+        try:
+            from pilot.model.cluster import WorkerManagerFactory
+
+            worker_manager = CFG.SYSTEM_APP.get_component(
+                ComponentType.WORKER_MANAGER_FACTORY, WorkerManagerFactory
+            ).create()
+            self.model_context_len = await worker_manager.get_model_context_len(
+                self.llm_model
+            )
+        except Exception as e:
+            logger.warning(f"Read context length of model error: {str(e)}")
 
     def current_ai_response(self) -> str:
         for message in self.current_message.messages:
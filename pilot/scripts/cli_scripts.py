@@ -82,16 +82,20 @@ try:
         start_apiserver,
         stop_apiserver,
         _stop_all_model_server,
+        start_mock_proxy_server,
+        stop_mock_proxy_server,
     )
 
     add_command_alias(model_cli_group, name="model", parent_group=cli)
     add_command_alias(start_model_controller, name="controller", parent_group=start)
     add_command_alias(start_model_worker, name="worker", parent_group=start)
     add_command_alias(start_apiserver, name="apiserver", parent_group=start)
+    add_command_alias(start_mock_proxy_server, name="mockllm", parent_group=start)
 
     add_command_alias(stop_model_controller, name="controller", parent_group=stop)
     add_command_alias(stop_model_worker, name="worker", parent_group=stop)
     add_command_alias(stop_apiserver, name="apiserver", parent_group=stop)
+    add_command_alias(stop_mock_proxy_server, name="mockllm", parent_group=stop)
     stop_all_func_list.append(_stop_all_model_server)
 
 except ImportError as e:
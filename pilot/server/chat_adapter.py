@@ -20,6 +20,11 @@ class BaseChatAdpter:
 
         return generate_stream
 
+    def get_async_generate_stream_func(self, model_path: str):
+        """Return the async generate stream handler func, None if the model only has
+        a sync one"""
+        return None
+
     def get_conv_template(self, model_path: str) -> Conversation:
         return None
 
@@ -182,6 +187,11 @@ class ProxyllmChatAdapter(BaseChatAdpter):
 
         return proxyllm_generate_stream
 
+    def get_async_generate_stream_func(self, model_path: str):
+        from pilot.model.llm_out.proxy_llm import proxyllm_async_generate_stream
+
+        return proxyllm_async_generate_stream
+
 
 class GorillaChatAdapter(BaseChatAdpter):
     def match(self, model_path: str):
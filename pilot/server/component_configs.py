@@ -21,7 +21,11 @@ def initialize_components(
     embedding_model_path: str,
 ):
     from pilot.model.cluster.controller.controller import controller
+    from pilot.utils.duckdb_pool import DuckdbConnectionPool
+    from pilot.utils.http_client import HttpClientPool
 
+    system_app.register(HttpClientPool, params=_http_client_parameters())
+    system_app.register(DuckdbConnectionPool)
     system_app.register_instance(controller)
 
     _initialize_embedding_model(
@@ -29,6 +33,20 @@ def initialize_components(
     )
 
 
+def _http_client_parameters():
+    from pilot.configs.config import Config
+    from pilot.utils.http_client import HttpClientParameters
+
+    cfg = Config()
+    return HttpClientParameters(
+        max_connections_per_host=cfg.HTTP_CLIENT_MAX_CONNECTIONS_PER_HOST,
+        max_keepalive_connections_per_host=cfg.HTTP_CLIENT_MAX_KEEPALIVE_CONNECTIONS_PER_HOST,
+        keepalive_expiry=cfg.HTTP_CLIENT_KEEPALIVE_EXPIRY,
+        connect_timeout=cfg.HTTP_CLIENT_CONNECT_TIMEOUT,
+        timeout=cfg.HTTP_CLIENT_TIMEOUT,
+    )
+
+
 def _initialize_embedding_model(
     param: WebWerverParameters,
     system_app: SystemApp,
@@ -0,0 +1,344 @@
+"""Queue-backed document ingestion pipeline.
+
+Documents flow through four stages, each with its own worker threads:
+
+    load -> split -> embed -> index
+
+Stages are connected by bounded queues, a slow stage blocks the stages before it
+(backpressure), so only ``queue_size`` batches per stage are held in memory no matter
+how many documents are submitted. Embedding and indexing work on batches of chunks,
+the chunks of one document can be embedded and indexed in parallel.
+
+The handler of a document runs in a copy of the context it was submitted in, so context
+variables like the LLM request priority reach the stage threads.
+"""
+
+import contextvars
+import logging
+import queue
+import threading
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+@dataclass
+class IngestionParameters:
+    load_workers: int = 4
+    split_workers: int = 2
+    embed_workers: int = 2
+    index_workers: int = 1
+    # Chunks per embedding/index batch
+    batch_size: int = 64
+    # Max pending items between two stages
+    queue_size: int = 8
+
+
+class IngestionHandler(ABC):
+    """The work of each stage for one kind of document"""
+
+    @abstractmethod
+    def load(self, document: Any) -> Any:
+        """Load the raw content of document"""
+
+    @abstractmethod
+    def split(self, document: Any, loaded: Any) -> List[Any]:
+        """Split the loaded content into chunks"""
+
+    @abstractmethod
+    def embed(self, document: Any, chunks: List[Any]) -> Optional[List[List[float]]]:
+        """Embed a batch of chunks, return None to let the index stage embed them"""
+
+    @abstractmethod
+    def index(
+        self,
+        document: Any,
+        chunks: List[Any],
+        embeddings: Optional[List[List[float]]],
+    ) -> List[str]:
+        """Write a batch of chunks to the index, return the ids of chunks"""
+
+    def on_split(self, document: Any, chunks: List[Any]) -> None:
+        """Invoked once all chunks of document are known"""
+
+    def on_finished(self, document: Any, ids: List[str]) -> None:
+        """Invoked when all chunks of document are indexed"""
+
+    def on_failed(self, document: Any, error: Exception) -> None:
+        """Invoked when any stage of document fails"""
+
+
+@dataclass
+class IngestionStats:
+    submitted: int = 0
+    finished: int = 0
+    failed: int = 0
+    chunks: int = 0
+    # Pending items of each stage
+    queue_sizes: Dict[str, int] = field(default_factory=dict)
+
+
+class IngestionHandle:
+    """The progress of one submitted document"""
+
+    def __init__(self, document: Any, handler: IngestionHandler):
+        self.document = document
+        self.handler = handler
+        self.ids: List[str] = []
+        self.error: Optional[Exception] = None
+        self._total_batches: Optional[int] = None
+        self._done_batches = 0
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+        self._context = contextvars.copy_context()
+
+    def run(self, func: Callable, *args) -> Any:
+        """Run the handler function in the context the document was submitted in"""
+        # A context can't be entered by two threads at once, batches run in parallel
+        return self._context.copy().run(func, *args)
+
+    @property
+    def failed(self) -> bool:
+        return self.error is not None
+
+    def done(self) -> bool:
+        return self._done.is_set()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        return self._done.wait(timeout)
+
+
+@dataclass
+class _Batch:
+    handle: IngestionHandle
+    # Keep the order of ids same with chunks
+    index: int
+    chunks: List[Any]
+    embeddings: Optional[List[List[float]]] = None
+
+
+class _Stage:
+    def __init__(
+        self,
+        name: str,
+        workers: int,
+        input_queue: queue.Queue,
+        process: Callable[[Any], None],
+    ):
+        self.name = name
+        self.input_queue = input_queue
+        self.process = process
+        self.threads = [
+            threading.Thread(
+                target=self._run, name=f"ingestion-{name}-{i}", daemon=True
+            )
+            for i in range(max(workers, 1))
+        ]
+
+    def start(self):
+        for thread in self.threads:
+            thread.start()
+
+    def stop(self):
+        for _ in self.threads:
+            self.input_queue.put(_STOP)
+        for thread in self.threads:
+            thread.join()
+
+    def _run(self):
+        while True:
+            item = self.input_queue.get()
+            if item is _STOP:
+                break
+            try:
+                self.process(item)
+            except Exception as e:
+                # Stage functions handle the errors of documents, never kill the worker
+                logger.exception(f"Ingestion stage {self.name} error: {str(e)}")
+
+
+class IngestionPipeline:
+    """Bounded, staged document ingestion, submit documents from any thread"""
+
+    def __init__(self, params: Optional[IngestionParameters] = None):
+        self.params = params or IngestionParameters()
+        # Submitting never blocks, documents are small before loaded
+        self._load_queue: queue.Queue = queue.Queue()
+        self._split_queue: queue.Queue = queue.Queue(self.params.queue_size)
+        self._embed_queue: queue.Queue = queue.Queue(self.params.queue_size)
+        self._index_queue: queue.Queue = queue.Queue(self.params.queue_size)
+        self._stages = [
+            _Stage("load", self.params.load_workers, self._load_queue, self._load),
+            _Stage("split", self.params.split_workers, self._split_queue, self._split),
+            _Stage("embed", self.params.embed_workers, self._embed_queue, self._embed),
+            _Stage("index", self.params.index_workers, self._index_queue, self._index),
+        ]
+        self._lock = threading.Lock()
+        self._started = False
+        self._pending: Dict[int, IngestionHandle] = {}
+        self._stats = IngestionStats()
+
+    def start(self):
+        with self._lock:
+            if self._started:
+                return
+            for stage in self._stages:
+                stage.start()
+            self._started = True
+
+    def stop(self):
+        """Stop after the submitted documents are done"""
+        with self._lock:
+            if not self._started:
+                return
+            self._started = False
+        # Stop stages in flow order, so every stage drains before the next stops
+        for stage in self._stages:
+            stage.stop()
+
+    def submit(self, document: Any, handler: IngestionHandler) -> IngestionHandle:
+        self.start()
+        handle = IngestionHandle(document, handler)
+        with self._lock:
+            self._pending[id(handle)] = handle
+            self._stats.submitted += 1
+        self._load_queue.put(handle)
+        return handle
+
+    def join(self, timeout: Optional[float] = None) -> bool:
+        """Wait for all submitted documents"""
+        with self._lock:
+            handles = list(self._pending.values())
+        return all(handle.wait(timeout) for handle in handles)
+
+    def stats(self) -> IngestionStats:
+        with self._lock:
+            stats = IngestionStats(**{**self._stats.__dict__})
+        stats.queue_sizes = {
+            stage.name: stage.input_queue.qsize() for stage in self._stages
+        }
+        return stats
+
+    def _load(self, handle: IngestionHandle):
+        if handle.done():
+            return
+        try:
+            loaded = handle.run(handle.handler.load, handle.document)
+        except Exception as e:
+            self._fail(handle, e)
+            return
+        self._split_queue.put((handle, loaded))
+
+    def _split(self, item):
+        handle, loaded = item
+        try:
+            chunks = handle.run(handle.handler.split, handle.document, loaded)
+            handle.run(handle.handler.on_split, handle.document, chunks)
+        except Exception as e:
+            self._fail(handle, e)
+            return
+        with self._lock:
+            self._stats.chunks += len(chunks)
+        size = max(self.params.batch_size, 1)
+        batches = [
+            _Batch(handle=handle, index=i, chunks=chunks[start : start + size])
+            for i, start in enumerate(range(0, len(chunks), size))
+        ]
+        handle.ids = [None] * len(batches)
+        with handle._lock:
+            handle._total_batches = len(batches)
+        if not batches:
+            self._finish(handle)
+            return
+        for batch in batches:
+            self._embed_queue.put(batch)
+
+    def _embed(self, batch: _Batch):
+        handle = batch.handle
+        if handle.done():
+            return
+        try:
+            batch.embeddings = handle.run(
+                handle.handler.embed, handle.document, batch.chunks
+            )
+        except Exception as e:
+            self._fail(handle, e)
+            return
+        self._index_queue.put(batch)
+
+    def _index(self, batch: _Batch):
+        handle = batch.handle
+        if handle.done():
+            return
+        try:
+            ids = handle.run(
+                handle.handler.index, handle.document, batch.chunks, batch.embeddings
+            )
+        except Exception as e:
+            self._fail(handle, e)
+            return
+        with handle._lock:
+            handle.ids[batch.index] = ids
+            handle._done_batches += 1
+            finished = handle._done_batches == handle._total_batches
+        if finished:
+            self._finish(handle)
+
+    def _finish(self, handle: IngestionHandle):
+        handle.ids = [i for ids in handle.ids for i in (ids or [])]
+        try:
+            handle.run(handle.handler.on_finished, handle.document, handle.ids)
+        except Exception as e:
+            logger.exception(f"Ingestion finished callback error: {str(e)}")
+        self._complete(handle, failed=False)
+
+    def _fail(self, handle: IngestionHandle, error: Exception):
+        with handle._lock:
+            if handle.done() or handle.error is not None:
+                return
+            handle.error = error
+        logger.error(f"Ingest document {handle.document} failed: {str(error)}")
+        try:
+            handle.run(handle.handler.on_failed, handle.document, error)
+        except Exception as e:
+            logger.exception(f"Ingestion failed callback error: {str(e)}")
+        self._complete(handle, failed=True)
+
+    def _complete(self, handle: IngestionHandle, failed: bool):
+        with self._lock:
+            self._pending.pop(id(handle), None)
+            if failed:
+                self._stats.failed += 1
+            else:
+                self._stats.finished += 1
+        handle._done.set()
+
+
+_default_pipeline: Optional[IngestionPipeline] = None
+_default_pipeline_lock = threading.Lock()
+
+
+def get_ingestion_pipeline() -> IngestionPipeline:
+    """Return the IngestionPipeline of current process, configured by environment"""
+    global _default_pipeline
+    if _default_pipeline is None:
+        with _default_pipeline_lock:
+            if _default_pipeline is None:
+                from pilot.configs.config import Config
+
+                cfg = Config()
+                _default_pipeline = IngestionPipeline(
+                    IngestionParameters(
+                        load_workers=cfg.KNOWLEDGE_INGEST_LOAD_WORKERS,
+                        split_workers=cfg.KNOWLEDGE_INGEST_SPLIT_WORKERS,
+                        embed_workers=cfg.KNOWLEDGE_INGEST_EMBED_WORKERS,
+                        index_workers=cfg.KNOWLEDGE_INGEST_INDEX_WORKERS,
+                        batch_size=cfg.KNOWLEDGE_INGEST_BATCH_SIZE,
+                        queue_size=cfg.KNOWLEDGE_INGEST_QUEUE_SIZE,
+                    )
+                )
+    return _default_pipeline
@@ -1,6 +1,7 @@
 import json
 import threading
 from datetime import datetime
+from typing import List
 
 from pilot.vector_store.connector import VectorStoreConnector
 
@@ -10,6 +11,7 @@ from pilot.configs.model_config import (
     KNOWLEDGE_UPLOAD_ROOT_PATH,
 )
 from pilot.logs import logger
+from pilot.model.cluster.priority import batch_priority
 from pilot.server.knowledge.chunk_db import (
     DocumentChunkEntity,
     DocumentChunkDao,
@@ -18,6 +20,7 @@ from pilot.server.knowledge.document_db import (
     KnowledgeDocumentDao,
     KnowledgeDocumentEntity,
 )
+from pilot.server.knowledge.ingestion import IngestionHandler, get_ingestion_pipeline
 from pilot.server.knowledge.space_db import (
     KnowledgeSpaceDao,
     KnowledgeSpaceEntity,
@@ -51,6 +54,100 @@ class SyncStatus(Enum):
     FINISHED = "FINISHED"
 
 
+class _LoadOnlySplitter:
+    """Keep the loaded documents, documents are split in the split stage"""
+
+    def split_documents(self, documents):
+        return list(documents)
+
+
+class KnowledgeDocumentIngestion(IngestionHandler):
+    """Ingest knowledge documents of one space into its vector store"""
+
+    def __init__(self, vector_store_config, text_splitter):
+        self.vector_store_config = vector_store_config
+        self.text_splitter = text_splitter
+        self.embeddings = vector_store_config["embeddings"]
+        self._vector_client = None
+        self._lock = threading.Lock()
+
+    @property
+    def vector_client(self) -> VectorStoreConnector:
+        if self._vector_client is None:
+            with self._lock:
+                if self._vector_client is None:
+                    self._vector_client = VectorStoreConnector(
+                        self.vector_store_config["vector_store_type"],
+                        self.vector_store_config,
+                    )
+        return self._vector_client
+
+    def load(self, doc: KnowledgeDocumentEntity):
+        from pilot.embedding_engine.knowledge_type import get_knowledge_embedding
+
+        source = get_knowledge_embedding(
+            doc.doc_type.upper(),
+            doc.content,
+            self.vector_store_config,
+            None,
+            _LoadOnlySplitter(),
+        )
+        return source, source.read()
+
+    def split(self, doc: KnowledgeDocumentEntity, loaded) -> List:
+        source, documents = loaded
+        chunk_docs = self.text_splitter.split_documents(documents)
+        return source.data_process(chunk_docs)
+
+    def on_split(self, doc: KnowledgeDocumentEntity, chunk_docs: List) -> None:
+        doc.chunk_size = len(chunk_docs)
+        doc.gmt_modified = datetime.now()
+        knowledge_document_dao.update_knowledge_document(doc)
+        logger.info(f"begin save document chunks, doc:{doc.doc_name}")
+        chunk_entities = [
+            DocumentChunkEntity(
+                doc_name=doc.doc_name,
+                doc_type=doc.doc_type,
+                document_id=doc.id,
+                content=chunk_doc.page_content,
+                meta_info=str(chunk_doc.metadata),
+                gmt_created=datetime.now(),
+                gmt_modified=datetime.now(),
+            )
+            for chunk_doc in chunk_docs
+        ]
+        document_chunk_dao.create_documents_chunks(chunk_entities)
+
+    @batch_priority
+    def embed(self, doc: KnowledgeDocumentEntity, chunk_docs: List):
+        if not self.vector_client.support_precomputed_embeddings:
+            # The vector store embeds documents itself
+            return None
+        return self.embeddings.embed_documents(
+            [chunk_doc.page_content for chunk_doc in chunk_docs]
+        )
+
+    @batch_priority
+    def index(self, doc: KnowledgeDocumentEntity, chunk_docs: List, embeddings):
+        if embeddings is None:
+            return self.vector_client.load_document(chunk_docs)
+        return self.vector_client.load_document_embeddings(chunk_docs, embeddings)
+
+    def on_finished(self, doc: KnowledgeDocumentEntity, ids: List[str]) -> None:
+        doc.status = SyncStatus.FINISHED.name
+        doc.result = "document embedding success"
+        if ids:
+            doc.vector_ids = ",".join(ids)
+        logger.info(f"async document embedding, success:{doc.doc_name}")
+        knowledge_document_dao.update_knowledge_document(doc)
+
+    def on_failed(self, doc: KnowledgeDocumentEntity, error: Exception) -> None:
+        doc.status = SyncStatus.FAILED.name
+        doc.result = "document embedding failed" + str(error)
+        logger.error(f"document embedding, failed:{doc.doc_name}, {str(error)}")
+        knowledge_document_dao.update_knowledge_document(doc)
+
+
 # @singleton
 class KnowledgeService:
     def __init__(self):
@@ -153,7 +250,6 @@ class KnowledgeService:
     """sync knowledge document chunk into vector store"""
 
     def sync_knowledge_document(self, space_name, doc_ids):
-        from pilot.embedding_engine.embedding_engine import EmbeddingEngine
         from pilot.embedding_engine.embedding_factory import EmbeddingFactory
         from langchain.text_splitter import (
             RecursiveCharacterTextSplitter,
@@ -162,6 +258,7 @@ class KnowledgeService:
 
         # import langchain is very very slow!!!
 
+        docs = []
         for doc_id in doc_ids:
             query = KnowledgeDocumentEntity(
                 id=doc_id,
@@ -175,78 +272,60 @@ class KnowledgeService:
                 raise Exception(
                     f" doc:{doc.doc_name} status is {doc.status}, can not sync"
                 )
-
-            space_context = self.get_space_context(space_name)
-            chunk_size = (
-                CFG.KNOWLEDGE_CHUNK_SIZE
-                if space_context is None
-                else int(space_context["embedding"]["chunk_size"])
-            )
-            chunk_overlap = (
-                CFG.KNOWLEDGE_CHUNK_OVERLAP
-                if space_context is None
-                else int(space_context["embedding"]["chunk_overlap"])
+            docs.append(doc)
+
+        # The splitter, embeddings and vector store are shared by all documents of space
+        space_context = self.get_space_context(space_name)
+        chunk_size = (
+            CFG.KNOWLEDGE_CHUNK_SIZE
+            if space_context is None
+            else int(space_context["embedding"]["chunk_size"])
+        )
+        chunk_overlap = (
+            CFG.KNOWLEDGE_CHUNK_OVERLAP
+            if space_context is None
+            else int(space_context["embedding"]["chunk_overlap"])
+        )
+        if CFG.LANGUAGE == "en":
+            text_splitter = RecursiveCharacterTextSplitter(
+                chunk_size=chunk_size,
+                chunk_overlap=chunk_overlap,
+                length_function=len,
             )
-            if CFG.LANGUAGE == "en":
+        else:
+            try:
+                text_splitter = SpacyTextSplitter(
+                    pipeline="zh_core_web_sm",
+                    chunk_size=chunk_size,
+                    chunk_overlap=chunk_overlap,
+                )
+            except Exception:
                 text_splitter = RecursiveCharacterTextSplitter(
                     chunk_size=chunk_size,
                     chunk_overlap=chunk_overlap,
-                    length_function=len,
                 )
-            else:
-                try:
-                    text_splitter = SpacyTextSplitter(
-                        pipeline="zh_core_web_sm",
-                        chunk_size=chunk_size,
-                        chunk_overlap=chunk_overlap,
-                    )
-                except Exception:
-                    text_splitter = RecursiveCharacterTextSplitter(
-                        chunk_size=chunk_size,
-                        chunk_overlap=chunk_overlap,
-                    )
-            embedding_factory = CFG.SYSTEM_APP.get_component(
-                "embedding_factory", EmbeddingFactory
-            )
-            client = EmbeddingEngine(
-                knowledge_source=doc.content,
-                knowledge_type=doc.doc_type.upper(),
-                model_name=EMBEDDING_MODEL_CONFIG[CFG.EMBEDDING_MODEL],
-                vector_store_config={
-                    "vector_store_name": space_name,
-                    "vector_store_type": CFG.VECTOR_STORE_TYPE,
-                    "chroma_persist_path": KNOWLEDGE_UPLOAD_ROOT_PATH,
-                },
-                text_splitter=text_splitter,
-                embedding_factory=embedding_factory,
-            )
-            chunk_docs = client.read()
-            # update document status
+        embedding_factory = CFG.SYSTEM_APP.get_component(
+            "embedding_factory", EmbeddingFactory
+        )
+        embeddings = embedding_factory.create(
+            model_name=EMBEDDING_MODEL_CONFIG[CFG.EMBEDDING_MODEL]
+        )
+        handler = KnowledgeDocumentIngestion(
+            vector_store_config={
+                "vector_store_name": space_name,
+                "vector_store_type": CFG.VECTOR_STORE_TYPE,
+                "chroma_persist_path": KNOWLEDGE_UPLOAD_ROOT_PATH,
+                "embeddings": embeddings,
+            },
+            text_splitter=text_splitter,
+        )
+        pipeline = get_ingestion_pipeline()
+        for doc in docs:
+            # update document status, chunk size is updated after splitting
             doc.status = SyncStatus.RUNNING.name
-            doc.chunk_size = len(chunk_docs)
             doc.gmt_modified = datetime.now()
             knowledge_document_dao.update_knowledge_document(doc)
-            # async doc embeddings
-            thread = threading.Thread(
-                target=self.async_doc_embedding, args=(client, chunk_docs, doc)
-            )
-            thread.start()
-            logger.info(f"begin save document chunks, doc:{doc.doc_name}")
-            # save chunk details
-            chunk_entities = [
-                DocumentChunkEntity(
-                    doc_name=doc.doc_name,
-                    doc_type=doc.doc_type,
-                    document_id=doc.id,
-                    content=chunk_doc.page_content,
-                    meta_info=str(chunk_doc.metadata),
-                    gmt_created=datetime.now(),
-                    gmt_modified=datetime.now(),
-                )
-                for chunk_doc in chunk_docs
-            ]
-            document_chunk_dao.create_documents_chunks(chunk_entities)
-
+            pipeline.submit(doc, handler)
         return True
 
     """update knowledge space"""
@@ -321,23 +400,6 @@ class KnowledgeService:
         res.page = request.page
         return res
 
-    def async_doc_embedding(self, client, chunk_docs, doc):
-        logger.info(
-            f"async_doc_embedding, doc:{doc.doc_name}, chunk_size:{len(chunk_docs)}, begin embedding to vector store-{CFG.VECTOR_STORE_TYPE}"
-        )
-        try:
-            vector_ids = client.knowledge_embedding_batch(chunk_docs)
-            doc.status = SyncStatus.FINISHED.name
-            doc.result = "document embedding success"
-            if vector_ids is not None:
-                doc.vector_ids = ",".join(vector_ids)
-            logger.info(f"async document embedding, success:{doc.doc_name}")
-        except Exception as e:
-            doc.status = SyncStatus.FAILED.name
-            doc.result = "document embedding failed" + str(e)
-            logger.error(f"document embedding, failed:{doc.doc_name}, {str(e)}")
-        return knowledge_document_dao.update_knowledge_document(doc)
-
     def _build_default_context(self):
         from pilot.scene.chat_knowledge.v1.prompt import (
             PROMPT_SCENE_DEFINE,
@@ -0,0 +1,159 @@
+"""Run unit test with command: pytest pilot/server/knowledge/tests/test_ingestion.py"""
+
+import threading
+import time
+from typing import Dict, List
+
+import pytest
+
+from pilot.model.cluster.priority import (
+    PRIORITY_BATCH,
+    PRIORITY_INTERACTIVE,
+    get_request_priority,
+    request_priority,
+)
+from pilot.server.knowledge.ingestion import (
+    IngestionHandler,
+    IngestionParameters,
+    IngestionPipeline,
+)
+
+
+class _FakeHandler(IngestionHandler):
+    """Documents are chunk counts, every stage sleeps like IO or a model call"""
+
+    def __init__(self, cost: float = 0.0, fail_doc: str = None) -> None:
+        self.cost = cost
+        self.fail_doc = fail_doc
+        self.status: Dict[str, str] = {}
+        self.ids: Dict[str, List[str]] = {}
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+
+    def load(self, document):
+        time.sleep(self.cost)
+        name, chunks = document
+        return [f"{name}-{i}" for i in range(chunks)]
+
+    def split(self, document, loaded):
+        return loaded
+
+    def on_split(self, document, chunks):
+        self.status[document[0]] = "RUNNING"
+
+    def embed(self, document, chunks):
+        with self._lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        time.sleep(self.cost)
+        if document[0] == self.fail_doc:
+            raise ValueError("embedding error")
+        return [[float(len(chunk))] for chunk in chunks]
+
+    def index(self, document, chunks, embeddings):
+        time.sleep(self.cost)
+        assert len(embeddings) == len(chunks)
+        with self._lock:
+            self.in_flight -= 1
+        return [f"id-{chunk}" for chunk in chunks]
+
+    def on_finished(self, document, ids):
+        self.status[document[0]] = "FINISHED"
+        self.ids[document[0]] = ids
+
+    def on_failed(self, document, error):
+        self.status[document[0]] = "FAILED"
+
+
+@pytest.fixture
+def pipeline():
+    pipeline = IngestionPipeline(IngestionParameters(batch_size=4, queue_size=2))
+    yield pipeline
+    pipeline.stop()
+
+
+def test_ingest_documents(pipeline):
+    handler = _FakeHandler()
+    docs = [("doc1", 10), ("doc2", 3), ("empty", 0)]
+    handles = [pipeline.submit(doc, handler) for doc in docs]
+    assert pipeline.join(timeout=5)
+    assert all(handle.done() and not handle.failed for handle in handles)
+    assert handler.status == {
+        "doc1": "FINISHED",
+        "doc2": "FINISHED",
+        "empty": "FINISHED",
+    }
+    # Ids keep the order of chunks though batches are indexed in parallel
+    assert handler.ids["doc1"] == [f"id-doc1-{i}" for i in range(10)]
+    assert handler.ids["empty"] == []
+    stats = pipeline.stats()
+    assert (stats.submitted, stats.finished, stats.failed) == (3, 3, 0)
+    assert stats.chunks == 13
+
+
+def test_failed_document_does_not_stop_others(pipeline):
+    handler = _FakeHandler(fail_doc="bad")
+    bad = pipeline.submit(("bad", 12), handler)
+    good = pipeline.submit(("good", 12), handler)
+    assert pipeline.join(timeout=5)
+    assert bad.failed and isinstance(bad.error, ValueError)
+    assert not good.failed
+    assert handler.status == {"bad": "FAILED", "good": "FINISHED"}
+    assert pipeline.stats().failed == 1
+
+
+def test_stages_run_in_context_of_submitter(pipeline):
+    class _PriorityHandler(_FakeHandler):
+        def embed(self, document, chunks):
+            priorities.append(get_request_priority())
+            return super().embed(document, chunks)
+
+    priorities = []
+    with request_priority(PRIORITY_BATCH):
+        batch = pipeline.submit(("batch", 12), _PriorityHandler())
+    interactive = pipeline.submit(("interactive", 4), _PriorityHandler())
+    assert batch.wait(5) and interactive.wait(5)
+    assert sorted(priorities) == [PRIORITY_BATCH] * 3 + [PRIORITY_INTERACTIVE]
+
+
+def test_backpressure_bounds_pending_batches():
+    params = IngestionParameters(
+        embed_workers=2, index_workers=1, batch_size=1, queue_size=2
+    )
+    pipeline = IngestionPipeline(params)
+    handler = _FakeHandler(cost=0.002)
+    try:
+        for i in range(4):
+            pipeline.submit((f"doc{i}", 20), handler)
+        assert pipeline.join(timeout=10)
+    finally:
+        pipeline.stop()
+    # Embedded batches wait in the bounded index queue, at most: embed workers +
+    # index queue + index workers
+    assert handler.max_in_flight <= 2 + 2 + 1
+    assert pipeline.stats().chunks == 80
+
+
+def test_parallel_stages_are_faster_than_serial():
+    docs = [(f"doc{i}", 8) for i in range(8)]
+    cost = 0.01
+    serial_handler = _FakeHandler(cost=cost)
+    start = time.perf_counter()
+    for doc in docs:
+        chunks = serial_handler.split(doc, serial_handler.load(doc))
+        for i in range(0, len(chunks), 4):
+            batch = chunks[i : i + 4]
+            serial_handler.index(doc, batch, serial_handler.embed(doc, batch))
+    serial_cost = time.perf_counter() - start
+
+    pipeline = IngestionPipeline(IngestionParameters(batch_size=4))
+    try:
+        start = time.perf_counter()
+        for doc in docs:
+            pipeline.submit(doc, _FakeHandler(cost=cost))
+        assert pipeline.join(timeout=10)
+        parallel_cost = time.perf_counter() - start
+    finally:
+        pipeline.stop()
+    assert parallel_cost * 2 < serial_cost
@@ -9,6 +9,7 @@ from pilot.configs.model_config import (
     EMBEDDING_MODEL_CONFIG,
     LOGDIR,
 )
+from pilot.model.cluster.priority import batch_priority
 from pilot.scene.base import ChatScene
 from pilot.scene.base_chat import BaseChat
 from pilot.scene.chat_factory import ChatFactory
@@ -30,6 +31,7 @@ class DBSummaryClient:
     def __init__(self, system_app: SystemApp):
         self.system_app = system_app
 
+    @batch_priority
     def db_summary_embedding(self, dbname, db_type):
         """put db profile and table profile summary into vector store"""
         from pilot.embedding_engine.string_embedding import StringEmbedding
@@ -156,6 +158,7 @@ class DBSummaryClient:
             related_table_summaries.append(table_summery[0].page_content)
         return related_table_summaries
 
+    @batch_priority
     def init_db_summary(self):
         db_mange = CFG.LOCAL_DB_MANAGE
         dbs = db_mange.get_db_list()
@@ -197,6 +200,7 @@ class DBSummaryClient:
 
 
 def _get_llm_response(query, db_input, dbsummary):
+    # Batch priority when summarizing, interactive when called by a chat of user
     chat_param = {
         "temperature": 0.7,
         "max_new_tokens": 512,
@@ -62,20 +62,18 @@ def _build_request(self, func, path, method, *args, **kwargs):
 def _api_remote(path, method="GET"):
     def decorator(func):
         async def wrapper(self, *args, **kwargs):
-            import httpx
+            from pilot.utils.http_client import get_http_client_pool
 
             return_type, actual_dataclass, request_params = _build_request(
                 self, func, path, method, *args, **kwargs
             )
-            async with httpx.AsyncClient() as client:
-                response = await client.request(**request_params)
-                if response.status_code == 200:
-                    return _parse_response(
-                        response.json(), return_type, actual_dataclass
-                    )
-                else:
-                    error_msg = f"Remote request error, error code: {response.status_code}, error msg: {response.text}"
-                    raise Exception(error_msg)
+            client = get_http_client_pool().async_client(request_params["url"])
+            response = await client.request(**request_params)
+            if response.status_code == 200:
+                return _parse_response(response.json(), return_type, actual_dataclass)
+            else:
+                error_msg = f"Remote request error, error code: {response.status_code}, error msg: {response.text}"
+                raise Exception(error_msg)
 
         return wrapper
 
@@ -85,13 +83,13 @@ def _api_remote(path, method="GET"):
 def _sync_api_remote(path, method="GET"):
     def decorator(func):
         def wrapper(self, *args, **kwargs):
-            import requests
+            from pilot.utils.http_client import get_http_client_pool
 
             return_type, actual_dataclass, request_params = _build_request(
                 self, func, path, method, *args, **kwargs
             )
 
-            response = requests.request(**request_params)
+            response = get_http_client_pool().sync_session().request(**request_params)
 
             if response.status_code == 200:
                 return _parse_response(response.json(), return_type, actual_dataclass)
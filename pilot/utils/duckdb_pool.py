@@ -0,0 +1,99 @@
+"""Process-wide shared DuckDB connections.
+
+Opening a DuckDB database loads its catalog and takes the file lock, doing it for every
+chat or every request is slow and fails when another connection of the same process
+uses a different configuration. One connection is opened per database file and every
+thread works on its own cursor of that connection.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import threading
+from typing import TYPE_CHECKING, Dict, Optional
+
+from pilot.component import BaseComponent, ComponentType, SystemApp
+
+if TYPE_CHECKING:
+    import duckdb
+
+logger = logging.getLogger(__name__)
+
+
+class DuckdbConnectionPool(BaseComponent):
+    """Lifecycle-managed DuckDB connections, one per database file"""
+
+    name = ComponentType.DUCKDB_CONNECTION_POOL
+
+    def __init__(self, system_app: Optional[SystemApp] = None):
+        self._connections: Dict[str, "duckdb.DuckDBPyConnection"] = {}
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        super().__init__(system_app)
+
+    def init_app(self, system_app: SystemApp):
+        # The registered pool becomes the default pool of current process
+        set_duckdb_pool(self)
+
+    def _connection(self, db_path: str) -> "duckdb.DuckDBPyConnection":
+        db_path = os.path.abspath(db_path)
+        connection = self._connections.get(db_path)
+        if connection is not None:
+            return connection
+        import duckdb
+
+        with self._lock:
+            connection = self._connections.get(db_path)
+            if connection is None:
+                os.makedirs(os.path.dirname(db_path), exist_ok=True)
+                connection = duckdb.connect(db_path)
+                self._connections[db_path] = connection
+                logger.info(f"Open shared duckdb connection of {db_path}")
+            return connection
+
+    def cursor(self, db_path: str) -> "duckdb.DuckDBPyConnection":
+        """Return the cursor of current thread on the shared connection of db_path"""
+        cursors = getattr(self._local, "cursors", None)
+        if cursors is None:
+            cursors = self._local.cursors = {}
+        key = os.path.abspath(db_path)
+        cursor = cursors.get(key)
+        if cursor is None:
+            cursor = self._connection(key).cursor()
+            cursors[key] = cursor
+        return cursor
+
+    def close(self):
+        with self._lock:
+            connections = list(self._connections.values())
+            self._connections.clear()
+        # Cursors of other threads become invalid with their connection
+        self._local = threading.local()
+        for connection in connections:
+            try:
+                connection.close()
+            except Exception as e:
+                logger.warning(f"Close duckdb connection error: {str(e)}")
+
+    def before_stop(self):
+        self.close()
+
+
+_default_pool: Optional[DuckdbConnectionPool] = None
+_default_pool_lock = threading.Lock()
+
+
+def get_duckdb_pool() -> DuckdbConnectionPool:
+    """Return the DuckdbConnectionPool of current process, create a default one if needed"""
+    global _default_pool
+    if _default_pool is None:
+        with _default_pool_lock:
+            if _default_pool is None:
+                _default_pool = DuckdbConnectionPool()
+    return _default_pool
+
+
+def set_duckdb_pool(pool: DuckdbConnectionPool) -> None:
+    global _default_pool
+    _default_pool = pool
@@ -0,0 +1,175 @@
+"""Process-wide pooled HTTP clients.
+
+Opening a new ``httpx.AsyncClient`` or ``requests`` connection per call costs a
+TCP handshake on every token stream, embedding batch and heartbeat. The clients here
+are created once per target host and keep their connections alive.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import dataclasses
+import logging
+import threading
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Dict, Optional, Tuple
+from urllib.parse import urlparse
+
+from pilot.component import BaseComponent, ComponentType, SystemApp
+
+if TYPE_CHECKING:
+    import httpx
+    import requests
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class HttpClientParameters:
+    max_connections_per_host: int = 100
+    max_keepalive_connections_per_host: int = 20
+    keepalive_expiry: float = 60
+    connect_timeout: float = 10
+    timeout: float = 180
+    # None means enable HTTP/2 when the h2 package is installed
+    http2: Optional[bool] = None
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+
+        return True
+    except ImportError:
+        return False
+
+
+def _origin(url: str) -> str:
+    parsed = urlparse(url)
+    return f"{parsed.scheme}://{parsed.netloc}"
+
+
+class HttpClientPool(BaseComponent):
+    """Lifecycle-managed HTTP client pool, one keep-alive client per target host.
+
+    Async clients are bound to the event loop that created them, so they are also
+    keyed by the running loop.
+    """
+
+    name = ComponentType.HTTP_CLIENT_POOL
+
+    def __init__(
+        self,
+        system_app: Optional[SystemApp] = None,
+        params: Optional[HttpClientParameters] = None,
+    ):
+        self.params = None
+        self.configure(params or HttpClientParameters())
+        self._async_clients: Dict[
+            Tuple[asyncio.AbstractEventLoop, str], "httpx.AsyncClient"
+        ] = {}
+        self._sync_session: Optional["requests.Session"] = None
+        self._lock = threading.Lock()
+        super().__init__(system_app)
+
+    def init_app(self, system_app: SystemApp):
+        # The registered pool becomes the default pool of current process
+        set_http_client_pool(self)
+
+    def configure(self, params: HttpClientParameters):
+        """Replace the parameters, only the clients created afterwards use them"""
+        params = dataclasses.replace(params)
+        if params.http2 is None:
+            params.http2 = _http2_available()
+        self.params = params
+
+    def _timeout(self) -> "httpx.Timeout":
+        import httpx
+
+        return httpx.Timeout(self.params.timeout, connect=self.params.connect_timeout)
+
+    def async_client(self, url: str) -> "httpx.AsyncClient":
+        """Return the shared async client for the host of url"""
+        import httpx
+
+        loop = asyncio.get_running_loop()
+        key = (loop, _origin(url))
+        client = self._async_clients.get(key)
+        if client is not None and not client.is_closed:
+            return client
+        with self._lock:
+            client = self._async_clients.get(key)
+            if client is None or client.is_closed:
+                self._prune_closed_loops()
+                limits = httpx.Limits(
+                    max_connections=self.params.max_connections_per_host,
+                    max_keepalive_connections=self.params.max_keepalive_connections_per_host,
+                    keepalive_expiry=self.params.keepalive_expiry,
+                )
+                client = httpx.AsyncClient(
+                    limits=limits, timeout=self._timeout(), http2=self.params.http2
+                )
+                self._async_clients[key] = client
+                logger.info(f"Create pooled http client for {key[1]}")
+            return client
+
+    def sync_session(self) -> "requests.Session":
+        """Return the shared synchronous session, connections are pooled per host"""
+        if self._sync_session is not None:
+            return self._sync_session
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        with self._lock:
+            if self._sync_session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(
+                    pool_connections=16,
+                    pool_maxsize=self.params.max_connections_per_host,
+                )
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                self._sync_session = session
+            return self._sync_session
+
+    def _prune_closed_loops(self):
+        for key in [k for k in self._async_clients if k[0].is_closed()]:
+            self._async_clients.pop(key, None)
+
+    async def aclose(self):
+        """Close all clients created in current event loop, close sync session"""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            keys = [k for k in self._async_clients if k[0] is loop]
+            clients = [self._async_clients.pop(k) for k in keys]
+            self._prune_closed_loops()
+        await asyncio.gather(*(c.aclose() for c in clients), return_exceptions=True)
+        self.close()
+
+    def close(self):
+        with self._lock:
+            session, self._sync_session = self._sync_session, None
+        if session is not None:
+            session.close()
+
+    async def async_before_stop(self):
+        await self.aclose()
+
+
+_default_pool: Optional[HttpClientPool] = None
+_default_pool_lock = threading.Lock()
+
+
+def get_http_client_pool() -> HttpClientPool:
+    """Return the HttpClientPool of current process, create a default one if needed"""
+    global _default_pool
+    if _default_pool is None:
+        with _default_pool_lock:
+            if _default_pool is None:
+                _default_pool = HttpClientPool()
+    return _default_pool
+
+
+def set_http_client_pool(pool: HttpClientPool) -> None:
+    global _default_pool
+    _default_pool = pool
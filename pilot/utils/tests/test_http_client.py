@@ -0,0 +1,108 @@
+"""Run unit test with command: pytest pilot/utils/tests/test_http_client.py"""
+import asyncio
+
+import pytest
+
+pytest.importorskip("httpx")
+
+from pilot.utils.http_client import (
+    HttpClientParameters,
+    HttpClientPool,
+    get_http_client_pool,
+    set_http_client_pool,
+)
+
+
+@pytest.fixture
+def pool():
+    pool = HttpClientPool(params=HttpClientParameters(http2=False))
+    yield pool
+    pool.close()
+
+
+@pytest.mark.asyncio
+async def test_async_client_reused_per_host(pool: HttpClientPool):
+    client = pool.async_client("http://127.0.0.1:8000/api/controller/models")
+    assert pool.async_client("http://127.0.0.1:8000/api/worker/generate") is client
+    assert pool.async_client("http://127.0.0.1:8001/api/worker/generate") is not client
+    assert pool.async_client("https://127.0.0.1:8000/api") is not client
+    await pool.aclose()
+
+
+def test_async_client_per_event_loop(pool: HttpClientPool):
+    async def _get_client():
+        return pool.async_client("http://127.0.0.1:8000")
+
+    loop1 = asyncio.new_event_loop()
+    loop2 = asyncio.new_event_loop()
+    try:
+        client1 = loop1.run_until_complete(_get_client())
+        assert loop1.run_until_complete(_get_client()) is client1
+        # A client can't be used by another event loop
+        client2 = loop2.run_until_complete(_get_client())
+        assert client2 is not client1
+        loop1.close()
+        # The clients of closed loops are dropped when creating a new client
+        loop3 = asyncio.new_event_loop()
+        client3 = loop3.run_until_complete(_get_client())
+        assert set(pool._async_clients.values()) == {client2, client3}
+        loop3.run_until_complete(pool.aclose())
+        loop3.close()
+        loop2.run_until_complete(pool.aclose())
+        assert not pool._async_clients
+    finally:
+        loop1.close()
+        loop2.close()
+
+
+@pytest.mark.asyncio
+async def test_aclose_closes_clients_and_session(pool: HttpClientPool):
+    client = pool.async_client("http://127.0.0.1:8000")
+    session = pool.sync_session()
+    assert pool.sync_session() is session
+
+    await pool.aclose()
+    assert client.is_closed
+    assert not pool._async_clients
+    # Created again on demand after stopping
+    new_client = pool.async_client("http://127.0.0.1:8000")
+    assert new_client is not client and not new_client.is_closed
+    assert pool.sync_session() is not session
+    await pool.aclose()
+
+
+@pytest.mark.asyncio
+async def test_async_before_stop_closes_clients(pool: HttpClientPool):
+    client = pool.async_client("http://127.0.0.1:8000")
+    await pool.async_before_stop()
+    assert client.is_closed
+
+
+@pytest.mark.asyncio
+async def test_configure_applies_to_new_clients(pool: HttpClientPool):
+    client = pool.async_client("http://127.0.0.1:8000")
+    assert client.timeout.read == 180
+    pool.configure(HttpClientParameters(timeout=5, connect_timeout=1, http2=False))
+    assert pool.async_client("http://127.0.0.1:8000") is client
+    new_client = pool.async_client("http://127.0.0.1:8001")
+    assert new_client.timeout.read == 5
+    assert new_client.timeout.connect == 1
+    await pool.aclose()
+
+
+def test_configure_resolves_http2():
+    params = HttpClientParameters()
+    pool = HttpClientPool(params=params)
+    assert isinstance(pool.params.http2, bool)
+    # The parameters of caller are not modified
+    assert params.http2 is None
+
+
+def test_registered_pool_is_default():
+    old_pool = get_http_client_pool()
+    try:
+        pool = HttpClientPool()
+        pool.init_app(None)
+        assert get_http_client_pool() is pool
+    finally:
+        set_http_client_pool(old_pool)
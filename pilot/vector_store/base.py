@@ -4,11 +4,18 @@ from abc import ABC, abstractmethod
 class VectorStoreBase(ABC):
     """base class for vector store database"""
 
+    # Whether load_document_embeddings stores the given embeddings
+    support_precomputed_embeddings: bool = False
+
     @abstractmethod
     def load_document(self, documents) -> None:
         """load document in vector database."""
         pass
 
+    def load_document_embeddings(self, documents, embeddings) -> None:
+        """load document with embeddings computed before, default embeds documents again."""
+        return self.load_document(documents)
+
     @abstractmethod
     def similar_search(self, text, topk) -> None:
         """similar search in vector database."""
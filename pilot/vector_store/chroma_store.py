@@ -1,4 +1,5 @@
 import os
+import uuid
 from typing import Any
 
 from chromadb.config import Settings
@@ -10,6 +11,8 @@ from pilot.vector_store.base import VectorStoreBase
 class ChromaStore(VectorStoreBase):
     """chroma database"""
 
+    support_precomputed_embeddings = True
+
     def __init__(self, ctx: {}) -> None:
         from langchain.vectorstores import Chroma
 
@@ -55,6 +58,28 @@ class ChromaStore(VectorStoreBase):
         self.vector_store_client.persist()
         return ids
 
+    def load_document_embeddings(self, documents, embeddings):
+        logger.info("ChromaStore load document with embeddings")
+        ids = [str(uuid.uuid1()) for _ in documents]
+        collection = self.vector_store_client._collection
+        # Chroma rejects empty metadata, upsert documents without metadata separately
+        with_metadata = [i for i, doc in enumerate(documents) if doc.metadata]
+        without_metadata = [i for i, doc in enumerate(documents) if not doc.metadata]
+        if with_metadata:
+            collection.upsert(
+                ids=[ids[i] for i in with_metadata],
+                embeddings=[embeddings[i] for i in with_metadata],
+                documents=[documents[i].page_content for i in with_metadata],
+                metadatas=[documents[i].metadata for i in with_metadata],
+            )
+        if without_metadata:
+            collection.upsert(
+                ids=[ids[i] for i in without_metadata],
+                embeddings=[embeddings[i] for i in without_metadata],
+                documents=[documents[i].page_content for i in without_metadata],
+            )
+        return ids
+
     def delete_vector_name(self, vector_name):
         logger.info(f"chroma vector_name:{vector_name} begin delete...")
         self.vector_store_client.delete_collection()
@@ -31,6 +31,14 @@ class VectorStoreConnector:
         """load document in vector database."""
         return self.client.load_document(docs)
 
+    def load_document_embeddings(self, docs, embeddings):
+        """load document with embeddings computed before."""
+        return self.client.load_document_embeddings(docs, embeddings)
+
+    @property
+    def support_precomputed_embeddings(self) -> bool:
+        return self.client.support_precomputed_embeddings
+
     def similar_search(self, docs, topk):
         """similar search in vector database."""
         return self.client.similar_search(docs, topk)
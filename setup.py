@@ -429,7 +429,16 @@ init_install_requires()
 
 setuptools.setup(
     name="db-gpt",
-    packages=find_packages(exclude=("tests", "*.tests", "*.tests.*", "examples")),
+    packages=find_packages(
+        exclude=(
+            "tests",
+            "*.tests",
+            "*.tests.*",
+            "examples",
+            "benchmarks",
+            "benchmarks.*",
+        )
+    ),
     version="0.3.8",
     author="csunny",
     author_email="cfqcsunny@gmail.com",